@@ -0,0 +1,52 @@
+"""analytics rollup tables
+
+Revision ID: 032_analytics_rollups
+Revises: 031_vocab_rename
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '032_analytics_rollups'
+down_revision = '031_vocab_rename'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('org_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('organizations.id', ondelete='CASCADE'), nullable=False, index=True),
+        sa.Column('dataset_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('form_datasets.id', ondelete='CASCADE'), nullable=False, index=True),
+        sa.Column('created_by', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('bucket', sa.String(length=20), nullable=False, server_default='day'),
+        sa.Column('time_field', sa.String(), nullable=False, server_default='_submitted_at'),
+        sa.Column('dimensions', postgresql.JSONB(), nullable=False, server_default='[]'),
+        sa.Column('measures', postgresql.JSONB(), nullable=False, server_default='[]'),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='building'),
+        sa.Column('last_built_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+    )
+    op.create_table(
+        'analytics_rollup_cells',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('rollup_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('analytics_rollups.id', ondelete='CASCADE'), nullable=False, index=True),
+        sa.Column('cell_key', sa.String(length=32), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=True),
+        sa.Column('dimensions', postgresql.JSONB(), nullable=False),
+        sa.Column('measure_key', sa.String(), nullable=False),
+        sa.Column('value_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('value_sum', sa.Float(), nullable=True),
+        sa.UniqueConstraint('rollup_id', 'cell_key', name='uq_analytics_rollup_cell'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_rollup_cells')
+    op.drop_table('analytics_rollups')
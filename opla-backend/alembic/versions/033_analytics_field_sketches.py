@@ -0,0 +1,38 @@
+"""analytics distinct-count sketches
+
+Revision ID: 033_analytics_field_sketches
+Revises: 032_analytics_rollups
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '033_analytics_field_sketches'
+down_revision = '032_analytics_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_field_sketches',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('dataset_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('form_datasets.id', ondelete='CASCADE'), nullable=False, index=True),
+        sa.Column('field_key', sa.String(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.UniqueConstraint('dataset_id', 'field_key', name='uq_analytics_field_sketch'),
+    )
+    op.create_table(
+        'analytics_field_sketch_registers',
+        sa.Column('sketch_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('analytics_field_sketches.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('register', sa.Integer(), primary_key=True),
+        sa.Column('rho', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_field_sketch_registers')
+    op.drop_table('analytics_field_sketches')
@@ -0,0 +1,40 @@
+"""background jobs with progress
+
+Revision ID: 034_background_jobs
+Revises: 033_analytics_field_sketches
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '034_background_jobs'
+down_revision = '033_analytics_field_sketches'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'background_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('org_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('organizations.id', ondelete='CASCADE'), nullable=False, index=True),
+        sa.Column('created_by', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False, server_default='queued'),
+        sa.Column('progress_done', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('progress_total', sa.BigInteger(), nullable=True),
+        sa.Column('subject_id', postgresql.UUID(as_uuid=True), nullable=True, index=True),
+        sa.Column('result_json', postgresql.JSONB(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('background_jobs')
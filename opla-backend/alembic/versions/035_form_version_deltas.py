@@ -0,0 +1,78 @@
+"""delta-encoded draft history
+
+Revision ID: 035_form_version_deltas
+Revises: 034_background_jobs
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '035_form_version_deltas'
+down_revision = '034_background_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('form_versions', sa.Column('base_version_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('form_versions.id', deferrable=True, initially='DEFERRED'), nullable=True))
+    op.add_column('form_versions', sa.Column('blueprint_delta', postgresql.JSONB(), nullable=True))
+    op.add_column('form_versions', sa.Column('delta_chain_length', sa.Integer(), nullable=False, server_default='0'))
+    op.alter_column('form_versions', 'blueprint', existing_type=postgresql.JSONB(), nullable=True)
+
+
+def downgrade() -> None:
+    # Rebuild the full blueprint of every delta-only row before the columns go.
+    from app.services import json_patch
+
+    form_versions = sa.table(
+        'form_versions',
+        sa.column('id', postgresql.UUID(as_uuid=True)),
+        sa.column('form_id', postgresql.UUID(as_uuid=True)),
+        sa.column('base_version_id', postgresql.UUID(as_uuid=True)),
+        sa.column('blueprint', postgresql.JSONB()),
+        sa.column('blueprint_delta', postgresql.JSONB()),
+    )
+    bind = op.get_bind()
+    form_ids = bind.execute(
+        sa.select(form_versions.c.form_id).where(form_versions.c.blueprint.is_(None)).distinct()
+    ).scalars().all()
+    for form_id in form_ids:
+        rows = {
+            row.id: row
+            for row in bind.execute(
+                sa.select(
+                    form_versions.c.id,
+                    form_versions.c.base_version_id,
+                    form_versions.c.blueprint,
+                    form_versions.c.blueprint_delta,
+                ).where(form_versions.c.form_id == form_id)
+            )
+        }
+        blueprints = {version_id: row.blueprint for version_id, row in rows.items() if row.blueprint is not None}
+        for version_id in rows:
+            # Walk back to the nearest keyframe (or already rebuilt row), then replay forward.
+            chain = []
+            current = version_id
+            while current not in blueprints:
+                if current not in rows:
+                    raise RuntimeError(f"Form version history is incomplete for form {form_id}")
+                chain.append(current)
+                current = rows[current].base_version_id
+            for rebuilt_id in reversed(chain):
+                blueprints[rebuilt_id] = json_patch.apply(blueprints[current], rows[rebuilt_id].blueprint_delta or [])
+                current = rebuilt_id
+        for version_id, row in rows.items():
+            if row.blueprint is None:
+                bind.execute(
+                    form_versions.update()
+                    .where(form_versions.c.id == version_id)
+                    .values(blueprint=blueprints[version_id])
+                )
+
+    op.alter_column('form_versions', 'blueprint', existing_type=postgresql.JSONB(), nullable=False)
+    op.drop_column('form_versions', 'delta_chain_length')
+    op.drop_column('form_versions', 'blueprint_delta')
+    op.drop_column('form_versions', 'base_version_id')
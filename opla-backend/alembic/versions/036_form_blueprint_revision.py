@@ -0,0 +1,23 @@
+"""blueprint revision for optimistic draft patches
+
+Revision ID: 036_form_blueprint_revision
+Revises: 035_form_version_deltas
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '036_form_blueprint_revision'
+down_revision = '035_form_version_deltas'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('forms', sa.Column('blueprint_revision', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('forms', 'blueprint_revision')
@@ -0,0 +1,34 @@
+"""content-addressed cache of AI survey responses
+
+Revision ID: 037_ai_response_cache
+Revises: 036_form_blueprint_revision
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '037_ai_response_cache'
+down_revision = '036_form_blueprint_revision'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ai_response_cache',
+        sa.Column('key', sa.String(length=64), primary_key=True),
+        sa.Column('step', sa.String(length=32), nullable=False),
+        sa.Column('model', sa.String(length=128), nullable=False),
+        sa.Column('value', postgresql.JSONB(), nullable=False),
+        sa.Column('hit_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False, server_default=sa.text('now()'), index=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False, index=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ai_response_cache')
@@ -0,0 +1,25 @@
+"""build analytics field sketches in background jobs
+
+Revision ID: 038_analytics_field_sketch_status
+Revises: 037_ai_response_cache
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '038_analytics_field_sketch_status'
+down_revision = '037_ai_response_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Sketches that already exist were built inline, so they are ready.
+    op.add_column('analytics_field_sketches', sa.Column('status', sa.String(16), nullable=False, server_default='ready'))
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM analytics_field_sketches WHERE status <> 'ready'")
+    op.drop_column('analytics_field_sketches', 'status')
@@ -0,0 +1,33 @@
+"""debounce attention reconcile through the projects table
+
+Revision ID: 039_project_attention_reconcile_due
+Revises: 038_analytics_field_sketch_status
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '039_project_attention_reconcile_due'
+down_revision = '038_analytics_field_sketch_status'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('projects', sa.Column('attention_reconcile_due_at', sa.DateTime(), nullable=True))
+    op.add_column('projects', sa.Column('attention_reconcile_requested_at', sa.DateTime(), nullable=True))
+    op.add_column(
+        'projects',
+        sa.Column('attention_reconcile_actor_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+    )
+    op.create_index('ix_projects_attention_reconcile_due_at', 'projects', ['attention_reconcile_due_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_projects_attention_reconcile_due_at', table_name='projects')
+    op.drop_column('projects', 'attention_reconcile_actor_id')
+    op.drop_column('projects', 'attention_reconcile_requested_at')
+    op.drop_column('projects', 'attention_reconcile_due_at')
@@ -0,0 +1,28 @@
+"""build analytics rollups in background jobs
+
+Revision ID: 040_analytics_rollup_pending
+Revises: 039_project_attention_reconcile_due
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '040_analytics_rollup_pending'
+down_revision = '039_project_attention_reconcile_due'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_rollup_pending',
+        sa.Column('rollup_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('analytics_rollups.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('submission_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('submissions.id', ondelete='CASCADE'), primary_key=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_rollup_pending')
@@ -0,0 +1,15 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for routes that return plain dicts/rows instead of Pydantic models.
+
+    Serializes with pydantic-core's Rust encoder (UUIDs, datetimes and enums
+    included), so large listings skip per-row model validation entirely.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
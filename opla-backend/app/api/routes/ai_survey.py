@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import uuid
+from typing import Any, AsyncIterator, Awaitable
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.dependencies import get_current_user, get_db
@@ -28,38 +32,102 @@ from app.services.project_access_service import ProjectAccessService
 router = APIRouter(prefix="/ai/survey", tags=["ai-survey"])
 project_router = APIRouter(prefix="/projects/{project_id}/ai-survey", tags=["ai-survey"])
 
+DISCONNECT_POLL_SECONDS = 0.5
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _until_disconnect(request: Request, work: Awaitable[Any]) -> Any:
+    """Await ``work``, cancelling it (and its provider calls) if the client goes away."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 @router.post("/interview", response_model=InterviewResponse)
-def interview(
+async def interview(
+    request: Request,
     body: InterviewRequest,
     current_user: User = Depends(get_current_user),
 ):
     try:
-        questions = ai_survey_service.generate_interview_questions(body.brief)
+        questions = await _until_disconnect(request, ai_survey_service.generate_interview_questions(body.brief))
     except ai_survey_service.AiSurveyServiceError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     return InterviewResponse(questions=questions)
 
 
 @router.post("/draft", response_model=DraftResponse)
-def draft(
+async def draft(
+    request: Request,
     body: DraftRequest,
     current_user: User = Depends(get_current_user),
 ):
     try:
-        result = ai_survey_service.draft_survey_markdown(body.brief, body.answers)
+        result = await _until_disconnect(request, ai_survey_service.draft_survey_markdown(body.brief, body.answers))
     except ai_survey_service.AiSurveyServiceError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     return DraftResponse(title=result["title"], markdown=result["markdown"])
 
 
+@router.post("/draft/stream")
+async def draft_stream(
+    body: DraftRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """Server-sent events: ``outline``, then one ``section`` per drafted section as it
+    compiles (in completion order), then ``done`` with the full draft or ``error``."""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(event: str, data: dict) -> None:
+        await queue.put((event, data))
+
+    async def work() -> None:
+        try:
+            result = await ai_survey_service.draft_survey_markdown(body.brief, body.answers, on_event=emit)
+        except ai_survey_service.AiSurveyServiceError as exc:
+            await queue.put(("error", {"detail": str(exc)}))
+        except Exception:
+            await queue.put(("error", {"detail": "Drafting failed"}))
+            raise
+        else:
+            await queue.put(("done", result))
+
+    async def events() -> AsyncIterator[str]:
+        # The response is cancelled when the client disconnects, taking the draft with it.
+        task = asyncio.ensure_future(work())
+        try:
+            while True:
+                event, data = await queue.get()
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event in ("done", "error"):
+                    break
+        finally:
+            task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/revise", response_model=ReviseResponse)
-def revise(
+async def revise(
+    request: Request,
     body: ReviseRequest,
     current_user: User = Depends(get_current_user),
 ):
     try:
-        markdown = ai_survey_service.revise_survey_markdown(body.markdown, body.instruction)
+        markdown = await _until_disconnect(request, ai_survey_service.revise_survey_markdown(body.markdown, body.instruction))
     except ai_survey_service.AiSurveyServiceError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     return ReviseResponse(markdown=markdown)
@@ -71,14 +139,10 @@ def compile_markdown(
     current_user: User = Depends(get_current_user),
 ):
     try:
-        result = ai_survey_service.compile_markdown(body.markdown)
+        preview = ai_survey_service.compile_markdown_preview(body.markdown, body.base_revision)
     except ai_survey_service.AiSurveyServiceError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-    return CompileResponse(
-        title=result.title,
-        blueprint=result.blueprint,
-        warnings=result.warnings,
-    )
+    return CompileResponse(**preview)
 
 
 @project_router.post("/generate", response_model=FormOut, status_code=status.HTTP_201_CREATED)
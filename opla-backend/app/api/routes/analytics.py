@@ -1,7 +1,12 @@
+import os
+import shutil
+import tempfile
 import uuid
+from datetime import timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
 
 from app.api.dependencies import get_current_user, get_db, get_user_org_role
@@ -9,11 +14,17 @@ from app.api.schemas.analytics import (
     AnalyticsDashboardCreate,
     AnalyticsDashboardOut,
     AnalyticsDashboardUpdate,
+    AnalyticsQueryCancelOut,
     AnalyticsQueryRequest,
     AnalyticsQueryResponse,
+    AnalyticsRollupCreate,
+    AnalyticsRollupOut,
     AnalyticsSource,
     ComparePeriodRequest,
     ComparePeriodResponse,
+    CsvImportOut,
+    DashboardRunRequest,
+    DashboardRunResponse,
     DerivedDatasetCreate,
     DerivedDatasetOut,
     GroupBySpec,
@@ -22,7 +33,11 @@ from app.api.schemas.analytics import (
     SavedQuestionUpdate,
 )
 from app.models.user import User
+from app.services.analytics_guard_service import AnalyticsQueryGuard, is_query_canceled
+from app.services.analytics_rollup_service import AnalyticsRollupService
 from app.services.analytics_service import AnalyticsService
+from app.services.csv_import_service import CsvImportService
+from app.services.dashboard_run_service import DashboardRunService
 
 
 router = APIRouter(prefix="/organizations/{org_id}/analytics", tags=["analytics"])
@@ -66,7 +81,6 @@ def create_derived_dataset(
             "PROJECT_NOT_ACTIVE": (409, "Project is not active"),
             "INVALID_MODE": (400, "Mode must be snapshot or linked"),
             "COLUMNS_REQUIRED": (400, "At least one column is required"),
-            "ROWS_REQUIRED_FOR_SNAPSHOT": (400, "Snapshot mode requires row data"),
         }
         if detail in status_map:
             code, message = status_map[detail]
@@ -74,15 +88,8 @@ def create_derived_dataset(
         raise HTTPException(status_code=400, detail=detail) from exc
 
 
-from fastapi import UploadFile, File
-import csv
-import io
-from app.models.form import Form
-from app.models.form_dataset import FormDataset, FormDatasetField, FormDatasetFieldStatus, FormDatasetStatus
-from app.models.submission import Submission
-
-@router.post("/upload-csv")
-async def upload_csv_dataset(
+@router.post("/upload-csv", response_model=CsvImportOut, status_code=status.HTTP_202_ACCEPTED)
+def upload_csv_dataset(
     org_id: uuid.UUID,
     project_id: uuid.UUID = Query(...),
     file: UploadFile = File(...),
@@ -90,82 +97,37 @@ async def upload_csv_dataset(
     current_user: User = Depends(get_current_user),
     membership=Depends(get_user_org_role),
 ):
-    # Parse CSV
-    content = await file.read()
-    text = content.decode('utf-8')
-    reader = csv.DictReader(io.StringIO(text))
-    rows = list(reader)
-
-    if not rows:
-        raise HTTPException(status_code=400, detail="CSV is empty")
-
-    # Determine fields
-    fields = []
-    for key in reader.fieldnames or []:
-        fields.append({
-            "field_key": key,
-            "label": key,
-            "field_type": "number" if all(row[key].replace('.','',1).isdigit() for row in rows if row.get(key)) else "string",
-            "field_identifier": f"csv_{key}"
-        })
-
-    # Create mock Form and FormDataset
-    form = Form(
-        org_id=org_id,
-        project_id=project_id,
-        title=f"Uploaded: {file.filename}",
-        created_by=current_user.id,
-        version=1,
-        published_version=1,
-        schema={"pages": [], "fields": fields}
-    )
-    db.add(form)
-    db.flush()
-
-    dataset_slug = f"csv_{form.id.hex[:8]}"
-    dataset = FormDataset(
-        form_id=form.id,
-        name=form.title,
-        slug=dataset_slug,
-        status=FormDatasetStatus.ACTIVE,
-        current_schema_version_number=1,
-    )
-    db.add(dataset)
-    db.flush()
-
-    # Create FormDatasetField records
-    for idx, f in enumerate(fields):
-        field = FormDatasetField(
-            dataset_id=dataset.id,
-            field_identifier=f["field_identifier"],
-            field_key=f["field_key"],
-            label=f["label"],
-            field_type=f["field_type"],
-            status=FormDatasetFieldStatus.ACTIVE,
-            introduced_in_version_number=1,
-        )
-        db.add(field)
-
-    # Update form dataset slug with id
-    dataset.slug = dataset_slug
-    db.flush()
-    
-    # Create Submissions
-    for row in rows:
-        sub = Submission(
-            org_id=org_id,
+    # A plain def runs in the threadpool, so spooling, sniffing and the DB work never block the event loop.
+    spool = tempfile.NamedTemporaryFile(prefix="opla-csv-", suffix=".csv", delete=False)
+    try:
+        with spool:
+            shutil.copyfileobj(file.file, spool, CsvImportService.UPLOAD_CHUNK_BYTES)
+        name = os.path.splitext(file.filename or "")[0].strip() or "CSV upload"
+        fields = CsvImportService.infer_fields(spool.name)
+        return CsvImportService.create_dataset(
+            db,
+            org_id,
             project_id=project_id,
-            form_id=form.id,
-            form_version=1,
-            data=row,
-            created_by=current_user.id
+            name=f"Uploaded: {name}",
+            fields=fields,
+            file_path=spool.name,
+            user_id=current_user.id,
         )
-        db.add(sub)
-    
-    db.commit()
-    db.refresh(dataset)
-    return {"status": "success", "dataset_id": dataset.id, "row_count": len(rows)}
-
+    except ValueError as exc:
+        os.unlink(spool.name)
+        detail = str(exc)
+        status_map = {
+            "CSV_EMPTY": (400, "CSV is empty"),
+            "PROJECT_NOT_FOUND": (404, "Project not found"),
+            "PROJECT_NOT_ACTIVE": (409, "Project is not active"),
+        }
+        if detail in status_map:
+            code, message = status_map[detail]
+            raise HTTPException(status_code=code, detail=message) from exc
+        raise HTTPException(status_code=400, detail=detail) from exc
+    except BaseException:
+        os.unlink(spool.name)
+        raise
 
 
 @router.post("/query", response_model=AnalyticsQueryResponse)
@@ -176,24 +138,28 @@ def run_analytics_query(
     current_user: User = Depends(get_current_user),
     membership=Depends(get_user_org_role),
 ):
+    query_id = body.query_id or uuid.uuid4()
     try:
         group_by = [
             item.model_dump() if isinstance(item, GroupBySpec) else item
             for item in body.group_by
         ]
-        return AnalyticsService.execute_query(
-            db=db,
-            org_id=org_id,
-            dataset_id=body.dataset_id,
-            select_fields=body.select_fields,
-            filters=body.filters,
-            group_by=group_by,
-            aggregates=[item.model_dump() for item in body.aggregates],
-            order_by=[item.model_dump() for item in body.order_by],
-            limit=body.limit,
-            offset=body.offset,
-            calculated_fields=body.calculated_fields,
-        )
+        with AnalyticsQueryGuard.running(db, org_id, query_id):
+            result = AnalyticsService.execute_query(
+                db=db,
+                org_id=org_id,
+                dataset_id=body.dataset_id,
+                select_fields=body.select_fields,
+                filters=body.filters,
+                group_by=group_by,
+                aggregates=[item.model_dump() for item in body.aggregates],
+                order_by=[item.model_dump() for item in body.order_by],
+                limit=body.limit,
+                offset=body.offset,
+                calculated_fields=body.calculated_fields,
+                approximate=body.approximate.model_dump() if body.approximate else None,
+                max_estimated_cost=AnalyticsQueryGuard.MAX_ESTIMATED_COST,
+            )
     except ValueError as exc:
         detail = str(exc)
         if detail == "DATASET_NOT_FOUND":
@@ -202,9 +168,109 @@ def run_analytics_query(
             raise HTTPException(status_code=400, detail=f"Field not allowed: {detail.split(':', 1)[1]}") from exc
         if detail.startswith("AGG_NOT_ALLOWED:"):
             raise HTTPException(status_code=400, detail=f"Aggregate not allowed: {detail.split(':', 1)[1]}") from exc
+        if detail == "QUERY_TOO_EXPENSIVE":
+            raise HTTPException(
+                status_code=422,
+                detail="Query is too expensive; add filters or group by fewer high-cardinality fields",
+            ) from exc
+        if detail == "ANALYTICS_QUEUE_FULL":
+            raise HTTPException(status_code=429, detail="Too many analytics queries running; try again shortly") from exc
+        raise HTTPException(status_code=400, detail=detail) from exc
+    except DBAPIError as exc:
+        if not is_query_canceled(exc):
+            raise
+        db.rollback()
+        raise HTTPException(status_code=408, detail="Query was cancelled or timed out") from exc
+    result["query_id"] = query_id
+    return result
+
+
+@router.post("/queries/{query_id}/cancel", response_model=AnalyticsQueryCancelOut)
+def cancel_analytics_query(
+    org_id: uuid.UUID,
+    query_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    if not AnalyticsQueryGuard.cancel(db, org_id, query_id):
+        raise HTTPException(status_code=404, detail="Query is not running")
+    return {"query_id": query_id, "cancelled": True}
+
+
+@router.post("/datasets/{dataset_id}/rollups", response_model=AnalyticsRollupOut, status_code=status.HTTP_201_CREATED)
+def create_analytics_rollup(
+    org_id: uuid.UUID,
+    dataset_id: uuid.UUID,
+    body: AnalyticsRollupCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    try:
+        return AnalyticsRollupService.create_rollup(
+            db,
+            org_id,
+            dataset_id,
+            name=body.name.strip(),
+            bucket=body.bucket,
+            time_field=body.time_field,
+            dimensions=body.dimensions,
+            measures=body.measures,
+            user_id=current_user.id,
+        )
+    except ValueError as exc:
+        detail = str(exc)
+        if detail == "DATASET_NOT_FOUND":
+            raise HTTPException(status_code=404, detail="Dataset not found") from exc
+        if detail == "ROLLUP_LINKED_DATASET":
+            raise HTTPException(status_code=400, detail="Declare rollups on the parent of a linked dataset") from exc
+        if detail.startswith("FIELD_NOT_ALLOWED:"):
+            raise HTTPException(status_code=400, detail=f"Field not allowed: {detail.split(':', 1)[1]}") from exc
         raise HTTPException(status_code=400, detail=detail) from exc
 
 
+@router.get("/datasets/{dataset_id}/rollups", response_model=list[AnalyticsRollupOut])
+def list_analytics_rollups(
+    org_id: uuid.UUID,
+    dataset_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    return AnalyticsRollupService.list_rollups(db, org_id, dataset_id)
+
+
+@router.post("/rollups/{rollup_id}/rebuild", response_model=AnalyticsRollupOut)
+def rebuild_analytics_rollup(
+    org_id: uuid.UUID,
+    rollup_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    rollup = AnalyticsRollupService.get_rollup(db, org_id, rollup_id)
+    if not rollup:
+        raise HTTPException(status_code=404, detail="Rollup not found")
+    AnalyticsRollupService.request_build(db, rollup, user_id=current_user.id)
+    db.refresh(rollup)
+    return rollup
+
+
+@router.delete("/rollups/{rollup_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_analytics_rollup(
+    org_id: uuid.UUID,
+    rollup_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    rollup = AnalyticsRollupService.get_rollup(db, org_id, rollup_id)
+    if not rollup:
+        raise HTTPException(status_code=404, detail="Rollup not found")
+    AnalyticsRollupService.delete_rollup(db, rollup)
+
+
 @router.post("/compare", response_model=ComparePeriodResponse)
 def compare_analytics_period(
     org_id: uuid.UUID,
@@ -213,6 +279,9 @@ def compare_analytics_period(
     current_user: User = Depends(get_current_user),
     membership=Depends(get_user_org_role),
 ):
+    as_of = body.as_of
+    if as_of is not None and as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
     try:
         return AnalyticsService.compare_period(
             db=db,
@@ -223,9 +292,14 @@ def compare_analytics_period(
             date_field=body.date_field,
             period=body.period,
             filters=body.filters,
+            series_length=body.series_length,
+            as_of=as_of,
         )
     except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
+        detail = str(exc)
+        if detail in {"DATASET_NOT_FOUND", "PARENT_DATASET_NOT_FOUND"}:
+            raise HTTPException(status_code=404, detail="Dataset not found") from exc
+        raise HTTPException(status_code=400, detail=detail) from exc
 
 
 @router.post("/questions", response_model=SavedQuestionOut, status_code=status.HTTP_201_CREATED)
@@ -344,6 +418,27 @@ def update_dashboard(
     return AnalyticsService.update_dashboard(db, dashboard, body.model_dump(exclude_unset=True))
 
 
+@router.post("/dashboards/{dashboard_id}/run", response_model=DashboardRunResponse)
+def run_dashboard(
+    org_id: uuid.UUID,
+    dashboard_id: uuid.UUID,
+    body: DashboardRunRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    dashboard = AnalyticsService.get_dashboard(db, dashboard_id)
+    if not dashboard or dashboard.org_id != org_id:
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+    return DashboardRunService.run_dashboard(
+        dashboard,
+        org_id=org_id,
+        extra_filters=body.filters,
+        card_ids=set(body.card_ids) if body.card_ids is not None else None,
+        timeout_seconds=body.timeout_seconds,
+    )
+
+
 @router.delete("/dashboards/{dashboard_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_dashboard(
     org_id: uuid.UUID,
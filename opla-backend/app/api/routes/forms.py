@@ -1,11 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from app.api.schemas.automation import FormAutomationRuleCreate, FormAutomationRuleOut, FormAutomationRuleUpdate
+from typing import List, Dict, Optional
+from app.api.schemas.automation import (
+    FormAutomationBacktestIn,
+    FormAutomationBacktestOut,
+    FormAutomationRuleCreate,
+    FormAutomationRuleOut,
+    FormAutomationRuleUpdate,
+)
 from app.api.dependencies import get_current_user, get_db
+from app.api.schemas.job import BackgroundJobOut
 from app.api.schemas.dataset import FormDatasetOut, FormDatasetUpdateIn, LookupDatasetSourceOut, LookupOptionsOut
 from app.api.schemas.form import (
+    BlueprintPatchIn,
+    BlueprintPatchOut,
     DirectoryDesignationIn,
     DirectoryEntryDeleteOut,
     DirectoryEntryOut,
@@ -22,6 +31,7 @@ from app.api.schemas.form import (
     PublishFormIn,
     FormResponsibilityUpdateIn,
 )
+from app.services.background_job_service import BackgroundJobService
 from app.services.directory_form_service import DirectoryFormService
 from app.services.dataset_service import DatasetService
 from app.services.form_automation_service import FormAutomationService
@@ -140,6 +150,7 @@ def update_form_blueprint(
     form_id: uuid.UUID,
     blueprint: Dict,
     target_slot: int = 1,
+    base_revision: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -155,23 +166,51 @@ def update_form_blueprint(
             blueprint,
             target_slot=target_slot,
             updated_by=current_user.id,
+            base_revision=base_revision,
         )
     except ValueError as exc:
+        if str(exc) == "BLUEPRINT_REVISION_CONFLICT":
+            raise HTTPException(
+                status_code=409, detail="Blueprint has changed since this revision; reload and retry"
+            ) from exc
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     return form
 
-@router.patch("/{form_id}/blueprint", response_model=FormOut)
-def update_form_blueprint_patch(
+@router.patch("/{form_id}/blueprint", response_model=BlueprintPatchOut)
+def patch_form_blueprint(
     form_id: uuid.UUID,
-    blueprint: Dict,
+    payload: BlueprintPatchIn,
     target_slot: int = 1,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return update_form_blueprint(form_id, blueprint, target_slot, db, current_user)
+    source_form = FormService.get_form(db, form_id)
+    if not source_form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_edit_form(db, current_user.id, source_form)
+
+    try:
+        form = FormService.patch_blueprint(
+            db,
+            form_id,
+            payload.operations,
+            payload.base_revision,
+            target_slot=target_slot,
+            updated_by=current_user.id,
+        )
+    except ValueError as exc:
+        if str(exc) == "BLUEPRINT_REVISION_CONFLICT":
+            raise HTTPException(
+                status_code=409, detail="Blueprint has changed since this revision; reload and retry"
+            ) from exc
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    return form
 
 
 @router.get("/{form_id}/versions", response_model=List[FormVersionOut])
@@ -187,6 +226,44 @@ def list_form_versions(
     return FormService.get_form_versions(db, form_id)
 
 
+@router.get("/{form_id}/versions/{version_id}", response_model=FormVersionOut)
+def get_form_version(
+    form_id: uuid.UUID,
+    version_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    form = FormService.get_form(db, form_id)
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_view_form(db, current_user.id, form)
+
+    version = FormService.get_form_version(db, form_id, version_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Form version not found")
+    payload = FormVersionOut.model_validate(version)
+    payload.blueprint = FormService.get_version_blueprint(db, version)
+    return payload
+
+
+@router.post("/{form_id}/versions/compact", response_model=BackgroundJobOut, status_code=status.HTTP_202_ACCEPTED)
+def compact_form_versions(
+    form_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    form = FormService.get_form(db, form_id)
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_edit_form(db, current_user.id, form)
+
+    job = BackgroundJobService.create(
+        db, form.project.org_id, "form_history_compaction", user_id=current_user.id, subject_id=form.id
+    )
+    BackgroundJobService.start(job.id, lambda job_db, progress: FormService.compact_draft_history(job_db, form_id, progress))
+    return job
+
+
 @router.get("/{form_id}/dataset", response_model=FormDatasetOut)
 def get_form_dataset(
     form_id: uuid.UUID,
@@ -278,6 +355,9 @@ def publish_form(
     DirectoryFormService.validate_ready_to_publish(source_form)
 
     payload = payload or PublishFormIn()
+    if payload.migrate_renamed_keys:
+        # Moving answers can touch every submission; only the publish job does that.
+        raise HTTPException(status_code=400, detail="Use the publish job to migrate renamed keys")
 
     try:
         form = FormService.publish_form(
@@ -289,6 +369,8 @@ def publish_form(
             published_by=current_user.id,
         )
     except ValueError as exc:
+        if str(exc) == "PUBLISH_CONFLICT":
+            raise HTTPException(status_code=409, detail="Form was published concurrently") from exc
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     if not form:
@@ -296,6 +378,45 @@ def publish_form(
     return form
 
 
+@router.post("/{form_id}/publish-job", response_model=BackgroundJobOut, status_code=status.HTTP_202_ACCEPTED)
+def publish_form_in_background(
+    form_id: uuid.UUID,
+    payload: PublishFormIn | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Publish as a tracked job; progress counts submissions migrated to renamed keys."""
+    source_form = FormService.get_form(db, form_id)
+    if not source_form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_publish_form(db, current_user.id, source_form)
+    DirectoryFormService.validate_ready_to_publish(source_form)
+
+    payload = payload or PublishFormIn()
+    if BackgroundJobService.has_active(db, "form_publish", source_form.id):
+        raise HTTPException(status_code=409, detail="Form is already being published")
+    publisher_id = current_user.id
+    job = BackgroundJobService.create(
+        db, source_form.project.org_id, "form_publish", user_id=publisher_id, subject_id=source_form.id
+    )
+    BackgroundJobService.start(
+        job.id,
+        lambda job_db, progress: FormService.run_publish_job(
+            job_db,
+            progress,
+            form_id,
+            draft_version_id=payload.draft_version_id,
+            draft_slot=payload.draft_slot,
+            changelog=payload.changelog,
+            published_by=publisher_id,
+            migrate_renamed_keys=payload.migrate_renamed_keys,
+        ),
+        # Publishing must not wait behind bulk imports and snapshots.
+        priority=True,
+    )
+    return job
+
+
 # ---------------------------------------------------------------------------
 # Directory-specific endpoints
 # ---------------------------------------------------------------------------
@@ -540,6 +661,70 @@ def delete_form_automation_rule(
     return None
 
 
+@router.post("/{form_id}/automation-rules/{rule_id}/backtest", response_model=FormAutomationBacktestOut)
+def backtest_form_automation_rule(
+    form_id: uuid.UUID,
+    rule_id: uuid.UUID,
+    payload: FormAutomationBacktestIn | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    form = FormService.get_form(db, form_id)
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_edit_form(db, current_user.id, form)
+    rule = FormAutomationService.get_rule(db, form_id, rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Automation rule not found")
+    payload = payload or FormAutomationBacktestIn()
+    try:
+        return FormAutomationService.backtest_rule(
+            db,
+            rule,
+            event_type=payload.event_type,
+            conditions_json=payload.conditions_json,
+            sample_size=payload.sample_size,
+        )
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Conditions could not be evaluated: {exc}") from exc
+
+
+@router.post(
+    "/{form_id}/automation-rules/{rule_id}/apply",
+    response_model=BackgroundJobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def apply_form_automation_rule_to_existing(
+    form_id: uuid.UUID,
+    rule_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Apply a rule to existing submissions as a tracked job; the result holds the apply summary."""
+    form = FormService.get_form(db, form_id)
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_edit_form(db, current_user.id, form)
+    if form.project and form.project.status != ProjectStatus.ACTIVE:
+        raise HTTPException(status_code=409, detail="Project is not active")
+    rule = FormAutomationService.get_rule(db, form_id, rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Automation rule not found")
+    if not rule.is_active:
+        raise HTTPException(status_code=409, detail="Automation rule is inactive")
+    actor_id = current_user.id
+    job = BackgroundJobService.create(
+        db, form.project.org_id, "form_automation_apply", user_id=actor_id, subject_id=rule.id
+    )
+    BackgroundJobService.start(
+        job.id,
+        lambda job_db, progress: FormAutomationService.apply_rule_to_existing(
+            job_db, form_id, rule_id, actor_id=actor_id, progress=progress
+        ),
+    )
+    return job
+
+
 def _serialize_media_item(item) -> FormSubmissionMediaOut:
     out = FormSubmissionMediaOut.model_validate(item)
     out.previewable = FormSubmissionMediaService.is_previewable_url(item.url)
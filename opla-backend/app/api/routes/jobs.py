@@ -0,0 +1,26 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.dependencies import get_current_user, get_db, get_user_org_role
+from app.api.schemas.job import BackgroundJobOut
+from app.models.user import User
+from app.services.background_job_service import BackgroundJobService
+
+
+router = APIRouter(prefix="/organizations/{org_id}/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=BackgroundJobOut)
+def get_background_job(
+    org_id: uuid.UUID,
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    membership=Depends(get_user_org_role),
+):
+    job = BackgroundJobService.get(db, org_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import DataError
 from sqlalchemy.orm import Session
 from typing import List
 from app.api.dependencies import get_current_user, get_db, get_optional_user
-from app.api.schemas.submission import SubmissionCreate, PublicSubmissionCreate, SubmissionOut, SubmissionReviewUpdate
+from app.api.responses import FastJSONResponse
+from app.api.schemas.submission import (
+    PublicSubmissionCreate,
+    SubmissionBulkReviewIn,
+    SubmissionBulkReviewOut,
+    SubmissionCountOut,
+    SubmissionCreate,
+    SubmissionListOut,
+    SubmissionOut,
+    SubmissionReviewUpdate,
+)
 from app.api.schemas.form import DirectoryLookupOptionsOut, FormRuntimeOut
 from app.api.schemas.dataset import LookupOptionsOut
 from app.services.directory_form_service import DirectoryFormService
 from app.services.dataset_service import DatasetService
 from app.services.submission_service import SubmissionService
+from app.services.submission_validation import SubmissionValidationError
 from app.services.project_access_service import ProjectAccessService
 from app.services.form_service import FormService
 from app.models.user import User
@@ -35,8 +49,11 @@ def create_submission(
             form_id=submission_in.form_id,
             data=submission_in.data,
             user_id=current_user.id,
-            metadata=submission_in.metadata
+            metadata=submission_in.metadata,
+            validation_mode=submission_in.validation_mode,
         )
+    except SubmissionValidationError as exc:
+        raise HTTPException(status_code=422, detail={"code": str(exc), "issues": exc.issues}) from exc
     except ValueError as exc:
         if str(exc) == "FORM_NOT_PUBLISHED":
             raise HTTPException(status_code=409, detail="Form is not deployed") from exc
@@ -45,10 +62,18 @@ def create_submission(
         raise
 
 
-@router.get("/forms/{form_id}/submissions", response_model=List[SubmissionOut])
+@router.get("/forms/{form_id}/submissions", response_model=SubmissionListOut)
 def list_form_submissions(
     form_id: uuid.UUID,
     review_status: SubmissionReviewStatus | None = None,
+    user_id: uuid.UUID | None = None,
+    submitted_after: datetime | None = None,
+    submitted_before: datetime | None = None,
+    field_filter: List[str] | None = Query(None, description="Repeatable field:operator:value filter on submission data"),
+    fields: str | None = Query(None, description="Comma-separated data keys to return; omit for the full record"),
+    include_metadata: bool = True,
+    limit: int = Query(SubmissionService.LIST_DEFAULT_LIMIT, ge=1, le=SubmissionService.LIST_MAX_LIMIT),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -56,7 +81,66 @@ def list_form_submissions(
     if not form:
         raise HTTPException(status_code=404, detail="Form not found")
     ProjectAccessService.ensure_can_review_form(db, current_user.id, form)
-    return SubmissionService.list_form_submissions(db, form_id, review_status)
+    try:
+        page = SubmissionService.list_form_submissions(
+            db,
+            form_id,
+            review_status,
+            user_id=user_id,
+            submitted_after=submitted_after,
+            submitted_before=submitted_before,
+            field_filters=field_filter,
+            fields=[key.strip() for key in fields.split(",") if key.strip()] if fields is not None else None,
+            include_metadata=include_metadata,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as exc:
+        detail = str(exc)
+        if detail == "INVALID_CURSOR":
+            raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+        if detail.startswith("INVALID_FIELD_FILTER:"):
+            raise HTTPException(status_code=400, detail=f"Invalid field filter: {detail.split(':', 1)[1]}") from exc
+        raise
+    except DataError as exc:
+        raise HTTPException(status_code=400, detail="Field filter value does not match the stored data type") from exc
+    return FastJSONResponse(page)
+
+
+@router.get("/forms/{form_id}/submissions/count", response_model=SubmissionCountOut)
+def count_form_submissions(
+    form_id: uuid.UUID,
+    review_status: SubmissionReviewStatus | None = None,
+    user_id: uuid.UUID | None = None,
+    submitted_after: datetime | None = None,
+    submitted_before: datetime | None = None,
+    field_filter: List[str] | None = Query(None, description="Repeatable field:operator:value filter on submission data"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Count matching submissions, for badges and stats that do not need the rows."""
+    form = FormService.get_form(db, form_id)
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_review_form(db, current_user.id, form)
+    try:
+        count = SubmissionService.count_form_submissions(
+            db,
+            form_id,
+            review_status,
+            user_id=user_id,
+            submitted_after=submitted_after,
+            submitted_before=submitted_before,
+            field_filters=field_filter,
+        )
+    except ValueError as exc:
+        detail = str(exc)
+        if detail.startswith("INVALID_FIELD_FILTER:"):
+            raise HTTPException(status_code=400, detail=f"Invalid field filter: {detail.split(':', 1)[1]}") from exc
+        raise
+    except DataError as exc:
+        raise HTTPException(status_code=400, detail="Field filter value does not match the stored data type") from exc
+    return SubmissionCountOut(count=count)
 
 
 @router.patch("/submissions/{submission_id}/review", response_model=SubmissionOut)
@@ -85,6 +169,49 @@ def review_submission(
         review_comment=payload.review_comment,
     )
 
+@router.post("/forms/{form_id}/submissions/review", response_model=SubmissionBulkReviewOut)
+def bulk_review_submissions(
+    form_id: uuid.UUID,
+    payload: SubmissionBulkReviewIn,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    form = FormService.get_form(db, form_id)
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
+    ProjectAccessService.ensure_can_review_form(db, current_user.id, form)
+    try:
+        submission_ids = SubmissionService.bulk_review_submissions(
+            db,
+            form,
+            review_status=payload.review_status,
+            reviewed_by=current_user.id,
+            review_comment=payload.review_comment,
+            submission_ids=payload.submission_ids,
+            current_review_status=payload.current_review_status,
+            submitted_by_user_id=payload.submitted_by_user_id,
+            submitted_by_team_id=payload.submitted_by_team_id,
+            submitted_after=payload.submitted_after,
+            submitted_before=payload.submitted_before,
+        )
+    except ValueError as exc:
+        if str(exc) == "BULK_REVIEW_SCOPE_REQUIRED":
+            raise HTTPException(
+                status_code=400,
+                detail="Provide submission_ids or at least one filter",
+            ) from exc
+        if str(exc) == "BULK_REVIEW_LIMIT_EXCEEDED":
+            raise HTTPException(
+                status_code=422,
+                detail=f"More than {SubmissionService.BULK_REVIEW_MAX_SUBMISSIONS} submissions match; narrow the filters",
+            ) from exc
+        raise
+    return SubmissionBulkReviewOut(
+        review_status=payload.review_status,
+        updated_count=len(submission_ids),
+        submission_ids=submission_ids,
+    )
+
 @router.get("/public/forms/{slug}", response_model=FormRuntimeOut)
 def get_public_form(
     slug: str,
@@ -124,8 +251,11 @@ def create_public_submission(
             form_id=form.id,
             data=submission_in.data,
             user_id=current_user.id if current_user else None,
-            metadata=submission_in.metadata
+            metadata=submission_in.metadata,
+            validation_mode=submission_in.validation_mode,
         )
+    except SubmissionValidationError as exc:
+        raise HTTPException(status_code=422, detail={"code": str(exc), "issues": exc.issues}) from exc
     except ValueError as exc:
         if str(exc) == "FORM_NOT_PUBLISHED":
             raise HTTPException(status_code=409, detail="Form is not deployed") from exc
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 
 from app.api.dependencies import get_current_user, get_db
 from app.api.schemas.walker_compute import WalkerComputePayload, WalkerComputeResponse
+from app.services.analytics_guard_service import AnalyticsQueryGuard, is_query_canceled
 from app.services.walker_compute_service import WalkerComputeService
 from app.models.user import User
 
@@ -19,17 +20,23 @@ def compute_walker_payload(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    query_id = payload.query_id or uuid.uuid4()
     try:
         start_t = time.time()
-        result = WalkerComputeService.process_payload(
-            db=db,
-            org_id=org_id,
-            dataset_id=dataset_id,
-            payload=payload.model_dump(exclude_none=True)
-        )
+        with AnalyticsQueryGuard.running(db, org_id, query_id):
+            result = WalkerComputeService.process_payload(
+                db=db,
+                org_id=org_id,
+                dataset_id=dataset_id,
+                payload=payload.model_dump(exclude_none=True, exclude={"query_id"}),
+                max_estimated_cost=AnalyticsQueryGuard.MAX_ESTIMATED_COST,
+            )
         print(f"[WalkerCompute] Query processed in {time.time() - start_t:.3f}s")
         return WalkerComputeResponse(success=True, data=result)
     except Exception as e:
+        if is_query_canceled(e):
+            db.rollback()
+            return WalkerComputeResponse(success=False, message="QUERY_CANCELLED_OR_TIMED_OUT")
         import traceback
         traceback.print_exc()
         return WalkerComputeResponse(success=False, message=str(e))
@@ -40,11 +40,16 @@ class ReviseResponse(BaseModel):
 
 class CompileRequest(BaseModel):
     markdown: str = Field(min_length=1)
+    # Revision of the caller's previous preview; when still cached the response carries a patch.
+    base_revision: Optional[str] = None
 
 
 class CompileResponse(BaseModel):
     title: str
-    blueprint: Dict[str, Any]
+    revision: str
+    # Exactly one of blueprint (full document) or patch (JSON Patch from base_revision) is set.
+    blueprint: Optional[Dict[str, Any]] = None
+    patch: Optional[List[Dict[str, Any]]] = None
     warnings: List[str] = []
 
 
@@ -54,7 +54,7 @@ class DerivedDatasetCreate(BaseModel):
     parent_dataset_id: UUID
     project_id: UUID | None = None
     columns: list[PrepColumnSpec] = Field(..., min_length=1)
-    """Required for snapshot mode — current prep rows with calculated values baked in."""
+    """Snapshot rows to store as posted; when empty, the snapshot is copied from the parent server-side."""
     rows: list[dict[str, Any]] = Field(default_factory=list)
 
 
@@ -66,6 +66,23 @@ class DerivedDatasetOut(BaseModel):
     parent_dataset_id: UUID | None = None
     row_count: int = 0
     record_count: int = 0
+    """Background job copying snapshot rows; poll /jobs/{job_id} for progress."""
+    job_id: UUID | None = None
+
+
+class CsvImportField(BaseModel):
+    key: str
+    label: str
+    field_type: str
+
+
+class CsvImportOut(BaseModel):
+    dataset_id: UUID
+    form_id: UUID
+    name: str
+    """Background job streaming rows into the dataset; poll /jobs/{job_id} for progress."""
+    job_id: UUID
+    fields: list[CsvImportField] = Field(default_factory=list)
 
 
 class AggregateSpec(BaseModel):
@@ -84,6 +101,11 @@ class GroupBySpec(BaseModel):
     bucket: str | None = None
 
 
+class ApproximateQuerySpec(BaseModel):
+    sample_percent: float | None = Field(None, gt=0, le=100)
+    seed: int = Field(0, ge=0)
+
+
 class AnalyticsQueryRequest(BaseModel):
     dataset_id: UUID
     select_fields: list[str] = Field(default_factory=list)
@@ -94,6 +116,9 @@ class AnalyticsQueryRequest(BaseModel):
     limit: int = Field(500, ge=1, le=10000)
     offset: int = Field(0, ge=0)
     calculated_fields: list[dict[str, Any]] = Field(default_factory=list)
+    approximate: ApproximateQuerySpec | None = None
+    # Client-chosen id so the query can be cancelled while it runs.
+    query_id: UUID | None = None
 
 
 class AnalyticsQueryResponse(BaseModel):
@@ -102,6 +127,37 @@ class AnalyticsQueryResponse(BaseModel):
     total_count: int
     truncated: bool = False
     derived: AnalyticsSourceDerived | None = None
+    rollup_id: UUID | None = None
+    approximate: dict[str, Any] | None = None
+    query_id: UUID | None = None
+
+
+class AnalyticsQueryCancelOut(BaseModel):
+    query_id: UUID
+    cancelled: bool
+
+
+class AnalyticsRollupCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    bucket: str = Field("day", pattern="^(hour|day)$")
+    time_field: str = "_submitted_at"
+    dimensions: list[str] = Field(default_factory=list, max_length=8)
+    measures: list[str] = Field(default_factory=list, max_length=16)
+
+
+class AnalyticsRollupOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    dataset_id: UUID
+    name: str
+    bucket: str
+    time_field: str
+    dimensions: list[str]
+    measures: list[str]
+    status: str
+    last_built_at: datetime | None = None
+    created_at: datetime
 
 
 class SavedQuestionCreate(BaseModel):
@@ -177,6 +233,27 @@ class AnalyticsDashboardUpdate(BaseModel):
     is_archived: bool | None = None
 
 
+class DashboardRunRequest(BaseModel):
+    filters: dict[str, Any] | None = None
+    card_ids: list[UUID] | None = None
+    timeout_seconds: float = Field(15.0, gt=0, le=60)
+
+
+class DashboardCardRunResult(BaseModel):
+    card_id: UUID
+    question_id: UUID
+    status: str
+    result: AnalyticsQueryResponse | None = None
+    error: str | None = None
+
+
+class DashboardRunResponse(BaseModel):
+    dashboard_id: UUID
+    query_count: int
+    elapsed_ms: int
+    cards: list[DashboardCardRunResult]
+
+
 class ComparePeriodRequest(BaseModel):
     dataset_id: UUID
     measure_field: str
@@ -184,14 +261,31 @@ class ComparePeriodRequest(BaseModel):
     date_field: str = "_submitted_at"
     period: str = Field("month", pattern="^(day|week|month|quarter|year)$")
     filters: dict[str, Any] | None = None
+    series_length: int = Field(12, ge=1, le=60)
+    as_of: datetime | None = None
+
+
+class ComparePeriodPoint(BaseModel):
+    start: datetime
+    end: datetime
+    value: float | None = None
 
 
 class ComparePeriodResponse(BaseModel):
-    current_value: float
-    previous_value: float
+    current_value: float | None = None
+    previous_value: float | None = None
+    last_year_value: float | None = None
     delta_pct: float | None = None
+    last_year_delta_pct: float | None = None
     direction: str
     period: str
+    current_start: datetime
+    current_end: datetime
+    previous_start: datetime
+    previous_end: datetime
+    last_year_start: datetime
+    last_year_end: datetime
+    series: list[ComparePeriodPoint] = Field(default_factory=list)
 
 
 class AnalyticsDashboardOut(BaseModel):
@@ -1,10 +1,11 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.models.form_automation_rule import FormAutomationAction, FormAutomationEvent
+from app.models.submission import SubmissionReviewStatus
 
 
 class FormAutomationRuleBase(BaseModel):
@@ -38,4 +39,30 @@ class FormAutomationRuleOut(FormAutomationRuleBase):
     form_id: UUID
     created_by: Optional[UUID] = None
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+
+class FormAutomationBacktestIn(BaseModel):
+    # Optional overrides so unsaved edits can be previewed against existing data.
+    event_type: Optional[FormAutomationEvent] = None
+    conditions_json: Optional[Dict[str, Any]] = None
+    sample_size: int = Field(default=20, ge=0, le=200)
+
+
+class FormAutomationBacktestMatchOut(BaseModel):
+    submission_id: UUID
+    user_id: Optional[UUID] = None
+    review_status: SubmissionReviewStatus
+    created_at: datetime
+    data: Dict[str, Any]
+
+
+class FormAutomationBacktestOut(BaseModel):
+    rule_id: UUID
+    event_type: FormAutomationEvent
+    candidate_count: int
+    scanned_count: int
+    matched_count: int
+    pushed_down: bool
+    samples: List[FormAutomationBacktestMatchOut]
+
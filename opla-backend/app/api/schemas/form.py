@@ -49,6 +49,7 @@ class FormOut(FormBase):
     current_dataset_schema_version_number: Optional[int] = None
     blueprint_draft: Optional[Dict] = None
     blueprint_live: Optional[Dict] = None
+    blueprint_revision: int = 0
     version: int
     published_version: Optional[int] = None
     published_at: Optional[datetime] = None
@@ -110,10 +111,27 @@ class FormStatsOut(BaseModel):
     last_submitted_at: Optional[datetime] = None
 
 
+class BlueprintPatchIn(BaseModel):
+    """RFC 6902 operations or field-level operations (add_field, update_field,
+    move_field, remove_field, reorder_sections) against blueprint revision base_revision."""
+    base_revision: int
+    operations: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class BlueprintPatchOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    blueprint_revision: int
+    updated_at: datetime
+
+
 class PublishFormIn(BaseModel):
     draft_version_id: Optional[UUID] = None
     draft_slot: Optional[int] = None
     changelog: Optional[str] = None
+    # Move existing answers to the new key of fields whose key changed but id did not.
+    migrate_renamed_keys: bool = False
 
 
 class FormVersionsListOut(BaseModel):
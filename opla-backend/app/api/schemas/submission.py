@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 from datetime import datetime
 from typing import Optional, Dict, List
@@ -9,10 +9,16 @@ class SubmissionCreate(BaseModel):
     form_id: UUID
     data: Dict
     metadata: Optional[Dict] = None
+    # strict rejects the submission on any invalid answer; lenient stores it without them and
+    # keeps each rejected value in metadata.validation_issues.
+    # Lenient by default so older clients and offline queues built against an earlier
+    # form version are not rejected (and eventually dropped) after a publish.
+    validation_mode: str = Field("lenient", pattern="^(strict|lenient)$")
 
 class PublicSubmissionCreate(BaseModel):
     data: Dict
     metadata: Optional[Dict] = None
+    validation_mode: str = Field("lenient", pattern="^(strict|lenient)$")
 
 
 class SubmissionReviewUpdate(BaseModel):
@@ -20,8 +26,30 @@ class SubmissionReviewUpdate(BaseModel):
     review_comment: Optional[str] = None
 
 
+class SubmissionBulkReviewIn(BaseModel):
+    review_status: SubmissionReviewStatus
+    review_comment: Optional[str] = None
+    # Explicit ids and filters combine; at least one is required so a bare request cannot review the whole form.
+    submission_ids: Optional[List[UUID]] = Field(default=None, max_length=5000)
+    current_review_status: Optional[SubmissionReviewStatus] = None
+    submitted_by_user_id: Optional[UUID] = None
+    submitted_by_team_id: Optional[UUID] = None
+    submitted_after: Optional[datetime] = None
+    submitted_before: Optional[datetime] = None
+
+
+class SubmissionBulkReviewOut(BaseModel):
+    review_status: SubmissionReviewStatus
+    updated_count: int
+    submission_ids: List[UUID]
+
+
 class SubmissionListOut(BaseModel):
     items: List["SubmissionOut"]
+    next_cursor: Optional[str] = None
+
+class SubmissionCountOut(BaseModel):
+    count: int
 
 class SubmissionOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
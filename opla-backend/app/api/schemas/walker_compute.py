@@ -1,4 +1,5 @@
 from typing import Any, Optional
+from uuid import UUID
 
 from pydantic import BaseModel, Field
 
@@ -8,6 +9,7 @@ class WalkerComputePayload(BaseModel):
     tag: Optional[str] = None
     limit: Optional[int] = None
     offset: Optional[int] = None
+    query_id: Optional[UUID] = None
 
 
 class WalkerComputeResponse(BaseModel):
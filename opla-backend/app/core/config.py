@@ -32,7 +32,15 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.1-8b-instant"
     GROQ_BASE_URL: str = "https://api.groq.com/openai/v1"
-    
+    # Provider limits for GROQ_MODEL; shared by every AI request in the process.
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 6000
+    GROQ_MAX_CONNECTIONS: int = 10
+    GROQ_TIMEOUT_SECONDS: float = 90.0
+    # Cache of generated AI survey steps (ai_response_cache); a TTL of 0 disables it.
+    AI_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    AI_CACHE_MAX_ENTRIES: int = 5000
+
     @property
     def cors_origins_list(self) -> List[str]:
         """Convert comma-separated CORS origins to list"""
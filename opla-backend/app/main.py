@@ -1,8 +1,24 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.routes import auth, organizations, projects, forms, submissions, roles, teams, section_templates, reports, assets, messages, analytics, walker_compute, ai_survey
+from app.api.routes import auth, organizations, projects, forms, submissions, roles, teams, section_templates, reports, assets, messages, analytics, walker_compute, ai_survey, jobs
 import app.models  # Ensure all models are loaded
+from app.services import groq_client
+from app.services.background_job_service import BackgroundJobService
+from app.services.project_attention_service import AttentionReconcileScheduler
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    BackgroundJobService.start_monitor()
+    AttentionReconcileScheduler.start()
+    yield
+    AttentionReconcileScheduler.stop()
+    BackgroundJobService.stop_monitor()
+    await groq_client.aclose()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -10,7 +26,8 @@ app = FastAPI(
     version="1.0.0",
     description="Opla Intelligence Layer - No-code form building platform",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -40,6 +57,7 @@ app.include_router(analytics.router, prefix=settings.API_V1_STR)
 app.include_router(walker_compute.router, prefix=settings.API_V1_STR)
 app.include_router(ai_survey.router, prefix=settings.API_V1_STR)
 app.include_router(ai_survey.project_router, prefix=settings.API_V1_STR)
+app.include_router(jobs.router, prefix=settings.API_V1_STR)
 # Root endpoint
 @app.get("/")
 def read_root():
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import Base
+
+
+class AiResponseCacheEntry(Base):
+    """A generated AI survey step, addressed by the hash of everything that shaped it."""
+
+    __tablename__ = "ai_response_cache"
+
+    key = Column(String(64), primary_key=True)
+    step = Column(String(32), nullable=False)
+    model = Column(String(128), nullable=False)
+    value = Column(JSONB, nullable=False)
+    hit_count = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,7 +1,8 @@
+import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import backref, relationship
 
@@ -64,3 +65,80 @@ class DashboardCard(Base):
 
     dashboard = relationship("AnalyticsDashboard", back_populates="cards")
     question = relationship("SavedQuestion", back_populates="cards")
+
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    org_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False, index=True)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("form_datasets.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    name = Column(String, nullable=False)
+    bucket = Column(String(20), nullable=False, default="day")
+    time_field = Column(String, nullable=False, default="_submitted_at")
+    dimensions = Column(JSONB, nullable=False, default=list)
+    measures = Column(JSONB, nullable=False, default=list)
+    status = Column(String(20), nullable=False, default="building")
+    last_built_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    cells = relationship("AnalyticsRollupCell", back_populates="rollup", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class AnalyticsRollupCell(Base):
+    """One (time bucket, dimension values, measure) aggregate of a rollup; measure_key "*" holds row counts."""
+
+    __tablename__ = "analytics_rollup_cells"
+    __table_args__ = (UniqueConstraint("rollup_id", "cell_key", name="uq_analytics_rollup_cell"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    rollup_id = Column(UUID(as_uuid=True), ForeignKey("analytics_rollups.id", ondelete="CASCADE"), nullable=False, index=True)
+    cell_key = Column(String(32), nullable=False)
+    bucket_start = Column(DateTime, nullable=True)
+    dimensions = Column(JSONB, nullable=False)
+    measure_key = Column(String, nullable=False)
+    value_count = Column(BigInteger, nullable=False, default=0)
+    value_sum = Column(Float, nullable=True)
+
+    rollup = relationship("AnalyticsRollup", back_populates="cells")
+
+
+class AnalyticsRollupPending(Base):
+    """A submission inserted while its rollup was building; the build job folds it in before activating."""
+
+    __tablename__ = "analytics_rollup_pending"
+
+    rollup_id = Column(UUID(as_uuid=True), ForeignKey("analytics_rollups.id", ondelete="CASCADE"), primary_key=True)
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id", ondelete="CASCADE"), primary_key=True)
+
+
+class AnalyticsFieldSketchStatus(str, enum.Enum):
+    BUILDING = "building"
+    READY = "ready"
+
+
+class AnalyticsFieldSketch(Base):
+    """HyperLogLog sketch of the distinct values of one dataset field.
+
+    Sketches are built by a background job; until the job marks one READY,
+    queries answer its field exactly.
+    """
+
+    __tablename__ = "analytics_field_sketches"
+    __table_args__ = (UniqueConstraint("dataset_id", "field_key", name="uq_analytics_field_sketch"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("form_datasets.id", ondelete="CASCADE"), nullable=False, index=True)
+    field_key = Column(String, nullable=False)
+    status = Column(String(16), nullable=False, default=AnalyticsFieldSketchStatus.BUILDING.value)
+    built_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AnalyticsFieldSketchRegister(Base):
+    __tablename__ = "analytics_field_sketch_registers"
+
+    sketch_id = Column(UUID(as_uuid=True), ForeignKey("analytics_field_sketches.id", ondelete="CASCADE"), primary_key=True)
+    register = Column(Integer, primary_key=True)
+    rho = Column(Integer, nullable=False)
@@ -33,6 +33,8 @@ class Form(Base):
     blueprint_draft = Column(JSONB, nullable=True)
     blueprint_live = Column(JSONB, nullable=True)
     version = Column(Integer, default=1, nullable=False)
+    # Bumped on every draft save; blueprint patches must name the revision they were built on.
+    blueprint_revision = Column(Integer, default=0, nullable=False)
     is_public = Column(Boolean, default=False, nullable=False)
     status = Column(Enum(FormStatus, name="form_status", values_callable=lambda obj: [e.value for e in obj]), default=FormStatus.DRAFT, nullable=False)
     published_version = Column(Integer, nullable=True)
@@ -29,7 +29,19 @@ class FormVersion(Base):
     )
     # Draft slots are bounded to 1..3; null for live snapshots.
     slot_index = Column(Integer, nullable=True)
-    blueprint = Column(JSONB, nullable=False)
+    # Full blueprint for live snapshots, active drafts and periodic keyframes.
+    # Superseded drafts keep only blueprint_delta, a JSON Patch that turns the
+    # blueprint of base_version_id (the draft that replaced them) back into theirs.
+    blueprint = Column(JSONB(none_as_null=True), nullable=True)
+    # Deferred so a draft can point at its successor in the same flush that inserts it.
+    base_version_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("form_versions.id", deferrable=True, initially="DEFERRED"),
+        nullable=True,
+    )
+    blueprint_delta = Column(JSONB(none_as_null=True), nullable=True)
+    # Consecutive delta-only drafts directly behind this full row in its slot.
+    delta_chain_length = Column(Integer, default=0, nullable=False)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
     changelog = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
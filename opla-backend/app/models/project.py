@@ -34,6 +34,10 @@ class Project(Base):
     activated_at = Column(DateTime, nullable=True)
     paused_at = Column(DateTime, nullable=True)
     archived_at = Column(DateTime, nullable=True)
+    # Debounced attention reconcile (see AttentionReconcileScheduler).
+    attention_reconcile_due_at = Column(DateTime, nullable=True, index=True)
+    attention_reconcile_requested_at = Column(DateTime, nullable=True)
+    attention_reconcile_actor_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
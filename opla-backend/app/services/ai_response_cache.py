@@ -0,0 +1,153 @@
+"""Content-addressed cache for AI survey generation steps.
+
+Entries are keyed by a SHA-256 over the step name, model, prompt template
+version, temperature and normalized inputs, so a retried interview, draft or
+revise (or an unchanged section inside a larger draft) is served from Postgres
+instead of the LLM. Entries expire after AI_CACHE_TTL_SECONDS and the table is
+trimmed to the AI_CACHE_MAX_ENTRIES most recently used rows. The cache is an
+optimization only: storage errors are logged and treated as misses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.models.ai_response_cache import AiResponseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_inputs(value: Any) -> Any:
+    """Collapse whitespace in strings and drop blank mapping entries, recursively."""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    if isinstance(value, dict):
+        normalized = {str(key): normalize_inputs(item) for key, item in value.items()}
+        return {key: item for key, item in normalized.items() if item not in ("", None)}
+    if isinstance(value, (list, tuple)):
+        return [normalize_inputs(item) for item in value]
+    return value
+
+
+class AiResponseCache:
+    @staticmethod
+    def key_for(step: str, template_version: int, temperature: float, inputs: Any) -> str:
+        material = {
+            "step": step,
+            "model": settings.GROQ_MODEL,
+            "template": template_version,
+            "temperature": temperature,
+            "inputs": normalize_inputs(inputs),
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.AI_CACHE_TTL_SECONDS > 0
+
+    @staticmethod
+    def get(key: str) -> Optional[Any]:
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            value = db.execute(
+                update(AiResponseCacheEntry)
+                .where(AiResponseCacheEntry.key == key, AiResponseCacheEntry.expires_at > now)
+                .values(hit_count=AiResponseCacheEntry.hit_count + 1, last_used_at=now)
+                .returning(AiResponseCacheEntry.value)
+            ).scalar_one_or_none()
+            db.commit()
+            return value
+        finally:
+            db.close()
+
+    @staticmethod
+    def put(key: str, step: str, value: Any) -> None:
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=settings.AI_CACHE_TTL_SECONDS)
+            statement = insert(AiResponseCacheEntry).values(
+                key=key,
+                step=step,
+                model=settings.GROQ_MODEL,
+                value=value,
+                hit_count=0,
+                created_at=now,
+                last_used_at=now,
+                expires_at=expires_at,
+            )
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[AiResponseCacheEntry.key],
+                    set_={"value": statement.excluded.value, "last_used_at": now, "expires_at": expires_at},
+                )
+            )
+            AiResponseCache._prune(db, now)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _prune(db, now: datetime) -> None:
+        db.execute(delete(AiResponseCacheEntry).where(AiResponseCacheEntry.expires_at <= now))
+        overflow = (
+            select(AiResponseCacheEntry.key)
+            .order_by(AiResponseCacheEntry.last_used_at.desc())
+            .offset(max(0, settings.AI_CACHE_MAX_ENTRIES))
+            .scalar_subquery()
+        )
+        db.execute(delete(AiResponseCacheEntry).where(AiResponseCacheEntry.key.in_(overflow)))
+
+    @staticmethod
+    def clear() -> None:
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.execute(delete(AiResponseCacheEntry))
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    async def get_or_generate(
+        step: str,
+        template_version: int,
+        temperature: float,
+        inputs: Any,
+        generate: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value for these inputs, or await ``generate`` and store its result."""
+        if not AiResponseCache.enabled():
+            return await generate()
+        key = AiResponseCache.key_for(step, template_version, temperature, inputs)
+        try:
+            cached = await asyncio.to_thread(AiResponseCache.get, key)
+        except SQLAlchemyError:
+            logger.warning("AI response cache lookup failed for %s", step, exc_info=True)
+            cached = None
+        if cached is not None:
+            return cached
+
+        value = await generate()
+        try:
+            await asyncio.to_thread(AiResponseCache.put, key, step, value)
+        except SQLAlchemyError:
+            logger.warning("AI response cache store failed for %s", step, exc_info=True)
+        return value
@@ -2,10 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import re
-import time
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
+from app.services import json_patch
+from app.services.ai_response_cache import AiResponseCache
 from app.services.groq_client import GroqClientError, chat_completion, chat_completion_json
 from app.services.survey_markdown_compiler import (
     CompileResult,
@@ -17,6 +22,9 @@ from app.services.survey_markdown_compiler import (
 SINGLE_SHOT_QUESTION_LIMIT = 12
 MAX_QUESTIONS = 60
 DEFAULT_QUESTIONS = 10
+PREVIEW_CACHE_SIZE = 64
+# Part of every AI response cache key; bump when prompts or post-processing change.
+PROMPT_TEMPLATE_VERSION = 1
 
 DIALECT_RULES = """
 Rules:
@@ -79,11 +87,20 @@ class AiSurveyServiceError(Exception):
     pass
 
 
-def generate_interview_questions(brief: str) -> List[Dict[str, Any]]:
+# Receives ("outline" | "section", payload) while a chunked draft is in progress.
+DraftEventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+async def generate_interview_questions(brief: str) -> List[Dict[str, Any]]:
     brief = (brief or "").strip()
     if not brief:
         raise AiSurveyServiceError("Brief is required")
+    return await AiResponseCache.get_or_generate(
+        "interview", PROMPT_TEMPLATE_VERSION, 0.3, {"brief": brief}, lambda: _interview_questions(brief)
+    )
 
+
+async def _interview_questions(brief: str) -> List[Dict[str, Any]]:
     messages = [
         {
             "role": "system",
@@ -101,7 +118,7 @@ def generate_interview_questions(brief: str) -> List[Dict[str, Any]]:
         {"role": "user", "content": f"Survey brief:\n{brief}"},
     ]
     try:
-        data = chat_completion_json(messages, temperature=0.3, max_tokens=1500)
+        data = await chat_completion_json(messages, temperature=0.3, max_tokens=1500)
     except GroqClientError as exc:
         raise AiSurveyServiceError(str(exc)) from exc
 
@@ -140,42 +157,65 @@ def generate_interview_questions(brief: str) -> List[Dict[str, Any]]:
     return normalized
 
 
-def draft_survey_markdown(brief: str, answers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+async def draft_survey_markdown(
+    brief: str,
+    answers: Optional[Dict[str, str]] = None,
+    on_event: Optional[DraftEventHandler] = None,
+) -> Dict[str, str]:
     brief = (brief or "").strip()
     if not brief:
         raise AiSurveyServiceError("Brief is required")
 
     answers = answers or {}
+    return await AiResponseCache.get_or_generate(
+        "draft",
+        PROMPT_TEMPLATE_VERSION,
+        0.35,
+        {"brief": brief, "answers": answers},
+        lambda: _draft(brief, answers, on_event),
+    )
+
+
+async def _draft(brief: str, answers: Dict[str, str], on_event: Optional[DraftEventHandler]) -> Dict[str, str]:
     target = _infer_target_question_count(brief, answers)
     answers_block = _format_answers(answers)
 
     if target <= SINGLE_SHOT_QUESTION_LIMIT:
-        markdown = _draft_single_shot(brief, answers_block, target)
+        markdown = await _draft_single_shot(brief, answers_block, target)
     else:
-        markdown = _draft_chunked(brief, answers_block, target)
+        markdown = await _draft_chunked(brief, answers_block, target, on_event)
 
-    return _finalize_draft(markdown)
+    return await _finalize_draft(markdown)
 
 
-def revise_survey_markdown(markdown: str, instruction: str) -> str:
+async def revise_survey_markdown(markdown: str, instruction: str) -> str:
     markdown = (markdown or "").strip()
     instruction = (instruction or "").strip()
     if not markdown:
         raise AiSurveyServiceError("Markdown is required")
     if not instruction:
         raise AiSurveyServiceError("Instruction is required")
+    return await AiResponseCache.get_or_generate(
+        "revise",
+        PROMPT_TEMPLATE_VERSION,
+        0.3,
+        {"markdown": markdown, "instruction": instruction},
+        lambda: _revise(markdown, instruction),
+    )
 
+
+async def _revise(markdown: str, instruction: str) -> str:
     title, sections = _split_markdown_sections(markdown)
     question_count = sum(len(re.findall(r"(?m)^### ", body)) for _, body in sections)
     expand_to = _infer_expand_target(instruction)
 
     if expand_to and expand_to > question_count:
-        return _expand_survey(markdown, title, sections, instruction, expand_to)
+        return await _expand_survey(markdown, title, sections, instruction, expand_to)
 
     if question_count <= SINGLE_SHOT_QUESTION_LIMIT and len(markdown) < 9000:
-        return _revise_full_document(markdown, instruction)
+        return await _revise_full_document(markdown, instruction)
 
-    return _revise_chunked(title, sections, instruction)
+    return await _revise_chunked(title, sections, instruction)
 
 
 def compile_markdown(markdown: str) -> CompileResult:
@@ -185,10 +225,54 @@ def compile_markdown(markdown: str) -> CompileResult:
         raise AiSurveyServiceError(str(exc)) from exc
 
 
+class CompilePreviewCache:
+    """Recently previewed blueprints by revision, so live previews can answer with a patch."""
+
+    _lock = threading.Lock()
+    _blueprints: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @classmethod
+    def get(cls, revision: str) -> Optional[Dict[str, Any]]:
+        with cls._lock:
+            blueprint = cls._blueprints.get(revision)
+            if blueprint is not None:
+                cls._blueprints.move_to_end(revision)
+            return blueprint
+
+    @classmethod
+    def put(cls, revision: str, blueprint: Dict[str, Any]) -> None:
+        with cls._lock:
+            cls._blueprints[revision] = blueprint
+            cls._blueprints.move_to_end(revision)
+            while len(cls._blueprints) > PREVIEW_CACHE_SIZE:
+                cls._blueprints.popitem(last=False)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._blueprints.clear()
+
+
+def compile_markdown_preview(markdown: str, base_revision: Optional[str] = None) -> Dict[str, Any]:
+    """Compile for live preview: unchanged sections come from the compiler's block cache,
+    and a caller holding a still-cached ``base_revision`` gets a JSON Patch instead of
+    the whole blueprint."""
+    result = compile_markdown(markdown)
+    revision = hashlib.blake2b(markdown.encode("utf-8"), digest_size=16).hexdigest()
+    base = CompilePreviewCache.get(base_revision) if base_revision else None
+    CompilePreviewCache.put(revision, result.blueprint)
+    preview: Dict[str, Any] = {"title": result.title, "revision": revision, "warnings": result.warnings}
+    if base is not None:
+        preview["patch"] = json_patch.diff(base, result.blueprint)
+    else:
+        preview["blueprint"] = result.blueprint
+    return preview
+
+
 # ── Draft strategies ─────────────────────────────────────────────────────────
 
 
-def _draft_single_shot(brief: str, answers_block: str, target: int) -> str:
+async def _draft_single_shot(brief: str, answers_block: str, target: int) -> str:
     messages = [
         {
             "role": "system",
@@ -206,44 +290,49 @@ def _draft_single_shot(brief: str, answers_block: str, target: int) -> str:
         },
     ]
     try:
-        raw = chat_completion(messages, temperature=0.35, max_tokens=3500)
+        raw = await chat_completion(messages, temperature=0.35, max_tokens=3500)
     except GroqClientError as exc:
         raise AiSurveyServiceError(str(exc)) from exc
     return _normalize_document_markdown(raw)
 
 
-def _draft_chunked(brief: str, answers_block: str, target: int) -> str:
-    outline = _plan_outline(brief, answers_block, target)
+async def _draft_chunked(
+    brief: str,
+    answers_block: str,
+    target: int,
+    on_event: Optional[DraftEventHandler] = None,
+) -> str:
+    outline = await _plan_outline(brief, answers_block, target)
     title = str(outline.get("title") or "Survey").strip() or "Survey"
-    planned = outline.get("sections")
-    if not isinstance(planned, list) or not planned:
+    planned = [raw for raw in outline.get("sections") or [] if isinstance(raw, dict)]
+    if not planned:
         raise AiSurveyServiceError("AI outline returned no sections")
 
-    section_ids = []
-    for raw in planned:
-        if isinstance(raw, dict) and raw.get("id"):
-            section_ids.append(_slugify(str(raw["id"])))
+    section_ids = [_slugify(str(raw["id"])) for raw in planned if raw.get("id")]
+    if on_event is not None:
+        await on_event(
+            "outline",
+            {"title": title, "sections": [{"id": raw.get("id"), "title": raw.get("title")} for raw in planned]},
+        )
 
-    parts: List[str] = [f"# {title}"]
-    for index, raw in enumerate(planned):
-        if not isinstance(raw, dict):
-            continue
-        if index > 0:
-            # Stay under free-tier Groq TPM when drafting many sections.
-            time.sleep(1.2)
-        section_md = _draft_section(
+    async def draft(index: int, raw: Dict[str, Any]) -> str:
+        section_md = await _draft_section(
             brief=brief,
             answers_block=answers_block,
             section=raw,
             section_index=index,
             all_section_ids=section_ids,
         )
-        parts.append(section_md)
+        if on_event is not None:
+            await on_event("section", {"index": index, "id": raw.get("id"), "markdown": section_md})
+        return section_md
 
-    return "\n\n".join(parts).strip()
+    # Sections draft concurrently; the shared Groq rate limiter paces the calls.
+    sections = await _gather_all(draft(index, raw) for index, raw in enumerate(planned))
+    return "\n\n".join([f"# {title}", *sections]).strip()
 
 
-def _plan_outline(brief: str, answers_block: str, target: int) -> Dict[str, Any]:
+async def _plan_outline(brief: str, answers_block: str, target: int) -> Dict[str, Any]:
     # Aim for ~5–8 questions per section for large surveys
     suggested_sections = max(3, min(12, (target + 5) // 6))
     messages = [
@@ -265,7 +354,7 @@ def _plan_outline(brief: str, answers_block: str, target: int) -> Dict[str, Any]
         },
     ]
     try:
-        data = chat_completion_json(messages, temperature=0.3, max_tokens=2000)
+        data = await chat_completion_json(messages, temperature=0.3, max_tokens=2000)
     except GroqClientError as exc:
         raise AiSurveyServiceError(str(exc)) from exc
 
@@ -317,7 +406,7 @@ def _plan_outline(brief: str, answers_block: str, target: int) -> Dict[str, Any]
     return {"title": str(data.get("title") or "Survey").strip(), "sections": scaled}
 
 
-def _draft_section(
+async def _draft_section(
     *,
     brief: str,
     answers_block: str,
@@ -355,25 +444,32 @@ def _draft_section(
             ).strip(),
         },
     ]
-    try:
-        raw = chat_completion(messages, temperature=0.35, max_tokens=2200)
-    except GroqClientError as exc:
-        raise AiSurveyServiceError(f"Failed drafting section '{sid}': {exc}") from exc
 
-    section_md = _normalize_section_markdown(raw, sid, title)
-    # Soft repair if this section alone won't parse as part of a doc
-    probe = f"# Probe\n\n{section_md}"
-    try:
-        compile_survey_markdown(probe)
-    except SurveyMarkdownCompileError as exc:
-        section_md = _repair_section(section_md, sid, title, str(exc))
-    return section_md
+    async def generate() -> str:
+        try:
+            raw = await chat_completion(messages, temperature=0.35, max_tokens=2200)
+        except GroqClientError as exc:
+            raise AiSurveyServiceError(f"Failed drafting section '{sid}': {exc}") from exc
+
+        section_md = _normalize_section_markdown(raw, sid, title)
+        # Soft repair if this section alone won't parse as part of a doc
+        probe = f"# Probe\n\n{section_md}"
+        try:
+            compile_survey_markdown(probe)
+        except SurveyMarkdownCompileError as exc:
+            section_md = await _repair_section(section_md, sid, title, str(exc))
+        return section_md
+
+    # Keyed by the section prompt, so re-drafts and expansions reuse unchanged sections.
+    return await AiResponseCache.get_or_generate(
+        "section", PROMPT_TEMPLATE_VERSION, 0.35, {"messages": messages}, generate
+    )
 
 
 # ── Revise strategies ────────────────────────────────────────────────────────
 
 
-def _revise_full_document(markdown: str, instruction: str) -> str:
+async def _revise_full_document(markdown: str, instruction: str) -> str:
     messages = [
         {
             "role": "system",
@@ -390,7 +486,7 @@ def _revise_full_document(markdown: str, instruction: str) -> str:
     ]
     try:
         updated = _normalize_document_markdown(
-            chat_completion(messages, temperature=0.3, max_tokens=3500)
+            await chat_completion(messages, temperature=0.3, max_tokens=3500)
         )
     except GroqClientError as exc:
         raise AiSurveyServiceError(str(exc)) from exc
@@ -398,12 +494,12 @@ def _revise_full_document(markdown: str, instruction: str) -> str:
     try:
         compile_survey_markdown(updated)
     except SurveyMarkdownCompileError as exc:
-        updated = _repair_markdown(updated, str(exc))
+        updated = await _repair_markdown(updated, str(exc))
         compile_survey_markdown(updated)
     return updated
 
 
-def _revise_chunked(title: str, sections: List[Tuple[str, str]], instruction: str) -> str:
+async def _revise_chunked(title: str, sections: List[Tuple[str, str]], instruction: str) -> str:
     outline = [
         {"id": sid, "title": _section_title_from_body(body, sid)}
         for sid, body in sections
@@ -427,7 +523,7 @@ def _revise_chunked(title: str, sections: List[Tuple[str, str]], instruction: st
         },
     ]
     try:
-        plan = chat_completion_json(messages, temperature=0.2, max_tokens=800)
+        plan = await chat_completion_json(messages, temperature=0.2, max_tokens=800)
     except GroqClientError as exc:
         raise AiSurveyServiceError(str(exc)) from exc
 
@@ -437,23 +533,26 @@ def _revise_chunked(title: str, sections: List[Tuple[str, str]], instruction: st
         # Fallback: revise first section only rather than failing
         target_ids = {sections[0][0]}
 
+    revised = await _gather_all(
+        _revise_one_section(sid, body, instruction, outline)
+        for sid, body in sections
+        if sid in target_ids
+    )
+    revised_by_id = dict(zip([sid for sid, _ in sections if sid in target_ids], revised))
     revised_parts: List[str] = [f"# {title}"] if title else []
     for sid, body in sections:
-        if sid in target_ids:
-            revised_parts.append(_revise_one_section(sid, body, instruction, outline))
-        else:
-            revised_parts.append(body.strip())
+        revised_parts.append(revised_by_id[sid] if sid in revised_by_id else body.strip())
 
     updated = "\n\n".join(revised_parts).strip()
     try:
         compile_survey_markdown(updated)
     except SurveyMarkdownCompileError as exc:
-        updated = _repair_markdown(updated, str(exc))
+        updated = await _repair_markdown(updated, str(exc))
         compile_survey_markdown(updated)
     return updated
 
 
-def _revise_one_section(
+async def _revise_one_section(
     sid: str,
     body: str,
     instruction: str,
@@ -478,14 +577,20 @@ def _revise_one_section(
             ),
         },
     ]
-    try:
-        raw = chat_completion(messages, temperature=0.3, max_tokens=2200)
-    except GroqClientError as exc:
-        raise AiSurveyServiceError(f"Failed revising section '{sid}': {exc}") from exc
-    return _normalize_section_markdown(raw, sid, title)
 
+    async def generate() -> str:
+        try:
+            raw = await chat_completion(messages, temperature=0.3, max_tokens=2200)
+        except GroqClientError as exc:
+            raise AiSurveyServiceError(f"Failed revising section '{sid}': {exc}") from exc
+        return _normalize_section_markdown(raw, sid, title)
+
+    return await AiResponseCache.get_or_generate(
+        "section_revision", PROMPT_TEMPLATE_VERSION, 0.3, {"messages": messages}, generate
+    )
 
-def _expand_survey(
+
+async def _expand_survey(
     markdown: str,
     title: str,
     sections: List[Tuple[str, str]],
@@ -501,7 +606,7 @@ def _expand_survey(
     if extra_target <= 0:
         return markdown
 
-    outline = _plan_outline(
+    outline = await _plan_outline(
         brief=f"Expand this survey to about {expand_to} questions. Existing title: {title}",
         answers_block=answers_block,
         target=extra_target,
@@ -521,25 +626,35 @@ def _expand_survey(
         used.add(sid)
         new_sections.append({**raw, "id": sid})
 
-    parts = [markdown.rstrip()]
     all_ids = existing_ids + [s["id"] for s in new_sections]
-    for index, section in enumerate(new_sections):
-        parts.append(
-            _draft_section(
-                brief=f"{title}. {instruction}",
-                answers_block=answers_block,
-                section=section,
-                section_index=index,
-                all_section_ids=all_ids,
-            )
+    drafted = await _gather_all(
+        _draft_section(
+            brief=f"{title}. {instruction}",
+            answers_block=answers_block,
+            section=section,
+            section_index=index,
+            all_section_ids=all_ids,
         )
-    updated = "\n\n".join(parts).strip()
-    return _finalize_draft(updated)["markdown"]
+        for index, section in enumerate(new_sections)
+    )
+    updated = "\n\n".join([markdown.rstrip(), *drafted]).strip()
+    return (await _finalize_draft(updated))["markdown"]
 
 
 # ── Parsing / helpers ────────────────────────────────────────────────────────
 
 
+async def _gather_all(coros: Iterable[Awaitable[Any]]) -> List[Any]:
+    """Run coroutines concurrently, in order; the first failure cancels the rest."""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
 def _infer_target_question_count(brief: str, answers: Dict[str, str]) -> int:
     blob = " ".join([brief, *[f"{k} {v}" for k, v in answers.items()]]).lower()
 
@@ -582,13 +697,13 @@ def _format_answers(answers: Dict[str, str]) -> str:
     return ("Interview answers:\n" + "\n".join(lines)) if lines else ""
 
 
-def _finalize_draft(markdown: str) -> Dict[str, str]:
+async def _finalize_draft(markdown: str) -> Dict[str, str]:
     markdown = _normalize_document_markdown(markdown)
     try:
         compiled = compile_survey_markdown(markdown)
         title = compiled.title
     except SurveyMarkdownCompileError as exc:
-        repaired = _repair_markdown(markdown, str(exc))
+        repaired = await _repair_markdown(markdown, str(exc))
         compiled = compile_survey_markdown(repaired)
         markdown = repaired
         title = compiled.title
@@ -684,7 +799,7 @@ def _strip_markdown_fences(text: str) -> str:
     return cleaned
 
 
-def _repair_markdown(markdown: str, error: str) -> str:
+async def _repair_markdown(markdown: str, error: str) -> str:
     messages = [
         {
             "role": "system",
@@ -701,7 +816,7 @@ def _repair_markdown(markdown: str, error: str) -> str:
     ]
     try:
         fixed = _normalize_document_markdown(
-            chat_completion(messages, temperature=0.1, max_tokens=3500)
+            await chat_completion(messages, temperature=0.1, max_tokens=3500)
         )
     except GroqClientError as exc:
         raise AiSurveyServiceError(f"Markdown failed compile and repair failed: {exc}") from exc
@@ -710,7 +825,7 @@ def _repair_markdown(markdown: str, error: str) -> str:
     return fixed
 
 
-def _repair_section(section_md: str, sid: str, title: str, error: str) -> str:
+async def _repair_section(section_md: str, sid: str, title: str, error: str) -> str:
     messages = [
         {
             "role": "system",
@@ -726,7 +841,7 @@ def _repair_section(section_md: str, sid: str, title: str, error: str) -> str:
         },
     ]
     try:
-        fixed = chat_completion(messages, temperature=0.1, max_tokens=2200)
+        fixed = await chat_completion(messages, temperature=0.1, max_tokens=2200)
     except GroqClientError as exc:
         raise AiSurveyServiceError(f"Section '{sid}' failed repair: {exc}") from exc
     return _normalize_section_markdown(fixed, sid, title)
@@ -0,0 +1,310 @@
+"""Approximate aggregates: Bernoulli table samples with error bounds and HyperLogLog distinct counts."""
+
+from __future__ import annotations
+
+import math
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger, Float, Text, and_, cast, func, literal, literal_column, select, tablesample
+from sqlalchemy.dialects.postgresql import BIT, UUID as PGUUID, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.analytics import AnalyticsFieldSketch, AnalyticsFieldSketchRegister, AnalyticsFieldSketchStatus
+from app.models.submission import Submission
+
+
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_RELATIVE_ERROR = 1.04 / math.sqrt(HLL_REGISTERS)
+CONFIDENCE_LEVEL = 0.95
+CONFIDENCE_Z = 1.96
+TARGET_SAMPLE_ROWS = 20_000
+# Sampling more than this fraction saves too little over an exact scan to be worth the error.
+MAX_SAMPLE_PERCENT = 50.0
+# A sketch still building after this long lost its job (e.g. a restart) and may be claimed again.
+SKETCH_BUILD_TIMEOUT = timedelta(hours=1)
+
+
+def _hll_register_and_rho(value):
+    """SQL (register, rho) of a text value: top HLL_PRECISION hash bits pick the register,
+    rho is the 1-based position of the first set bit in the remaining bits."""
+    hashed = func.hashtextextended(value, 0)
+    register = (hashed.op(">>")(64 - HLL_PRECISION)).op("&")(HLL_REGISTERS - 1)
+    tail_bits = func.substr(cast(cast(hashed, BIT(64)), Text), HLL_PRECISION + 1)
+    rho = func.coalesce(func.nullif(func.strpos(tail_bits, "1"), 0), 64 - HLL_PRECISION + 1)
+    return register, rho
+
+
+def hll_estimate(registers: dict[int, int]) -> float:
+    """Cardinality estimate from register -> rho (absent registers are zero)."""
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    harmonic = (HLL_REGISTERS - len(registers)) + sum(2.0 ** -rho for rho in registers.values())
+    estimate = alpha * HLL_REGISTERS * HLL_REGISTERS / harmonic
+    empty = HLL_REGISTERS - len(registers)
+    if estimate <= 2.5 * HLL_REGISTERS and empty:
+        # Small-range correction (linear counting).
+        return HLL_REGISTERS * math.log(HLL_REGISTERS / empty)
+    return estimate
+
+
+def _interval(estimate: float, half_width: float) -> dict[str, float]:
+    return {"low": estimate - half_width, "high": estimate + half_width}
+
+
+class ApproximateAnalyticsService:
+    """Helpers behind AnalyticsService.execute_query(approximate=...).
+
+    count/sum/avg run on a Bernoulli TABLESAMPLE and are scaled back up with a normal
+    95% interval. count_distinct uses HyperLogLog: a maintained per-field sketch for
+    whole-dataset counts, or registers computed in one scan (no distinct sort) otherwise.
+    A missing sketch is queued for a background build and the count is answered
+    exactly in the meantime.
+    """
+
+    @staticmethod
+    def sample_percent(db: Session, base_filter, requested: Optional[float]) -> Optional[float]:
+        if requested:
+            return None if requested >= 100 else float(requested)
+        row_count = db.query(func.count(Submission.id)).filter(base_filter).scalar() or 0
+        if not row_count:
+            return None
+        percent = TARGET_SAMPLE_ROWS / row_count * 100
+        return None if percent >= MAX_SAMPLE_PERCENT else percent
+
+    @staticmethod
+    def sample(query, percent: float, seed: int = 0):
+        sampled = tablesample(
+            Submission.__table__, func.bernoulli(percent), name="submissions_sample", seed=literal_column(str(int(seed)))
+        )
+        return query.replace_selectable(Submission.__table__, sampled)
+
+    @staticmethod
+    def moment_columns(column, alias: str) -> list:
+        value = cast(column, Float)
+        return [
+            func.sum(value * value).label(f"__sq_{alias}"),
+            func.count(column).label(f"__n_{alias}"),
+        ]
+
+    @staticmethod
+    def finalize(
+        db: Session,
+        rows: list[dict],
+        *,
+        org_id: uuid.UUID,
+        dataset_id: uuid.UUID,
+        aggregates: list[tuple[str, str]],
+        distinct: list[tuple[str, str, Any]],
+        sample_percent: Optional[float],
+        group_aliases: list[str],
+        group_columns: list,
+        filter_clauses: list,
+        sketch_fields: set[str],
+        params: Optional[dict] = None,
+    ) -> dict:
+        """Scale sampled aggregates in place, fill HyperLogLog distinct counts and return interval metadata."""
+        fraction = sample_percent / 100 if sample_percent else 1.0
+        intervals: list[dict[str, Optional[dict[str, float]]]] = []
+        for row in rows:
+            bounds: dict[str, Optional[dict[str, float]]] = {}
+            for function_name, alias in aggregates:
+                squares = row.pop(f"__sq_{alias}", None)
+                count = row.pop(f"__n_{alias}", None)
+                value = row.get(alias)
+                if function_name == "count_distinct":
+                    continue
+                if value is None or function_name not in {"count", "sum", "avg"}:
+                    bounds[alias] = None
+                    continue
+                value = float(value)
+                if function_name == "count":
+                    estimate = value / fraction
+                    variance = (1 - fraction) / fraction**2 * value
+                    row[alias] = int(round(estimate))
+                elif function_name == "sum":
+                    estimate = value / fraction
+                    variance = (1 - fraction) / fraction**2 * float(squares or 0)
+                    row[alias] = estimate
+                else:
+                    estimate = value
+                    count = int(count or 0)
+                    if count < 2:
+                        bounds[alias] = None
+                        continue
+                    sample_variance = max(float(squares or 0) - count * value * value, 0.0) / (count - 1)
+                    variance = (1 - fraction) * sample_variance / count
+                bounds[alias] = _interval(estimate, CONFIDENCE_Z * math.sqrt(max(variance, 0.0)))
+            intervals.append(bounds)
+
+        for alias, field_key, column in distinct:
+            relative_error = HLL_RELATIVE_ERROR
+            if field_key in sketch_fields:
+                sketch_id = ApproximateAnalyticsService.ready_sketch(db, dataset_id, field_key)
+                if sketch_id is not None:
+                    estimates = {(): ApproximateAnalyticsService.sketch_estimate(db, sketch_id)}
+                else:
+                    ApproximateAnalyticsService.request_sketch(org_id, dataset_id, field_key)
+                    exact = db.execute(
+                        select(func.count(func.distinct(column))).where(*filter_clauses), params or {}
+                    ).scalar()
+                    estimates = {(): float(exact or 0)}
+                    relative_error = 0.0
+            else:
+                estimates = ApproximateAnalyticsService.scan_estimates(db, column, group_columns, filter_clauses, params)
+            for row, bounds in zip(rows, intervals):
+                estimate = estimates.get(tuple(row.get(key) for key in group_aliases), 0.0)
+                row[alias] = int(round(estimate))
+                bounds[alias] = _interval(estimate, CONFIDENCE_Z * relative_error * estimate)
+
+        return {
+            "sample_percent": sample_percent,
+            "confidence_level": CONFIDENCE_LEVEL,
+            "intervals": intervals,
+        }
+
+    @staticmethod
+    def scan_estimates(
+        db: Session, column, group_columns: list, filter_clauses: list, params: Optional[dict] = None
+    ) -> dict[tuple, float]:
+        register, rho = _hll_register_and_rho(cast(column, Text))
+        register = register.label("__register")
+        query = (
+            select(*group_columns, register, func.max(rho).label("__rho"))
+            .where(*filter_clauses, column.isnot(None))
+            .group_by(*group_columns, register)
+        )
+        registers: dict[tuple, dict[int, int]] = {}
+        for row in db.execute(query, params or {}):
+            values = tuple(row)
+            registers.setdefault(values[:-2], {})[int(values[-2])] = int(values[-1])
+        return {key: hll_estimate(group) for key, group in registers.items()}
+
+    @staticmethod
+    def sketch_estimate(db: Session, sketch_id: uuid.UUID) -> float:
+        rows = db.query(AnalyticsFieldSketchRegister.register, AnalyticsFieldSketchRegister.rho).filter(
+            AnalyticsFieldSketchRegister.sketch_id == sketch_id
+        )
+        return hll_estimate({register: rho for register, rho in rows})
+
+    @staticmethod
+    def ready_sketch(db: Session, dataset_id: uuid.UUID, field_key: str) -> Optional[uuid.UUID]:
+        return (
+            db.query(AnalyticsFieldSketch.id)
+            .filter(
+                AnalyticsFieldSketch.dataset_id == dataset_id,
+                AnalyticsFieldSketch.field_key == field_key,
+                AnalyticsFieldSketch.status == AnalyticsFieldSketchStatus.READY.value,
+            )
+            .scalar()
+        )
+
+    @staticmethod
+    def request_sketch(org_id: uuid.UUID, dataset_id: uuid.UUID, field_key: str) -> Optional[uuid.UUID]:
+        """Queue a background build of the field's sketch unless one exists or is already building.
+
+        Uses its own session so the caller's (guarded, read-only) transaction is never committed.
+        Returns the build job id, or None when no build was queued.
+        """
+        from app.core.database import SessionLocal
+        from app.services.background_job_service import BackgroundJobService
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            statement = pg_insert(AnalyticsFieldSketch).values(
+                id=uuid.uuid4(),
+                dataset_id=dataset_id,
+                field_key=field_key,
+                status=AnalyticsFieldSketchStatus.BUILDING.value,
+                built_at=now,
+            )
+            table = AnalyticsFieldSketch.__table__
+            sketch_id = db.execute(
+                statement.on_conflict_do_update(
+                    constraint="uq_analytics_field_sketch",
+                    set_={"built_at": now},
+                    where=and_(
+                        table.c.status == AnalyticsFieldSketchStatus.BUILDING.value,
+                        table.c.built_at < now - SKETCH_BUILD_TIMEOUT,
+                    ),
+                ).returning(AnalyticsFieldSketch.id)
+            ).scalar()
+            if sketch_id is None:
+                db.rollback()
+                return None
+            # create() commits the claimed sketch together with its job.
+            job = BackgroundJobService.create(db, org_id, "analytics_sketch_build", subject_id=sketch_id)
+            BackgroundJobService.start(
+                job.id, lambda job_db, progress: ApproximateAnalyticsService.build_sketch(job_db, sketch_id)
+            )
+            return job.id
+        finally:
+            db.close()
+
+    @staticmethod
+    def build_sketch(db: Session, sketch_id: uuid.UUID) -> dict:
+        """Background job: fill a claimed sketch from the dataset's submissions and mark it ready.
+
+        On failure the sketch row is removed, so the next query queues a fresh build.
+        """
+        sketch = db.query(AnalyticsFieldSketch).filter(AnalyticsFieldSketch.id == sketch_id).first()
+        if sketch is None:
+            raise ValueError("SKETCH_NOT_FOUND")
+        try:
+            db.query(AnalyticsFieldSketchRegister).filter(AnalyticsFieldSketchRegister.sketch_id == sketch_id).delete(
+                synchronize_session=False
+            )
+            db.execute(
+                ApproximateAnalyticsService._upsert_registers(
+                    sketch_id, sketch.field_key, Submission.dataset_id == sketch.dataset_id
+                )
+            )
+            sketch.status = AnalyticsFieldSketchStatus.READY.value
+            sketch.built_at = datetime.utcnow()
+            db.commit()
+        except Exception:
+            db.rollback()
+            db.query(AnalyticsFieldSketch).filter(AnalyticsFieldSketch.id == sketch_id).delete(synchronize_session=False)
+            db.commit()
+            raise
+        registers = (
+            db.query(func.count()).filter(AnalyticsFieldSketchRegister.sketch_id == sketch_id).scalar() or 0
+        )
+        return {"sketch_id": str(sketch_id), "field_key": sketch.field_key, "registers": registers}
+
+    @staticmethod
+    def discard_sketches(db: Session, dataset_id: uuid.UUID) -> None:
+        """Drop the dataset's sketches inside the caller's transaction; queries rebuild them on demand."""
+        db.query(AnalyticsFieldSketch).filter(AnalyticsFieldSketch.dataset_id == dataset_id).delete(
+            synchronize_session=False
+        )
+
+    @staticmethod
+    def apply_submission(db: Session, submission: Submission) -> None:
+        """Fold a flushed submission into the dataset's existing sketches, inside the caller's transaction."""
+        if submission.dataset_id is None:
+            return
+        sketches = db.query(AnalyticsFieldSketch.id, AnalyticsFieldSketch.field_key).filter(
+            AnalyticsFieldSketch.dataset_id == submission.dataset_id
+        )
+        for sketch_id, field_key in sketches.all():
+            db.execute(ApproximateAnalyticsService._upsert_registers(sketch_id, field_key, Submission.id == submission.id))
+
+    @staticmethod
+    def _upsert_registers(sketch_id: uuid.UUID, field_key: str, submission_filter):
+        value = Submission.data[field_key].as_string()
+        register, rho = _hll_register_and_rho(value)
+        source = (
+            select(literal(sketch_id, PGUUID(as_uuid=True)), cast(register, BigInteger), func.max(rho))
+            .where(and_(submission_filter, value.isnot(None)))
+            .group_by(register)
+        )
+        table = AnalyticsFieldSketchRegister.__table__
+        statement = pg_insert(table).from_select(["sketch_id", "register", "rho"], source)
+        return statement.on_conflict_do_update(
+            index_elements=["sketch_id", "register"],
+            set_={"rho": func.greatest(table.c.rho, statement.excluded.rho)},
+            where=table.c.rho < statement.excluded.rho,
+        )
@@ -0,0 +1,122 @@
+"""Guardrails for ad-hoc analytics queries: cost estimates, per-org concurrency,
+statement timeouts and cancellation."""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+
+QUERY_CANCELED_PGCODE = "57014"
+APPLICATION_NAME_PREFIX = "opla-analytics:"
+
+
+def is_query_canceled(exc: BaseException) -> bool:
+    """True when Postgres aborted the statement (statement_timeout or pg_cancel_backend)."""
+    return isinstance(exc, DBAPIError) and getattr(exc.orig, "pgcode", None) == QUERY_CANCELED_PGCODE
+
+
+class AnalyticsQueryGuard:
+    """Bounds what one analyst can cost the database.
+
+    Queries are EXPLAINed before they run and rejected above MAX_ESTIMATED_COST.
+    Each org runs at most MAX_CONCURRENT_PER_ORG queries per process; further
+    queries wait up to QUEUE_TIMEOUT_SECONDS for a slot. Running statements carry
+    a statement_timeout and an application_name derived from (org, query id), so
+    any worker can cancel them through pg_stat_activity. Both are transaction-local,
+    so they are re-applied to every transaction the session begins inside the block.
+    """
+
+    MAX_CONCURRENT_PER_ORG = 4
+    QUEUE_TIMEOUT_SECONDS = 10.0
+    STATEMENT_TIMEOUT_SECONDS = 30.0
+    # Postgres planner cost units; roughly a few million rows through a hash aggregate.
+    MAX_ESTIMATED_COST = 5_000_000.0
+
+    _lock = threading.Lock()
+    _slots: dict[uuid.UUID, threading.BoundedSemaphore] = {}
+
+    @staticmethod
+    def application_name(org_id: uuid.UUID, query_id: uuid.UUID) -> str:
+        # Scoping the name by org keeps one org from cancelling another's query ids.
+        return f"{APPLICATION_NAME_PREFIX}{uuid.uuid5(org_id, str(query_id)).hex}"
+
+    @classmethod
+    def _semaphore(cls, org_id: uuid.UUID) -> threading.BoundedSemaphore:
+        with cls._lock:
+            semaphore = cls._slots.get(org_id)
+            if semaphore is None:
+                semaphore = cls._slots[org_id] = threading.BoundedSemaphore(cls.MAX_CONCURRENT_PER_ORG)
+            return semaphore
+
+    @classmethod
+    @contextmanager
+    def running(
+        cls,
+        db: Session,
+        org_id: uuid.UUID,
+        query_id: uuid.UUID,
+        timeout_seconds: Optional[float] = None,
+    ) -> Iterator[None]:
+        """Hold one of the org's query slots and tag the transaction for timeout and cancellation."""
+        semaphore = cls._semaphore(org_id)
+        if not semaphore.acquire(timeout=cls.QUEUE_TIMEOUT_SECONDS):
+            raise ValueError("ANALYTICS_QUEUE_FULL")
+        timeout_ms = max(int((timeout_seconds or cls.STATEMENT_TIMEOUT_SECONDS) * 1000), 1)
+        name = cls.application_name(org_id, query_id)
+
+        def tag(connection) -> None:
+            connection.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            connection.execute(text("SELECT set_config('application_name', :name, true)"), {"name": name})
+
+        def retag(session, transaction, connection) -> None:
+            # A commit inside the block (e.g. a helper persisting state) ends the tagged transaction.
+            tag(connection)
+
+        try:
+            tag(db.connection())
+            event.listen(db, "after_begin", retag)
+            try:
+                yield
+            finally:
+                event.remove(db, "after_begin", retag)
+        finally:
+            semaphore.release()
+
+    @staticmethod
+    def estimate(db: Session, statement, params: Optional[dict] = None) -> dict[str, float]:
+        """Planner estimate of the statement's total cost and result rows."""
+        compiled = statement.params(params or {}).compile(
+            dialect=db.get_bind().dialect,
+            compile_kwargs={"render_postcompile": True},
+        )
+        plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+        top = plan[0]["Plan"]
+        return {"total_cost": float(top["Total Cost"]), "rows": float(top["Plan Rows"])}
+
+    @staticmethod
+    def check_cost(db: Session, statement, params: Optional[dict], max_cost: float) -> dict[str, float]:
+        estimate = AnalyticsQueryGuard.estimate(db, statement, params)
+        if estimate["total_cost"] > max_cost:
+            raise ValueError("QUERY_TOO_EXPENSIVE")
+        return estimate
+
+    @staticmethod
+    def cancel(db: Session, org_id: uuid.UUID, query_id: uuid.UUID) -> bool:
+        """Cancel the running statement tagged with the query id; False when none is running."""
+        # pg_stat_activity is snapshotted per transaction; look at live backends.
+        db.execute(text("SELECT pg_stat_clear_snapshot()"))
+        cancelled = db.execute(
+            text(
+                "SELECT pg_cancel_backend(pid) FROM pg_stat_activity "
+                "WHERE application_name = :name AND pid <> pg_backend_pid()"
+            ),
+            {"name": AnalyticsQueryGuard.application_name(org_id, query_id)},
+        ).scalars().all()
+        return any(cancelled)
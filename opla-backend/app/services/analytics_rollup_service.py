@@ -0,0 +1,465 @@
+"""Pre-aggregated rollups over dataset submissions and the planner that answers queries from them."""
+
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger, DateTime, Float, String, Text, and_, case, cast, func, literal, null, or_, select, union_all
+from sqlalchemy.dialects.postgresql import UUID as PGUUID, insert as pg_insert
+from sqlalchemy.orm import Session, selectinload
+
+from app.models.analytics import AnalyticsRollup, AnalyticsRollupCell, AnalyticsRollupPending
+from app.models.form import Form
+from app.models.form_dataset import FormDataset, FormDatasetFieldStatus, FormDatasetStatus
+from app.models.project import Project
+from app.models.submission import Submission
+
+
+ROLLUP_BUCKETS = ("hour", "day")
+ROLLUP_BUILD_JOB = "analytics_rollup_build"
+BUCKET_GRANULARITY = {"hour": 0, "day": 1, "week": 2, "month": 3, "quarter": 4, "year": 5}
+ROW_COUNT_MEASURE = "*"
+ROW_COUNT_META_FIELDS = {"_submission_id", "_submitted_at"}
+META_FIELDS = {"_submission_id", "_submitted_at", "_user_id", "_form_version"}
+NUMERIC_TEXT_PATTERN = r"^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$"
+TIMESTAMP_TEXT_PATTERN = r"^\d{4}-\d{2}-\d{2}"
+
+
+class AnalyticsRollupStatus:
+    BUILDING = "building"
+    ACTIVE = "active"
+    STALE = "stale"
+
+
+def _time_expression(time_field: str):
+    if time_field == "_submitted_at":
+        return Submission.created_at
+    raw = Submission.data[time_field].as_string()
+    return case((raw.op("~")(TIMESTAMP_TEXT_PATTERN), cast(raw, DateTime)), else_=null())
+
+
+class AnalyticsRollupService:
+    """Declared bucket x dimensions x measures aggregates, kept current on every submission insert.
+
+    Cells are stored long-form: one row per (bucket, dimension values, measure) holding a
+    non-null count and a numeric sum, so inserts merge with a single ON CONFLICT upsert.
+
+    Full scans run as background jobs. While a rollup is building, queries are answered
+    from raw rows and new submissions are parked in analytics_rollup_pending; the job
+    folds in the ones its scan did not see before activating the rollup.
+    """
+
+    @staticmethod
+    def _get_dataset(db: Session, org_id: uuid.UUID, dataset_id: uuid.UUID) -> FormDataset:
+        dataset = (
+            db.query(FormDataset)
+            .options(selectinload(FormDataset.fields))
+            .join(Form, Form.id == FormDataset.form_id)
+            .join(Project, Project.id == Form.project_id)
+            .filter(
+                FormDataset.id == dataset_id,
+                Project.org_id == org_id,
+                FormDataset.status == FormDatasetStatus.ACTIVE,
+            )
+            .first()
+        )
+        if not dataset:
+            raise ValueError("DATASET_NOT_FOUND")
+        return dataset
+
+    @staticmethod
+    def create_rollup(
+        db: Session,
+        org_id: uuid.UUID,
+        dataset_id: uuid.UUID,
+        *,
+        name: str,
+        bucket: str,
+        time_field: str,
+        dimensions: list[str],
+        measures: list[str],
+        user_id: Optional[uuid.UUID] = None,
+    ) -> AnalyticsRollup:
+        dataset = AnalyticsRollupService._get_dataset(db, org_id, dataset_id)
+        meta = dataset.metadata_json or {}
+        if meta.get("kind") == "derived" and meta.get("mode") == "linked":
+            # Linked tables read their parent live; declare the rollup on the parent instead.
+            raise ValueError("ROLLUP_LINKED_DATASET")
+        if bucket not in ROLLUP_BUCKETS:
+            raise ValueError("INVALID_ROLLUP_BUCKET")
+
+        field_keys = {field.field_key for field in dataset.fields if field.status == FormDatasetFieldStatus.ACTIVE}
+        if time_field != "_submitted_at" and time_field not in field_keys:
+            raise ValueError(f"FIELD_NOT_ALLOWED:{time_field}")
+        dimensions = list(dict.fromkeys(dimensions))
+        measures = list(dict.fromkeys(measures))
+        for key in dimensions + measures:
+            if key not in field_keys:
+                raise ValueError(f"FIELD_NOT_ALLOWED:{key}")
+
+        rollup = AnalyticsRollup(
+            org_id=org_id,
+            dataset_id=dataset.id,
+            created_by=user_id,
+            name=name,
+            bucket=bucket,
+            time_field=time_field,
+            dimensions=dimensions,
+            measures=measures,
+            status=AnalyticsRollupStatus.BUILDING,
+        )
+        db.add(rollup)
+        db.flush()
+        AnalyticsRollupService.request_build(db, rollup, user_id=user_id)
+        db.refresh(rollup)
+        return rollup
+
+    @staticmethod
+    def list_rollups(db: Session, org_id: uuid.UUID, dataset_id: uuid.UUID) -> list[AnalyticsRollup]:
+        return (
+            db.query(AnalyticsRollup)
+            .filter(AnalyticsRollup.org_id == org_id, AnalyticsRollup.dataset_id == dataset_id)
+            .order_by(AnalyticsRollup.created_at.asc())
+            .all()
+        )
+
+    @staticmethod
+    def get_rollup(db: Session, org_id: uuid.UUID, rollup_id: uuid.UUID) -> Optional[AnalyticsRollup]:
+        return (
+            db.query(AnalyticsRollup)
+            .filter(AnalyticsRollup.id == rollup_id, AnalyticsRollup.org_id == org_id)
+            .first()
+        )
+
+    @staticmethod
+    def delete_rollup(db: Session, rollup: AnalyticsRollup) -> None:
+        db.delete(rollup)
+        db.commit()
+
+    @staticmethod
+    def request_build(db: Session, rollup: AnalyticsRollup, *, user_id: Optional[uuid.UUID] = None) -> Optional[uuid.UUID]:
+        """Mark the rollup building and queue its build job, committing the caller's transaction.
+
+        Returns the job id, or None when a build is already queued or running; that job
+        re-reads the rollup definition before activating, so it picks up any change.
+        """
+        from app.services.background_job_service import BackgroundJobService
+
+        db.flush()
+        locked = (
+            db.query(AnalyticsRollup)
+            .filter(AnalyticsRollup.id == rollup.id)
+            .with_for_update()
+            .populate_existing()
+            .one()
+        )
+        if locked.status == AnalyticsRollupStatus.BUILDING and BackgroundJobService.has_active(
+            db, ROLLUP_BUILD_JOB, locked.id
+        ):
+            db.commit()
+            return None
+        locked.status = AnalyticsRollupStatus.BUILDING
+        rollup_id = locked.id
+        # create() commits the building status together with its job.
+        job = BackgroundJobService.create(db, locked.org_id, ROLLUP_BUILD_JOB, user_id=user_id, subject_id=rollup_id)
+        BackgroundJobService.start(job.id, lambda job_db, progress: AnalyticsRollupService.build(job_db, rollup_id))
+        return job.id
+
+    @staticmethod
+    def build(db: Session, rollup_id: uuid.UUID) -> dict:
+        """Background job: rescan the dataset into the rollup's cells and activate it.
+
+        The scan runs in one REPEATABLE READ snapshot and drops the pending rows that
+        snapshot already covers. The rollup row is then locked, which waits out inserts
+        still parking rows, and the remaining pending submissions are folded in exactly
+        once. If the definition changed meanwhile the scan is repeated. On failure the
+        rollup is left stale for a later rebuild.
+        """
+        try:
+            while True:
+                db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                rollup = db.query(AnalyticsRollup).filter(AnalyticsRollup.id == rollup_id).first()
+                if rollup is None:
+                    raise ValueError("ROLLUP_NOT_FOUND")
+                definition = (rollup.time_field, list(rollup.dimensions or []), list(rollup.measures or []))
+                db.query(AnalyticsRollupCell).filter(AnalyticsRollupCell.rollup_id == rollup_id).delete(
+                    synchronize_session=False
+                )
+                db.execute(AnalyticsRollupService._upsert_cells(rollup, Submission.dataset_id == rollup.dataset_id))
+                db.query(AnalyticsRollupPending).filter(AnalyticsRollupPending.rollup_id == rollup_id).delete(
+                    synchronize_session=False
+                )
+                db.commit()
+
+                rollup = (
+                    db.query(AnalyticsRollup)
+                    .filter(AnalyticsRollup.id == rollup_id)
+                    .with_for_update()
+                    .populate_existing()
+                    .first()
+                )
+                if rollup is None:
+                    raise ValueError("ROLLUP_NOT_FOUND")
+                if (rollup.time_field, list(rollup.dimensions or []), list(rollup.measures or [])) != definition:
+                    db.commit()
+                    continue
+                pending = select(AnalyticsRollupPending.submission_id).where(AnalyticsRollupPending.rollup_id == rollup_id)
+                caught_up = db.query(AnalyticsRollupPending).filter(AnalyticsRollupPending.rollup_id == rollup_id).count()
+                if caught_up:
+                    db.execute(AnalyticsRollupService._upsert_cells(rollup, Submission.id.in_(pending)))
+                    db.query(AnalyticsRollupPending).filter(AnalyticsRollupPending.rollup_id == rollup_id).delete(
+                        synchronize_session=False
+                    )
+                rollup.status = AnalyticsRollupStatus.ACTIVE
+                rollup.last_built_at = datetime.utcnow()
+                db.commit()
+                break
+        except Exception:
+            db.rollback()
+            db.query(AnalyticsRollup).filter(AnalyticsRollup.id == rollup_id).update(
+                {"status": AnalyticsRollupStatus.STALE}, synchronize_session=False
+            )
+            db.query(AnalyticsRollupPending).filter(AnalyticsRollupPending.rollup_id == rollup_id).delete(
+                synchronize_session=False
+            )
+            db.commit()
+            raise
+        cells = db.query(func.count()).filter(AnalyticsRollupCell.rollup_id == rollup_id).scalar() or 0
+        return {"rollup_id": str(rollup_id), "cells": cells, "caught_up_submissions": caught_up}
+
+    @staticmethod
+    def apply_submission(db: Session, submission: Submission) -> None:
+        """Fold a flushed submission into every rollup of its dataset, inside the caller's transaction.
+
+        Rollups are share-locked so a build cannot activate between the status check and
+        commit; building ones only record the submission as pending.
+        """
+        if submission.dataset_id is None:
+            return
+        rollups = (
+            db.query(AnalyticsRollup)
+            .filter(
+                AnalyticsRollup.dataset_id == submission.dataset_id,
+                AnalyticsRollup.status.in_([AnalyticsRollupStatus.ACTIVE, AnalyticsRollupStatus.BUILDING]),
+            )
+            .with_for_update(read=True)
+            .populate_existing()
+            .all()
+        )
+        for rollup in rollups:
+            if rollup.status == AnalyticsRollupStatus.BUILDING:
+                db.add(AnalyticsRollupPending(rollup_id=rollup.id, submission_id=submission.id))
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(AnalyticsRollupService._upsert_cells(rollup, Submission.id == submission.id))
+            except Exception:
+                # A rollup that missed a row must not answer queries until it is rebuilt.
+                rollup.status = AnalyticsRollupStatus.STALE
+
+    @staticmethod
+    def _upsert_cells(rollup: AnalyticsRollup, submission_filter):
+        dimension_args: list[Any] = []
+        for key in rollup.dimensions or []:
+            dimension_args.extend([literal(key), Submission.data[key].as_string()])
+        measures = list(rollup.measures or [])
+
+        rows = (
+            select(
+                func.date_trunc(rollup.bucket, _time_expression(rollup.time_field)).label("bucket_start"),
+                func.jsonb_build_object(*dimension_args).label("dimensions"),
+                *(Submission.data[key].as_string().label(f"m{index}") for index, key in enumerate(measures)),
+            )
+            .where(submission_filter)
+            .subquery()
+        )
+
+        def cell_select(measure_key: str, value_count, value_sum, where=None):
+            cell_key = func.md5(
+                func.concat(
+                    func.coalesce(cast(rows.c.bucket_start, String), ""),
+                    "|",
+                    measure_key,
+                    "|",
+                    cast(rows.c.dimensions, Text),
+                )
+            )
+            statement = select(
+                func.gen_random_uuid(),
+                literal(rollup.id, PGUUID(as_uuid=True)),
+                cell_key,
+                rows.c.bucket_start,
+                rows.c.dimensions,
+                literal(measure_key),
+                value_count,
+                value_sum,
+            )
+            if where is not None:
+                statement = statement.where(where)
+            return statement.group_by(rows.c.bucket_start, rows.c.dimensions)
+
+        selects = [cell_select(ROW_COUNT_MEASURE, func.count(), cast(null(), Float))]
+        for index, key in enumerate(measures):
+            value = rows.c[f"m{index}"]
+            selects.append(
+                cell_select(
+                    key,
+                    func.count(value),
+                    func.sum(case((value.op("~")(NUMERIC_TEXT_PATTERN), cast(value, Float)), else_=null())),
+                    where=value.isnot(None),
+                )
+            )
+
+        table = AnalyticsRollupCell.__table__
+        statement = pg_insert(table).from_select(
+            ["id", "rollup_id", "cell_key", "bucket_start", "dimensions", "measure_key", "value_count", "value_sum"],
+            union_all(*selects),
+        )
+        return statement.on_conflict_do_update(
+            constraint="uq_analytics_rollup_cell",
+            set_={
+                "value_count": table.c.value_count + statement.excluded.value_count,
+                "value_sum": case(
+                    (table.c.value_sum.is_(None), statement.excluded.value_sum),
+                    (statement.excluded.value_sum.is_(None), table.c.value_sum),
+                    else_=table.c.value_sum + statement.excluded.value_sum,
+                ),
+            },
+        )
+
+    @staticmethod
+    def try_answer(
+        db: Session,
+        dataset_id: uuid.UUID,
+        *,
+        allowed_fields: dict,
+        filters: Optional[dict],
+        group_by: list[Any],
+        aggregates: list[dict],
+        order_by: list[dict],
+        limit: int,
+        offset: int,
+    ) -> Optional[dict]:
+        """Answer an aggregate query from the coarsest matching active rollup, or return None."""
+        if not aggregates:
+            return None
+        rollups = (
+            db.query(AnalyticsRollup)
+            .filter(AnalyticsRollup.dataset_id == dataset_id, AnalyticsRollup.status == AnalyticsRollupStatus.ACTIVE)
+            .all()
+        )
+        rollups.sort(key=lambda item: BUCKET_GRANULARITY.get(item.bucket, 0), reverse=True)
+        for rollup in rollups:
+            statement = AnalyticsRollupService._plan(rollup, allowed_fields, filters, group_by, aggregates, order_by)
+            if statement is None:
+                continue
+            total_count = db.execute(select(func.count()).select_from(statement.subquery())).scalar() or 0
+            rows = [dict(row._mapping) for row in db.execute(statement.limit(limit).offset(offset))]
+            return {"rollup_id": rollup.id, "rows": rows, "total_count": total_count}
+        return None
+
+    @staticmethod
+    def _plan(rollup: AnalyticsRollup, allowed_fields: dict, filters, group_by, aggregates, order_by):
+        cell = AnalyticsRollupCell
+        dimensions = set(rollup.dimensions or [])
+        measures = set(rollup.measures or [])
+
+        group_columns = []
+        aliases: dict[str, Any] = {}
+        for item in group_by:
+            field_key = item["field"] if isinstance(item, dict) else item
+            bucket = item.get("bucket") if isinstance(item, dict) else None
+            if bucket:
+                if field_key != rollup.time_field or bucket not in BUCKET_GRANULARITY:
+                    return None
+                if BUCKET_GRANULARITY[bucket] < BUCKET_GRANULARITY[rollup.bucket]:
+                    return None
+                column = func.date_trunc(bucket, cell.bucket_start).label(f"{field_key}_{bucket}")
+                aliases[f"{field_key}_{bucket}"] = column
+            elif field_key in dimensions:
+                column = cell.dimensions[field_key].as_string().label(field_key)
+            else:
+                return None
+            aliases[field_key] = column
+            group_columns.append(column)
+
+        aggregate_columns = []
+        for aggregate in aggregates:
+            function_name = aggregate["fn"]
+            field_key = aggregate["field"]
+            alias = aggregate.get("alias") or f"{function_name}_{field_key}"
+            measure_filter = cell.measure_key == field_key
+            if function_name == "count":
+                if field_key in measures:
+                    counted = func.sum(cell.value_count).filter(measure_filter)
+                elif field_key in ROW_COUNT_META_FIELDS:
+                    counted = func.sum(cell.value_count).filter(cell.measure_key == ROW_COUNT_MEASURE)
+                elif field_key in dimensions:
+                    counted = func.sum(cell.value_count).filter(
+                        and_(cell.measure_key == ROW_COUNT_MEASURE, cell.dimensions[field_key].as_string().isnot(None))
+                    )
+                else:
+                    return None
+                column = cast(func.coalesce(counted, 0), BigInteger)
+            elif function_name == "sum" and field_key in measures:
+                column = func.sum(cell.value_sum).filter(measure_filter)
+            elif function_name == "avg" and field_key in measures:
+                column = cast(func.sum(cell.value_sum).filter(measure_filter), Float) / func.nullif(
+                    cast(func.sum(cell.value_count).filter(measure_filter), Float), 0
+                )
+            else:
+                return None
+            labelled = column.label(alias)
+            aliases[alias] = labelled
+            aggregate_columns.append(labelled)
+
+        where_clause = AnalyticsRollupService._dimension_where(filters, dimensions, allowed_fields) if filters else None
+        if where_clause is False:
+            return None
+
+        statement = select(*group_columns, *aggregate_columns).where(cell.rollup_id == rollup.id)
+        if where_clause is not None:
+            statement = statement.where(where_clause)
+        if group_columns:
+            statement = statement.group_by(*group_columns)
+        for ordering in order_by:
+            column = aliases.get(ordering["field"])
+            if column is None:
+                return None
+            statement = statement.order_by(column.desc() if ordering.get("direction", "asc") == "desc" else column.asc())
+        return statement
+
+    @staticmethod
+    def _dimension_where(rule_group: dict, dimensions: set[str], allowed_fields: dict):
+        """Mirror AnalyticsService._build_where over rollup dimensions; False when a rule needs raw rows."""
+        from app.services.analytics_service import AnalyticsService
+
+        clauses = []
+        for rule in rule_group.get("rules", []):
+            if "combinator" in rule:
+                nested = AnalyticsRollupService._dimension_where(rule, dimensions, allowed_fields)
+                if nested is False:
+                    return False
+                if nested is not None:
+                    clauses.append(nested)
+                continue
+
+            field_key = rule.get("field")
+            operator = rule.get("operator")
+            if not field_key or not operator:
+                continue
+            if field_key not in dimensions:
+                if field_key in META_FIELDS or field_key in allowed_fields:
+                    return False
+                continue
+            clause = AnalyticsService._apply_operator(
+                AnalyticsRollupCell.dimensions[field_key].as_string(), operator, rule.get("value")
+            )
+            if clause is not None:
+                clauses.append(clause)
+
+        if not clauses:
+            return None
+        return or_(*clauses) if rule_group.get("combinator", "and") == "or" else and_(*clauses)
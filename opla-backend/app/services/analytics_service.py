@@ -1,11 +1,37 @@
 from __future__ import annotations
 
+import json
 import re
+import threading
 import uuid
-from datetime import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Any, Optional
 
-from sqlalchemy import Float, and_, cast, func, or_, select, Date, DateTime
+from sqlalchemy import (
+    Boolean,
+    Float,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    and_,
+    bindparam,
+    case,
+    cast,
+    func,
+    literal,
+    not_,
+    null,
+    or_,
+    select,
+    type_coerce,
+    Date,
+    DateTime,
+)
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PGUUID
+from sqlalchemy.sql.elements import BindParameter
 from sqlalchemy.orm import Session, selectinload
 
 from app.models.analytics import AnalyticsDashboard, DashboardCard, SavedQuestion
@@ -18,7 +44,10 @@ from app.models.form_dataset import (
     FormDatasetStatus,
 )
 from app.models.project import Project, ProjectStatus
-from app.models.submission import Submission
+from app.models.submission import Submission, SubmissionReviewStatus
+from app.services.analytics_approximate_service import ApproximateAnalyticsService
+from app.services.analytics_guard_service import AnalyticsQueryGuard
+from app.services.blueprint_index import BlueprintIndex, BlueprintIndexCache, option_entry
 from app.services.form_service import slugify
 
 
@@ -31,6 +60,46 @@ ALLOWED_AGG_FNS = {
     "count_distinct": lambda col: func.count(col.distinct()),
 }
 
+COMPARE_PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+COMPARE_ADDITIVE_AGG_FNS = {"count", "sum", "count_distinct"}
+QUERY_PLAN_CACHE_SIZE = 512
+SNAPSHOT_BATCH_SIZE = 5000
+# Strings Prep treats as numbers in formulas (see coerceCellValue in the studio).
+CALC_NUMBER_PATTERN = r"^-?\d+(\.\d+)?$"
+
+
+def _period_floor(moment: datetime, period: str) -> datetime:
+    """Start of the calendar period containing moment (weeks start on Monday)."""
+    day_start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "day":
+        return day_start
+    if period == "week":
+        return day_start - timedelta(days=day_start.weekday())
+    if period == "month":
+        return day_start.replace(day=1)
+    if period == "quarter":
+        return day_start.replace(month=(day_start.month - 1) // 3 * 3 + 1, day=1)
+    if period == "year":
+        return day_start.replace(month=1, day=1)
+    raise ValueError(f"PERIOD_NOT_ALLOWED:{period}")
+
+
+def _shift_period(start: datetime, period: str, count: int) -> datetime:
+    """Move a period start (as returned by _period_floor) by count whole periods."""
+    if period == "day":
+        return start + timedelta(days=count)
+    if period == "week":
+        return start + timedelta(weeks=count)
+    month_index = start.year * 12 + start.month - 1 + count * COMPARE_PERIOD_MONTHS[period]
+    return start.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def _one_year_earlier(moment: datetime) -> datetime:
+    try:
+        return moment.replace(year=moment.year - 1)
+    except ValueError:
+        return moment.replace(year=moment.year - 1, day=28)
+
 
 def _derived_meta(dataset: FormDataset) -> dict | None:
     meta = dataset.metadata_json or {}
@@ -44,22 +113,6 @@ def _derived_meta(dataset: FormDataset) -> dict | None:
     }
 
 
-def _option_entry(raw: Any) -> dict[str, str] | None:
-    if isinstance(raw, dict):
-        if raw.get("value") is None and raw.get("label") is None:
-            return None
-        value = raw.get("value")
-        label = raw.get("label")
-        if value is None:
-            value = label
-        if label is None:
-            label = value
-        return {"label": str(label), "value": str(value)}
-    if isinstance(raw, str) and raw.strip():
-        return {"label": raw, "value": raw}
-    return None
-
-
 def _field_options(metadata_json: Any) -> list[dict[str, str]]:
     """Extract choice value/label pairs from dataset field metadata."""
     if not isinstance(metadata_json, dict):
@@ -69,7 +122,7 @@ def _field_options(metadata_json: Any) -> list[dict[str, str]]:
     seen: set[str] = set()
 
     def add_option(raw: Any) -> None:
-        entry = _option_entry(raw)
+        entry = option_entry(raw)
         if not entry:
             return
         if entry["value"] in seen:
@@ -92,59 +145,115 @@ def _field_options(metadata_json: Any) -> list[dict[str, str]]:
     return collected
 
 
-def _blueprint_option_maps(blueprint: Any) -> dict[str, list[dict[str, str]]]:
+def _excel_formula_expression(formula: str, columns: list[dict]) -> str:
+    """Rewrite a Prep (spreadsheet-style) formula into the calculated-field syntax.
+
+    ``[Label]`` and ``[key]`` references become ``[key]``, matching longest names first
+    like the Prep editor does; ``=``, ``<>`` and ``^`` outside string literals become
+    ``==``, ``!=`` and ``**``.
     """
-    Choice options usually live on blueprint.ui nodes (radio/dropdown/checkbox),
-    while dataset field metadata often only has the schema type. Index by bind/key/id.
+    text = formula.strip()
+    if text.startswith("="):
+        text = text[1:]
+    ranked = sorted(
+        (column for column in columns if column.get("key")),
+        key=lambda column: max(len(column.get("label") or ""), len(column["key"])),
+        reverse=True,
+    )
+    for column in ranked:
+        if column.get("label"):
+            text = text.replace(f"[{column['label']}]", f"[{column['key']}]")
+
+    parts = re.split(r'("[^"]*")', text)
+    for index in range(0, len(parts), 2):
+        part = parts[index].replace("<>", "!=").replace("^", "**")
+        parts[index] = re.sub(r"(?<![<>!=])=(?!=)", "==", part)
+    return "".join(parts)
+
+
+def _calc_field_type(expression) -> str:
+    expression_type = getattr(expression, "type", None)
+    if isinstance(expression_type, Boolean):
+        return "boolean"
+    if isinstance(expression_type, String):
+        return "text"
+    return "number"
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _filter_binder(leaf: int):
+    """Bind parameter factory for one filter rule; names match _filter_signature."""
+
+    def bind(index: int, value: Any):
+        return bindparam(f"flt_{leaf}_{index}", value, expanding=isinstance(value, list))
+
+    return bind
+
+
+@dataclass(frozen=True)
+class AnalyticsQueryPlan:
+    """A compiled query shape. Filter values are bind parameters supplied per execution."""
+
+    query: Any
+    count_query: Any
+    columns_meta: tuple[dict, ...]
+    field_keys: frozenset[str]
+    base_filter: Any
+    filter_clauses: tuple
+    group_aliases: tuple[str, ...]
+    group_columns: tuple
+    approximate_aggregates: tuple[tuple[str, str], ...]
+    approximate_distinct: tuple[tuple[str, str, Any], ...]
+    sketch_fields: frozenset[str]
+
+
+@dataclass(frozen=True)
+class LinkedTablePlan:
+    """A linked derived table resolved against its parent: the parent's field keys and
+    the Prep formulas that compile to SQL, as calculated_fields over the parent."""
+
+    parent_keys: tuple[str, ...]
+    calculated_fields: tuple[dict, ...]
+    calculated_keys: frozenset[str]
+    saved_columns: tuple[str, ...]
+
+
+class AnalyticsQueryPlanCache:
+    """In-process LRU of compiled query plans keyed by normalized query shape.
+
+    The key carries the dataset schema version and updated_at, so schema changes
+    compile a fresh plan. Reusing the same statement objects also keeps SQLAlchemy's
+    compiled SQL cache warm, so repeated shapes skip both planning and compilation.
+    Linked derived tables cache their compiled formulas here too, keyed by the
+    table's updated_at (its metadata revision) and the parent's schema version.
     """
-    if not isinstance(blueprint, dict):
-        return {}
 
-    maps: dict[str, list[dict[str, str]]] = {}
+    _lock = threading.Lock()
+    _plans: "OrderedDict[str, AnalyticsQueryPlan | LinkedTablePlan]" = OrderedDict()
 
-    def remember(keys: list[str], options: list[dict[str, str]]) -> None:
-        if not options:
-            return
-        for key in keys:
-            if not key:
-                continue
-            existing = maps.get(key)
-            if not existing or len(options) > len(existing):
-                maps[key] = options
-
-    def walk(node: Any) -> None:
-        if isinstance(node, dict):
-            raw_options = node.get("options")
-            parsed: list[dict[str, str]] = []
-            if isinstance(raw_options, list):
-                seen: set[str] = set()
-                for raw in raw_options:
-                    entry = _option_entry(raw)
-                    if not entry or entry["value"] in seen:
-                        continue
-                    seen.add(entry["value"])
-                    parsed.append(entry)
-
-            if parsed:
-                keys = [
-                    str(node.get("bind") or ""),
-                    str(node.get("key") or ""),
-                    str(node.get("id") or ""),
-                    str(node.get("field_id") or ""),
-                    str(node.get("dataset_field_id") or ""),
-                ]
-                remember(keys, parsed)
-
-            for value in node.values():
-                walk(value)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item)
-
-    walk(blueprint.get("ui"))
-    # Fallback: some blueprints may put options on schema nodes too.
-    walk(blueprint.get("schema"))
-    return maps
+    @classmethod
+    def get(cls, key: str) -> Optional[AnalyticsQueryPlan | LinkedTablePlan]:
+        with cls._lock:
+            plan = cls._plans.get(key)
+            if plan is not None:
+                cls._plans.move_to_end(key)
+            return plan
+
+    @classmethod
+    def put(cls, key: str, plan: AnalyticsQueryPlan | LinkedTablePlan) -> None:
+        with cls._lock:
+            cls._plans[key] = plan
+            cls._plans.move_to_end(key)
+            while len(cls._plans) > QUERY_PLAN_CACHE_SIZE:
+                cls._plans.popitem(last=False)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._plans.clear()
 
 
 class AnalyticsService:
@@ -219,10 +328,12 @@ class AnalyticsService:
                         or 0
                     )
 
-            ui_option_maps = _blueprint_option_maps(
-                (dataset.form.blueprint_live if dataset.form else None)
-                or (dataset.form.blueprint_draft if dataset.form else None)
-            )
+            ui_option_maps: dict[str, list[dict[str, str]]] = {}
+            if dataset.form:
+                if dataset.form.blueprint_live:
+                    ui_option_maps = BlueprintIndexCache.for_live_form(dataset.form).option_maps
+                else:
+                    ui_option_maps = BlueprintIndex.compile(dataset.form.blueprint_draft).option_maps
 
             fields = []
             for field in dataset.fields:
@@ -307,9 +418,6 @@ class AnalyticsService:
         if not columns:
             raise ValueError("COLUMNS_REQUIRED")
 
-        if mode == "snapshot" and not rows:
-            raise ValueError("ROWS_REQUIRED_FOR_SNAPSHOT")
-
         clean_columns = []
         seen_keys: set[str] = set()
         for col in columns:
@@ -376,6 +484,10 @@ class AnalyticsService:
             "created_by": str(user_id) if user_id else None,
             "created_at": datetime.utcnow().isoformat() + "Z",
         }
+        # Snapshots without posted rows are copied from the parent by a background job.
+        server_snapshot = mode == "snapshot" and not rows
+        if server_snapshot:
+            metadata["snapshot_status"] = "building"
 
         dataset = FormDataset(
             form_id=form.id,
@@ -441,9 +553,20 @@ class AnalyticsService:
         db.commit()
         db.refresh(dataset)
 
+        job_id = None
+        if server_snapshot:
+            from app.services.background_job_service import BackgroundJobService
+
+            job = BackgroundJobService.create(db, org_id, "derived_snapshot", user_id=user_id, subject_id=dataset.id)
+            dataset_id = dataset.id
+            BackgroundJobService.start(
+                job.id, lambda job_db, progress: AnalyticsService.build_snapshot(job_db, progress, dataset_id)
+            )
+            job_id = job.id
+
         # Linked tables report parent live count
         record_count = row_count
-        if mode == "linked":
+        if mode == "linked" or server_snapshot:
             record_count = (
                 db.query(func.count(Submission.id))
                 .filter(Submission.dataset_id == parent_dataset_id)
@@ -466,20 +589,230 @@ class AnalyticsService:
             "parent_dataset_id": parent_dataset_id,
             "row_count": row_count,
             "record_count": record_count,
+            "job_id": job_id,
         }
 
+    @staticmethod
+    def build_snapshot(db: Session, progress, dataset_id: uuid.UUID) -> dict:
+        """Copy a snapshot dataset's rows from its parent with batched INSERT ... SELECT.
+
+        Saved columns are read straight from the parent's JSON and calculated columns
+        are evaluated in SQL, so rows never leave the database. Batches are keyset
+        ranges over submission id so progress can be reported between statements; the
+        copy commits once, at the end. A calculated column the SQL compiler cannot
+        express fails the job (UNSUPPORTED_CALCULATED_COLUMNS:<keys>) rather than
+        producing a snapshot without it.
+        """
+        dataset = db.query(FormDataset).filter(FormDataset.id == dataset_id).first()
+        if not dataset:
+            raise ValueError("DATASET_NOT_FOUND")
+        metadata = dict(dataset.metadata_json or {})
+        try:
+            try:
+                parent_id = uuid.UUID(str(metadata.get("parent_dataset_id")))
+            except (TypeError, ValueError) as exc:
+                raise ValueError("PARENT_DATASET_NOT_FOUND") from exc
+            parent = (
+                db.query(FormDataset)
+                .options(selectinload(FormDataset.fields))
+                .filter(FormDataset.id == parent_id, FormDataset.status == FormDatasetStatus.ACTIVE)
+                .first()
+            )
+            if not parent:
+                raise ValueError("PARENT_DATASET_NOT_FOUND")
+            parent_fields = {
+                field.field_key: field
+                for field in parent.fields
+                if field.status == FormDatasetFieldStatus.ACTIVE
+            }
+            schema_version_id = (
+                db.query(FormDatasetSchemaVersion.id)
+                .filter(
+                    FormDatasetSchemaVersion.dataset_id == dataset.id,
+                    FormDatasetSchemaVersion.version_number == dataset.current_schema_version_number,
+                )
+                .scalar()
+            )
+
+            calculated = {
+                spec["key"]: spec for spec in AnalyticsService._linked_calculated_fields(metadata, parent_fields)
+            }
+            unsupported = [
+                column["key"]
+                for column in metadata.get("columns") or []
+                if column.get("key") and column.get("calculated") and column.get("formula")
+                and column["key"] not in calculated
+            ]
+            if unsupported:
+                raise ValueError(f"UNSUPPORTED_CALCULATED_COLUMNS:{','.join(unsupported)}")
+            scope: dict[str, Any] = {}
+            pairs: list = []
+            for column in metadata.get("columns") or []:
+                key = column.get("key")
+                if key in calculated:
+                    compiled = AnalyticsService._compile_calculated_field(calculated[key]["expression"], parent_fields, scope)
+                    scope[key] = compiled
+                    pairs.append((key, func.to_jsonb(compiled)))
+                elif key and not column.get("calculated") and key in parent_fields:
+                    pairs.append((key, Submission.data[key]))
+            # jsonb_build_object takes at most 100 arguments; merge wider rows from chunks.
+            chunks = [
+                func.jsonb_build_object(*(part for key, value in pairs[start:start + 50] for part in (key, value)))
+                for start in range(0, len(pairs), 50)
+            ] or [func.jsonb_build_object()]
+            row_data = chunks[0]
+            for chunk in chunks[1:]:
+                row_data = row_data.op("||")(chunk)
+            row_data = func.jsonb_strip_nulls(row_data)
+
+            has_parent_rows = db.query(Submission.id).filter(Submission.dataset_id == parent.id).first() is not None
+            source_filter = Submission.dataset_id == parent.id if has_parent_rows else Submission.form_id == parent.form_id
+            total = db.query(func.count(Submission.id)).filter(source_filter).scalar() or 0
+            progress.report(0, total, force=True)
+
+            created_by = metadata.get("created_by")
+            table = Submission.__table__
+            target_columns = [
+                "id",
+                "form_id",
+                "user_id",
+                "dataset_id",
+                "dataset_schema_version_id",
+                "data",
+                "metadata_json",
+                "form_version_number",
+                "review_status",
+                "created_at",
+            ]
+            copied = 0
+            last_id = None
+            while True:
+                batch_filter = [source_filter]
+                if last_id is not None:
+                    batch_filter.append(Submission.id > last_id)
+                boundary = db.execute(
+                    select(Submission.id)
+                    .where(*batch_filter)
+                    .order_by(Submission.id)
+                    .offset(SNAPSHOT_BATCH_SIZE - 1)
+                    .limit(1)
+                ).scalar()
+                if boundary is not None:
+                    batch_filter.append(Submission.id <= boundary)
+                source = select(
+                    func.gen_random_uuid(),
+                    literal(dataset.form_id, PGUUID(as_uuid=True)),
+                    literal(uuid.UUID(created_by) if created_by else None, PGUUID(as_uuid=True)),
+                    literal(dataset.id, PGUUID(as_uuid=True)),
+                    literal(schema_version_id, PGUUID(as_uuid=True)),
+                    row_data,
+                    literal({"source": "prep_snapshot"}, JSONB),
+                    literal(1),
+                    cast(literal(SubmissionReviewStatus.SUBMITTED.value), table.c.review_status.type),
+                    func.timezone("utc", func.now()),
+                ).where(*batch_filter)
+                copied += db.execute(table.insert().from_select(target_columns, source)).rowcount
+                progress.report(copied, total)
+                if boundary is None:
+                    break
+                last_id = boundary
+
+            metadata.update({"snapshot_status": "ready", "row_count": copied})
+            dataset.metadata_json = metadata
+            db.commit()
+            return {"dataset_id": str(dataset.id), "row_count": copied}
+        except Exception as exc:
+            db.rollback()
+            metadata["snapshot_status"] = "failed"
+            if isinstance(exc, ValueError):
+                metadata["snapshot_error"] = str(exc)
+            db.query(FormDataset).filter(FormDataset.id == dataset_id).update(
+                {"metadata_json": metadata}, synchronize_session=False
+            )
+            db.commit()
+            raise
+
     @staticmethod
     def _compile_calculated_field(expression: str, allowed_fields: dict, meta_columns: dict):
+        """Compile a formula over dataset fields into a SQL expression.
+
+        Supports arithmetic, comparisons, ``&`` concatenation and the spreadsheet
+        functions in CALC_FUNCTIONS. Text operands are coerced to numbers the way
+        Prep does (numeric-looking strings only), and division by zero yields NULL.
+        """
         import ast
-        from sqlalchemy import Float, cast
-        from sqlalchemy.sql import expression as sql_expression
+
+        def is_numeric(expr) -> bool:
+            return isinstance(getattr(expr, "type", None), (Integer, Numeric))
+
+        def as_number(expr):
+            if is_numeric(expr):
+                return expr
+            if isinstance(getattr(expr, "type", None), Boolean):
+                return cast(cast(expr, Integer), Float)
+            trimmed = func.btrim(cast(expr, Text))
+            return case((trimmed.op("~")(CALC_NUMBER_PATTERN), cast(trimmed, Float)), else_=null())
+
+        def as_text(expr):
+            return expr if isinstance(getattr(expr, "type", None), String) else cast(expr, Text)
+
+        def truthy(expr):
+            if isinstance(getattr(expr, "type", None), Boolean):
+                return expr
+            return as_number(expr) != 0
+
+        def as_float(expr):
+            return type_coerce(expr, Float)
 
         ops = {
-            ast.Add: lambda a, b: a + b,
-            ast.Sub: lambda a, b: a - b,
-            ast.Mult: lambda a, b: a * b,
-            ast.Div: lambda a, b: a / b,
+            ast.Add: lambda a, b: as_float(as_number(a) + as_number(b)),
+            ast.Sub: lambda a, b: as_float(as_number(a) - as_number(b)),
+            ast.Mult: lambda a, b: as_float(as_number(a) * as_number(b)),
+            ast.Div: lambda a, b: as_float(as_number(a) / func.nullif(as_number(b), 0)),
+            ast.Pow: lambda a, b: func.power(as_number(a), as_number(b), type_=Float),
+            ast.BitAnd: lambda a, b: func.concat(as_text(a), as_text(b), type_=Text),
         }
+        comparisons = {
+            ast.Eq: lambda a, b: a == b,
+            ast.NotEq: lambda a, b: a != b,
+            ast.Lt: lambda a, b: a < b,
+            ast.LtE: lambda a, b: a <= b,
+            ast.Gt: lambda a, b: a > b,
+            ast.GtE: lambda a, b: a >= b,
+        }
+
+        def call(name: str, args: list):
+            if name == "IF" and len(args) in (2, 3):
+                then, otherwise = args[1], args[2] if len(args) == 3 else literal(False)
+                if is_numeric(then) != is_numeric(otherwise):
+                    then, otherwise = as_text(then), as_text(otherwise)
+                return case((truthy(args[0]), then), else_=otherwise)
+            if name == "AND" and args:
+                return and_(*(truthy(arg) for arg in args))
+            if name == "OR" and args:
+                return or_(*(truthy(arg) for arg in args))
+            if name == "NOT" and len(args) == 1:
+                return not_(truthy(args[0]))
+            if name == "ROUND" and len(args) in (1, 2):
+                digits = args[1].value if len(args) == 2 and isinstance(args[1], BindParameter) else 0
+                if not isinstance(digits, int):
+                    raise ValueError("Unsupported expression: ROUND digits must be a whole number")
+                return cast(func.round(cast(as_number(args[0]), Numeric), digits), Float)
+            if name == "ABS" and len(args) == 1:
+                return func.abs(as_number(args[0]), type_=Float)
+            if name in ("MIN", "MAX") and args:
+                return (func.least if name == "MIN" else func.greatest)(*(as_number(arg) for arg in args), type_=Float)
+            if name == "SUM" and args:
+                return as_float(sum((func.coalesce(as_number(arg), 0) for arg in args[1:]), func.coalesce(as_number(args[0]), 0)))
+            if name in ("CONCAT", "CONCATENATE") and args:
+                return func.concat(*(as_text(arg) for arg in args), type_=Text)
+            if name in ("UPPER", "LOWER", "TRIM") and len(args) == 1:
+                return getattr(func, "btrim" if name == "TRIM" else name.lower())(as_text(args[0]), type_=Text)
+            if name == "LEN" and len(args) == 1:
+                return func.length(as_text(args[0]), type_=Integer)
+            if name == "ISBLANK" and len(args) == 1:
+                return or_(args[0].is_(None), as_text(args[0]) == "")
+            raise ValueError(f"Unsupported function: {name}")
 
         def parse_node(node):
             if isinstance(node, ast.Expression):
@@ -491,8 +824,20 @@ class AnalyticsService:
                 if not op_func:
                     raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
                 return op_func(left, right)
+            if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in comparisons:
+                left = parse_node(node.left)
+                right = parse_node(node.comparators[0])
+                if is_numeric(left) or is_numeric(right):
+                    left, right = as_number(left), as_number(right)
+                else:
+                    left, right = as_text(left), as_text(right)
+                return comparisons[type(node.ops[0])](left, right)
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+                return call(node.func.id.upper(), [parse_node(arg) for arg in node.args])
             if isinstance(node, ast.Name):
                 key = node.id
+                if key.upper() in ("TRUE", "FALSE"):
+                    return literal(key.upper() == "TRUE")
                 if key in meta_columns:
                     return meta_columns[key]
                 field = allowed_fields.get(key)
@@ -504,17 +849,66 @@ class AnalyticsService:
                 return col
             if isinstance(node, ast.Constant):
                 if isinstance(node.value, (int, float)):
-                    return sql_expression.literal(node.value)
-                return sql_expression.literal(str(node.value))
+                    return literal(node.value)
+                return literal(str(node.value))
             if isinstance(node, ast.UnaryOp):
                 if isinstance(node.op, ast.USub):
-                    return -parse_node(node.operand)
+                    return as_float(-as_number(parse_node(node.operand)))
+                if isinstance(node.op, ast.UAdd):
+                    return as_number(parse_node(node.operand))
             raise ValueError(f"Unsupported expression: {type(node).__name__}")
 
         clean = re.sub(r"\[([^\]]+)\]", r"\1", expression)
-        tree = ast.parse(clean, mode="eval")
+        try:
+            tree = ast.parse(clean, mode="eval")
+        except SyntaxError as exc:
+            raise ValueError(f"Unsupported expression: {expression}") from exc
         return parse_node(tree)
 
+    @staticmethod
+    def _linked_calculated_fields(derived: dict, parent_fields: dict) -> list[dict]:
+        """Calculated Prep columns of a linked table as calculated_fields over its parent.
+
+        Formulas the SQL compiler cannot express are left out; the client still
+        evaluates those on the returned rows.
+        """
+        columns = [column for column in derived.get("columns") or [] if column.get("key")]
+        scope = dict(parent_fields)
+        calculated = []
+        for column in columns:
+            if not column.get("calculated") or not column.get("formula"):
+                continue
+            expression = _excel_formula_expression(column["formula"], columns)
+            try:
+                AnalyticsService._compile_calculated_field(expression, scope, {})
+            except ValueError:
+                continue
+            scope[column["key"]] = column
+            calculated.append({"key": column["key"], "label": column.get("label") or column["key"], "expression": expression})
+        return calculated
+
+    @staticmethod
+    def _build_linked_plan(derived: dict, parent: FormDataset) -> LinkedTablePlan:
+        parent_fields = {
+            field.field_key: field
+            for field in parent.fields
+            if field.status == FormDatasetFieldStatus.ACTIVE
+        }
+        calculated = AnalyticsService._linked_calculated_fields(derived, parent_fields)
+        calculated_keys = frozenset(spec["key"] for spec in calculated)
+        saved_columns = tuple(
+            column["key"]
+            for column in (derived.get("columns") or [])
+            if column.get("key")
+            and (column["key"] in calculated_keys or (not column.get("calculated") and column["key"] in parent_fields))
+        )
+        return LinkedTablePlan(
+            parent_keys=tuple(parent_fields),
+            calculated_fields=tuple(calculated),
+            calculated_keys=calculated_keys,
+            saved_columns=saved_columns,
+        )
+
     @staticmethod
     def execute_query(
         db: Session,
@@ -528,10 +922,12 @@ class AnalyticsService:
         limit: int = 500,
         offset: int = 0,
         calculated_fields: Optional[list[dict]] = None,
+        approximate: Optional[dict] = None,
+        max_estimated_cost: Optional[float] = None,
     ) -> dict:
+        # Fields load lazily: only a plan cache miss needs them.
         dataset = (
             db.query(FormDataset)
-            .options(selectinload(FormDataset.fields))
             .join(Form, Form.id == FormDataset.form_id)
             .join(Project, Project.id == Form.project_id)
             .filter(
@@ -546,7 +942,7 @@ class AnalyticsService:
 
         derived = _derived_meta(dataset)
 
-        # Linked derived tables always query the live parent; formulas are client-applied.
+        # Linked derived tables always query the live parent, with their formulas compiled into the SQL.
         if derived and derived["mode"] == "linked" and derived.get("parent_dataset_id"):
             try:
                 parent_id = uuid.UUID(str(derived["parent_dataset_id"]))
@@ -555,28 +951,34 @@ class AnalyticsService:
 
             parent = (
                 db.query(FormDataset)
-                .options(selectinload(FormDataset.fields))
                 .filter(FormDataset.id == parent_id, FormDataset.status == FormDatasetStatus.ACTIVE)
                 .first()
             )
             if not parent:
                 raise ValueError("PARENT_DATASET_NOT_FOUND")
 
-            parent_keys = [
-                field.field_key
-                for field in parent.fields
-                if field.status == FormDatasetFieldStatus.ACTIVE
-            ]
+            linked_key = _canonical_json(
+                {
+                    "linked_dataset_id": dataset.id,
+                    "updated_at": dataset.updated_at,
+                    "parent_dataset_id": parent.id,
+                    "parent_schema_version": parent.current_schema_version_number,
+                    "parent_updated_at": parent.updated_at,
+                }
+            )
+            linked_plan = AnalyticsQueryPlanCache.get(linked_key)
+            if linked_plan is None:
+                linked_plan = AnalyticsService._build_linked_plan(derived, parent)
+                AnalyticsQueryPlanCache.put(linked_key, linked_plan)
+
+            parent_keys = list(linked_plan.parent_keys)
             # Allow selecting any parent field (Prep column picker may request more than the saved set).
             if select_fields:
-                query_select = [key for key in select_fields if key in parent_keys] or parent_keys
+                query_select = [
+                    key for key in select_fields if key in parent_keys or key in linked_plan.calculated_keys
+                ] or parent_keys
             else:
-                saved_base = [
-                    c["key"]
-                    for c in (derived.get("columns") or [])
-                    if c.get("key") and not c.get("calculated") and c["key"] in parent_keys
-                ]
-                query_select = saved_base or parent_keys
+                query_select = list(linked_plan.saved_columns) or parent_keys
 
             result = AnalyticsService.execute_query(
                 db=db,
@@ -589,16 +991,155 @@ class AnalyticsService:
                 order_by=order_by,
                 limit=limit,
                 offset=offset,
-                calculated_fields=None,
+                calculated_fields=list(linked_plan.calculated_fields) + list(calculated_fields or []),
+                approximate=approximate,
+                max_estimated_cost=max_estimated_cost,
             )
             result["derived"] = derived
             return result
 
+        group_by = group_by or []
+        aggregates = aggregates or []
+        order_by = order_by or []
+        calculated_fields = calculated_fields or []
+
+        # Distinct counts come from HyperLogLog after the query runs, so they cannot drive ordering.
+        distinct_aliases = {
+            aggregate.get("alias") or f"count_distinct_{aggregate['field']}"
+            for aggregate in aggregates
+            if aggregate["fn"] == "count_distinct"
+        }
+        approximate_active = bool(
+            approximate is not None
+            and aggregates
+            and not {ordering["field"] for ordering in order_by} & distinct_aliases
+        )
+
+        dataset_filter = Submission.dataset_id == dataset.id
+        has_dataset_rows = db.query(Submission.id).filter(dataset_filter).first() is not None
+
+        filter_shape, filter_params = AnalyticsService._filter_signature(filters)
+        plan_key = _canonical_json(
+            {
+                "dataset_id": dataset.id,
+                "schema_version": dataset.current_schema_version_number,
+                "updated_at": dataset.updated_at,
+                "has_dataset_rows": has_dataset_rows,
+                "approximate": approximate_active,
+                "select_fields": select_fields,
+                "filters": filter_shape,
+                "group_by": group_by,
+                "aggregates": aggregates,
+                "order_by": order_by,
+                "calculated_fields": calculated_fields,
+            }
+        )
+        plan = AnalyticsQueryPlanCache.get(plan_key)
+        if plan is None:
+            plan = AnalyticsService._build_query_plan(
+                dataset,
+                has_dataset_rows=has_dataset_rows,
+                select_fields=select_fields,
+                filters=filters,
+                group_by=group_by,
+                aggregates=aggregates,
+                order_by=order_by,
+                calculated_fields=calculated_fields,
+                approximate_active=approximate_active,
+            )
+            AnalyticsQueryPlanCache.put(plan_key, plan)
+
+        rollup_answer = None
+        if has_dataset_rows and aggregates and not calculated_fields:
+            from app.services.analytics_rollup_service import AnalyticsRollupService
+
+            rollup_answer = AnalyticsRollupService.try_answer(
+                db,
+                dataset.id,
+                allowed_fields=plan.field_keys,
+                filters=filters,
+                group_by=group_by,
+                aggregates=aggregates,
+                order_by=order_by,
+                limit=limit,
+                offset=offset,
+            )
+
+        approximate_payload = None
+        if rollup_answer is not None:
+            total_count = rollup_answer["total_count"]
+            rows = rollup_answer["rows"]
+        elif approximate_active:
+            query = plan.query
+            sample_percent = ApproximateAnalyticsService.sample_percent(db, plan.base_filter, approximate.get("sample_percent"))
+            if sample_percent:
+                query = ApproximateAnalyticsService.sample(query, sample_percent, approximate.get("seed") or 0)
+            if max_estimated_cost is not None:
+                AnalyticsQueryGuard.check_cost(db, query, filter_params, max_estimated_cost)
+            total_count = db.execute(select(func.count()).select_from(query.subquery()), filter_params).scalar() or 0
+            rows = [dict(row._mapping) for row in db.execute(query.limit(limit).offset(offset), filter_params)]
+            approximate_payload = ApproximateAnalyticsService.finalize(
+                db,
+                rows,
+                org_id=org_id,
+                dataset_id=dataset.id,
+                aggregates=plan.approximate_aggregates,
+                distinct=plan.approximate_distinct,
+                sample_percent=sample_percent,
+                group_aliases=plan.group_aliases,
+                group_columns=plan.group_columns,
+                filter_clauses=plan.filter_clauses,
+                sketch_fields=plan.sketch_fields,
+                params=filter_params,
+            )
+        else:
+            if max_estimated_cost is not None:
+                AnalyticsQueryGuard.check_cost(db, plan.query, filter_params, max_estimated_cost)
+            total_count = db.execute(plan.count_query, filter_params).scalar() or 0
+            result = db.execute(plan.query.limit(limit).offset(offset), filter_params)
+            rows = [dict(row._mapping) for row in result]
+
+        for row in rows:
+            for key, value in list(row.items()):
+                if isinstance(value, uuid.UUID):
+                    row[key] = str(value)
+                elif hasattr(value, "isoformat"):
+                    row[key] = value.isoformat()
+
+        payload = {
+            "columns": [dict(column) for column in plan.columns_meta],
+            "rows": rows,
+            "total_count": total_count,
+            "truncated": total_count > offset + limit,
+        }
+        if rollup_answer is not None:
+            payload["rollup_id"] = str(rollup_answer["rollup_id"])
+        if approximate_payload is not None:
+            payload["approximate"] = approximate_payload
+        if derived:
+            payload["derived"] = derived
+        return payload
+
+    @staticmethod
+    def _build_query_plan(
+        dataset: FormDataset,
+        *,
+        has_dataset_rows: bool,
+        select_fields: list[str],
+        filters: Optional[dict],
+        group_by: list[Any],
+        aggregates: list[dict],
+        order_by: list[dict],
+        calculated_fields: list[dict],
+        approximate_active: bool,
+    ) -> AnalyticsQueryPlan:
+        """Compile the SELECT for one query shape; filter values stay bind parameters."""
         allowed_fields = {
             field.field_key: field
             for field in dataset.fields
             if field.status == FormDatasetFieldStatus.ACTIVE
         }
+        field_keys = frozenset(allowed_fields)
         meta_columns = {
             "_submission_id": Submission.id.label("_submission_id"),
             "_submitted_at": Submission.created_at.label("_submitted_at"),
@@ -606,15 +1147,19 @@ class AnalyticsService:
             "_form_version": Submission.form_version_number.label("_form_version"),
         }
 
-        calculated_fields = calculated_fields or []
         calc_field_exprs = {}
+        # Later formulas may reference earlier calculated fields by key.
+        calc_scope = dict(meta_columns)
         for cf in calculated_fields:
             key = cf.get("key") or cf.get("field", "calc")
             label = cf.get("label", key)
             expr_str = cf.get("expression", cf.get("formula", ""))
-            compiled = AnalyticsService._compile_calculated_field(expr_str, allowed_fields, meta_columns)
+            compiled = AnalyticsService._compile_calculated_field(expr_str, allowed_fields, calc_scope)
+            calc_scope[key] = compiled
             calc_field_exprs[key] = compiled.label(key)
-            allowed_fields[key] = type("obj", (object,), {"field_key": key, "label": label, "field_type": "number"})()
+            allowed_fields[key] = type(
+                "obj", (object,), {"field_key": key, "label": label, "field_type": _calc_field_type(compiled)}
+            )()
 
         def resolve_column(key: str):
             if key in meta_columns:
@@ -633,16 +1178,16 @@ class AnalyticsService:
                 key = group_item
                 bucket = None
 
-            base_col = meta_columns[key] if key in meta_columns else Submission.data[key].as_string()
+            base_col = calc_scope[key] if key in calc_scope else Submission.data[key].as_string()
             if bucket:
                 return func.date_trunc(bucket, cast(base_col, DateTime)).label(f"{key}_{bucket}")
             return resolve_column(key)
 
         selected_columns = []
         order_aliases = {}
-        group_by = group_by or []
-        aggregates = aggregates or []
-        order_by = order_by or []
+        approximate_aggregates: list[tuple[str, str]] = []
+        approximate_distinct: list[tuple[str, str, Any]] = []
+        group_aliases: list[str] = []
 
         if aggregates:
             for group_item in group_by:
@@ -657,15 +1202,25 @@ class AnalyticsService:
                 selected_columns.append(col)
                 order_aliases[alias] = col
                 order_aliases[group_key] = col
+                group_aliases.append(alias)
             for aggregate in aggregates:
                 function_name = aggregate["fn"]
                 if function_name not in ALLOWED_AGG_FNS:
                     raise ValueError(f"AGG_NOT_ALLOWED:{function_name}")
                 col = resolve_column(aggregate["field"])
                 alias = aggregate.get("alias") or f"{function_name}_{aggregate['field']}"
-                expr = ALLOWED_AGG_FNS[function_name](col).label(alias)
+                if approximate_active and function_name == "count_distinct":
+                    # Placeholder keeps the query aggregate; the value is replaced by the HyperLogLog estimate.
+                    expr = func.count().label(alias)
+                    approximate_distinct.append((alias, aggregate["field"], col))
+                else:
+                    expr = ALLOWED_AGG_FNS[function_name](col).label(alias)
                 selected_columns.append(expr)
                 order_aliases[alias] = expr
+                if approximate_active:
+                    approximate_aggregates.append((function_name, alias))
+                    if function_name in {"sum", "avg"}:
+                        selected_columns.extend(ApproximateAnalyticsService.moment_columns(col, alias))
         elif select_fields:
             for field_key in select_fields:
                 col = resolve_column(field_key)
@@ -680,19 +1235,18 @@ class AnalyticsService:
                 selected_columns.append(col)
                 order_aliases[field_key] = col
 
-        dataset_filter = Submission.dataset_id == dataset.id
-        has_dataset_rows = db.query(Submission.id).filter(dataset_filter).first() is not None
-        base_filter = dataset_filter if has_dataset_rows else Submission.form_id == dataset.form_id
-
+        base_filter = Submission.dataset_id == dataset.id if has_dataset_rows else Submission.form_id == dataset.form_id
         query = select(*selected_columns).where(base_filter)
 
+        where_clause = None
         if filters:
-            where_clause = AnalyticsService._build_where(filters, allowed_fields, meta_columns)
+            where_clause = AnalyticsService._build_where(filters, allowed_fields, calc_scope, parameterize=True)
             if where_clause is not None:
                 query = query.where(where_clause)
 
-        if aggregates and group_by:
-            query = query.group_by(*(get_group_col(group_item) for group_item in group_by))
+        group_columns = [get_group_col(group_item) for group_item in group_by] if aggregates else []
+        if group_columns:
+            query = query.group_by(*group_columns)
 
         for ordering in order_by:
             key = ordering["field"]
@@ -701,29 +1255,26 @@ class AnalyticsService:
                 col = resolve_column(key)
             query = query.order_by(col.desc() if ordering.get("direction", "asc") == "desc" else col.asc())
 
-        total_count = db.execute(select(func.count()).select_from(query.subquery())).scalar() or 0
-        result = db.execute(query.limit(limit).offset(offset))
-        rows = [dict(row._mapping) for row in result]
-
-        for row in rows:
-            for key, value in list(row.items()):
-                if isinstance(value, uuid.UUID):
-                    row[key] = str(value)
-                elif hasattr(value, "isoformat"):
-                    row[key] = value.isoformat()
-
-        columns_meta = AnalyticsService._build_columns_meta(
-            allowed_fields, meta_columns, select_fields, group_by, aggregates
+        return AnalyticsQueryPlan(
+            query=query,
+            count_query=select(func.count()).select_from(query.subquery()),
+            columns_meta=tuple(
+                AnalyticsService._build_columns_meta(allowed_fields, meta_columns, select_fields, group_by, aggregates)
+            ),
+            field_keys=field_keys,
+            base_filter=base_filter,
+            filter_clauses=tuple(clause for clause in (base_filter, where_clause) if clause is not None),
+            group_aliases=tuple(group_aliases),
+            group_columns=tuple(group_columns),
+            approximate_aggregates=tuple(approximate_aggregates),
+            approximate_distinct=tuple(approximate_distinct),
+            # Maintained per-field sketches only cover whole-dataset counts of stored fields.
+            sketch_fields=(
+                frozenset(allowed_fields) - frozenset(calc_field_exprs)
+                if has_dataset_rows and not group_by and where_clause is None
+                else frozenset()
+            ),
         )
-        payload = {
-            "columns": columns_meta,
-            "rows": rows,
-            "total_count": total_count,
-            "truncated": total_count > offset + limit,
-        }
-        if derived:
-            payload["derived"] = derived
-        return payload
 
     @staticmethod
     def _build_columns_meta(allowed_fields: dict[str, FormDatasetField], meta_columns: dict, select_fields: list[str], group_by: list[str], aggregates: list[dict]) -> list[dict]:
@@ -776,15 +1327,24 @@ class AnalyticsService:
         return meta
 
     @staticmethod
-    def _build_where(rule_group: dict, allowed_fields: dict[str, FormDatasetField], meta_columns: Optional[dict] = None):
+    def _build_where(
+        rule_group: dict,
+        allowed_fields: dict[str, FormDatasetField],
+        meta_columns: Optional[dict] = None,
+        parameterize: bool = False,
+        _leaves: Optional[list[int]] = None,
+    ):
+        """Compile a filter group. With parameterize, rule values become named bind
+        parameters (see _filter_signature) so the statement can be reused across values."""
         combinator = rule_group.get("combinator", "and")
         rules = rule_group.get("rules", [])
         clauses = []
         meta_columns = meta_columns or {}
+        leaves = _leaves if _leaves is not None else [0]
 
         for rule in rules:
             if "combinator" in rule:
-                nested = AnalyticsService._build_where(rule, allowed_fields, meta_columns)
+                nested = AnalyticsService._build_where(rule, allowed_fields, meta_columns, parameterize, leaves)
                 if nested is not None:
                     clauses.append(nested)
                 continue
@@ -794,6 +1354,8 @@ class AnalyticsService:
             value = rule.get("value")
             if not field_key or not operator:
                 continue
+            leaf = leaves[0]
+            leaves[0] += 1
 
             if field_key in meta_columns:
                 column = meta_columns[field_key]
@@ -802,7 +1364,8 @@ class AnalyticsService:
             else:
                 continue
 
-            clause = AnalyticsService._apply_operator(column, operator, value)
+            bind = _filter_binder(leaf) if parameterize else None
+            clause = AnalyticsService._apply_operator(column, operator, value, bind)
             if clause is not None:
                 clauses.append(clause)
 
@@ -811,41 +1374,97 @@ class AnalyticsService:
         return or_(*clauses) if combinator == "or" else and_(*clauses)
 
     @staticmethod
-    def _apply_operator(column, operator: str, value):
+    def _filter_signature(rule_group: Optional[dict]) -> tuple[Any, dict[str, Any]]:
+        """Split a filter group into its shape (fields, operators, value arity) and the
+        bind parameter values _build_where(parameterize=True) expects for it."""
+        params: dict[str, Any] = {}
+        leaves = [0]
+
+        def walk(group: dict) -> list:
+            shape: list = [group.get("combinator", "and")]
+            for rule in group.get("rules", []):
+                if "combinator" in rule:
+                    shape.append(walk(rule))
+                    continue
+                field_key = rule.get("field")
+                operator = rule.get("operator")
+                if not field_key or not operator:
+                    continue
+                leaf = leaves[0]
+                leaves[0] += 1
+                try:
+                    values = AnalyticsService._operator_params(operator, rule.get("value"))
+                except (TypeError, ValueError):
+                    # Unusable values fail when the plan is compiled, as before.
+                    shape.append([field_key, operator, "invalid", leaf])
+                    continue
+                if values is None:
+                    shape.append([field_key, operator, None])
+                    continue
+                for index, param in enumerate(values):
+                    params[f"flt_{leaf}_{index}"] = param
+                # Value types are part of the shape: bind parameters take their type from the first value seen.
+                shape.append([field_key, operator, [type(param).__name__ for param in values]])
+            return shape
+
+        if not rule_group:
+            return None, {}
+        return walk(rule_group), params
+
+    @staticmethod
+    def _operator_params(operator: str, value) -> Optional[list]:
+        """Values an operator binds, or None when it produces no clause."""
+        if operator in {"=", "equal", "!=", "notEqual"}:
+            return [] if value is None else [value]
+        if operator in {">", "greaterThan", "<", "lessThan", ">=", "greaterThanOrEqual", "<=", "lessThanOrEqual"}:
+            return [float(value)]
+        if operator == "contains":
+            return [f"%{value}%"]
+        if operator == "beginsWith":
+            return [f"{value}%"]
+        if operator == "endsWith":
+            return [f"%{value}"]
+        if operator in {"null", "isEmpty", "notNull", "isNotEmpty"}:
+            return []
+        if operator in {"between", "in", "notIn"}:
+            values = value if isinstance(value, list) else [item.strip() for item in str(value).split(",")]
+            if operator != "between":
+                return [list(values)]
+            if len(values) == 2:
+                return [float(values[0]), float(values[1])]
+        return None
+
+    @staticmethod
+    def _apply_operator(column, operator: str, value, bind=None):
+        params = AnalyticsService._operator_params(operator, value)
+        if params is None:
+            return None
+        if bind is not None:
+            params = [bind(index, param) for index, param in enumerate(params)]
+
         if operator in {"=", "equal"}:
-            return column == value
+            return column == params[0] if params else column.is_(None)
         if operator in {"!=", "notEqual"}:
-            return column != value
+            return column != params[0] if params else column.isnot(None)
         if operator in {">", "greaterThan"}:
-            return cast(column, Float) > float(value)
+            return cast(column, Float) > params[0]
         if operator in {"<", "lessThan"}:
-            return cast(column, Float) < float(value)
+            return cast(column, Float) < params[0]
         if operator in {">=", "greaterThanOrEqual"}:
-            return cast(column, Float) >= float(value)
+            return cast(column, Float) >= params[0]
         if operator in {"<=", "lessThanOrEqual"}:
-            return cast(column, Float) <= float(value)
-        if operator == "contains":
-            return column.ilike(f"%{value}%")
-        if operator == "beginsWith":
-            return column.ilike(f"{value}%")
-        if operator == "endsWith":
-            return column.ilike(f"%{value}")
+            return cast(column, Float) <= params[0]
+        if operator in {"contains", "beginsWith", "endsWith"}:
+            return column.ilike(params[0])
         if operator in {"null", "isEmpty"}:
             return column.is_(None)
         if operator in {"notNull", "isNotEmpty"}:
             return column.isnot(None)
         if operator == "between":
-            values = value if isinstance(value, list) else [item.strip() for item in str(value).split(",")]
-            if len(values) == 2:
-                return and_(cast(column, Float) >= float(values[0]), cast(column, Float) <= float(values[1]))
-            return None
+            return and_(cast(column, Float) >= params[0], cast(column, Float) <= params[1])
         if operator == "in":
-            values = value if isinstance(value, list) else [item.strip() for item in str(value).split(",")]
-            return column.in_(values)
-        if operator == "notIn":
-            values = value if isinstance(value, list) else [item.strip() for item in str(value).split(",")]
-            return column.notin_(values)
-        return None
+            return column.in_(params[0])
+        return column.notin_(params[0])
 
     @staticmethod
     def create_question(db: Session, org_id: uuid.UUID, user_id: uuid.UUID, data: dict) -> SavedQuestion:
@@ -937,6 +1556,49 @@ class AnalyticsService:
         db.delete(dashboard)
         db.commit()
 
+    @staticmethod
+    def _resolve_query_source(db: Session, org_id: uuid.UUID, dataset_id: uuid.UUID):
+        """Return (allowed_fields, base_filter) for a dataset, following linked derived tables to their parent."""
+        dataset = (
+            db.query(FormDataset)
+            .options(selectinload(FormDataset.fields))
+            .join(Form, Form.id == FormDataset.form_id)
+            .join(Project, Project.id == Form.project_id)
+            .filter(
+                FormDataset.id == dataset_id,
+                Project.org_id == org_id,
+                FormDataset.status == FormDatasetStatus.ACTIVE,
+            )
+            .first()
+        )
+        if not dataset:
+            raise ValueError("DATASET_NOT_FOUND")
+
+        derived = _derived_meta(dataset)
+        if derived and derived["mode"] == "linked" and derived.get("parent_dataset_id"):
+            try:
+                parent_id = uuid.UUID(str(derived["parent_dataset_id"]))
+            except (ValueError, TypeError) as exc:
+                raise ValueError("PARENT_DATASET_NOT_FOUND") from exc
+            dataset = (
+                db.query(FormDataset)
+                .options(selectinload(FormDataset.fields))
+                .filter(FormDataset.id == parent_id, FormDataset.status == FormDatasetStatus.ACTIVE)
+                .first()
+            )
+            if not dataset:
+                raise ValueError("PARENT_DATASET_NOT_FOUND")
+
+        allowed_fields = {
+            field.field_key: field
+            for field in dataset.fields
+            if field.status == FormDatasetFieldStatus.ACTIVE
+        }
+        dataset_filter = Submission.dataset_id == dataset.id
+        has_dataset_rows = db.query(Submission.id).filter(dataset_filter).first() is not None
+        base_filter = dataset_filter if has_dataset_rows else Submission.form_id == dataset.form_id
+        return allowed_fields, base_filter
+
     @staticmethod
     def compare_period(
         db: Session,
@@ -947,59 +1609,114 @@ class AnalyticsService:
         date_field: str = "_submitted_at",
         period: str = "month",
         filters: Optional[dict] = None,
+        series_length: int = 12,
+        as_of: Optional[datetime] = None,
     ) -> dict:
-        from datetime import datetime, timedelta
-        from sqlalchemy import func as sa_func
-
-        now = datetime.utcnow()
-        period_map = {
-            "day": timedelta(days=1),
-            "week": timedelta(days=7),
-            "month": timedelta(days=30),
-            "quarter": timedelta(days=90),
-            "year": timedelta(days=365),
+        """Compare the current calendar period to date against earlier windows in one scan.
+
+        The current window runs from the start of the calendar period containing
+        as_of up to as_of. The previous period and the same period last year
+        cover the same elapsed span, clipped to their own period end. The
+        sparkline holds the last series_length calendar periods, ending with the
+        current one.
+        """
+        if agg_fn not in ALLOWED_AGG_FNS:
+            raise ValueError(f"AGG_NOT_ALLOWED:{agg_fn}")
+
+        as_of = as_of or datetime.utcnow()
+        current_start = _period_floor(as_of, period)
+        elapsed = as_of - current_start
+
+        previous_start = _shift_period(current_start, period, -1)
+        previous_end = min(previous_start + elapsed, current_start)
+        last_year_start = _period_floor(_one_year_earlier(current_start), period)
+        last_year_end = min(last_year_start + elapsed, _shift_period(last_year_start, period, 1))
+
+        series_windows = []
+        for index in range(series_length - 1, -1, -1):
+            start = _shift_period(current_start, period, -index)
+            series_windows.append((start, min(_shift_period(start, period, 1), as_of)))
+
+        windows = {
+            "current": (current_start, as_of),
+            "previous": (previous_start, previous_end),
+            "last_year": (last_year_start, last_year_end),
         }
-        delta = period_map.get(period, timedelta(days=30))
-
-        current_start = now - delta
-        previous_start = now - 2 * delta
-        previous_end = now - delta
-
-        def run_for_range(start, end):
-            range_filters = {
-                "combinator": "and",
-                "rules": [
-                    {"field": date_field, "operator": ">=", "value": start.isoformat()},
-                    {"field": date_field, "operator": "<", "value": end.isoformat()},
-                ],
-            }
-            if filters:
-                range_filters = {
-                    "combinator": "and",
-                    "rules": [range_filters, filters],
-                }
-            result = AnalyticsService.execute_query(
-                db=db,
-                org_id=org_id,
-                dataset_id=dataset_id,
-                select_fields=[],
-                filters=range_filters,
-                group_by=[],
-                aggregates=[{"field": measure_field, "fn": agg_fn, "alias": "value"}],
-                limit=1,
-            )
-            rows = result.get("rows", [])
-            return rows[0]["value"] if rows else 0
+        for index, window in enumerate(series_windows):
+            windows[f"series_{index}"] = window
+
+        allowed_fields, base_filter = AnalyticsService._resolve_query_source(db, org_id, dataset_id)
+        meta_columns = {
+            "_submission_id": Submission.id,
+            "_submitted_at": Submission.created_at,
+            "_user_id": Submission.user_id,
+            "_form_version": Submission.form_version_number,
+        }
+
+        if date_field == "_submitted_at":
+            date_column = Submission.created_at
+        elif date_field in allowed_fields:
+            date_column = cast(Submission.data[date_field].as_string(), DateTime)
+        else:
+            raise ValueError(f"FIELD_NOT_ALLOWED:{date_field}")
+
+        if measure_field in meta_columns:
+            measure_column = meta_columns[measure_field]
+        elif measure_field in allowed_fields:
+            measure_column = Submission.data[measure_field].as_string()
+        else:
+            raise ValueError(f"FIELD_NOT_ALLOWED:{measure_field}")
+        if agg_fn in {"min", "max"}:
+            measure_column = cast(measure_column, Float)
+
+        aggregate = ALLOWED_AGG_FNS[agg_fn]
+        columns = [
+            aggregate(measure_column).filter(and_(date_column >= start, date_column < end)).label(name)
+            for name, (start, end) in windows.items()
+        ]
+        query = select(*columns).where(
+            base_filter,
+            date_column >= min(start for start, _ in windows.values()),
+            date_column < as_of,
+        )
+        if filters:
+            where_clause = AnalyticsService._build_where(filters, allowed_fields, meta_columns)
+            if where_clause is not None:
+                query = query.where(where_clause)
+
+        row = db.execute(query).one()._mapping
+        empty_value = 0.0 if agg_fn in COMPARE_ADDITIVE_AGG_FNS else None
+
+        def value_of(name: str) -> Optional[float]:
+            value = row[name]
+            return float(value) if value is not None else empty_value
 
-        current_value = run_for_range(current_start, now)
-        previous_value = run_for_range(previous_start, previous_end)
+        def change_pct(current: Optional[float], baseline: Optional[float]) -> Optional[float]:
+            if current is None or not baseline:
+                return None
+            return round((current - baseline) / baseline * 100, 2)
 
-        delta_pct = ((current_value - previous_value) / previous_value * 100) if previous_value else None
+        current_value = value_of("current")
+        previous_value = value_of("previous")
+        last_year_value = value_of("last_year")
+        delta_pct = change_pct(current_value, previous_value)
 
         return {
             "current_value": current_value,
             "previous_value": previous_value,
-            "delta_pct": round(delta_pct, 2) if delta_pct is not None else None,
+            "last_year_value": last_year_value,
+            "delta_pct": delta_pct,
+            "last_year_delta_pct": change_pct(current_value, last_year_value),
             "direction": "up" if delta_pct and delta_pct > 0 else "down" if delta_pct and delta_pct < 0 else "flat",
             "period": period,
+            "current_start": current_start,
+            "current_end": as_of,
+            "previous_start": previous_start,
+            "previous_end": previous_end,
+            "last_year_start": last_year_start,
+            "last_year_end": last_year_end,
+            "series": [
+                {"start": start, "end": end, "value": value_of(f"series_{index}")}
+                for index, (start, end) in enumerate(series_windows)
+            ],
         }
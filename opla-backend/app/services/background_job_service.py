@@ -0,0 +1,256 @@
+"""Background jobs with persisted progress for long-running, org-scoped work."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.background_job import BackgroundJob, BackgroundJobStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """Progress reporter handed to a job runner.
+
+    Updates are written through a short-lived session of their own, so they are
+    visible while the runner's own transaction is still open, and are throttled
+    to one write per REPORT_INTERVAL_SECONDS.
+    """
+
+    REPORT_INTERVAL_SECONDS = 0.5
+
+    def __init__(self, job_id: uuid.UUID):
+        self.job_id = job_id
+        self.done = 0
+        self.total: Optional[int] = None
+        self._reported_at = 0.0
+
+    def report(self, done: int, total: Optional[int] = None, *, force: bool = False) -> None:
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if not force and now - self._reported_at < self.REPORT_INTERVAL_SECONDS:
+            return
+        self._reported_at = now
+        BackgroundJobService._update(self.job_id, progress_done=self.done, progress_total=self.total)
+
+
+class BackgroundJobService:
+    """Runs job callables on small in-process pools and records their outcome.
+
+    A runner is called as runner(db, progress) with a dedicated session and
+    returns a JSON-serialisable result. ValueError codes become the job error;
+    anything else is logged and recorded as JOB_FAILED.
+
+    Bulk work (imports, snapshots, sketches) shares one pool; priority jobs such
+    as publishing get their own worker so they never queue behind it. The process
+    heartbeats its queued and running jobs through updated_at, and a job without
+    a heartbeat for STALE_SECONDS (its process died) is failed as JOB_INTERRUPTED,
+    on startup and periodically after, so pollers always see it finish.
+    """
+
+    MAX_WORKERS = 2
+    PRIORITY_WORKERS = 1
+    HEARTBEAT_SECONDS = 30.0
+    STALE_SECONDS = 120.0
+
+    _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="background-job")
+    _priority_executor = ThreadPoolExecutor(max_workers=PRIORITY_WORKERS, thread_name_prefix="background-job-priority")
+    _lock = threading.Lock()
+    _active: set[uuid.UUID] = set()
+    _stop: Optional[threading.Event] = None
+
+    @staticmethod
+    def create(
+        db: Session,
+        org_id: uuid.UUID,
+        kind: str,
+        *,
+        user_id: Optional[uuid.UUID] = None,
+        subject_id: Optional[uuid.UUID] = None,
+        total: Optional[int] = None,
+    ) -> BackgroundJob:
+        job = BackgroundJob(
+            org_id=org_id,
+            created_by=user_id,
+            kind=kind,
+            subject_id=subject_id,
+            status=BackgroundJobStatus.QUEUED.value,
+            progress_done=0,
+            progress_total=total,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def has_active(db: Session, kind: str, subject_id: uuid.UUID) -> bool:
+        """Whether a job of *kind* for *subject_id* is still queued or running."""
+        return (
+            db.query(BackgroundJob.id)
+            .filter(
+                BackgroundJob.kind == kind,
+                BackgroundJob.subject_id == subject_id,
+                BackgroundJob.status.in_([BackgroundJobStatus.QUEUED.value, BackgroundJobStatus.RUNNING.value]),
+            )
+            .first()
+            is not None
+        )
+
+    @staticmethod
+    def get(db: Session, org_id: uuid.UUID, job_id: uuid.UUID) -> Optional[BackgroundJob]:
+        return db.query(BackgroundJob).filter(BackgroundJob.id == job_id, BackgroundJob.org_id == org_id).first()
+
+    @staticmethod
+    def start(job_id: uuid.UUID, runner: Callable[[Session, JobProgress], Any], *, priority: bool = False) -> Future:
+        """Queue a committed job for execution; the future resolves once its outcome is stored."""
+        with BackgroundJobService._lock:
+            BackgroundJobService._active.add(job_id)
+        executor = BackgroundJobService._priority_executor if priority else BackgroundJobService._executor
+        return executor.submit(BackgroundJobService._run, job_id, runner)
+
+    @staticmethod
+    def _run(job_id: uuid.UUID, runner: Callable[[Session, JobProgress], Any]) -> None:
+        try:
+            BackgroundJobService._execute(job_id, runner)
+        finally:
+            with BackgroundJobService._lock:
+                BackgroundJobService._active.discard(job_id)
+
+    @staticmethod
+    def _execute(job_id: uuid.UUID, runner: Callable[[Session, JobProgress], Any]) -> None:
+        from app.core.database import SessionLocal
+
+        progress = JobProgress(job_id)
+        BackgroundJobService._update(job_id, status=BackgroundJobStatus.RUNNING.value, started_at=datetime.utcnow())
+        db = SessionLocal()
+        try:
+            result = runner(db, progress)
+        except Exception as exc:
+            db.rollback()
+            if isinstance(exc, ValueError):
+                error = str(exc)
+            else:
+                logger.exception("Background job %s failed", job_id)
+                error = "JOB_FAILED"
+            BackgroundJobService._update(
+                job_id,
+                status=BackgroundJobStatus.FAILED.value,
+                error=error,
+                finished_at=datetime.utcnow(),
+            )
+            return
+        finally:
+            db.close()
+
+        values: dict[str, Any] = {
+            "status": BackgroundJobStatus.SUCCEEDED.value,
+            "result_json": result,
+            "finished_at": datetime.utcnow(),
+        }
+        if progress.total is not None:
+            values["progress_done"] = progress.total
+            values["progress_total"] = progress.total
+        BackgroundJobService._update(job_id, **values)
+
+    @staticmethod
+    def heartbeat() -> int:
+        """Touch this process's queued and running jobs so other processes do not reap them."""
+        from app.core.database import SessionLocal
+
+        with BackgroundJobService._lock:
+            active = list(BackgroundJobService._active)
+        if not active:
+            return 0
+        db = SessionLocal()
+        try:
+            touched = db.query(BackgroundJob).filter(
+                BackgroundJob.id.in_(active),
+                BackgroundJob.status.in_([BackgroundJobStatus.QUEUED.value, BackgroundJobStatus.RUNNING.value]),
+            ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            return touched
+        finally:
+            db.close()
+
+    @staticmethod
+    def fail_orphaned() -> int:
+        """Fail queued or running jobs whose process stopped heartbeating them; returns how many."""
+        from app.core.database import SessionLocal
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            failed = db.query(BackgroundJob).filter(
+                BackgroundJob.status.in_([BackgroundJobStatus.QUEUED.value, BackgroundJobStatus.RUNNING.value]),
+                BackgroundJob.updated_at < now - timedelta(seconds=BackgroundJobService.STALE_SECONDS),
+            ).update(
+                {
+                    "status": BackgroundJobStatus.FAILED.value,
+                    "error": "JOB_INTERRUPTED",
+                    "finished_at": now,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+        if failed:
+            logger.warning("Marked %s interrupted background jobs as failed", failed)
+        return failed
+
+    @staticmethod
+    def start_monitor() -> None:
+        """Reap orphaned jobs now, then heartbeat and reap every HEARTBEAT_SECONDS (app startup)."""
+        with BackgroundJobService._lock:
+            if BackgroundJobService._stop is not None:
+                return
+            BackgroundJobService._stop = stop = threading.Event()
+        try:
+            BackgroundJobService.fail_orphaned()
+        except Exception:
+            logger.exception("Could not reap interrupted background jobs")
+        threading.Thread(
+            target=BackgroundJobService._monitor, args=(stop,), name="background-job-monitor", daemon=True
+        ).start()
+
+    @staticmethod
+    def stop_monitor() -> None:
+        with BackgroundJobService._lock:
+            if BackgroundJobService._stop is not None:
+                BackgroundJobService._stop.set()
+                BackgroundJobService._stop = None
+
+    @staticmethod
+    def _monitor(stop: threading.Event) -> None:
+        while not stop.wait(BackgroundJobService.HEARTBEAT_SECONDS):
+            try:
+                BackgroundJobService.heartbeat()
+                BackgroundJobService.fail_orphaned()
+            except Exception:
+                logger.exception("Background job monitor pass failed")
+
+    @staticmethod
+    def _update(job_id: uuid.UUID, **values: Any) -> None:
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(
+                {**values, "updated_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,351 @@
+"""Compiled, cached views over a form blueprint.
+
+Publishing, analytics sources, media indexing and directory lookups all need the
+same facts about a blueprint: its dataset fields, choice options, media fields and
+section layout. BlueprintIndex walks the JSON once and keeps the results in small
+slotted nodes; BlueprintIndexCache shares one index per immutable form version.
+Indexes are shared between requests, so treat them and their nodes as read-only.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+
+INDEX_CACHE_SIZE = 256
+
+MEDIA_FIELD_TYPES = {
+    "photo_capture",
+    "file_upload",
+    "audio_recorder",
+    "signature_pad",
+    "image",
+    "photo",
+    "video",
+    "video_capture",
+    "audio",
+    "signature",
+}
+
+
+def normalize_field_type(value: Any) -> str:
+    return re.sub(r"[\s-]+", "_", str(value or "").strip().lower())
+
+
+def option_entry(raw: Any) -> dict[str, str] | None:
+    if isinstance(raw, dict):
+        if raw.get("value") is None and raw.get("label") is None:
+            return None
+        value = raw.get("value")
+        label = raw.get("label")
+        if value is None:
+            value = label
+        if label is None:
+            label = value
+        return {"label": str(label), "value": str(value)}
+    if isinstance(raw, str) and raw.strip():
+        return {"label": raw, "value": raw}
+    return None
+
+
+class SchemaField:
+    """A dataset field from blueprint.schema; nested properties are flattened with dotted paths."""
+
+    __slots__ = ("identifier", "key", "label", "field_type", "definition")
+
+    def __init__(self, identifier: str, key: str, label: str, field_type: Optional[str], definition: dict):
+        self.identifier = identifier
+        self.key = key
+        self.label = label
+        self.field_type = field_type
+        self.definition = definition
+
+    def as_dict(self) -> dict:
+        return {
+            "identifier": self.identifier,
+            "key": self.key,
+            "label": self.label,
+            "field_type": self.field_type,
+            "definition": self.definition,
+        }
+
+
+class UiField:
+    """A question placed directly in a UI section."""
+
+    __slots__ = ("bind", "field_type", "label", "node")
+
+    def __init__(self, bind: str, field_type: str, label: str, node: dict):
+        self.bind = bind
+        self.field_type = field_type
+        self.label = label
+        self.node = node
+
+
+class Section:
+    __slots__ = ("id", "title", "fields")
+
+    def __init__(self, section_id: Optional[str], title: Optional[str], fields: tuple[UiField, ...]):
+        self.id = section_id
+        self.title = title
+        self.fields = fields
+
+
+class MediaField:
+    __slots__ = ("bind", "type", "label")
+
+    def __init__(self, bind: str, field_type: str, label: str):
+        self.bind = bind
+        self.type = field_type
+        self.label = label
+
+    def as_dict(self) -> dict[str, str]:
+        return {"bind": self.bind, "type": self.type, "label": self.label}
+
+
+class BlueprintIndex:
+    __slots__ = ("schema_fields", "fields_by_identifier", "fields_by_bind", "option_maps", "media_fields", "sections")
+
+    def __init__(
+        self,
+        schema_fields: tuple[SchemaField, ...],
+        option_maps: dict[str, list[dict[str, str]]],
+        media_fields: tuple[MediaField, ...],
+        sections: tuple[Section, ...],
+    ):
+        self.schema_fields = schema_fields
+        self.fields_by_identifier = {field.identifier: field for field in schema_fields}
+        self.fields_by_bind = {field.bind: field for section in sections for field in section.fields}
+        self.option_maps = option_maps
+        self.media_fields = media_fields
+        self.sections = sections
+
+    @classmethod
+    def compile(cls, blueprint: Any) -> "BlueprintIndex":
+        if not isinstance(blueprint, dict):
+            return cls((), {}, (), ())
+        return cls(
+            _compile_schema_fields(blueprint.get("schema")),
+            _compile_option_maps(blueprint),
+            _compile_media_fields(blueprint.get("ui")),
+            _compile_sections(blueprint.get("ui")),
+        )
+
+    def ui_fields(self, excluded_types: Iterable[str] = ()) -> list[dict[str, str]]:
+        """Bound section questions as {bind, label}, skipping the given field types."""
+        excluded = set(excluded_types)
+        return [
+            {"bind": field.bind, "label": field.label}
+            for section in self.sections
+            for field in section.fields
+            if field.bind and field.field_type not in excluded
+        ]
+
+
+def _compile_schema_fields(schema: Any) -> tuple[SchemaField, ...]:
+    extracted: list[SchemaField] = []
+    if not isinstance(schema, list):
+        return ()
+
+    def append_definition_fields(
+        field: dict,
+        *,
+        parent_identifier: Optional[str] = None,
+        parent_key: Optional[str] = None,
+        parent_type: Optional[str] = None,
+    ) -> None:
+        identifier = field.get("id") or field.get("field_id") or field.get("dataset_field_id") or field.get("key")
+        key = field.get("key") or str(identifier)
+
+        if parent_identifier and identifier:
+            identifier = f"{parent_identifier}.{identifier}"
+        elif not identifier:
+            identifier = f"field_{len(extracted) + 1}"
+
+        if parent_key:
+            key = f"{parent_key}.{key}"
+
+        definition = dict(field)
+        if parent_identifier:
+            definition["parent_identifier"] = parent_identifier
+        if parent_key:
+            definition["parent_key"] = parent_key
+        if parent_type:
+            definition["parent_type"] = parent_type
+
+        extracted.append(
+            SchemaField(
+                identifier=str(identifier),
+                key=key,
+                label=field.get("label") or field.get("title") or field.get("key") or str(identifier),
+                field_type=field.get("type"),
+                definition=definition,
+            )
+        )
+
+        nested_properties = []
+        if isinstance(field.get("properties"), list):
+            nested_properties = field.get("properties") or []
+        elif isinstance(field.get("item_definition"), dict):
+            nested_properties = field.get("item_definition", {}).get("properties") or []
+
+        for nested_field in nested_properties:
+            if isinstance(nested_field, dict):
+                append_definition_fields(
+                    nested_field,
+                    parent_identifier=str(identifier),
+                    parent_key=key,
+                    parent_type=str(field.get("type") or parent_type or "object"),
+                )
+
+    for index, field in enumerate(schema):
+        if not isinstance(field, dict):
+            continue
+        if not (field.get("id") or field.get("field_id") or field.get("dataset_field_id") or field.get("key")):
+            field = dict(field)
+            field["id"] = f"field_{index + 1}"
+        append_definition_fields(field)
+
+    return tuple(extracted)
+
+
+def _compile_option_maps(blueprint: dict) -> dict[str, list[dict[str, str]]]:
+    """Choice options usually live on blueprint.ui nodes (radio/dropdown/checkbox),
+    while dataset field metadata often only has the schema type. Index by bind/key/id."""
+    maps: dict[str, list[dict[str, str]]] = {}
+
+    def remember(keys: list[str], options: list[dict[str, str]]) -> None:
+        if not options:
+            return
+        for key in keys:
+            if not key:
+                continue
+            existing = maps.get(key)
+            if not existing or len(options) > len(existing):
+                maps[key] = options
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            raw_options = node.get("options")
+            parsed: list[dict[str, str]] = []
+            if isinstance(raw_options, list):
+                seen: set[str] = set()
+                for raw in raw_options:
+                    entry = option_entry(raw)
+                    if not entry or entry["value"] in seen:
+                        continue
+                    seen.add(entry["value"])
+                    parsed.append(entry)
+
+            if parsed:
+                keys = [
+                    str(node.get("bind") or ""),
+                    str(node.get("key") or ""),
+                    str(node.get("id") or ""),
+                    str(node.get("field_id") or ""),
+                    str(node.get("dataset_field_id") or ""),
+                ]
+                remember(keys, parsed)
+
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(blueprint.get("ui"))
+    # Fallback: some blueprints may put options on schema nodes too.
+    walk(blueprint.get("schema"))
+    return maps
+
+
+def _compile_media_fields(ui: Any) -> tuple[MediaField, ...]:
+    fields: list[MediaField] = []
+
+    def walk(nodes: Any) -> None:
+        if not isinstance(nodes, list):
+            return
+        for node in nodes:
+            if not isinstance(node, dict):
+                continue
+            field_type = normalize_field_type(node.get("type"))
+            bind = node.get("bind") or node.get("id")
+            if field_type in MEDIA_FIELD_TYPES and bind:
+                fields.append(MediaField(str(bind), field_type, str(node.get("label") or node.get("title") or bind)))
+            walk(node.get("children") or node.get("fields") or node.get("items"))
+            if isinstance(node.get("ui"), list):
+                walk(node.get("ui"))
+
+    if isinstance(ui, list):
+        walk(ui)
+    elif isinstance(ui, dict):
+        walk(ui.get("children") or ui.get("sections"))
+    # de-dupe by bind (last wins)
+    by_bind: dict[str, MediaField] = {}
+    for field in fields:
+        by_bind[field.bind] = field
+    return tuple(by_bind.values())
+
+
+def _compile_sections(ui: Any) -> tuple[Section, ...]:
+    if not isinstance(ui, list):
+        return ()
+    sections: list[Section] = []
+    for screen in ui:
+        if not isinstance(screen, dict):
+            continue
+        fields = []
+        for child in screen.get("children") or []:
+            if not isinstance(child, dict):
+                continue
+            bind = str(child.get("bind") or "").strip()
+            fields.append(UiField(bind, str(child.get("type") or ""), str(child.get("label") or bind), child))
+        sections.append(Section(screen.get("id"), screen.get("title"), tuple(fields)))
+    return tuple(sections)
+
+
+class BlueprintIndexCache:
+    """In-process LRU of compiled indexes keyed by form version.
+
+    Form versions are immutable once written, so entries never go stale. A form's
+    live blueprint is the live FormVersion numbered published_version, which lets
+    callers holding only the Form hit the same entry without a query.
+    """
+
+    _lock = threading.Lock()
+    _indexes: "OrderedDict[tuple, BlueprintIndex]" = OrderedDict()
+
+    @classmethod
+    def get_or_compile(cls, key: tuple, blueprint: Any) -> BlueprintIndex:
+        with cls._lock:
+            index = cls._indexes.get(key)
+            if index is not None:
+                cls._indexes.move_to_end(key)
+                return index
+        index = BlueprintIndex.compile(blueprint)
+        with cls._lock:
+            cls._indexes[key] = index
+            cls._indexes.move_to_end(key)
+            while len(cls._indexes) > INDEX_CACHE_SIZE:
+                cls._indexes.popitem(last=False)
+        return index
+
+    @classmethod
+    def for_version(cls, version_id: uuid.UUID, blueprint: Any) -> BlueprintIndex:
+        return cls.get_or_compile(("version", version_id), blueprint)
+
+    @classmethod
+    def for_live_form(cls, form: Any) -> BlueprintIndex:
+        """Index of form.blueprint_live; unpublished forms are compiled without caching."""
+        if not form.blueprint_live or form.published_version is None:
+            return BlueprintIndex.compile(form.blueprint_live)
+        return cls.get_or_compile(("live", form.id, form.published_version), form.blueprint_live)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._indexes.clear()
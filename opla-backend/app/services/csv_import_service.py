@@ -0,0 +1,304 @@
+"""Streaming CSV import into a new analytics dataset via Postgres COPY."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import BinaryIO, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.form import Form, FormStatus
+from app.models.form_dataset import (
+    FormDataset,
+    FormDatasetField,
+    FormDatasetFieldStatus,
+    FormDatasetSchemaVersion,
+    FormDatasetStatus,
+)
+from app.models.project import Project, ProjectStatus
+from app.models.submission import SubmissionReviewStatus
+from app.services.form_service import slugify
+
+
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+COPY_COLUMNS = (
+    "id",
+    "form_id",
+    "user_id",
+    "dataset_id",
+    "dataset_schema_version_id",
+    "data",
+    "metadata_json",
+    "form_version_number",
+    "review_status",
+    "created_at",
+)
+
+
+def _text_stream(raw: BinaryIO) -> io.TextIOWrapper:
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def _field_keys(header: list[str]) -> list[str]:
+    """Unique, non-empty field keys for a CSV header, in column order."""
+    keys: list[str] = []
+    seen: set[str] = set()
+    for index, name in enumerate(header):
+        base = name.strip() or f"column_{index + 1}"
+        key = base
+        suffix = 2
+        while key in seen:
+            key = f"{base}_{suffix}"
+            suffix += 1
+        seen.add(key)
+        keys.append(key)
+    return keys
+
+
+class CsvImportService:
+    """Imports an uploaded CSV without holding it in memory.
+
+    The upload is spooled to a temporary file in chunks. Field types are inferred
+    from the first SAMPLE_ROWS rows, the dataset is created, and a background job
+    streams the file into submissions with COPY in batches of COPY_BATCH_ROWS,
+    reporting bytes read as progress. Number fields that turn out to hold other
+    values past the sample are downgraded to text when the import finishes.
+    """
+
+    UPLOAD_CHUNK_BYTES = 1 << 20
+    SAMPLE_ROWS = 1000
+    COPY_BATCH_ROWS = 10_000
+
+    @staticmethod
+    def infer_fields(path: str) -> list[dict]:
+        with open(path, "rb") as raw:
+            reader = csv.reader(_text_stream(raw))
+            header = next(reader, None)
+            if not header:
+                raise ValueError("CSV_EMPTY")
+            keys = _field_keys(header)
+            numeric = [True] * len(keys)
+            seen_value = [False] * len(keys)
+            for row_number, row in enumerate(reader):
+                if row_number >= CsvImportService.SAMPLE_ROWS:
+                    break
+                for index, value in enumerate(row[: len(keys)]):
+                    value = value.strip()
+                    if value:
+                        seen_value[index] = True
+                        numeric[index] = numeric[index] and bool(NUMBER_PATTERN.match(value))
+        return [
+            {
+                "key": key,
+                "label": label.strip() or key,
+                "field_type": "number" if numeric[index] and seen_value[index] else "string",
+            }
+            for index, (key, label) in enumerate(zip(keys, header))
+        ]
+
+    @staticmethod
+    def create_dataset(
+        db: Session,
+        org_id: uuid.UUID,
+        *,
+        project_id: uuid.UUID,
+        name: str,
+        fields: list[dict],
+        file_path: str,
+        user_id: Optional[uuid.UUID] = None,
+    ) -> dict:
+        """Create the dataset for an uploaded CSV and queue its import job."""
+        project = db.query(Project).filter(Project.id == project_id, Project.org_id == org_id).first()
+        if not project:
+            raise ValueError("PROJECT_NOT_FOUND")
+        if project.status != ProjectStatus.ACTIVE:
+            raise ValueError("PROJECT_NOT_ACTIVE")
+
+        base_slug = slugify(name) or "csv-upload"
+        form_slug = f"csv-{base_slug}"
+        counter = 1
+        while db.query(Form).filter(Form.slug == form_slug).first():
+            form_slug = f"csv-{base_slug}-{counter}"
+            counter += 1
+
+        schema_fields = [
+            {
+                "id": f"q_{field['key']}",
+                "key": field["key"],
+                "type": "number" if field["field_type"] == "number" else "string",
+                "label": field["label"],
+            }
+            for field in fields
+        ]
+        blueprint = {"meta": {"title": name, "source": "csv_upload"}, "schema": schema_fields, "ui": [], "rules": []}
+        form = Form(
+            project_id=project.id,
+            title=name,
+            slug=form_slug,
+            blueprint_draft=blueprint,
+            blueprint_live=blueprint,
+            version=1,
+            status=FormStatus.LIVE,
+            published_version=1,
+            published_at=datetime.utcnow(),
+        )
+        db.add(form)
+        db.flush()
+
+        dataset = FormDataset(
+            form_id=form.id,
+            name=name,
+            slug=form_slug,
+            status=FormDatasetStatus.ACTIVE,
+            current_schema_version_number=1,
+            last_form_version_number=1,
+            metadata_json={"kind": "csv_upload", "import_status": "importing", "created_by": str(user_id) if user_id else None},
+        )
+        db.add(dataset)
+        db.flush()
+
+        schema_version = FormDatasetSchemaVersion(
+            dataset_id=dataset.id,
+            form_version_id=None,
+            version_number=1,
+            schema_snapshot=schema_fields,
+            blueprint_snapshot=blueprint,
+            change_summary_json={"source": "csv_upload"},
+            published_at=datetime.utcnow(),
+        )
+        db.add(schema_version)
+        db.flush()
+
+        for field in fields:
+            db.add(
+                FormDatasetField(
+                    dataset_id=dataset.id,
+                    field_identifier=f"csv_{field['key']}",
+                    field_key=field["key"],
+                    label=field["label"],
+                    field_type=field["field_type"],
+                    status=FormDatasetFieldStatus.ACTIVE,
+                    introduced_in_version_number=1,
+                )
+            )
+        db.commit()
+
+        from app.services.background_job_service import BackgroundJobService
+
+        job = BackgroundJobService.create(
+            db, org_id, "csv_import", user_id=user_id, subject_id=dataset.id, total=os.path.getsize(file_path)
+        )
+        dataset_id = dataset.id
+        BackgroundJobService.start(
+            job.id, lambda job_db, progress: CsvImportService.run_import(job_db, progress, dataset_id, file_path)
+        )
+        return {
+            "dataset_id": dataset.id,
+            "form_id": form.id,
+            "name": name,
+            "job_id": job.id,
+            "fields": fields,
+        }
+
+    @staticmethod
+    def run_import(db: Session, progress, dataset_id: uuid.UUID, file_path: str) -> dict:
+        """Stream the spooled CSV into submissions with COPY; removes the file when done."""
+        try:
+            dataset = db.query(FormDataset).filter(FormDataset.id == dataset_id).first()
+            if not dataset:
+                raise ValueError("DATASET_NOT_FOUND")
+            fields = (
+                db.query(FormDatasetField)
+                .filter(FormDatasetField.dataset_id == dataset.id)
+                .order_by(FormDatasetField.created_at.asc())
+                .all()
+            )
+            by_key = {field.field_key: field for field in fields}
+            schema_version_id = (
+                db.query(FormDatasetSchemaVersion.id)
+                .filter(FormDatasetSchemaVersion.dataset_id == dataset.id, FormDatasetSchemaVersion.version_number == 1)
+                .scalar()
+            )
+            metadata = dict(dataset.metadata_json or {})
+            created_by = metadata.get("created_by") or ""
+            constant_prefix = [str(dataset.form_id), created_by, str(dataset.id), str(schema_version_id)]
+            constant_suffix = [
+                json.dumps({"source": "csv_upload"}),
+                "1",
+                SubmissionReviewStatus.SUBMITTED.value,
+            ]
+            copy_sql = f"COPY submissions ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+            cursor = db.connection().connection.cursor()
+
+            total_bytes = os.path.getsize(file_path)
+            imported = 0
+            not_numeric: set[str] = set()
+            with open(file_path, "rb") as raw:
+                reader = csv.reader(_text_stream(raw))
+                keys = _field_keys(next(reader, None) or [])
+                numeric_columns = [
+                    (index, key) for index, key in enumerate(keys) if key in by_key and by_key[key].field_type == "number"
+                ]
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                batch_rows = 0
+
+                def flush() -> None:
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_sql, buffer)
+                    buffer.seek(0)
+                    buffer.truncate()
+
+                for row in reader:
+                    if not any(value.strip() for value in row):
+                        continue
+                    data: dict[str, object] = {}
+                    for key, value in zip(keys, row):
+                        if value.strip():
+                            data[key] = value
+                    for index, key in numeric_columns:
+                        value = data.get(key)
+                        if value is None or key in not_numeric:
+                            continue
+                        if NUMBER_PATTERN.match(value.strip()):
+                            data[key] = float(value) if "." in value else int(value)
+                        else:
+                            not_numeric.add(key)
+                    writer.writerow(
+                        [str(uuid.uuid4()), *constant_prefix, json.dumps(data), *constant_suffix, datetime.utcnow().isoformat()]
+                    )
+                    batch_rows += 1
+                    imported += 1
+                    if batch_rows >= CsvImportService.COPY_BATCH_ROWS:
+                        flush()
+                        batch_rows = 0
+                        progress.report(min(raw.tell(), total_bytes), total_bytes)
+                if batch_rows:
+                    flush()
+
+            # Values already stored as numbers still read back fine as text.
+            for key in not_numeric:
+                by_key[key].field_type = "string"
+            metadata.update({"import_status": "ready", "row_count": imported})
+            dataset.metadata_json = metadata
+            db.commit()
+            progress.report(total_bytes, total_bytes, force=True)
+            return {"dataset_id": str(dataset_id), "row_count": imported, "downgraded_fields": sorted(not_numeric)}
+        except Exception:
+            db.rollback()
+            dataset = db.query(FormDataset).filter(FormDataset.id == dataset_id).first()
+            if dataset is not None:
+                dataset.metadata_json = {**(dataset.metadata_json or {}), "import_status": "failed"}
+                db.commit()
+            raise
+        finally:
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,261 @@
+"""Server-side execution of every card on an analytics dashboard."""
+
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+from app.models.analytics import AnalyticsDashboard, SavedQuestion
+from app.services.analytics_guard_service import AnalyticsQueryGuard, is_query_canceled
+from app.services.analytics_service import AnalyticsService
+
+
+NON_QUERY_VIZ_TYPES = {"markdown", "walker"}
+MERGED_AGGREGATE_PREFIX = "__agg_"
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _group_aliases(group_by: list[Any]) -> set[str]:
+    aliases: set[str] = set()
+    for item in group_by:
+        if isinstance(item, dict):
+            aliases.add(item["field"])
+            if item.get("bucket"):
+                aliases.add(f"{item['field']}_{item['bucket']}")
+        else:
+            aliases.add(item)
+    return aliases
+
+
+def _aggregate_alias(aggregate: dict) -> str:
+    return aggregate.get("alias") or f"{aggregate['fn']}_{aggregate['field']}"
+
+
+class DashboardRunService:
+    """Plans and runs all card queries of a dashboard on a shared, bounded pool.
+
+    Identical card queries run once. Aggregate cards over the same dataset,
+    filters and grouping are merged into one grouped scan and split back per
+    card. Each query gets its own session and runs under AnalyticsQueryGuard with
+    its own query id, so it takes one of the org's query slots, carries the card
+    timeout as its statement timeout and can be cancelled like any other query; a
+    slow card reports a timeout without failing the rest of the dashboard. The pool
+    is shared across runs, so a card's timeout counts from when it gets a slot;
+    a card still waiting after MAX_QUEUE_SECONDS is reported as a timeout instead.
+    """
+
+    MAX_WORKERS = 4
+    DEFAULT_TIMEOUT_SECONDS = 15.0
+    MAX_QUEUE_SECONDS = 30.0
+    # Slack past the statement timeout for session setup and result handling.
+    TIMEOUT_GRACE_SECONDS = 1.0
+
+    _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dashboard-run")
+
+    @staticmethod
+    def card_query(question: SavedQuestion, extra_filters: Optional[dict] = None) -> dict:
+        config = question.query_config or {}
+        source = question.source_config or {}
+        try:
+            dataset_id = uuid.UUID(str(source.get("dataset_id")))
+        except (TypeError, ValueError) as exc:
+            raise ValueError("CARD_DATASET_MISSING") from exc
+
+        filters = config.get("filters") or None
+        if extra_filters:
+            filters = {"combinator": "and", "rules": [filters, extra_filters]} if filters else extra_filters
+
+        return {
+            "dataset_id": dataset_id,
+            "select_fields": list(config.get("select_fields") or []),
+            "filters": filters,
+            "group_by": list(config.get("group_by") or []),
+            "aggregates": list(config.get("aggregates") or []),
+            "order_by": list(config.get("order_by") or []),
+            "limit": int(config.get("limit") or 500),
+            "offset": int(config.get("offset") or 0),
+            "calculated_fields": list(config.get("calculated_fields") or []),
+        }
+
+    @staticmethod
+    def plan(card_queries: dict[uuid.UUID, dict]) -> list[dict]:
+        """Collapse card queries into jobs of {"query", "cards": [(card_id, projection)]}.
+
+        projection is None when the card takes the job result as is, otherwise a
+        list of (merged_alias, card_alias) pairs selecting the card's aggregates.
+        """
+        unique: dict[str, dict] = {}
+        for card_id, query in card_queries.items():
+            entry = unique.setdefault(_canonical(query), {"query": query, "card_ids": []})
+            entry["card_ids"].append(card_id)
+
+        mergeable: dict[str, list[dict]] = {}
+        jobs: list[dict] = []
+        for entry in unique.values():
+            query = entry["query"]
+            order_fields = {item.get("field") for item in query["order_by"]}
+            if query["aggregates"] and order_fields <= _group_aliases(query["group_by"]):
+                merge_key = _canonical({key: value for key, value in query.items() if key not in {"aggregates", "select_fields"}})
+                mergeable.setdefault(merge_key, []).append(entry)
+                continue
+            jobs.append({"query": query, "cards": [(card_id, None) for card_id in entry["card_ids"]]})
+
+        for entries in mergeable.values():
+            if len(entries) == 1:
+                entry = entries[0]
+                jobs.append({"query": entry["query"], "cards": [(card_id, None) for card_id in entry["card_ids"]]})
+                continue
+
+            merged_aggregates: list[dict] = []
+            merged_aliases: dict[tuple[str, str], str] = {}
+            cards: list[tuple[uuid.UUID, list[tuple[str, str]]]] = []
+            for entry in entries:
+                projection = []
+                for aggregate in entry["query"]["aggregates"]:
+                    signature = (aggregate["fn"], aggregate["field"])
+                    if signature not in merged_aliases:
+                        merged_aliases[signature] = f"{MERGED_AGGREGATE_PREFIX}{len(merged_aggregates)}"
+                        merged_aggregates.append(
+                            {"fn": aggregate["fn"], "field": aggregate["field"], "alias": merged_aliases[signature]}
+                        )
+                    projection.append((merged_aliases[signature], _aggregate_alias(aggregate)))
+                cards.extend((card_id, projection) for card_id in entry["card_ids"])
+
+            query = dict(entries[0]["query"], aggregates=merged_aggregates, select_fields=[])
+            jobs.append({"query": query, "cards": cards})
+        return jobs
+
+    @staticmethod
+    def _project(result: dict, group_count: int, projection: list[tuple[str, str]]) -> dict:
+        group_columns = result["columns"][:group_count]
+        group_keys = [column["key"] for column in group_columns]
+        return dict(
+            result,
+            columns=group_columns + [{"key": alias, "label": alias, "type": "number"} for _, alias in projection],
+            rows=[
+                {**{key: row.get(key) for key in group_keys}, **{alias: row.get(merged) for merged, alias in projection}}
+                for row in result["rows"]
+            ],
+        )
+
+    @staticmethod
+    def _execute(org_id: uuid.UUID, job: dict, timeout_seconds: float) -> dict:
+        from app.core.database import SessionLocal
+
+        query_id = job.setdefault("query_id", uuid.uuid4())
+        db = SessionLocal()
+        try:
+            with AnalyticsQueryGuard.running(db, org_id, query_id, timeout_seconds):
+                job["started_at"] = time.monotonic()
+                result = AnalyticsService.execute_query(
+                    db=db, org_id=org_id, max_estimated_cost=AnalyticsQueryGuard.MAX_ESTIMATED_COST, **job["query"]
+                )
+            result["query_id"] = query_id
+            return result
+        finally:
+            db.rollback()
+            db.close()
+
+    @staticmethod
+    def _wait_per_job(futures: dict[Future, dict], queued_at: float, timeout_seconds: float) -> set[Future]:
+        """Wait for every job, giving up on each one timeout_seconds after it started running
+        (or MAX_QUEUE_SECONDS after it was queued, if it never got a worker and query slot). Returns the
+        futures given up on; queued ones are cancelled, running ones end at their statement timeout."""
+        pending = set(futures)
+        timed_out: set[Future] = set()
+        while pending:
+            now = time.monotonic()
+            deadlines = {}
+            for future in pending:
+                begun = futures[future].get("started_at")
+                deadlines[future] = (
+                    begun + timeout_seconds + DashboardRunService.TIMEOUT_GRACE_SECONDS
+                    if begun is not None
+                    else queued_at + DashboardRunService.MAX_QUEUE_SECONDS
+                )
+            expired = {future for future, deadline in deadlines.items() if deadline <= now and not future.done()}
+            for future in expired:
+                future.cancel()
+            timed_out |= expired
+            pending -= expired
+            if not pending:
+                break
+            # Re-check at the nearest deadline; a queued job's deadline moves once it starts.
+            done, pending = wait(
+                pending, timeout=max(0.0, min(deadlines[future] for future in pending) - now), return_when=FIRST_COMPLETED
+            )
+        return timed_out
+
+    @staticmethod
+    def _failure(exc: BaseException) -> tuple[str, str]:
+        if isinstance(exc, ValueError):
+            return "error", str(exc)
+        if is_query_canceled(exc):
+            return "timeout", "QUERY_TIMEOUT"
+        return "error", "QUERY_FAILED"
+
+    @staticmethod
+    def run_dashboard(
+        dashboard: AnalyticsDashboard,
+        *,
+        org_id: uuid.UUID,
+        extra_filters: Optional[dict] = None,
+        card_ids: Optional[set[uuid.UUID]] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> dict:
+        timeout_seconds = timeout_seconds or DashboardRunService.DEFAULT_TIMEOUT_SECONDS
+        results: dict[uuid.UUID, dict] = {}
+        card_queries: dict[uuid.UUID, dict] = {}
+        cards = [card for card in dashboard.cards if card_ids is None or card.id in card_ids]
+
+        for card in cards:
+            base = {"card_id": card.id, "question_id": card.question_id, "result": None, "error": None}
+            question = card.question
+            if question is None or question.viz_type in NON_QUERY_VIZ_TYPES:
+                results[card.id] = dict(base, status="skipped")
+                continue
+            try:
+                card_queries[card.id] = DashboardRunService.card_query(question, extra_filters)
+            except ValueError as exc:
+                results[card.id] = dict(base, status="error", error=str(exc))
+                continue
+            results[card.id] = dict(base, status="pending")
+
+        started = time.monotonic()
+        jobs = DashboardRunService.plan(card_queries)
+        futures: dict[Future, dict] = {
+            DashboardRunService._executor.submit(DashboardRunService._execute, org_id, job, timeout_seconds): job
+            for job in jobs
+        }
+        timed_out = DashboardRunService._wait_per_job(futures, started, timeout_seconds)
+
+        for future, job in futures.items():
+            if future in timed_out:
+                outcome = {"status": "timeout", "error": "QUERY_TIMEOUT"}
+            elif future.exception() is not None:
+                status_value, error = DashboardRunService._failure(future.exception())
+                outcome = {"status": status_value, "error": error}
+            else:
+                outcome = {"status": "ok", "result": future.result()}
+
+            for card_id, projection in job["cards"]:
+                card_outcome = outcome
+                if projection is not None and outcome["status"] == "ok":
+                    card_outcome = dict(
+                        outcome,
+                        result=DashboardRunService._project(outcome["result"], len(job["query"]["group_by"]), projection),
+                    )
+                results[card_id].update(card_outcome)
+
+        return {
+            "dashboard_id": dashboard.id,
+            "query_count": len(jobs),
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+            "cards": [results[card.id] for card in cards],
+        }
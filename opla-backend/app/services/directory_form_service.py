@@ -20,6 +20,7 @@ from sqlalchemy.orm import Session
 
 from app.models.form import Form, FormKind, FormStatus
 from app.models.submission import Submission
+from app.services.blueprint_index import BlueprintIndexCache
 
 
 class DirectoryFormService:
@@ -230,23 +231,7 @@ class DirectoryFormService:
 
     @staticmethod
     def extract_directory_blueprint_fields(directory: Form) -> list[dict[str, str]]:
-        blueprint = directory.blueprint_live or {}
-        fields: list[dict[str, str]] = []
-        for screen in blueprint.get("ui", []) or []:
-            for child in screen.get("children", []) or []:
-                field_type = str(child.get("type") or "")
-                if field_type in DirectoryFormService.BLOCKED_FIELD_TYPES:
-                    continue
-                bind = str(child.get("bind") or "").strip()
-                if not bind:
-                    continue
-                fields.append(
-                    {
-                        "bind": bind,
-                        "label": str(child.get("label") or bind),
-                    }
-                )
-        return fields
+        return BlueprintIndexCache.for_live_form(directory).ui_fields(DirectoryFormService.BLOCKED_FIELD_TYPES)
 
     @staticmethod
     def list_lookup_sources(db: Session, form: Form) -> list[dict[str, Any]]:
@@ -0,0 +1,471 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from sqlalchemy import Float, and_, case, cast, false, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.form_automation_rule import FormAutomationAction, FormAutomationEvent, FormAutomationRule
+from app.models.submission import Submission
+
+# Top-level keys of the event context built by FormAutomationService.run_submission_event.
+# Any other leading path segment is resolved against submission data.
+EVENT_CONTEXT_KEYS = frozenset({"submission", "data", "context"})
+
+TEMPLATE_PATTERN = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+
+Predicate = Callable[[dict[str, Any]], bool]
+Resolver = Callable[[dict[str, Any]], Any]
+
+
+def compile_path(path: str) -> tuple[str, ...]:
+    parts = tuple(part for part in path.split(".") if part)
+    if parts and parts[0] not in EVENT_CONTEXT_KEYS:
+        parts = ("data", *parts)
+    return parts
+
+
+def resolve_compiled_path(event_context: dict[str, Any], parts: tuple[str, ...]) -> Any:
+    if not parts:
+        return None
+    current: Any = event_context
+    for part in parts:
+        if current is None:
+            return None
+        if isinstance(current, dict):
+            current = current.get(part)
+        else:
+            current = getattr(current, part, None)
+    return current
+
+
+def _always_true(_event_context: dict[str, Any]) -> bool:
+    return True
+
+
+def _always_false(_event_context: dict[str, Any]) -> bool:
+    return False
+
+
+def _numeric_operand(expected: Any) -> Callable[[], float]:
+    # Cast once at compile time; values that cannot be cast keep the original
+    # per-evaluation behaviour so the error surfaces only when a value is compared.
+    try:
+        cast = float(expected)
+    except (TypeError, ValueError):
+        return lambda: float(expected)
+    return lambda: cast
+
+
+# Numeric comparisons only match values that look like numbers; the SQL prefilter
+# applies the same pattern, so "n/a" or true never match rather than raising.
+_NUMERIC_TEXT_PATTERN = r"^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$"
+_NUMERIC_TEXT_RE = re.compile(_NUMERIC_TEXT_PATTERN)
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and _NUMERIC_TEXT_RE.match(value):
+        return float(value)
+    return None
+
+
+def compile_condition(rule: dict[str, Any]) -> Predicate:
+    field_path = rule.get("field")
+    operator = str(rule.get("operator") or "equal")
+    expected = rule.get("value")
+    if not field_path:
+        return _always_false
+
+    parts = compile_path(str(field_path))
+
+    def resolve(event_context: dict[str, Any]) -> Any:
+        return resolve_compiled_path(event_context, parts)
+
+    if operator in {"=", "equal", "eq"}:
+        return lambda ctx: resolve(ctx) == expected
+    if operator in {"!=", "notEqual", "neq"}:
+        return lambda ctx: resolve(ctx) != expected
+    if operator in {">", "greaterThan", "gt", "<", "lessThan", "lt", ">=", "greaterThanOrEqual", "gte", "<=", "lessThanOrEqual", "lte"}:
+        operand = _numeric_operand(expected)
+        if operator in {">", "greaterThan", "gt"}:
+            compare = float.__gt__
+        elif operator in {"<", "lessThan", "lt"}:
+            compare = float.__lt__
+        elif operator in {">=", "greaterThanOrEqual", "gte"}:
+            compare = float.__ge__
+        else:
+            compare = float.__le__
+
+        def numeric(ctx: dict[str, Any]) -> bool:
+            actual = _as_number(resolve(ctx))
+            return actual is not None and compare(actual, operand())
+
+        return numeric
+    if operator == "contains":
+        needle = str(expected)
+
+        def contains(ctx: dict[str, Any]) -> bool:
+            actual = resolve(ctx)
+            return actual is not None and needle in str(actual)
+
+        return contains
+    if operator == "in":
+        values = expected if isinstance(expected, list) else [expected]
+        return lambda ctx: resolve(ctx) in values
+    if operator in {"exists", "notNull", "isNotEmpty"}:
+        return lambda ctx: resolve(ctx) not in (None, "", [])
+    if operator in {"null", "isEmpty"}:
+        return lambda ctx: resolve(ctx) in (None, "", [])
+    return _always_false
+
+
+def compile_conditions(conditions: Optional[dict[str, Any]]) -> Predicate:
+    """Compile a conditions_json group into a single predicate over the event context."""
+    if not conditions:
+        return _always_true
+
+    children: list[Predicate] = []
+    for rule in conditions.get("rules") or []:
+        if isinstance(rule, dict) and "rules" in rule:
+            children.append(compile_conditions(rule))
+        elif isinstance(rule, dict):
+            children.append(compile_condition(rule))
+
+    if not children:
+        return _always_true
+    if len(children) == 1:
+        return children[0]
+
+    predicates = tuple(children)
+    if str(conditions.get("combinator") or "and").lower() == "or":
+        return lambda ctx: any(predicate(ctx) for predicate in predicates)
+    return lambda ctx: all(predicate(ctx) for predicate in predicates)
+
+
+def normalize_json_value(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: normalize_json_value(entry) for key, entry in value.items()}
+    if isinstance(value, list):
+        return [normalize_json_value(entry) for entry in value]
+    return value
+
+
+class CompiledTemplate:
+    """A `{{ path }}` template split into literal text and pre-parsed path lookups."""
+
+    __slots__ = ("segments",)
+
+    def __init__(self, template: str) -> None:
+        segments: list[str | tuple[str, ...]] = []
+        cursor = 0
+        for match in TEMPLATE_PATTERN.finditer(template):
+            if match.start() > cursor:
+                segments.append(template[cursor:match.start()])
+            segments.append(compile_path(match.group(1).strip()))
+            cursor = match.end()
+        if cursor < len(template):
+            segments.append(template[cursor:])
+        self.segments: tuple[str | tuple[str, ...], ...] = tuple(segments)
+
+    def render(self, event_context: dict[str, Any]) -> str:
+        rendered: list[str] = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                rendered.append(segment)
+                continue
+            value = resolve_compiled_path(event_context, segment)
+            if value is not None:
+                rendered.append(str(value))
+        return "".join(rendered).strip()
+
+
+@lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+def _compile_context_source(source: Any) -> Resolver:
+    if isinstance(source, str):
+        trimmed = source.strip()
+        if not trimmed:
+            return lambda ctx: None
+        if "{{" in trimmed and "}}" in trimmed:
+            template = compile_template(trimmed)
+            return lambda ctx: template.render(ctx) or None
+
+        parts = compile_path(trimmed)
+
+        def resolve_path(ctx: dict[str, Any]) -> Any:
+            resolved = resolve_compiled_path(ctx, parts)
+            if resolved is not None:
+                return normalize_json_value(resolved)
+            return trimmed
+
+        return resolve_path
+
+    if isinstance(source, dict):
+        entries = tuple((key, _compile_context_source(value)) for key, value in source.items())
+
+        def resolve_dict(ctx: dict[str, Any]) -> Any:
+            nested = {}
+            for key, resolver in entries:
+                value = resolver(ctx)
+                if value is not None:
+                    nested[key] = value
+            return nested or None
+
+        return resolve_dict
+
+    if isinstance(source, list):
+        items = tuple(_compile_context_source(value) for value in source)
+
+        def resolve_list(ctx: dict[str, Any]) -> Any:
+            nested = [value for value in (resolver(ctx) for resolver in items) if value is not None]
+            return nested or None
+
+        return resolve_list
+
+    constant = normalize_json_value(source)
+    return lambda ctx: constant
+
+
+def compile_context_mapping(raw_mapping: Any) -> Optional[Callable[[dict[str, Any]], Optional[dict[str, Any]]]]:
+    """Compile action_config_json.context_mapping_json into a resolver of the task context."""
+    if raw_mapping in (None, "", {}):
+        return None
+    if isinstance(raw_mapping, str):
+        try:
+            raw_mapping = json.loads(raw_mapping)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(raw_mapping, dict):
+        return None
+
+    targets: list[tuple[tuple[str, ...], Resolver]] = []
+    for target_key, source in raw_mapping.items():
+        if not isinstance(target_key, str) or not target_key.strip():
+            continue
+        target_parts = tuple(part for part in target_key.strip().split(".") if part)
+        if target_parts:
+            targets.append((target_parts, _compile_context_source(source)))
+    compiled_targets = tuple(targets)
+
+    def resolve(ctx: dict[str, Any]) -> Optional[dict[str, Any]]:
+        resolved: dict[str, Any] = {}
+        for target_parts, resolver in compiled_targets:
+            value = resolver(ctx)
+            if value is None:
+                continue
+            cursor = resolved
+            for part in target_parts[:-1]:
+                existing = cursor.get(part)
+                if not isinstance(existing, dict):
+                    existing = {}
+                    cursor[part] = existing
+                cursor = existing
+            cursor[target_parts[-1]] = value
+        return resolved or None
+
+    return resolve
+
+
+class CompiledAutomationRule:
+    """Session-independent snapshot of a FormAutomationRule with its compiled predicate."""
+
+    __slots__ = (
+        "id",
+        "form_id",
+        "name",
+        "event_type",
+        "action_type",
+        "action_config_json",
+        "created_by",
+        "updated_at",
+        "matches",
+        "title_template",
+        "body_template",
+        "context_mapping",
+    )
+
+    def __init__(self, rule: FormAutomationRule) -> None:
+        self.id: uuid.UUID = rule.id
+        self.form_id: uuid.UUID = rule.form_id
+        self.name: str = rule.name
+        self.event_type = FormAutomationEvent(rule.event_type)
+        self.action_type = FormAutomationAction(rule.action_type)
+        self.action_config_json: dict[str, Any] = dict(rule.action_config_json or {})
+        self.created_by: Optional[uuid.UUID] = rule.created_by
+        self.updated_at: Optional[datetime] = rule.updated_at
+        self.matches: Predicate = compile_conditions(rule.conditions_json)
+
+        # Action templates are parsed once per rule revision; rendering is a join of path lookups.
+        config = self.action_config_json
+        if self.action_type == FormAutomationAction.CREATE_ALERT:
+            title = config.get("title_template") or "Alert for {{ submission.id }}"
+            body = config.get("detail_template") or config.get("description_template")
+        else:
+            title = config.get("title_template") or "Follow up {{ submission.id }}"
+            body = config.get("description_template")
+        self.title_template = compile_template(str(title))
+        self.body_template: Optional[CompiledTemplate] = compile_template(str(body)) if body else None
+        self.context_mapping = compile_context_mapping(config.get("context_mapping_json"))
+
+
+class FormAutomationRuleRegistry:
+    """In-process cache of compiled active rules grouped per (form, event).
+
+    Groups are dropped on rule create/update/delete in this process and expire
+    after GROUP_TTL_SECONDS so changes made by other workers are picked up.
+    Compiled rules are reused across reloads while their updated_at is unchanged.
+    """
+
+    GROUP_TTL_SECONDS = 30.0
+
+    _lock = threading.Lock()
+    _groups: dict[tuple[uuid.UUID, FormAutomationEvent], tuple[float, tuple[CompiledAutomationRule, ...]]] = {}
+    _compiled: dict[uuid.UUID, CompiledAutomationRule] = {}
+
+    @classmethod
+    def get_rules(
+        cls,
+        db: Session,
+        form_id: uuid.UUID,
+        event_type: FormAutomationEvent,
+    ) -> tuple[CompiledAutomationRule, ...]:
+        key = (form_id, event_type)
+        now = time.monotonic()
+        cached = cls._groups.get(key)
+        if cached is not None and now - cached[0] < cls.GROUP_TTL_SECONDS:
+            return cached[1]
+
+        rules = (
+            db.query(FormAutomationRule)
+            .filter(
+                FormAutomationRule.form_id == form_id,
+                FormAutomationRule.event_type == event_type,
+                FormAutomationRule.is_active.is_(True),
+            )
+            .order_by(FormAutomationRule.created_at.asc())
+            .all()
+        )
+        compiled = tuple(cls.compile_rule(rule) for rule in rules)
+        with cls._lock:
+            cls._groups[key] = (now, compiled)
+        return compiled
+
+    @classmethod
+    def compile_rule(cls, rule: FormAutomationRule) -> CompiledAutomationRule:
+        compiled = cls._compiled.get(rule.id)
+        if compiled is None or compiled.updated_at != rule.updated_at:
+            compiled = CompiledAutomationRule(rule)
+            with cls._lock:
+                cls._compiled[rule.id] = compiled
+        return compiled
+
+    @classmethod
+    def invalidate_form(cls, form_id: uuid.UUID, rule_id: Optional[uuid.UUID] = None) -> None:
+        with cls._lock:
+            for key in [key for key in cls._groups if key[0] == form_id]:
+                cls._groups.pop(key, None)
+            if rule_id is not None:
+                cls._compiled.pop(rule_id, None)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._groups.clear()
+            cls._compiled.clear()
+
+
+# Only a subset of operators can be pushed down to SQL. The clauses built here are
+# prefilters: they may let through rows the Python predicate rejects, but never drop
+# a row it would accept, so compiled predicates remain the source of truth.
+_NUMERIC_SQL_OPERATORS = {
+    ">": "__gt__", "greaterThan": "__gt__", "gt": "__gt__",
+    "<": "__lt__", "lessThan": "__lt__", "lt": "__lt__",
+    ">=": "__ge__", "greaterThanOrEqual": "__ge__", "gte": "__ge__",
+    "<=": "__le__", "lessThanOrEqual": "__le__", "lte": "__le__",
+}
+
+
+def _data_key(field_path: Any) -> Optional[str]:
+    parts = compile_path(str(field_path or ""))
+    if len(parts) != 2 or parts[0] != "data":
+        return None
+    return parts[1]
+
+
+def compile_condition_sql(rule: dict[str, Any]):
+    key = _data_key(rule.get("field"))
+    if key is None:
+        return None
+    operator = str(rule.get("operator") or "equal")
+    expected = rule.get("value")
+    value = Submission.data[key]
+    text_value = value.as_string()
+
+    if operator in {"=", "equal", "eq"} and isinstance(expected, str):
+        return text_value == expected
+    if operator == "in":
+        values = expected if isinstance(expected, list) else [expected]
+        if values and all(isinstance(item, str) for item in values):
+            return text_value.in_(values)
+        return None
+    if operator in {"exists", "notNull", "isNotEmpty"}:
+        return Submission.data.has_key(key)
+    if operator in _NUMERIC_SQL_OPERATORS:
+        try:
+            operand = float(expected)
+        except (TypeError, ValueError):
+            return None
+        compare = getattr(cast(text_value, Float), _NUMERIC_SQL_OPERATORS[operator])(operand)
+        return and_(
+            text_value.isnot(None),
+            case((text_value.op("~")(_NUMERIC_TEXT_PATTERN), compare), else_=false()),
+        )
+    if operator == "contains":
+        return and_(
+            text_value.isnot(None),
+            or_(func.jsonb_typeof(value) != "string", text_value.contains(str(expected), autoescape=True)),
+        )
+    return None
+
+
+def compile_conditions_sql(conditions: Optional[dict[str, Any]]):
+    """Build a SQL prefilter for conditions_json, or None when nothing can be pushed down."""
+    if not conditions:
+        return None
+
+    is_or = str(conditions.get("combinator") or "and").lower() == "or"
+    clauses = []
+    for rule in conditions.get("rules") or []:
+        if not isinstance(rule, dict):
+            continue
+        clause = compile_conditions_sql(rule) if "rules" in rule else compile_condition_sql(rule)
+        if clause is None:
+            if is_or:
+                # One branch we cannot express means any row may match.
+                return None
+            continue
+        clauses.append(clause)
+
+    if not clauses:
+        return None
+    return or_(*clauses) if is_or else and_(*clauses)
@@ -1,24 +1,36 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-import json
-import re
+import logging
 import uuid
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.models.form import Form
 from app.models.form_automation_rule import FormAutomationAction, FormAutomationEvent, FormAutomationRule
 from app.models.project_access import AccessorType
-from app.models.project_task import ProjectTaskKind
-from app.models.submission import Submission
+from app.models.project_task import ProjectTask, ProjectTaskKind
+from app.models.submission import Submission, SubmissionReviewStatus
+from app.services.form_automation_engine import (
+    CompiledAutomationRule,
+    FormAutomationRuleRegistry,
+    compile_conditions,
+    compile_conditions_sql,
+    compile_path,
+    resolve_compiled_path,
+)
 from app.services.project_task_service import ProjectTaskService
 
 
-class FormAutomationService:
-    TEMPLATE_PATTERN = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+logger = logging.getLogger(__name__)
+
+# Failures beyond this many are only counted, keeping a large backfill's job result small.
+MAX_REPORTED_FAILURES = 100
+
 
+class FormAutomationService:
     @staticmethod
     def list_rules(db: Session, form_id: uuid.UUID) -> list[FormAutomationRule]:
         return (
@@ -64,6 +76,8 @@ class FormAutomationService:
         db.add(rule)
         db.commit()
         db.refresh(rule)
+        FormAutomationRuleRegistry.invalidate_form(rule.form_id, rule.id)
+        FormAutomationRuleRegistry.compile_rule(rule)
         return rule
 
     @staticmethod
@@ -96,12 +110,16 @@ class FormAutomationService:
 
         db.commit()
         db.refresh(rule)
+        FormAutomationRuleRegistry.invalidate_form(rule.form_id, rule.id)
+        FormAutomationRuleRegistry.compile_rule(rule)
         return rule
 
     @staticmethod
     def delete_rule(db: Session, rule: FormAutomationRule) -> None:
+        form_id, rule_id = rule.form_id, rule.id
         db.delete(rule)
         db.commit()
+        FormAutomationRuleRegistry.invalidate_form(form_id, rule_id)
 
     @staticmethod
     def run_submission_event(
@@ -112,18 +130,41 @@ class FormAutomationService:
         actor_id: Optional[uuid.UUID] = None,
         context: Optional[dict[str, Any]] = None,
     ) -> None:
-        rules = (
-            db.query(FormAutomationRule)
-            .filter(
-                FormAutomationRule.form_id == submission.form_id,
-                FormAutomationRule.event_type == event_type,
-                FormAutomationRule.is_active.is_(True),
-            )
-            .all()
-        )
+        rules = FormAutomationRuleRegistry.get_rules(db, submission.form_id, event_type)
         if not rules or not submission.form:
             return
+        FormAutomationService._run_rules(db, rules, submission, actor_id=actor_id, context=context)
+
+    @staticmethod
+    def has_rules(db: Session, form_id: uuid.UUID, event_type: FormAutomationEvent) -> bool:
+        return bool(FormAutomationRuleRegistry.get_rules(db, form_id, event_type))
+
+    @staticmethod
+    def run_submission_events(
+        db: Session,
+        form: Form,
+        submissions: list[Submission],
+        event_type: FormAutomationEvent,
+        *,
+        actor_id: Optional[uuid.UUID] = None,
+        context: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """Run one event for many submissions of the same form, resolving its rules once."""
+        rules = FormAutomationRuleRegistry.get_rules(db, form.id, event_type)
+        if not rules:
+            return
+        for submission in submissions:
+            FormAutomationService._run_rules(db, rules, submission, actor_id=actor_id, context=context)
 
+    @staticmethod
+    def _run_rules(
+        db: Session,
+        rules: tuple[CompiledAutomationRule, ...],
+        submission: Submission,
+        *,
+        actor_id: Optional[uuid.UUID],
+        context: Optional[dict[str, Any]],
+    ) -> None:
         event_context = {
             "submission": submission,
             "data": submission.data or {},
@@ -131,91 +172,245 @@ class FormAutomationService:
         }
 
         for rule in rules:
-            if not FormAutomationService._matches_conditions(rule.conditions_json, event_context):
+            if not rule.matches(event_context):
                 continue
             FormAutomationService._execute_action(db, submission.form, submission, rule, actor_id=actor_id, event_context=event_context)
 
     @staticmethod
-    def _matches_conditions(conditions: Optional[dict[str, Any]], event_context: dict[str, Any]) -> bool:
-        if not conditions:
-            return True
-        rules = conditions.get("rules") or []
-        combinator = str(conditions.get("combinator") or "and").lower()
-        evaluations: list[bool] = []
+    def _historical_event_filters(form_id: uuid.UUID, event_type: FormAutomationEvent) -> list[Any]:
+        filters: list[Any] = [Submission.form_id == form_id]
+        if event_type == FormAutomationEvent.SUBMISSION_APPROVED:
+            filters.append(Submission.review_status == SubmissionReviewStatus.APPROVED)
+        elif event_type == FormAutomationEvent.SUBMISSION_REVIEWED:
+            filters.append(Submission.review_status != SubmissionReviewStatus.SUBMITTED)
+        return filters
 
-        for rule in rules:
-            if isinstance(rule, dict) and "rules" in rule:
-                evaluations.append(FormAutomationService._matches_conditions(rule, event_context))
-            elif isinstance(rule, dict):
-                evaluations.append(FormAutomationService._evaluate_rule(rule, event_context))
+    @staticmethod
+    def _historical_event_context(row: Any, event_type: FormAutomationEvent) -> dict[str, Any]:
+        # Rebuild the context run_submission_event would have passed when the event fired.
+        if event_type == FormAutomationEvent.SUBMISSION_CREATED:
+            context = {"metadata": row.metadata_json or {}}
+        else:
+            context = {"review_status": SubmissionReviewStatus(row.review_status).value}
+        return {"submission": row, "data": row.data or {}, "context": context}
 
-        if not evaluations:
-            return True
-        return any(evaluations) if combinator == "or" else all(evaluations)
+    @staticmethod
+    def iter_historical_matches(
+        db: Session,
+        form_id: uuid.UUID,
+        event_type: FormAutomationEvent,
+        conditions_json: Optional[dict[str, Any]],
+        *,
+        chunk_size: int = 1000,
+    ) -> Iterator[tuple[Any, bool]]:
+        """Stream (row, matched) pairs for existing submissions the event would have covered.
+
+        Conditions are pushed down to SQL as a prefilter where the operators allow;
+        the compiled predicate decides the final match for every streamed row.
+        """
+        predicate = compile_conditions(conditions_json)
+        filters = FormAutomationService._historical_event_filters(form_id, event_type)
+        prefilter = compile_conditions_sql(conditions_json)
+        if prefilter is not None:
+            filters.append(prefilter)
+
+        query = (
+            select(
+                Submission.id,
+                Submission.form_id,
+                Submission.user_id,
+                Submission.dataset_id,
+                Submission.form_version_number,
+                Submission.review_status,
+                Submission.reviewed_by,
+                Submission.reviewed_at,
+                Submission.created_at,
+                Submission.data,
+                Submission.metadata_json,
+            )
+            .where(*filters)
+            .order_by(Submission.created_at.asc(), Submission.id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        for partition in db.execute(query).partitions():
+            for row in partition:
+                event_context = FormAutomationService._historical_event_context(row, event_type)
+                yield row, predicate(event_context)
 
     @staticmethod
-    def _evaluate_rule(rule: dict[str, Any], event_context: dict[str, Any]) -> bool:
-        field_path = rule.get("field")
-        operator = str(rule.get("operator") or "equal")
-        expected = rule.get("value")
-        if not field_path:
-            return False
-
-        actual = FormAutomationService._resolve_path(event_context, str(field_path))
-
-        if operator in {"=", "equal", "eq"}:
-            return actual == expected
-        if operator in {"!=", "notEqual", "neq"}:
-            return actual != expected
-        if operator in {">", "greaterThan", "gt"}:
-            return actual is not None and float(actual) > float(expected)
-        if operator in {"<", "lessThan", "lt"}:
-            return actual is not None and float(actual) < float(expected)
-        if operator in {">=", "greaterThanOrEqual", "gte"}:
-            return actual is not None and float(actual) >= float(expected)
-        if operator in {"<=", "lessThanOrEqual", "lte"}:
-            return actual is not None and float(actual) <= float(expected)
-        if operator == "contains":
-            return actual is not None and str(expected) in str(actual)
-        if operator == "in":
-            values = expected if isinstance(expected, list) else [expected]
-            return actual in values
-        if operator in {"exists", "notNull", "isNotEmpty"}:
-            return actual not in (None, "", [])
-        if operator in {"null", "isEmpty"}:
-            return actual in (None, "", [])
-        return False
+    def backtest_rule(
+        db: Session,
+        rule: FormAutomationRule,
+        *,
+        event_type: Optional[FormAutomationEvent] = None,
+        conditions_json: Optional[dict[str, Any]] = None,
+        sample_size: int = 20,
+    ) -> dict[str, Any]:
+        event = FormAutomationEvent(event_type or rule.event_type)
+        conditions = conditions_json if conditions_json is not None else rule.conditions_json
+
+        candidate_count = (
+            db.query(func.count(Submission.id))
+            .filter(*FormAutomationService._historical_event_filters(rule.form_id, event))
+            .scalar()
+            or 0
+        )
+
+        scanned_count = 0
+        matched_count = 0
+        samples: list[dict[str, Any]] = []
+        for row, matched in FormAutomationService.iter_historical_matches(db, rule.form_id, event, conditions):
+            scanned_count += 1
+            if not matched:
+                continue
+            matched_count += 1
+            if len(samples) < sample_size:
+                samples.append(
+                    {
+                        "submission_id": row.id,
+                        "user_id": row.user_id,
+                        "review_status": row.review_status,
+                        "created_at": row.created_at,
+                        "data": row.data or {},
+                    }
+                )
+
+        return {
+            "rule_id": rule.id,
+            "event_type": event,
+            "candidate_count": candidate_count,
+            "scanned_count": scanned_count,
+            "matched_count": matched_count,
+            "pushed_down": compile_conditions_sql(conditions) is not None,
+            "samples": samples,
+        }
+
+    @staticmethod
+    def apply_rule_to_existing(
+        db: Session,
+        form_id: uuid.UUID,
+        rule_id: uuid.UUID,
+        *,
+        actor_id: Optional[uuid.UUID],
+        batch_size: int = 200,
+        progress=None,
+    ) -> dict[str, Any]:
+        """Run a rule's action for every existing submission it matches, one batch at a time.
+
+        Submissions that already have a task from this rule are skipped; alerts are
+        deduplicated per (rule, submission) by ProjectAttentionService. Failed actions
+        are logged and listed in "failures" as {"submission_id", "error"}, the error
+        being the ValueError code or ACTION_FAILED. Raises ValueError("RULE_INACTIVE")
+        if the rule was switched off before it ran.
+        """
+        from app.services.project_attention_service import ProjectAttentionService
+
+        summary: dict[str, Any] = {
+            "matched_count": 0,
+            "applied_count": 0,
+            "skipped_count": 0,
+            "failed_count": 0,
+            "failures": [],
+        }
+        rule = FormAutomationService.get_rule(db, form_id, rule_id)
+        if not rule or not rule.form:
+            return summary
+        if not rule.is_active:
+            raise ValueError("RULE_INACTIVE")
+
+        form = rule.form
+        compiled = FormAutomationRuleRegistry.compile_rule(rule)
+        matched_ids = [
+            row.id
+            for row, matched in FormAutomationService.iter_historical_matches(
+                db, form_id, compiled.event_type, rule.conditions_json
+            )
+            if matched
+        ]
+        summary["matched_count"] = len(matched_ids)
+        if progress is not None:
+            progress.report(0, len(matched_ids), force=True)
+
+        for start in range(0, len(matched_ids), batch_size):
+            batch_ids = matched_ids[start:start + batch_size]
+            done_ids: set[uuid.UUID] = set()
+            if compiled.action_type == FormAutomationAction.CREATE_TASK:
+                done_ids = {
+                    task_submission_id
+                    for (task_submission_id,) in db.query(ProjectTask.source_submission_id).filter(
+                        ProjectTask.automation_rule_id == rule_id,
+                        ProjectTask.source_submission_id.in_(batch_ids),
+                    )
+                }
+
+            submissions = (
+                db.query(Submission)
+                .filter(Submission.id.in_(batch_ids))
+                .order_by(Submission.created_at.asc())
+                .all()
+            )
+            created_tasks: list[ProjectTask] = []
+            for submission in submissions:
+                if submission.id in done_ids:
+                    summary["skipped_count"] += 1
+                    continue
+                event_context = FormAutomationService._historical_event_context(submission, compiled.event_type)
+                # A failure only rolls back this submission's savepoint, keeping the batch's earlier actions.
+                try:
+                    with db.begin_nested():
+                        task = FormAutomationService._execute_action(
+                            db, form, submission, compiled, actor_id=actor_id, event_context=event_context, commit=False
+                        )
+                except Exception as exc:
+                    logger.exception("Automation rule %s failed on submission %s", rule_id, submission.id)
+                    error = str(exc) if isinstance(exc, ValueError) else "ACTION_FAILED"
+                    summary["failed_count"] += 1
+                    if len(summary["failures"]) < MAX_REPORTED_FAILURES:
+                        summary["failures"].append({"submission_id": str(submission.id), "error": error})
+                    continue
+                summary["applied_count"] += 1
+                if task is not None:
+                    created_tasks.append(task)
+            db.commit()
+            for task in created_tasks:
+                ProjectAttentionService.on_task_changed(db, task)
+            db.expire_all()
+            if progress is not None:
+                progress.report(start + len(batch_ids), len(matched_ids))
+
+        return summary
 
     @staticmethod
     def _execute_action(
         db: Session,
         form: Form,
         submission: Submission,
-        rule: FormAutomationRule,
+        rule: CompiledAutomationRule,
         *,
         actor_id: Optional[uuid.UUID],
         event_context: dict[str, Any],
-    ) -> None:
+        commit: bool = True,
+    ) -> Optional[ProjectTask]:
+        """Run the rule's action; returns the task it created, if any."""
         if rule.action_type == FormAutomationAction.CREATE_ALERT:
             FormAutomationService._execute_create_alert(
                 db, form, submission, rule, event_context=event_context
             )
-            return
+            return None
 
         if rule.action_type != FormAutomationAction.CREATE_TASK:
-            return
+            return None
 
         config = rule.action_config_json or {}
-        title = FormAutomationService._render_template(str(config.get("title_template") or "Follow up {{ submission.id }}"), event_context)
-        description_template = config.get("description_template")
-        description = FormAutomationService._render_template(str(description_template), event_context) if description_template else None
+        title = rule.title_template.render(event_context)
+        description = rule.body_template.render(event_context) if rule.body_template else None
         kind = ProjectTaskKind(str(config.get("kind") or ProjectTaskKind.GENERAL.value))
 
         assigned_accessor_type = config.get("assigned_accessor_type")
         if assigned_accessor_type is not None:
             assigned_accessor_type = AccessorType(str(assigned_accessor_type))
 
-        ProjectTaskService.create_task(
+        return ProjectTaskService.create_task(
             db,
             form.project,
             title=title,
@@ -227,11 +422,12 @@ class FormAutomationService:
                 config, event_context, field_key="scheduled_date_field", value_key="scheduled_date_value"
             ),
             source_submission_id=submission.id,
-            context_json=FormAutomationService._resolve_context_json(config, event_context),
+            context_json=rule.context_mapping(event_context) if rule.context_mapping else None,
             assigned_accessor_id=FormAutomationService._coerce_uuid(config.get("assigned_accessor_id")),
             assigned_accessor_type=assigned_accessor_type,
             created_by=actor_id or submission.user_id or rule.created_by,
             automation_rule_id=rule.id,
+            commit=commit,
         )
 
     @staticmethod
@@ -239,7 +435,7 @@ class FormAutomationService:
         db: Session,
         form: Form,
         submission: Submission,
-        rule: FormAutomationRule,
+        rule: CompiledAutomationRule,
         *,
         event_context: dict[str, Any],
     ) -> None:
@@ -249,16 +445,8 @@ class FormAutomationService:
             return
 
         config = rule.action_config_json or {}
-        title = FormAutomationService._render_template(
-            str(config.get("title_template") or "Alert for {{ submission.id }}"),
-            event_context,
-        )
-        detail_template = config.get("detail_template") or config.get("description_template")
-        detail = (
-            FormAutomationService._render_template(str(detail_template), event_context)
-            if detail_template
-            else None
-        )
+        title = rule.title_template.render(event_context)
+        detail = rule.body_template.render(event_context) if rule.body_template else None
         severity = str(config.get("severity") or "warning").lower().strip()
         deep_link = f"/projects/{form.project_id}?tab=ops&view=review"
 
@@ -274,99 +462,6 @@ class FormAutomationService:
             commit=False,
         )
 
-    @staticmethod
-    def _resolve_context_json(config: dict[str, Any], event_context: dict[str, Any]) -> Optional[dict[str, Any]]:
-        raw_mapping = config.get("context_mapping_json")
-        if raw_mapping in (None, "", {}):
-            return None
-
-        if isinstance(raw_mapping, str):
-            try:
-                raw_mapping = json.loads(raw_mapping)
-            except json.JSONDecodeError:
-                return None
-
-        if not isinstance(raw_mapping, dict):
-            return None
-
-        resolved: dict[str, Any] = {}
-        for target_key, source in raw_mapping.items():
-            if not isinstance(target_key, str) or not target_key.strip():
-                continue
-
-            resolved_value = FormAutomationService._resolve_context_value(source, event_context)
-            if resolved_value is None:
-                continue
-
-            FormAutomationService._set_context_value(resolved, target_key.strip(), resolved_value)
-
-        return resolved or None
-
-    @staticmethod
-    def _resolve_context_value(source: Any, event_context: dict[str, Any]) -> Any:
-        if isinstance(source, str):
-            trimmed = source.strip()
-            if not trimmed:
-                return None
-            if "{{" in trimmed and "}}" in trimmed:
-                rendered = FormAutomationService._render_template(trimmed, event_context)
-                return rendered or None
-
-            resolved = FormAutomationService._resolve_path(event_context, trimmed)
-            if resolved is not None:
-                return FormAutomationService._normalize_json_value(resolved)
-            return trimmed
-
-        if isinstance(source, dict):
-            nested = {
-                key: value
-                for key, value in (
-                    (key, FormAutomationService._resolve_context_value(value, event_context))
-                    for key, value in source.items()
-                )
-                if value is not None
-            }
-            return nested or None
-
-        if isinstance(source, list):
-            nested = [
-                value
-                for value in (FormAutomationService._resolve_context_value(value, event_context) for value in source)
-                if value is not None
-            ]
-            return nested or None
-
-        return FormAutomationService._normalize_json_value(source)
-
-    @staticmethod
-    def _set_context_value(target: dict[str, Any], path: str, value: Any) -> None:
-        parts = [part for part in path.split(".") if part]
-        if not parts:
-            return
-
-        cursor = target
-        for part in parts[:-1]:
-            existing = cursor.get(part)
-            if not isinstance(existing, dict):
-                existing = {}
-                cursor[part] = existing
-            cursor = existing
-        cursor[parts[-1]] = value
-
-    @staticmethod
-    def _normalize_json_value(value: Any) -> Any:
-        if isinstance(value, uuid.UUID):
-            return str(value)
-        if isinstance(value, datetime):
-            return value.isoformat()
-        if isinstance(value, date):
-            return value.isoformat()
-        if isinstance(value, dict):
-            return {key: FormAutomationService._normalize_json_value(entry) for key, entry in value.items()}
-        if isinstance(value, list):
-            return [FormAutomationService._normalize_json_value(entry) for entry in value]
-        return value
-
     @staticmethod
     def _resolve_date_value(config: dict[str, Any], event_context: dict[str, Any], *, field_key: str, value_key: str) -> Optional[date]:
         raw_value = config.get(value_key)
@@ -391,31 +486,9 @@ class FormAutomationService:
             return raw_value
         return datetime.fromisoformat(str(raw_value).replace("Z", "+00:00"))
 
-    @staticmethod
-    def _render_template(template: str, event_context: dict[str, Any]) -> str:
-        def replace(match: re.Match[str]) -> str:
-            value = FormAutomationService._resolve_path(event_context, match.group(1).strip())
-            return "" if value is None else str(value)
-
-        return FormAutomationService.TEMPLATE_PATTERN.sub(replace, template).strip()
-
     @staticmethod
     def _resolve_path(event_context: dict[str, Any], path: str) -> Any:
-        parts = [part for part in path.split(".") if part]
-        if not parts:
-            return None
-        current: Any = event_context
-        if parts[0] not in event_context:
-            parts = ["data", *parts]
-
-        for part in parts:
-            if current is None:
-                return None
-            if isinstance(current, dict):
-                current = current.get(part)
-            else:
-                current = getattr(current, part, None)
-        return current
+        return resolve_compiled_path(event_context, compile_path(path))
 
     @staticmethod
     def _coerce_uuid(value: Any) -> Optional[uuid.UUID]:
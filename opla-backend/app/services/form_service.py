@@ -1,3 +1,5 @@
+from sqlalchemy import String, and_, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
 from app.models.project import Project
 from app.models.project import ProjectStatus
@@ -13,7 +15,12 @@ from app.models.form_version import FormVersion, FormVersionKind
 from app.models.project_access import ProjectAccess, ProjectRole, AccessorType
 from app.models.org_member import OrgMember
 from app.models.team import Team
+from app.services import json_patch
+from app.services.blueprint_index import BlueprintIndex, BlueprintIndexCache
+import json
+import threading
 import uuid
+from collections import OrderedDict
 from typing import List, Optional, Dict
 import re
 from datetime import datetime
@@ -168,8 +175,54 @@ class ProjectService:
         db.refresh(project)
         return project
 
+# Mirrors `not form.blueprint_live`: SQL NULL, JSON null and {} all count as no live blueprint.
+LIVE_BLUEPRINT_PRESENT = func.coalesce(
+    and_(func.jsonb_typeof(Form.blueprint_live) == "object", Form.blueprint_live != func.jsonb_build_object()),
+    False,
+)
+
+
+class LinkedFormGraphCache:
+    """In-process LRU of resolved link graphs keyed by (root form, max_depth).
+
+    Links live in each form's blueprint_live, so a resolved graph stays valid while
+    every form it visited keeps the same published version, status and blueprint
+    presence. Entries store that snapshot and are checked with one query per hit.
+    """
+
+    MAX_ENTRIES = 256
+    _lock = threading.Lock()
+    _graphs: "OrderedDict[tuple, tuple[dict, tuple[uuid.UUID, ...]]]" = OrderedDict()
+
+    @classmethod
+    def get(cls, key: tuple) -> Optional[tuple[dict, tuple[uuid.UUID, ...]]]:
+        with cls._lock:
+            entry = cls._graphs.get(key)
+            if entry is not None:
+                cls._graphs.move_to_end(key)
+            return entry
+
+    @classmethod
+    def put(cls, key: tuple, visited: dict, linked_ids: tuple[uuid.UUID, ...]) -> None:
+        with cls._lock:
+            cls._graphs[key] = (visited, linked_ids)
+            cls._graphs.move_to_end(key)
+            while len(cls._graphs) > cls.MAX_ENTRIES:
+                cls._graphs.popitem(last=False)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._graphs.clear()
+
+
 class FormService:
     DRAFT_SLOTS = (1, 2, 3)
+    # Longest run of delta-only drafts before a superseded draft is kept whole,
+    # which bounds reconstruction to that many patch applications.
+    DRAFT_KEYFRAME_INTERVAL = 20
+    JSON_PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+    PUBLISH_MIGRATION_BATCH_ROWS = 1000
 
     @staticmethod
     def _normalize_identifier(value: Optional[str]) -> Optional[str]:
@@ -215,6 +268,81 @@ class FormService:
 
         return normalized_properties
 
+    @staticmethod
+    def _normalize_schema_entry(raw_entry, index: int, used_identifiers: set[str]) -> Dict:
+        entry = dict(raw_entry) if isinstance(raw_entry, dict) else {"type": "string"}
+        raw_key = entry.get("key")
+        normalized_key = FormService._normalize_identifier(raw_key) or f"field_{index + 1}"
+        identifier = FormService._normalize_identifier(
+            entry.get("id") or entry.get("field_id") or entry.get("dataset_field_id") or normalized_key
+        )
+        if not identifier or identifier in used_identifiers:
+            identifier = FormService._generate_field_identifier(normalized_key)
+            while identifier in used_identifiers:
+                identifier = FormService._generate_field_identifier()
+
+        entry["key"] = normalized_key
+        entry["id"] = identifier
+        entry["field_id"] = identifier
+        entry["dataset_field_id"] = identifier
+        if isinstance(entry.get("properties"), list):
+            entry["properties"] = FormService._normalize_object_properties(entry.get("properties"))
+        item_definition = entry.get("item_definition")
+        if isinstance(item_definition, dict):
+            normalized_item_definition = dict(item_definition)
+            normalized_item_definition["properties"] = FormService._normalize_object_properties(item_definition.get("properties"))
+            entry["item_definition"] = normalized_item_definition
+        return entry
+
+    @staticmethod
+    def _normalize_ui_section(
+        raw_section,
+        section_index: int,
+        field_identifiers_by_key: Dict[str, str],
+        used_identifiers: set[str],
+        normalized_schema: List[Dict],
+    ) -> Dict:
+        section = dict(raw_section) if isinstance(raw_section, dict) else {}
+        section_id = FormService._normalize_identifier(section.get("id")) or f"screen_{section_index + 1}"
+        section["id"] = section_id
+
+        children = section.get("children") or []
+        normalized_children = []
+        for child_index, raw_child in enumerate(children):
+            child = dict(raw_child) if isinstance(raw_child, dict) else {}
+            raw_bind = child.get("bind") or child.get("key") or child.get("field_id") or child.get("id")
+            normalized_bind = FormService._normalize_identifier(raw_bind) or f"field_{child_index + 1}"
+            identifier = field_identifiers_by_key.get(normalized_bind)
+            if not identifier:
+                identifier = FormService._normalize_identifier(child.get("field_id") or child.get("id"))
+            if not identifier or identifier in used_identifiers and field_identifiers_by_key.get(normalized_bind) != identifier:
+                identifier = FormService._generate_field_identifier(normalized_bind)
+                while identifier in used_identifiers:
+                    identifier = FormService._generate_field_identifier()
+
+            child["bind"] = normalized_bind
+            child["id"] = identifier
+            child["field_id"] = identifier
+            child["dataset_field_id"] = identifier
+            normalized_children.append(child)
+
+            if normalized_bind not in field_identifiers_by_key:
+                field_identifiers_by_key[normalized_bind] = identifier
+                normalized_schema.append(
+                    {
+                        "key": normalized_bind,
+                        "id": identifier,
+                        "field_id": identifier,
+                        "dataset_field_id": identifier,
+                        "type": child.get("type") or "string",
+                        "required": bool(child.get("required")),
+                    }
+                )
+            used_identifiers.add(identifier)
+
+        section["children"] = normalized_children
+        return section
+
     @staticmethod
     def _normalize_blueprint(blueprint: Optional[Dict]) -> Dict:
         payload = dict(blueprint or {})
@@ -227,178 +355,94 @@ class FormService:
 
         if isinstance(schema, list):
             for index, raw_entry in enumerate(schema):
-                entry = dict(raw_entry) if isinstance(raw_entry, dict) else {"type": "string"}
-                raw_key = entry.get("key")
-                normalized_key = FormService._normalize_identifier(raw_key) or f"field_{index + 1}"
-                identifier = FormService._normalize_identifier(
-                    entry.get("id") or entry.get("field_id") or entry.get("dataset_field_id") or normalized_key
-                )
-                if not identifier or identifier in used_identifiers:
-                    identifier = FormService._generate_field_identifier(normalized_key)
-                    while identifier in used_identifiers:
-                        identifier = FormService._generate_field_identifier()
-
-                entry["key"] = normalized_key
-                entry["id"] = identifier
-                entry["field_id"] = identifier
-                entry["dataset_field_id"] = identifier
-                if isinstance(entry.get("properties"), list):
-                    entry["properties"] = FormService._normalize_object_properties(entry.get("properties"))
-                item_definition = entry.get("item_definition")
-                if isinstance(item_definition, dict):
-                    normalized_item_definition = dict(item_definition)
-                    normalized_item_definition["properties"] = FormService._normalize_object_properties(item_definition.get("properties"))
-                    entry["item_definition"] = normalized_item_definition
+                entry = FormService._normalize_schema_entry(raw_entry, index, used_identifiers)
                 normalized_schema.append(entry)
-                field_identifiers_by_key[normalized_key] = identifier
-                used_identifiers.add(identifier)
+                field_identifiers_by_key[entry["key"]] = entry["id"]
+                used_identifiers.add(entry["id"])
 
         if isinstance(ui, list):
-            normalized_ui = []
-            for section_index, raw_section in enumerate(ui):
-                section = dict(raw_section) if isinstance(raw_section, dict) else {}
-                section_id = FormService._normalize_identifier(section.get("id")) or f"screen_{section_index + 1}"
-                section["id"] = section_id
-
-                children = section.get("children") or []
-                normalized_children = []
-                for child_index, raw_child in enumerate(children):
-                    child = dict(raw_child) if isinstance(raw_child, dict) else {}
-                    raw_bind = child.get("bind") or child.get("key") or child.get("field_id") or child.get("id")
-                    normalized_bind = FormService._normalize_identifier(raw_bind) or f"field_{child_index + 1}"
-                    identifier = field_identifiers_by_key.get(normalized_bind)
-                    if not identifier:
-                        identifier = FormService._normalize_identifier(child.get("field_id") or child.get("id"))
-                    if not identifier or identifier in used_identifiers and field_identifiers_by_key.get(normalized_bind) != identifier:
-                        identifier = FormService._generate_field_identifier(normalized_bind)
-                        while identifier in used_identifiers:
-                            identifier = FormService._generate_field_identifier()
-
-                    child["bind"] = normalized_bind
-                    child["id"] = identifier
-                    child["field_id"] = identifier
-                    child["dataset_field_id"] = identifier
-                    normalized_children.append(child)
-
-                    if normalized_bind not in field_identifiers_by_key:
-                        field_identifiers_by_key[normalized_bind] = identifier
-                        normalized_schema.append(
-                            {
-                                "key": normalized_bind,
-                                "id": identifier,
-                                "field_id": identifier,
-                                "dataset_field_id": identifier,
-                                "type": child.get("type") or "string",
-                                "required": bool(child.get("required")),
-                            }
-                        )
-                    used_identifiers.add(identifier)
-
-                section["children"] = normalized_children
-                normalized_ui.append(section)
-
-            payload["ui"] = normalized_ui
+            payload["ui"] = [
+                FormService._normalize_ui_section(
+                    raw_section, section_index, field_identifiers_by_key, used_identifiers, normalized_schema
+                )
+                for section_index, raw_section in enumerate(ui)
+            ]
 
         payload["schema"] = normalized_schema
         return payload
 
     @staticmethod
-    def _extract_schema_fields(blueprint: Optional[Dict]) -> List[Dict]:
-        schema = (blueprint or {}).get("schema") or []
-        extracted: List[Dict] = []
-        if not isinstance(schema, list):
-            return extracted
-
-        def append_definition_fields(field: Dict, *, parent_identifier: Optional[str] = None, parent_key: Optional[str] = None, parent_type: Optional[str] = None) -> None:
-            identifier = (
-                field.get("id")
-                or field.get("field_id")
-                or field.get("dataset_field_id")
-                or field.get("key")
-            )
-            key = field.get("key") or str(identifier)
-
-            if parent_identifier and identifier:
-                identifier = f"{parent_identifier}.{identifier}"
-            elif not identifier:
-                identifier = f"field_{len(extracted) + 1}"
-
-            if parent_key:
-                key = f"{parent_key}.{key}"
-
-            definition = dict(field)
-            if parent_identifier:
-                definition["parent_identifier"] = parent_identifier
-            if parent_key:
-                definition["parent_key"] = parent_key
-            if parent_type:
-                definition["parent_type"] = parent_type
-
-            extracted.append(
-                {
-                    "identifier": str(identifier),
-                    "key": key,
-                    "label": field.get("label") or field.get("title") or field.get("key") or str(identifier),
-                    "field_type": field.get("type"),
-                    "definition": definition,
-                }
-            )
+    def _normalize_patched_blueprint(previous: Dict, patched: Dict) -> Dict:
+        """Normalize only the schema entries and UI sections a patch touched.
 
-            nested_properties = []
-            if isinstance(field.get("properties"), list):
-                nested_properties = field.get("properties") or []
-            elif isinstance(field.get("item_definition"), dict):
-                nested_properties = field.get("item_definition", {}).get("properties") or []
-
-            for nested_field in nested_properties:
-                if isinstance(nested_field, dict):
-                    append_definition_fields(
-                        nested_field,
-                        parent_identifier=str(identifier),
-                        parent_key=key,
-                        parent_type=str(field.get("type") or parent_type or "object"),
-                    )
-
-        for index, field in enumerate(schema):
-            if not isinstance(field, dict):
-                continue
-            if not (
-                field.get("id")
-                or field.get("field_id")
-                or field.get("dataset_field_id")
-                or field.get("key")
-            ):
-                field = dict(field)
-                field["id"] = f"field_{index + 1}"
-            append_definition_fields(field)
-
-        return extracted
+        json_patch.apply shares unchanged subtrees with its input, so entries that
+        are still the very objects of the (already normalized) previous draft are
+        kept as they are; their identifiers win over those of touched entries.
+        """
+        schema = patched.get("schema")
+        ui = patched.get("ui")
+        previous_schema = previous.get("schema")
+        previous_ui = previous.get("ui")
+        if (
+            not isinstance(schema, list)
+            or not isinstance(previous_schema, list)
+            or not isinstance(ui, (list, type(None)))
+            or not isinstance(previous_ui, (list, type(None)))
+        ):
+            return FormService._normalize_blueprint(patched)
+
+        kept_entries = {id(entry) for entry in previous_schema}
+        kept_sections = {id(section) for section in previous_ui or []}
+        used_identifiers = {entry.get("id") for entry in schema if id(entry) in kept_entries}
+        for section in ui or []:
+            if id(section) in kept_sections:
+                used_identifiers.update(child.get("id") for child in section.get("children") or [])
+        used_identifiers.discard(None)
+
+        normalized_schema: List[Dict] = []
+        field_identifiers_by_key: Dict[str, str] = {}
+        for index, entry in enumerate(schema):
+            if id(entry) not in kept_entries:
+                entry = FormService._normalize_schema_entry(entry, index, used_identifiers)
+                used_identifiers.add(entry["id"])
+            normalized_schema.append(entry)
+            if entry.get("key"):
+                field_identifiers_by_key[entry["key"]] = entry.get("id")
+
+        payload = dict(patched)
+        if isinstance(ui, list):
+            payload["ui"] = [
+                section
+                if id(section) in kept_sections
+                else FormService._normalize_ui_section(
+                    section, section_index, field_identifiers_by_key, used_identifiers, normalized_schema
+                )
+                for section_index, section in enumerate(ui)
+            ]
+        payload["schema"] = normalized_schema
+        return payload
 
     @staticmethod
     def _build_schema_change_summary(
-        previous_schema: Optional[Dict],
-        current_schema: Optional[Dict],
+        previous_index: BlueprintIndex,
+        current_index: BlueprintIndex,
     ) -> Dict:
-        previous_fields = {
-            field["identifier"]: field for field in FormService._extract_schema_fields(previous_schema)
-        }
-        current_fields = {
-            field["identifier"]: field for field in FormService._extract_schema_fields(current_schema)
-        }
+        previous_fields = previous_index.fields_by_identifier
+        current_fields = current_index.fields_by_identifier
 
         previous_ids = set(previous_fields)
         current_ids = set(current_fields)
 
         modified = []
         for identifier in sorted(previous_ids & current_ids):
-            old_definition = previous_fields[identifier].get("definition") or {}
-            new_definition = current_fields[identifier].get("definition") or {}
+            old_definition = previous_fields[identifier].definition or {}
+            new_definition = current_fields[identifier].definition or {}
             if old_definition != new_definition:
                 modified.append(
                     {
                         "field_identifier": identifier,
-                        "previous_key": previous_fields[identifier].get("key"),
-                        "current_key": current_fields[identifier].get("key"),
+                        "previous_key": previous_fields[identifier].key,
+                        "current_key": current_fields[identifier].key,
                     }
                 )
 
@@ -413,10 +457,9 @@ class FormService:
         db: Session,
         dataset: FormDataset,
         schema_version_number: int,
-        blueprint: Optional[Dict],
+        index: BlueprintIndex,
     ) -> None:
-        current_fields = FormService._extract_schema_fields(blueprint)
-        current_by_identifier = {field["identifier"]: field for field in current_fields}
+        current_by_identifier = index.fields_by_identifier
         existing_fields = (
             db.query(FormDatasetField)
             .filter(FormDatasetField.dataset_id == dataset.id)
@@ -426,25 +469,26 @@ class FormService:
 
         for identifier, field in current_by_identifier.items():
             record = existing_by_identifier.get(identifier)
+            # The index is shared across requests; give the row its own copy of the definition.
             if record:
-                record.field_key = field.get("key")
-                record.label = field.get("label")
-                record.field_type = field.get("field_type")
+                record.field_key = field.key
+                record.label = field.label
+                record.field_type = field.field_type
                 record.status = FormDatasetFieldStatus.ACTIVE
                 record.retired_in_version_number = None
-                record.metadata_json = field.get("definition")
+                record.metadata_json = dict(field.definition)
                 continue
 
             db.add(
                 FormDatasetField(
                     dataset_id=dataset.id,
                     field_identifier=identifier,
-                    field_key=field.get("key"),
-                    label=field.get("label"),
-                    field_type=field.get("field_type"),
+                    field_key=field.key,
+                    label=field.label,
+                    field_type=field.field_type,
                     status=FormDatasetFieldStatus.ACTIVE,
                     introduced_in_version_number=schema_version_number,
-                    metadata_json=field.get("definition"),
+                    metadata_json=dict(field.definition),
                 )
             )
 
@@ -512,8 +556,15 @@ class FormService:
             .first()
         )
 
-        previous_blueprint = latest_version.blueprint_snapshot if latest_version else None
-        change_summary = FormService._build_schema_change_summary(previous_blueprint, blueprint)
+        if live_snapshot:
+            current_index = BlueprintIndexCache.for_version(live_snapshot.id, blueprint)
+        else:
+            current_index = BlueprintIndexCache.for_live_form(form)
+        if latest_version and latest_version.form_version_id:
+            previous_index = BlueprintIndexCache.for_version(latest_version.form_version_id, latest_version.blueprint_snapshot)
+        else:
+            previous_index = BlueprintIndex.compile(latest_version.blueprint_snapshot if latest_version else None)
+        change_summary = FormService._build_schema_change_summary(previous_index, current_index)
         if changelog:
             change_summary["changelog"] = changelog
 
@@ -539,7 +590,7 @@ class FormService:
             db.flush()
 
         dataset.current_schema_version_number = target_version_number
-        FormService._sync_dataset_fields(db, dataset, target_version_number, blueprint)
+        FormService._sync_dataset_fields(db, dataset, target_version_number, current_index)
         return dataset, schema_version
 
     @staticmethod
@@ -616,6 +667,36 @@ class FormService:
             raise ValueError("Draft slot must be one of: 1, 2, or 3")
         return slot
 
+    @staticmethod
+    def _store_draft_delta(
+        version: FormVersion,
+        blueprint: Dict,
+        successor: FormVersion,
+        successor_blueprint: Dict,
+        run_length: int,
+    ) -> bool:
+        """Keep a superseded draft as a reverse patch against its successor.
+
+        Falls back to storing the full blueprint (a keyframe) once the current run
+        of deltas reaches DRAFT_KEYFRAME_INTERVAL or when the patch would not be
+        smaller than the blueprint itself. Returns True when a delta was stored.
+        """
+        patch = None
+        if run_length < FormService.DRAFT_KEYFRAME_INTERVAL:
+            patch = json_patch.diff(successor_blueprint, blueprint)
+            if len(json.dumps(patch)) >= len(json.dumps(blueprint)):
+                patch = None
+        if patch is None:
+            version.blueprint = blueprint
+            version.base_version_id = None
+            version.blueprint_delta = None
+            return False
+        version.blueprint = None
+        version.base_version_id = successor.id
+        version.blueprint_delta = patch
+        version.delta_chain_length = 0
+        return True
+
     @staticmethod
     def _upsert_draft_snapshot(
         db: Session,
@@ -625,10 +706,9 @@ class FormService:
         created_by: Optional[uuid.UUID] = None,
     ) -> FormVersion:
         existing = FormService._get_active_draft_in_slot(db, form.id, slot_index)
-        if existing:
-            existing.is_active = False
 
         snapshot = FormVersion(
+            id=uuid.uuid4(),
             form_id=form.id,
             version_number=FormService._next_version_number(db, form.id),
             kind=FormVersionKind.DRAFT,
@@ -636,10 +716,106 @@ class FormService:
             blueprint=blueprint or {},
             created_by=created_by,
             is_active=True,
+            delta_chain_length=0,
         )
+        if existing:
+            existing.is_active = False
+            run_length = existing.delta_chain_length or 0
+            if FormService._store_draft_delta(existing, existing.blueprint or {}, snapshot, snapshot.blueprint, run_length):
+                snapshot.delta_chain_length = run_length + 1
         db.add(snapshot)
         return snapshot
 
+    @staticmethod
+    def get_version_blueprint(db: Session, version: FormVersion) -> Dict:
+        """Full blueprint of any form version, replaying stored deltas when needed."""
+        if version.blueprint is not None:
+            return version.blueprint
+
+        chain = (
+            select(
+                FormVersion.id,
+                FormVersion.base_version_id,
+                FormVersion.blueprint,
+                FormVersion.blueprint_delta,
+                literal(0).label("depth"),
+            )
+            .where(FormVersion.id == version.id)
+            .cte("version_chain", recursive=True)
+        )
+        chain = chain.union_all(
+            select(
+                FormVersion.id,
+                FormVersion.base_version_id,
+                FormVersion.blueprint,
+                FormVersion.blueprint_delta,
+                chain.c.depth + 1,
+            )
+            .join(chain, FormVersion.id == chain.c.base_version_id)
+            .where(chain.c.blueprint.is_(None))
+        )
+        rows = db.execute(select(chain.c.blueprint, chain.c.blueprint_delta).order_by(chain.c.depth.desc())).all()
+        if not rows or rows[0].blueprint is None:
+            raise ValueError("Form version history is incomplete")
+        blueprint = rows[0].blueprint
+        for row in rows[1:]:
+            blueprint = json_patch.apply(blueprint, row.blueprint_delta or [])
+        return blueprint
+
+    @staticmethod
+    def compact_draft_history(db: Session, form_id: uuid.UUID, progress=None) -> dict:
+        """Re-encode a form's draft history as keyframes plus reverse deltas.
+
+        Covers drafts written before delta encoding existed and chains whose
+        keyframes drifted; each slot is rewritten newest to oldest and committed.
+        """
+        rewritten = 0
+        delta_rows = 0
+        total = (
+            db.query(func.count(FormVersion.id))
+            .filter(FormVersion.form_id == form_id, FormVersion.kind == FormVersionKind.DRAFT)
+            .scalar()
+            or 0
+        )
+        for slot_index in FormService.DRAFT_SLOTS:
+            versions = (
+                db.query(FormVersion)
+                .filter(
+                    FormVersion.form_id == form_id,
+                    FormVersion.kind == FormVersionKind.DRAFT,
+                    FormVersion.slot_index == slot_index,
+                )
+                .order_by(FormVersion.version_number.desc())
+                .all()
+            )
+            if not versions:
+                continue
+            # Materialize the whole slot before rewriting any row so replays see the old encoding.
+            blueprints = {version.id: FormService.get_version_blueprint(db, version) for version in versions}
+            successor = versions[0]
+            keyframe = successor
+            keyframe.blueprint = blueprints[successor.id]
+            keyframe.base_version_id = None
+            keyframe.blueprint_delta = None
+            run_length = 0
+            for version in versions[1:]:
+                if FormService._store_draft_delta(
+                    version, blueprints[version.id], successor, blueprints[successor.id], run_length
+                ):
+                    run_length += 1
+                    delta_rows += 1
+                else:
+                    keyframe.delta_chain_length = run_length
+                    keyframe = version
+                    run_length = 0
+                successor = version
+            keyframe.delta_chain_length = run_length
+            db.commit()
+            rewritten += len(versions)
+            if progress is not None:
+                progress.report(rewritten, total)
+        return {"form_id": str(form_id), "versions": rewritten, "delta_versions": delta_rows}
+
     @staticmethod
     def _ensure_active_draft_exists(db: Session, form: Form) -> None:
         active_drafts = (
@@ -702,27 +878,195 @@ class FormService:
         blueprint: Dict,
         target_slot: Optional[int] = None,
         updated_by: Optional[uuid.UUID] = None,
+        base_revision: Optional[int] = None,
     ) -> Form:
-        form = db.query(Form).filter(Form.id == form_id).first()
+        """Replace a draft slot. With base_revision the save is rejected with
+        BLUEPRINT_REVISION_CONFLICT unless it matches the form's blueprint_revision."""
+        query = db.query(Form).filter(Form.id == form_id)
+        form = (query.with_for_update() if base_revision is not None else query).first()
         if form:
+            if base_revision is not None and base_revision != (form.blueprint_revision or 0):
+                raise ValueError("BLUEPRINT_REVISION_CONFLICT")
             blueprint = FormService._normalize_blueprint(blueprint)
             slot_index = FormService._ensure_slot(target_slot)
-            form.blueprint_draft = blueprint
-            if blueprint and "meta" in blueprint and "title" in blueprint["meta"]:
-                form.title = blueprint["meta"]["title"]
+            FormService._save_draft_blueprint(db, form, blueprint, slot_index, updated_by)
+        return form
 
-            FormService._upsert_draft_snapshot(
-                db,
-                form=form,
-                blueprint=blueprint or {},
-                slot_index=slot_index,
-                created_by=updated_by,
-            )
+    @staticmethod
+    def _save_draft_blueprint(
+        db: Session,
+        form: Form,
+        blueprint: Dict,
+        slot_index: int,
+        updated_by: Optional[uuid.UUID],
+    ) -> None:
+        form.blueprint_draft = blueprint
+        form.blueprint_revision = (form.blueprint_revision or 0) + 1
+        if blueprint and "meta" in blueprint and "title" in (blueprint["meta"] or {}):
+            form.title = blueprint["meta"]["title"]
 
-            db.commit()
-            db.refresh(form)
+        FormService._upsert_draft_snapshot(
+            db,
+            form=form,
+            blueprint=blueprint or {},
+            slot_index=slot_index,
+            created_by=updated_by,
+        )
+
+        db.commit()
+        db.refresh(form)
+
+    @staticmethod
+    def patch_blueprint(
+        db: Session,
+        form_id: uuid.UUID,
+        operations: List[Dict],
+        base_revision: int,
+        target_slot: Optional[int] = None,
+        updated_by: Optional[uuid.UUID] = None,
+    ) -> Optional[Form]:
+        """Apply JSON Patch or field-level operations to a draft slot.
+
+        The patch is rejected with BLUEPRINT_REVISION_CONFLICT unless base_revision
+        matches the form's current blueprint_revision. Operations apply in order
+        and all-or-nothing; only the nodes they touch are renormalized.
+        """
+        form = db.query(Form).filter(Form.id == form_id).with_for_update().first()
+        if not form:
+            return None
+        if base_revision != (form.blueprint_revision or 0):
+            raise ValueError("BLUEPRINT_REVISION_CONFLICT")
+        slot_index = FormService._ensure_slot(target_slot)
+
+        draft = FormService._get_active_draft_in_slot(db, form.id, slot_index)
+        current = draft.blueprint if draft else (form.blueprint_draft or {})
+        patched = current
+        for operation in operations:
+            patched = json_patch.apply(patched, FormService._blueprint_patch_operations(patched, operation))
+        if not isinstance(patched, dict):
+            raise ValueError("Blueprint must be a JSON object")
+
+        blueprint = FormService._normalize_patched_blueprint(current, patched)
+        FormService._save_draft_blueprint(db, form, blueprint, slot_index, updated_by)
         return form
 
+    @staticmethod
+    def _blueprint_patch_operations(blueprint: Dict, operation: Dict) -> List[Dict]:
+        """Translate one field-level operation into JSON Patch against *blueprint*.
+
+        RFC 6902 operations pass through unchanged. Field operations address
+        schema entries by id or key and UI sections by id:
+        add_field, update_field, move_field, remove_field and reorder_sections.
+        """
+        if not isinstance(operation, dict):
+            raise ValueError("Each operation must be an object")
+        op = operation.get("op")
+        if op in FormService.JSON_PATCH_OPS:
+            return [operation]
+
+        schema = blueprint.get("schema") if isinstance(blueprint.get("schema"), list) else []
+        ui = blueprint.get("ui") if isinstance(blueprint.get("ui"), list) else []
+
+        def field_index(field_id) -> int:
+            for index, entry in enumerate(schema):
+                if isinstance(entry, dict) and field_id in (entry.get("id"), entry.get("key")):
+                    return index
+            raise ValueError(f"Field not found: {field_id}")
+
+        def section_index(section_id) -> int:
+            for index, section in enumerate(ui):
+                if isinstance(section, dict) and section.get("id") == section_id:
+                    return index
+            raise ValueError(f"Section not found: {section_id}")
+
+        def bound_children(entry: Dict) -> List[tuple]:
+            targets = {entry.get("key"), entry.get("id")} - {None}
+            return [
+                (s_index, c_index)
+                for s_index, section in enumerate(ui)
+                if isinstance(section, dict)
+                for c_index, child in enumerate(section.get("children") or [])
+                if isinstance(child, dict) and (child.get("bind") in targets or child.get("field_id") in targets)
+            ]
+
+        def position(value) -> str:
+            return "-" if value is None else str(int(value))
+
+        if op == "add_field":
+            field = operation.get("field")
+            if not isinstance(field, dict):
+                raise ValueError("add_field requires a field object")
+            patch = [{"op": "add", "path": f"/schema/{position(operation.get('index'))}", "value": field}]
+            if operation.get("section_id") is not None:
+                s_index = section_index(operation["section_id"])
+                child = dict(operation.get("ui") or {})
+                child.setdefault("bind", field.get("key"))
+                child.setdefault("type", field.get("type"))
+                if isinstance(ui[s_index].get("children"), list):
+                    path = f"/ui/{s_index}/children/{position(operation.get('child_index'))}"
+                    patch.append({"op": "add", "path": path, "value": child})
+                else:
+                    patch.append({"op": "add", "path": f"/ui/{s_index}/children", "value": [child]})
+            return patch
+
+        if op == "update_field":
+            changes = operation.get("changes")
+            if not isinstance(changes, dict):
+                raise ValueError("update_field requires a changes object")
+            index = field_index(operation.get("field_id"))
+            entry = schema[index]
+            patch = [
+                {"op": "add", "path": f"/schema/{index}/{json_patch.escape_token(str(key))}", "value": value}
+                for key, value in changes.items()
+            ]
+            if "key" in changes and changes["key"] != entry.get("key"):
+                for s_index, c_index in bound_children(entry):
+                    patch.append({"op": "add", "path": f"/ui/{s_index}/children/{c_index}/bind", "value": changes["key"]})
+            return patch
+
+        if op == "remove_field":
+            index = field_index(operation.get("field_id"))
+            children = bound_children(schema[index])
+            # Back to front so earlier child indexes stay valid.
+            patch = [{"op": "remove", "path": f"/ui/{s}/children/{c}"} for s, c in reversed(children)]
+            patch.append({"op": "remove", "path": f"/schema/{index}"})
+            return patch
+
+        if op == "move_field":
+            index = field_index(operation.get("field_id"))
+            patch = []
+            if operation.get("index") is not None:
+                patch.append({"op": "move", "from": f"/schema/{index}", "path": f"/schema/{position(operation['index'])}"})
+            if operation.get("section_id") is not None:
+                children = bound_children(schema[index])
+                if not children:
+                    raise ValueError(f"Field is not placed in a section: {operation.get('field_id')}")
+                s_from, c_from = children[0]
+                s_to = section_index(operation["section_id"])
+                patch.append(
+                    {
+                        "op": "move",
+                        "from": f"/ui/{s_from}/children/{c_from}",
+                        "path": f"/ui/{s_to}/children/{position(operation.get('child_index'))}",
+                    }
+                )
+            return patch
+
+        if op == "reorder_sections":
+            order = operation.get("order")
+            current = [section.get("id") if isinstance(section, dict) else None for section in ui]
+            if not isinstance(order, list) or sorted(map(str, order)) != sorted(map(str, current)):
+                raise ValueError("reorder_sections requires every section id exactly once")
+            patch = []
+            for target, section_id in enumerate(order):
+                source = current.index(section_id)
+                if source != target:
+                    patch.append({"op": "move", "from": f"/ui/{source}", "path": f"/ui/{target}"})
+                    current.insert(target, current.pop(source))
+            return patch
+
+        raise ValueError(f"Unsupported blueprint operation: {op}")
+
     @staticmethod
     def get_form(db: Session, form_id: uuid.UUID) -> Optional[Form]:
         return db.query(Form).filter(Form.id == form_id).first()
@@ -736,6 +1080,14 @@ class FormService:
             .all()
         )
 
+    @staticmethod
+    def get_form_version(db: Session, form_id: uuid.UUID, version_id: uuid.UUID) -> Optional[FormVersion]:
+        return (
+            db.query(FormVersion)
+            .filter(FormVersion.id == version_id, FormVersion.form_id == form_id)
+            .first()
+        )
+
     @staticmethod
     def get_runtime_form_by_id(db: Session, form_id: uuid.UUID) -> Optional[Form]:
         form = db.query(Form).filter(Form.id == form_id).first()
@@ -751,47 +1103,162 @@ class FormService:
     ) -> List[Form]:
         """Recursively resolve linked_form_ids from blueprint_live.
 
-        Walks the form-link graph breadth-first up to *max_depth* levels,
-        collecting every referenced form that is live and has a blueprint.
-        Returns a flat, deduplicated list (excludes the root form itself).
-        Circular references and missing forms are silently skipped.
+        Walks the form-link graph one level at a time up to *max_depth* levels,
+        loading each level with a single IN query that reads only the link list,
+        and collects every referenced form that is live and has a blueprint.
+        Returns a flat, deduplicated list in breadth-first order (excludes the
+        root form itself). Circular references and missing forms are silently
+        skipped. Resolved graphs are cached until a visited form changes.
         """
-        visited: set = set()
-        result: List[Form] = []
-        queue: List[tuple] = [(form_id, 0)]  # (form_id, depth)
+        cache_key = (form_id, max_depth)
+        cached = LinkedFormGraphCache.get(cache_key)
+        if cached is not None:
+            visited, linked_ids = cached
+            if FormService._linked_form_states(db, list(visited)) == visited:
+                return FormService._load_forms_in_order(db, linked_ids)
+
+        visited = {}
+        linked_ids: List[uuid.UUID] = []
+        frontier: List[uuid.UUID] = [form_id]
+        depth = 0
+        while frontier:
+            rows = db.execute(
+                select(
+                    Form.id,
+                    Form.status,
+                    Form.published_version,
+                    LIVE_BLUEPRINT_PRESENT,
+                    Form.blueprint_live["linked_form_ids"],
+                ).where(Form.id.in_(frontier))
+            ).all()
+            by_id = {row[0]: row for row in rows}
+            for current_id in frontier:
+                visited[current_id] = None
+            next_frontier: List[uuid.UUID] = []
+            for current_id in frontier:
+                row = by_id.get(current_id)
+                if row is None:
+                    continue
+                _, status, published_version, has_blueprint, raw_links = row
+                visited[current_id] = (status, published_version, has_blueprint)
+                if not has_blueprint:
+                    continue
+                if current_id != form_id and status == FormStatus.LIVE:
+                    linked_ids.append(current_id)
+                if depth >= max_depth or not isinstance(raw_links, list):
+                    continue
+                for linked_id_str in raw_links:
+                    try:
+                        linked_uuid = uuid.UUID(str(linked_id_str))
+                    except (ValueError, AttributeError):
+                        continue
+                    if linked_uuid not in visited and linked_uuid not in next_frontier:
+                        next_frontier.append(linked_uuid)
+            frontier = next_frontier
+            depth += 1
+
+        LinkedFormGraphCache.put(cache_key, visited, tuple(linked_ids))
+        return FormService._load_forms_in_order(db, linked_ids)
 
-        while queue:
-            current_id, depth = queue.pop(0)
+    @staticmethod
+    def _linked_form_states(db: Session, form_ids: List[uuid.UUID]) -> dict:
+        states = dict.fromkeys(form_ids)
+        rows = db.execute(
+            select(Form.id, Form.status, Form.published_version, LIVE_BLUEPRINT_PRESENT).where(Form.id.in_(form_ids))
+        ).all()
+        for row_id, status, published_version, has_blueprint in rows:
+            states[row_id] = (status, published_version, has_blueprint)
+        return states
 
-            if current_id in visited:
-                continue
-            visited.add(current_id)
+    @staticmethod
+    def _load_forms_in_order(db: Session, form_ids) -> List[Form]:
+        if not form_ids:
+            return []
+        forms = {form.id: form for form in db.query(Form).filter(Form.id.in_(form_ids)).all()}
+        return [forms[form_id] for form_id in form_ids if form_id in forms]
 
-            form = db.query(Form).filter(Form.id == current_id).first()
-            if not form or not form.blueprint_live:
-                continue
+    @staticmethod
+    def _renamed_field_keys(previous_index: BlueprintIndex, current_index: BlueprintIndex) -> Dict[str, str]:
+        """Top-level fields that kept their identifier but changed key, as {old_key: new_key}."""
+        renames = {}
+        for identifier, field in current_index.fields_by_identifier.items():
+            previous = previous_index.fields_by_identifier.get(identifier)
+            if (
+                previous is not None
+                and previous.key != field.key
+                and "parent_identifier" not in field.definition
+                and "parent_identifier" not in previous.definition
+            ):
+                renames[previous.key] = field.key
+        return renames
+
+    @staticmethod
+    def _renamed_keys_assignment(renames: Dict[str, str]) -> Dict:
+        """SET clause moving every renamed key at once, so swapped keys read their original values."""
+        from app.models.submission import Submission
 
-            # Don't include the root form in the result list
-            if current_id != form_id:
-                if form.status == FormStatus.LIVE:
-                    result.append(form)
+        moved = func.jsonb_build_object(*[part for old, new in renames.items() for part in (new, Submission.data[old])])
+        return {Submission.data: Submission.data.op("-")(cast(list(renames), ARRAY(String))).op("||")(func.jsonb_strip_nulls(moved))}
 
-            # Stop recursing if we've hit the depth limit
-            if depth >= max_depth:
-                continue
+    @staticmethod
+    def _migrate_renamed_keys(db: Session, form_id: uuid.UUID, renames: Dict[str, str], progress=None) -> int:
+        """Move answers stored under renamed keys in batches of the caller's transaction.
 
-            # Extract linked_form_ids from blueprint
-            blueprint = form.blueprint_live
-            linked_ids = blueprint.get("linked_form_ids") or []
-            for linked_id_str in linked_ids:
-                try:
-                    linked_uuid = uuid.UUID(str(linked_id_str))
-                    if linked_uuid not in visited:
-                        queue.append((linked_uuid, depth + 1))
-                except (ValueError, AttributeError):
-                    continue
+        Nothing is committed here: the publish switch commits the moved answers
+        together with the new live schema, so readers never see one without the
+        other and a failure rolls both back. Batches walk ids once, so a swap is
+        applied to each row exactly once.
+        """
+        from app.models.submission import Submission
+
+        has_old_key = Submission.data.op("?|")(cast(list(renames), ARRAY(String)))
+        total = db.query(func.count(Submission.id)).filter(Submission.form_id == form_id, has_old_key).scalar() or 0
+        migrated = 0
+        last_id = None
+        while True:
+            query = db.query(Submission.id).filter(Submission.form_id == form_id, has_old_key)
+            if last_id is not None:
+                query = query.filter(Submission.id > last_id)
+            batch = [row[0] for row in query.order_by(Submission.id).limit(FormService.PUBLISH_MIGRATION_BATCH_ROWS)]
+            if not batch:
+                break
+            db.execute(
+                update(Submission)
+                .where(Submission.id.in_(batch))
+                .values(FormService._renamed_keys_assignment(renames))
+                .execution_options(synchronize_session=False)
+            )
+            migrated += len(batch)
+            last_id = batch[-1]
+            if progress is not None:
+                progress.report(migrated, max(total, migrated))
+        return migrated
 
-        return result
+    @staticmethod
+    def _refresh_renamed_materializations(db: Session, dataset: Optional[FormDataset], renames: Dict[str, str]) -> int:
+        """Point rollups at the renamed keys and queue their rebuilds; drop sketches of old keys (rebuilt on next use)."""
+        from app.models.analytics import AnalyticsFieldSketch, AnalyticsRollup
+        from app.services.analytics_rollup_service import AnalyticsRollupService
+
+        if dataset is None:
+            return 0
+        db.query(AnalyticsFieldSketch).filter(
+            AnalyticsFieldSketch.dataset_id == dataset.id,
+            AnalyticsFieldSketch.field_key.in_(list(renames) + list(renames.values())),
+        ).delete(synchronize_session=False)
+        rebuilt = 0
+        for rollup in db.query(AnalyticsRollup).filter(AnalyticsRollup.dataset_id == dataset.id).all():
+            keys = [rollup.time_field, *rollup.dimensions, *rollup.measures]
+            if not any(key in renames for key in keys):
+                continue
+            rollup.time_field = renames.get(rollup.time_field, rollup.time_field)
+            rollup.dimensions = [renames.get(key, key) for key in rollup.dimensions]
+            rollup.measures = [renames.get(key, key) for key in rollup.measures]
+            # Commits the new definition together with the building status and its job.
+            AnalyticsRollupService.request_build(db, rollup)
+            rebuilt += 1
+        db.commit()
+        return rebuilt
 
     @staticmethod
     def publish_form(
@@ -801,8 +1268,22 @@ class FormService:
         draft_slot: Optional[int] = None,
         changelog: Optional[str] = None,
         published_by: Optional[uuid.UUID] = None,
+        *,
+        migrate_renamed_keys: bool = False,
+        progress=None,
+        outcome: Optional[Dict] = None,
     ) -> Form:
-        form = db.query(Form).filter(Form.id == form_id).with_for_update().first()
+        """Promote a draft to the live version.
+
+        The schema diff runs before the form row is locked. With
+        *migrate_renamed_keys*, answers are moved to renamed keys under that lock,
+        in the same transaction that switches the live version and syncs the
+        dataset, so the switch is atomic and a failed or interrupted publish
+        leaves every row on its old key. Rollups over renamed keys are queued for
+        a background rebuild and their sketches dropped after the switch commits.
+        *outcome*, when given, receives the summary.
+        """
+        form = db.query(Form).filter(Form.id == form_id).first()
         if not form:
             return None
 
@@ -825,10 +1306,63 @@ class FormService:
             # Default publish behavior always promotes the working draft slot (1).
             selected_draft = FormService._get_active_draft_in_slot(db, form.id, 1)
 
-        blueprint = selected_draft.blueprint if selected_draft else form.blueprint_draft
+        blueprint = FormService.get_version_blueprint(db, selected_draft) if selected_draft else form.blueprint_draft
         if not blueprint:
             raise ValueError("No draft blueprint available to publish")
 
+        expected_version = form.version
+        renames: Dict[str, str] = {}
+        if migrate_renamed_keys and form.blueprint_live:
+            renames = FormService._renamed_field_keys(
+                BlueprintIndexCache.for_live_form(form), BlueprintIndex.compile(blueprint)
+            )
+
+        try:
+            form, dataset, migrated = FormService._switch_live_version(
+                db,
+                form_id,
+                blueprint,
+                expected_version=expected_version,
+                changelog=changelog,
+                published_by=published_by,
+                renames=renames,
+                progress=progress,
+            )
+        except Exception:
+            db.rollback()
+            raise
+        rebuilt = FormService._refresh_renamed_materializations(db, dataset, renames) if renames else 0
+        db.refresh(form)
+        if outcome is not None:
+            outcome.update(
+                {
+                    "form_id": str(form.id),
+                    "published_version": form.published_version,
+                    "renamed_keys": renames,
+                    "migrated_submissions": migrated,
+                    "rebuilt_rollups": rebuilt,
+                }
+            )
+        return form
+
+    @staticmethod
+    def _switch_live_version(
+        db: Session,
+        form_id: uuid.UUID,
+        blueprint: Dict,
+        *,
+        expected_version: Optional[int],
+        changelog: Optional[str],
+        published_by: Optional[uuid.UUID],
+        renames: Dict[str, str],
+        progress=None,
+    ):
+        """Lock the form, move renamed answers, promote *blueprint* and sync the dataset in one committed transaction."""
+        form = db.query(Form).filter(Form.id == form_id).with_for_update().populate_existing().first()
+        if form.version != expected_version:
+            raise ValueError("PUBLISH_CONFLICT")
+        migrated = FormService._migrate_renamed_keys(db, form.id, renames, progress) if renames else 0
+
         current_live = FormService._get_active_live(db, form.id)
         if current_live:
             current_live.is_active = False
@@ -856,7 +1390,7 @@ class FormService:
         form.published_at = published_at
 
         FormService._ensure_active_draft_exists(db, form)
-        FormService.ensure_live_dataset(
+        dataset, _ = FormService.ensure_live_dataset(
             db,
             form=form,
             live_snapshot=live_snapshot,
@@ -864,8 +1398,14 @@ class FormService:
         )
 
         db.commit()
-        db.refresh(form)
-        return form
+        return form, dataset, migrated
+
+    @staticmethod
+    def run_publish_job(db: Session, progress, form_id: uuid.UUID, **options) -> Dict:
+        outcome: Dict = {}
+        if FormService.publish_form(db, form_id, progress=progress, outcome=outcome, **options) is None:
+            raise ValueError("FORM_NOT_FOUND")
+        return outcome
 
     @staticmethod
     def get_project_forms(db: Session, project_id: uuid.UUID, live_only: bool = False) -> List[Form]:
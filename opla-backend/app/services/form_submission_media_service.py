@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import json
-import re
 import uuid
 from typing import Any
 from urllib.parse import urlparse
@@ -11,19 +10,7 @@ from sqlalchemy.orm import Session
 from app.models.form import Form
 from app.models.form_submission_media import FormSubmissionMedia
 from app.models.submission import Submission
-
-MEDIA_FIELD_TYPES = {
-    "photo_capture",
-    "file_upload",
-    "audio_recorder",
-    "signature_pad",
-    "image",
-    "photo",
-    "video",
-    "video_capture",
-    "audio",
-    "signature",
-}
+from app.services.blueprint_index import BlueprintIndex, BlueprintIndexCache
 
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".webm", ".m4v", ".avi", ".mkv"}
 AUDIO_EXTENSIONS = {".mp3", ".m4a", ".wav", ".aac", ".ogg", ".webm"}
@@ -31,48 +18,9 @@ IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".bmp"}
 
 
 class FormSubmissionMediaService:
-    @staticmethod
-    def _normalize_type(value: Any) -> str:
-        return re.sub(r"[\s-]+", "_", str(value or "").strip().lower())
-
-    @staticmethod
-    def _walk_media_fields(nodes: Any, out: list[dict[str, str]]) -> None:
-        if not isinstance(nodes, list):
-            return
-        for node in nodes:
-            if not isinstance(node, dict):
-                continue
-            field_type = FormSubmissionMediaService._normalize_type(node.get("type"))
-            bind = node.get("bind") or node.get("id")
-            if field_type in MEDIA_FIELD_TYPES and bind:
-                out.append(
-                    {
-                        "bind": str(bind),
-                        "type": field_type,
-                        "label": str(node.get("label") or node.get("title") or bind),
-                    }
-                )
-            children = node.get("children") or node.get("fields") or node.get("items")
-            FormSubmissionMediaService._walk_media_fields(children, out)
-            ui = node.get("ui")
-            if isinstance(ui, list):
-                FormSubmissionMediaService._walk_media_fields(ui, out)
-
     @staticmethod
     def media_fields_from_blueprint(blueprint: Any) -> list[dict[str, str]]:
-        fields: list[dict[str, str]] = []
-        if not isinstance(blueprint, dict):
-            return fields
-        ui = blueprint.get("ui")
-        if isinstance(ui, list):
-            FormSubmissionMediaService._walk_media_fields(ui, fields)
-        elif isinstance(ui, dict):
-            FormSubmissionMediaService._walk_media_fields(ui.get("children") or ui.get("sections"), fields)
-        # de-dupe by bind (last wins)
-        by_bind: dict[str, dict[str, str]] = {}
-        for field in fields:
-            by_bind[field["bind"]] = field
-        return list(by_bind.values())
+        return [field.as_dict() for field in BlueprintIndex.compile(blueprint).media_fields]
 
     @staticmethod
     def _extension(path: str | None) -> str:
@@ -163,11 +111,11 @@ class FormSubmissionMediaService:
         form: Form,
         submission: Submission,
     ) -> list[dict[str, Any]]:
-        fields = FormSubmissionMediaService.media_fields_from_blueprint(form.blueprint_live)
+        fields = BlueprintIndexCache.for_live_form(form).media_fields
         data = submission.data if isinstance(submission.data, dict) else {}
         items: list[dict[str, Any]] = []
         for field in fields:
-            bind = field["bind"]
+            bind = field.bind
             if bind not in data:
                 continue
             normalized = FormSubmissionMediaService._normalize_value(data.get(bind))
@@ -177,14 +125,14 @@ class FormSubmissionMediaService:
             filename = normalized.get("filename")
             mime_type = normalized.get("mime_type")
             # Skip empty non-signature values with no url/payload signal
-            if field["type"] not in {"signature_pad", "signature"} and not url and not filename:
+            if field.type not in {"signature_pad", "signature"} and not url and not filename:
                 continue
-            kind = FormSubmissionMediaService._guess_kind(field["type"], url, filename, mime_type)
+            kind = FormSubmissionMediaService._guess_kind(field.type, url, filename, mime_type)
             items.append(
                 {
                     "field_bind": bind,
-                    "field_label": field["label"],
-                    "field_type": field["type"],
+                    "field_label": field.label,
+                    "field_type": field.type,
                     "media_kind": kind,
                     "url": url,
                     "filename": filename,
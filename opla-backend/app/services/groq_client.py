@@ -1,29 +1,162 @@
-"""Thin Groq OpenAI-compatible chat client."""
+"""Thin async Groq OpenAI-compatible chat client.
+
+Calls share one pooled httpx.AsyncClient per event loop and a process-wide
+RateLimiter sized to the provider's RPM/TPM limits, so concurrent AI requests
+queue for capacity instead of tripping 429s. Nothing here blocks the event loop:
+waits are asyncio sleeps, and cancelling the awaiting task (e.g. when the HTTP
+client disconnects) aborts the in-flight provider call.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import json
 import re
+import threading
 import time
+import weakref
 from typing import Any, Dict, List, Optional
 
 import httpx
 
 from app.core.config import settings
 
+MAX_ATTEMPTS = 5
+
 
 class GroqClientError(Exception):
     """Raised when Groq is misconfigured or the API call fails."""
 
 
-def _retry_after_seconds(error_body: str, attempt: int) -> float:
+def _retry_after_seconds(error_body: str, attempt: int, header: Optional[str] = None) -> float:
+    if header:
+        try:
+            return min(30.0, max(0.0, float(header)))
+        except ValueError:
+            pass
     match = re.search(r"try again in ([0-9.]+)s", error_body or "", re.IGNORECASE)
     if match:
         return min(30.0, float(match.group(1)) + 0.5)
     return min(20.0, 2.5 * (attempt + 1))
 
 
-def chat_completion(
+class _Bucket:
+    """Token bucket refilled continuously at capacity per minute.
+
+    Reservations may drive the level negative; the deficit is the time the
+    reserving caller has to wait, which keeps callers in FIFO order.
+    """
+
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Process-wide request and token budget shared across threads and event loops."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self._lock = threading.Lock()
+        self.requests = _Bucket(requests_per_minute)
+        self.tokens = _Bucket(tokens_per_minute)
+        self._blocked_until = 0.0
+
+    async def acquire(self, tokens: int) -> int:
+        """Wait until one request and ``tokens`` tokens are available; returns the tokens reserved."""
+        tokens = min(tokens, int(self.tokens.capacity))
+        with self._lock:
+            now = time.monotonic()
+            delay = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(tokens, now),
+                self._blocked_until - now,
+            )
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.release(1, tokens)
+            raise
+        return tokens
+
+    def release(self, requests: int, tokens: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refund(requests, now)
+            self.tokens.refund(tokens, now)
+
+    def settle(self, reserved: int, used: Optional[int]) -> None:
+        """Return the unused part of a reservation once the provider reports real usage."""
+        if used is None or used >= reserved:
+            return
+        self.release(0, reserved - used)
+
+    def back_off(self, seconds: float) -> None:
+        """Hold every caller for ``seconds`` after the provider answered 429."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def rate_limiter() -> RateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(settings.GROQ_REQUESTS_PER_MINUTE, settings.GROQ_TOKENS_PER_MINUTE)
+        return _limiter
+
+
+def _http_client() -> httpx.AsyncClient:
+    """The pooled client for the running event loop; connections cannot cross loops."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.GROQ_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_CONNECTIONS,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the running loop's pooled client (application shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    # Providers count max_tokens against TPM at admission; prompts are ~4 chars/token.
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+async def chat_completion(
     messages: List[Dict[str, str]],
     *,
     temperature: float = 0.4,
@@ -49,25 +182,31 @@ def chat_completion(
         "Authorization": f"Bearer {settings.GROQ_API_KEY}",
         "Content-Type": "application/json",
     }
+    limiter = rate_limiter()
+    estimate = _estimate_tokens(messages, max_tokens)
 
     last_error: Optional[str] = None
-    for attempt in range(5):
+    for attempt in range(MAX_ATTEMPTS):
+        reserved = await limiter.acquire(estimate)
         try:
-            with httpx.Client(timeout=90.0) as client:
-                response = client.post(url, headers=headers, json=payload)
+            response = await _http_client().post(url, headers=headers, json=payload)
         except httpx.HTTPError as exc:
             raise GroqClientError(f"Failed to reach Groq API: {exc}") from exc
 
         if response.status_code == 429:
             last_error = response.text[:500]
-            time.sleep(_retry_after_seconds(last_error, attempt))
+            limiter.release(0, reserved)
+            limiter.back_off(_retry_after_seconds(last_error, attempt, response.headers.get("retry-after")))
             continue
 
         if response.status_code >= 400:
+            limiter.release(0, reserved)
             detail = response.text[:500]
             raise GroqClientError(f"Groq API error ({response.status_code}): {detail}")
 
         data = response.json()
+        usage = data.get("usage") if isinstance(data, dict) else None
+        limiter.settle(reserved, usage.get("total_tokens") if isinstance(usage, dict) else None)
         try:
             content = data["choices"][0]["message"]["content"]
         except (KeyError, IndexError, TypeError) as exc:
@@ -80,13 +219,13 @@ def chat_completion(
     raise GroqClientError(f"Groq API rate limited after retries: {last_error}")
 
 
-def chat_completion_json(
+async def chat_completion_json(
     messages: List[Dict[str, str]],
     *,
     temperature: float = 0.3,
     max_tokens: int = 4096,
 ) -> Dict[str, Any]:
-    raw = chat_completion(
+    raw = await chat_completion(
         messages,
         temperature=temperature,
         max_tokens=max_tokens,
@@ -0,0 +1,200 @@
+"""Minimal RFC 6902 JSON Patch: diff two JSON documents and apply patches."""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, List
+
+
+class JsonPatchError(ValueError):
+    """Raised when a patch does not apply to the document."""
+
+
+def escape_token(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _split(path: str) -> List[str]:
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise JsonPatchError("INVALID_PATCH_PATH")
+    return [_unescape(token) for token in path[1:].split("/")]
+
+
+def diff(source: Any, target: Any, path: str = "") -> List[dict]:
+    """Operations turning *source* into *target*.
+
+    Lists are compared after trimming their common prefix and suffix, so a
+    question inserted or removed mid-form yields one add/remove instead of
+    a replace for every element after it.
+    """
+    if type(source) is not type(target):
+        return [{"op": "replace", "path": path, "value": copy.deepcopy(target)}]
+    if isinstance(source, dict):
+        ops: List[dict] = []
+        for key in source:
+            child = f"{path}/{escape_token(str(key))}"
+            if key not in target:
+                ops.append({"op": "remove", "path": child})
+            else:
+                ops.extend(diff(source[key], target[key], child))
+        for key in target:
+            if key not in source:
+                ops.append({"op": "add", "path": f"{path}/{escape_token(str(key))}", "value": copy.deepcopy(target[key])})
+        return ops
+    if isinstance(source, list):
+        start = 0
+        while start < len(source) and start < len(target) and source[start] == target[start]:
+            start += 1
+        source_end, target_end = len(source), len(target)
+        while source_end > start and target_end > start and source[source_end - 1] == target[target_end - 1]:
+            source_end -= 1
+            target_end -= 1
+        ops = []
+        common = min(source_end, target_end) - start
+        for offset in range(common):
+            index = start + offset
+            ops.extend(diff(source[index], target[index], f"{path}/{index}"))
+        # Removals run back to front so earlier indexes stay valid.
+        for index in range(source_end - 1, start + common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+        for index in range(start + common, target_end):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": copy.deepcopy(target[index])})
+        return ops
+    if source != target:
+        return [{"op": "replace", "path": path, "value": copy.deepcopy(target)}]
+    return []
+
+
+def _list_index(node: list, token: str, *, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(node)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+    index = int(token)
+    if index > len(node) or (index == len(node) and not allow_end):
+        raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+    return index
+
+
+class _Patcher:
+    """Applies operations with path copying.
+
+    Containers on the path to a change are shallow-copied once; everything else
+    is shared with the input document, so callers can tell untouched subtrees by
+    identity. Treat both the input and the result as immutable.
+    """
+
+    def __init__(self, document: Any):
+        self.root = document
+        self._owned: set[int] = set()
+
+    def _own(self, node: Any) -> Any:
+        if id(node) in self._owned:
+            return node
+        node = dict(node) if isinstance(node, dict) else list(node)
+        self._owned.add(id(node))
+        return node
+
+    def _get(self, tokens: List[str]) -> Any:
+        node = self.root
+        for token in tokens:
+            if isinstance(node, dict):
+                if token not in node:
+                    raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+                node = node[token]
+            elif isinstance(node, list):
+                node = node[_list_index(node, token)]
+            else:
+                raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+        return node
+
+    def _parent(self, tokens: List[str]) -> Any:
+        """Owned copy of the container holding the last token, re-linked up to the root."""
+        if not isinstance(self.root, (dict, list)):
+            raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+        self.root = node = self._own(self.root)
+        for token in tokens[:-1]:
+            if isinstance(node, dict):
+                if token not in node:
+                    raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+                key: Any = token
+            else:
+                key = _list_index(node, token)
+            child = node[key]
+            if not isinstance(child, (dict, list)):
+                raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+            node[key] = node = self._own(child)
+        return node
+
+    def add(self, tokens: List[str], value: Any) -> None:
+        if not tokens:
+            self.root = value
+            return
+        parent = self._parent(tokens)
+        if isinstance(parent, dict):
+            parent[tokens[-1]] = value
+        else:
+            parent.insert(_list_index(parent, tokens[-1], allow_end=True), value)
+
+    def remove(self, tokens: List[str]) -> Any:
+        if not tokens:
+            raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+        parent = self._parent(tokens)
+        if isinstance(parent, dict):
+            if tokens[-1] not in parent:
+                raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+            return parent.pop(tokens[-1])
+        return parent.pop(_list_index(parent, tokens[-1]))
+
+    def replace(self, tokens: List[str], value: Any) -> None:
+        if not tokens:
+            self.root = value
+            return
+        parent = self._parent(tokens)
+        if isinstance(parent, dict):
+            if tokens[-1] not in parent:
+                raise JsonPatchError("PATCH_PATH_NOT_FOUND")
+            parent[tokens[-1]] = value
+        else:
+            parent[_list_index(parent, tokens[-1])] = value
+
+
+def apply(document: Any, patch: List[dict]) -> Any:
+    """Return *document* with *patch* applied; the input is not modified.
+
+    Supports add, remove, replace, move, copy and test. Unchanged subtrees of
+    the result are the same objects as in the input.
+    """
+    patcher = _Patcher(document)
+    for operation in patch:
+        if not isinstance(operation, dict):
+            raise JsonPatchError("INVALID_PATCH_OPERATION")
+        op = operation.get("op")
+        tokens = _split(operation.get("path", ""))
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError("INVALID_PATCH_OPERATION")
+        if op == "add":
+            patcher.add(tokens, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            patcher.remove(tokens)
+        elif op == "replace":
+            patcher.replace(tokens, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = _split(operation.get("from", ""))
+            if tokens[: len(source)] == source and tokens != source:
+                raise JsonPatchError("INVALID_PATCH_OPERATION")
+            patcher.add(tokens, patcher.remove(source))
+        elif op == "copy":
+            patcher.add(tokens, copy.deepcopy(patcher._get(_split(operation.get("from", "")))))
+        elif op == "test":
+            if patcher._get(tokens) != operation["value"]:
+                raise JsonPatchError("PATCH_TEST_FAILED")
+        else:
+            raise JsonPatchError("UNSUPPORTED_PATCH_OP")
+    return patcher.root
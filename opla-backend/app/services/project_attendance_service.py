@@ -100,7 +100,13 @@ class ProjectAttendanceService:
         db.refresh(record)
         from app.services.project_attention_service import ProjectAttentionService
 
-        ProjectAttentionService.on_attendance_changed(db, project, actor_id=user_id)
+        ProjectAttentionService.on_attendance_changed(
+            db,
+            project,
+            actor_id=user_id,
+            checked_in_user_id=user_id,
+            attendance_date=attendance_date,
+        )
         return record
 
     @staticmethod
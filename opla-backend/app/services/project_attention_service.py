@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import logging
+import threading
+import time as monotonic_time
 import uuid
 from datetime import date, datetime, time, timedelta
 from typing import Any
 
 from fastapi import HTTPException
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 
 from app.models.form import Form
@@ -24,6 +28,8 @@ from app.models.project_message import ProjectMessage
 from app.models.submission import Submission, SubmissionReviewStatus
 from app.models.team_member import TeamMember
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_HOOKS: list[dict[str, Any]] = [
     {
         "kind": AttentionHookKind.PENDING_REVIEW_AGING.value,
@@ -54,6 +60,166 @@ SEVERITY_RANK = {
 }
 
 
+class AttendanceGapCounter:
+    """In-process tally of checked-in vs expected users per (project, day).
+
+    Seeded from the database on first use and every TTL_SECONDS (so access changes
+    and check-ins handled by other workers are picked up), then advanced one user
+    at a time as check-ins arrive.
+    """
+
+    TTL_SECONDS = 300.0
+
+    _lock = threading.Lock()
+    _entries: dict[tuple[uuid.UUID, date], tuple[float, frozenset[uuid.UUID], set[uuid.UUID]]] = {}
+
+    @classmethod
+    def record_check_in(cls, db: Session, project_id: uuid.UUID, day: date, user_id: uuid.UUID) -> tuple[int, int]:
+        """Count user_id as checked in and return (missing_count, expected_count)."""
+        key = (project_id, day)
+        now = monotonic_time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and now - entry[0] < cls.TTL_SECONDS:
+                entry[2].add(user_id)
+                return len(entry[1] - entry[2]), len(entry[1])
+
+        expected = frozenset(ProjectAttentionService._expected_user_ids(db, project_id))
+        checked = {
+            row[0]
+            for row in db.query(ProjectAttendanceRecord.user_id).filter(
+                ProjectAttendanceRecord.project_id == project_id,
+                ProjectAttendanceRecord.attendance_date == day,
+            )
+        }
+        checked.add(user_id)
+        with cls._lock:
+            cls._entries = {
+                entry_key: entry
+                for entry_key, entry in cls._entries.items()
+                if now - entry[0] < cls.TTL_SECONDS
+            }
+            cls._entries[key] = (now, expected, checked)
+        return len(expected - checked), len(expected)
+
+
+class AttentionReconcileScheduler:
+    """Debounces full project reconciliation through projects.attention_reconcile_due_at.
+
+    Every event pushes the project's due time DEBOUNCE_SECONDS out, so a burst of
+    changes reconciles once after it goes quiet, but never later than MAX_WAIT_SECONDS
+    after the first pending event, so a long burst still reconciles periodically.
+    Each worker process polls for due projects; claiming one clears its due time under
+    FOR UPDATE SKIP LOCKED, so only one worker reconciles it and events arriving
+    mid-run schedule another pass. A failed pass is logged and scheduled again.
+    """
+
+    DEBOUNCE_SECONDS = 60.0
+    MAX_WAIT_SECONDS = 300.0
+    POLL_SECONDS = 5.0
+    CLAIM_BATCH = 20
+
+    _lock = threading.Lock()
+    _stop: threading.Event | None = None
+
+    @classmethod
+    def schedule(cls, db: Session, project_id: uuid.UUID, *, actor_id: uuid.UUID | None = None) -> None:
+        now = datetime.utcnow()
+        requested_at = func.coalesce(Project.attention_reconcile_requested_at, now)
+        values: dict[str, Any] = {
+            "attention_reconcile_requested_at": requested_at,
+            "attention_reconcile_due_at": func.least(
+                now + timedelta(seconds=cls.DEBOUNCE_SECONDS),
+                requested_at + timedelta(seconds=cls.MAX_WAIT_SECONDS),
+            ),
+            # Bookkeeping only; keep it from bumping the project's own updated_at.
+            "updated_at": Project.updated_at,
+        }
+        if actor_id is not None:
+            values["attention_reconcile_actor_id"] = actor_id
+        db.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    @classmethod
+    def claim_due(cls, db: Session) -> list[tuple[uuid.UUID, uuid.UUID | None]]:
+        due = (
+            select(Project.id)
+            .where(Project.attention_reconcile_due_at <= datetime.utcnow())
+            .order_by(Project.attention_reconcile_due_at.asc())
+            .limit(cls.CLAIM_BATCH)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        rows = db.execute(
+            update(Project)
+            .where(Project.id.in_(due))
+            .values(
+                attention_reconcile_due_at=None,
+                attention_reconcile_requested_at=None,
+                updated_at=Project.updated_at,
+            )
+            .returning(Project.id, Project.attention_reconcile_actor_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return [(row[0], row[1]) for row in rows]
+
+    @classmethod
+    def run_due(cls) -> int:
+        """Reconcile every project whose debounce window has passed; returns how many were claimed."""
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            claimed = cls.claim_due(db)
+            for project_id, actor_id in claimed:
+                try:
+                    project = db.query(Project).filter(Project.id == project_id).first()
+                    if project is not None:
+                        ProjectAttentionService.reconcile_project(db, project, actor_id=actor_id, commit=True)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Attention reconcile failed for project %s; rescheduling", project_id)
+                    try:
+                        cls.schedule(db, project_id, actor_id=actor_id)
+                    except Exception:
+                        db.rollback()
+                        logger.exception("Could not reschedule attention reconcile for project %s", project_id)
+            return len(claimed)
+        finally:
+            db.close()
+
+    @classmethod
+    def start(cls) -> None:
+        with cls._lock:
+            if cls._stop is not None:
+                return
+            cls._stop = threading.Event()
+            poller = threading.Thread(target=cls._poll, args=(cls._stop,), name="attention-reconcile", daemon=True)
+        poller.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        with cls._lock:
+            if cls._stop is not None:
+                cls._stop.set()
+                cls._stop = None
+
+    @classmethod
+    def _poll(cls, stop: threading.Event) -> None:
+        while not stop.wait(cls.POLL_SECONDS):
+            try:
+                cls.run_due()
+            except Exception:
+                # The next poll retries; a database hiccup must not kill the poller.
+                logger.exception("Attention reconcile poll failed")
+
+
 class ProjectAttentionService:
     @staticmethod
     def seed_default_hooks(db: Session, project_id: uuid.UUID, *, commit: bool = False) -> list[ProjectAttentionHook]:
@@ -632,6 +798,31 @@ class ProjectAttentionService:
         except Exception:
             db.rollback()
 
+    @staticmethod
+    def on_submissions_reviewed(db: Session, project_id: uuid.UUID, submission_ids: list[uuid.UUID]) -> None:
+        """Bulk counterpart of on_submission_reviewed: resolve pending_review items in one UPDATE."""
+        if not submission_ids:
+            return
+        try:
+            (
+                db.query(ProjectAttentionItem)
+                .filter(
+                    ProjectAttentionItem.project_id == project_id,
+                    ProjectAttentionItem.status == AttentionItemStatus.OPEN.value,
+                    ProjectAttentionItem.dedupe_key.in_([f"pending_review:{submission_id}" for submission_id in submission_ids]),
+                )
+                .update(
+                    {
+                        ProjectAttentionItem.status: AttentionItemStatus.RESOLVED.value,
+                        ProjectAttentionItem.updated_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+
     @staticmethod
     def on_task_changed(db: Session, task: ProjectTask) -> None:
         try:
@@ -691,8 +882,40 @@ class ProjectAttentionService:
             db.rollback()
 
     @staticmethod
-    def on_attendance_changed(db: Session, project: Project, *, actor_id: uuid.UUID | None = None) -> None:
+    def on_attendance_changed(
+        db: Session,
+        project: Project,
+        *,
+        actor_id: uuid.UUID | None = None,
+        checked_in_user_id: uuid.UUID | None = None,
+        attendance_date: date | None = None,
+    ) -> None:
+        """Keep the day's attendance-gap item current and defer everything else.
+
+        A check-in only moves the checked-in/expected tally for its day; the rest of
+        the project (reviews, tasks, channel posts) is reconciled by a debounced job.
+        """
+        if checked_in_user_id is not None and attendance_date is not None:
+            try:
+                ProjectAttentionService._apply_attendance_check_in(db, project, attendance_date, checked_in_user_id)
+                db.commit()
+            except Exception:
+                db.rollback()
         try:
-            ProjectAttentionService.reconcile_project(db, project, actor_id=actor_id, commit=True)
+            AttentionReconcileScheduler.schedule(db, project.id, actor_id=actor_id)
         except Exception:
             db.rollback()
+
+    @staticmethod
+    def _apply_attendance_check_in(db: Session, project: Project, day: date, user_id: uuid.UUID) -> None:
+        item = ProjectAttentionService._get_by_dedupe(db, project.id, f"attendance_gap:{project.id}:{day.isoformat()}")
+        if item is None or item.status != AttentionItemStatus.OPEN.value:
+            # Opening a gap depends on the collection window clock; the reconcile job owns that.
+            return
+
+        missing_count, expected_count = AttendanceGapCounter.record_check_in(db, project.id, day, user_id)
+        if missing_count <= 0:
+            item.status = AttentionItemStatus.RESOLVED.value
+        else:
+            item.detail = f"{missing_count} of {expected_count} expected people have not checked in today."
+        item.updated_at = datetime.utcnow()
@@ -113,7 +113,10 @@ class ProjectTaskService:
         assigned_accessor_type: AccessorType | None,
         created_by: uuid.UUID,
         automation_rule_id: uuid.UUID | None = None,
+        commit: bool = True,
     ) -> ProjectTask:
+        """Create a task; with commit=False it is only flushed and the caller must commit
+        and then call ProjectAttentionService.on_task_changed."""
         ProjectAccessService.ensure_project_is_mutable(project)
         ProjectTaskService._validate_timeline(starts_at, due_at)
         ProjectTaskService._validate_kind(kind, scheduled_date)
@@ -136,6 +139,9 @@ class ProjectTaskService:
             created_by=created_by,
         )
         db.add(task)
+        if not commit:
+            db.flush()
+            return task
         db.commit()
         db.refresh(task)
         from app.services.project_attention_service import ProjectAttentionService
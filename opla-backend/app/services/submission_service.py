@@ -1,16 +1,22 @@
+import base64
+import re
 from datetime import datetime
 
+from sqlalchemy import func, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 from app.models.submission import Submission
 from app.models.form import Form, FormStatus
 from app.models.form_automation_rule import FormAutomationEvent
 from app.models.form_dataset import FormDatasetSchemaVersion
 from app.models.project import ProjectStatus
+from app.models.team_member import TeamMember
 import uuid
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from app.models.submission import SubmissionReviewStatus
 from app.services.form_automation_service import FormAutomationService
+from app.services.submission_validation import LENIENT, STRICT, SubmissionValidationError, SubmissionValidatorCache
 
 class SubmissionService:
     @staticmethod
@@ -19,7 +25,8 @@ class SubmissionService:
         form_id: uuid.UUID, 
         data: Dict, 
         user_id: Optional[uuid.UUID] = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        validation_mode: str = LENIENT,
     ) -> Submission:
         form = db.query(Form).filter(Form.id == form_id).first()
         if not form or form.status != FormStatus.LIVE or not form.blueprint_live:
@@ -27,6 +34,13 @@ class SubmissionService:
         if not form.project or form.project.status != ProjectStatus.ACTIVE:
             raise ValueError("PROJECT_NOT_ACTIVE")
 
+        data, issues = SubmissionValidatorCache.for_live_form(form).validate(data, validation_mode)
+        if issues:
+            if validation_mode == STRICT:
+                raise SubmissionValidationError(issues)
+            # Lenient ingest keeps the row without the rejected answers; each issue holds the value as sent.
+            metadata = {**(metadata or {}), "validation_issues": issues}
+
         from app.services.form_service import FormService
 
         dataset, schema_version = FormService.ensure_live_dataset(db, form)
@@ -51,6 +65,18 @@ class SubmissionService:
             review_status=SubmissionReviewStatus.SUBMITTED,
         )
         db.add(submission)
+        db.flush()
+        from app.services.analytics_approximate_service import ApproximateAnalyticsService
+        from app.services.analytics_rollup_service import AnalyticsRollupService
+
+        AnalyticsRollupService.apply_submission(db, submission)
+        try:
+            with db.begin_nested():
+                ApproximateAnalyticsService.apply_submission(db, submission)
+        except Exception:
+            # Sketches only feed approximate answers; never fail the submission over them, but
+            # drop the ones that missed this row so they are rebuilt instead of undercounting.
+            ApproximateAnalyticsService.discard_sketches(db, submission.dataset_id)
         db.commit()
         db.refresh(submission)
         FormAutomationService.run_submission_event(
@@ -70,16 +96,152 @@ class SubmissionService:
             db.rollback()
         return submission
 
+    LIST_DEFAULT_LIMIT = 100
+    LIST_MAX_LIMIT = 1000
+    # field:operator:value, e.g. "region:equal:north" or "age:>=:18"; "in" values are "|"-separated.
+    FIELD_FILTER_PATTERN = re.compile(r"^([^:]+):([^:]+)(?::(.*))?$")
+
+    @staticmethod
+    def _encode_cursor(created_at: datetime, submission_id: uuid.UUID) -> str:
+        raw = f"{created_at.isoformat()}|{submission_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            created_at, submission_id = raw.split("|", 1)
+            return datetime.fromisoformat(created_at), uuid.UUID(submission_id)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ValueError("INVALID_CURSOR") from exc
+
+    @staticmethod
+    def _field_filter_clause(raw: str):
+        from app.services.analytics_service import AnalyticsService
+
+        match = SubmissionService.FIELD_FILTER_PATTERN.match(raw.strip())
+        if not match:
+            raise ValueError(f"INVALID_FIELD_FILTER:{raw}")
+        key, operator, value = match.group(1).strip(), match.group(2).strip(), match.group(3)
+        if operator in {"in", "notIn"} and value is not None:
+            value = [item for item in value.split("|")]
+        try:
+            clause = AnalyticsService._apply_operator(Submission.data[key].as_string(), operator, value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"INVALID_FIELD_FILTER:{raw}") from exc
+        if clause is None:
+            raise ValueError(f"INVALID_FIELD_FILTER:{raw}")
+        return clause
+
     @staticmethod
     def list_form_submissions(
         db: Session,
         form_id: uuid.UUID,
         review_status: SubmissionReviewStatus | None = None,
-    ) -> list[Submission]:
-        query = db.query(Submission).filter(Submission.form_id == form_id)
+        *,
+        user_id: Optional[uuid.UUID] = None,
+        submitted_after: Optional[datetime] = None,
+        submitted_before: Optional[datetime] = None,
+        field_filters: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        include_metadata: bool = True,
+        limit: int = LIST_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        """Return one page of a form's submissions, newest first, as plain dicts.
+
+        Rows are read as tuples rather than ORM objects, `fields` projects the
+        requested keys out of `data` in SQL, and `next_cursor` continues after the
+        last row of the page (keyset on created_at, id).
+        """
+        if fields is None:
+            data_column = Submission.data
+        elif not fields:
+            data_column = literal({}, JSONB)
+        else:
+            entry = func.jsonb_each(Submission.data).table_valued("key", "value")
+            data_column = (
+                select(func.coalesce(func.jsonb_object_agg(entry.c.key, entry.c.value), literal({}, JSONB)))
+                .select_from(entry)
+                .where(entry.c.key.in_(list(dict.fromkeys(fields))))
+                .scalar_subquery()
+            )
+
+        columns = [
+            Submission.id,
+            Submission.form_id,
+            Submission.user_id,
+            Submission.dataset_id,
+            Submission.dataset_schema_version_id,
+            Submission.form_version_number,
+            data_column.label("data"),
+            Submission.review_status,
+            Submission.reviewed_by,
+            Submission.reviewed_at,
+            Submission.review_comment,
+            Submission.created_at,
+        ]
+        if include_metadata:
+            columns.append(Submission.metadata_json)
+
+        query = select(*columns).where(
+            *SubmissionService._list_filters(
+                form_id, review_status, user_id, submitted_after, submitted_before, field_filters
+            )
+        )
+        if cursor:
+            cursor_created_at, cursor_id = SubmissionService._decode_cursor(cursor)
+            query = query.where(tuple_(Submission.created_at, Submission.id) < tuple_(cursor_created_at, cursor_id))
+
+        limit = max(1, min(limit, SubmissionService.LIST_MAX_LIMIT))
+        query = query.order_by(Submission.created_at.desc(), Submission.id.desc()).limit(limit + 1)
+        items = [dict(row._mapping) for row in db.execute(query)]
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = SubmissionService._encode_cursor(last["created_at"], last["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def count_form_submissions(
+        db: Session,
+        form_id: uuid.UUID,
+        review_status: SubmissionReviewStatus | None = None,
+        *,
+        user_id: Optional[uuid.UUID] = None,
+        submitted_after: Optional[datetime] = None,
+        submitted_before: Optional[datetime] = None,
+        field_filters: Optional[List[str]] = None,
+    ) -> int:
+        """Count the submissions list_form_submissions would page through with the same filters."""
+        filters = SubmissionService._list_filters(
+            form_id, review_status, user_id, submitted_after, submitted_before, field_filters
+        )
+        return db.execute(select(func.count(Submission.id)).where(*filters)).scalar() or 0
+
+    @staticmethod
+    def _list_filters(
+        form_id: uuid.UUID,
+        review_status: SubmissionReviewStatus | None,
+        user_id: Optional[uuid.UUID],
+        submitted_after: Optional[datetime],
+        submitted_before: Optional[datetime],
+        field_filters: Optional[List[str]],
+    ) -> list:
+        filters = [Submission.form_id == form_id]
         if review_status is not None:
-            query = query.filter(Submission.review_status == review_status)
-        return query.order_by(Submission.created_at.desc()).all()
+            filters.append(Submission.review_status == review_status)
+        if user_id is not None:
+            filters.append(Submission.user_id == user_id)
+        if submitted_after is not None:
+            filters.append(Submission.created_at >= submitted_after)
+        if submitted_before is not None:
+            filters.append(Submission.created_at < submitted_before)
+        for raw_filter in field_filters or []:
+            filters.append(SubmissionService._field_filter_clause(raw_filter))
+        return filters
 
     @staticmethod
     def get_submission_or_404(db: Session, submission_id: uuid.UUID) -> Submission:
@@ -129,6 +291,113 @@ class SubmissionService:
         ProjectAttentionService.on_submission_reviewed(db, submission)
         return submission
 
+    BULK_REVIEW_MAX_SUBMISSIONS = 5000
+    BULK_REVIEW_AUTOMATION_BATCH_SIZE = 500
+
+    @staticmethod
+    def bulk_review_submissions(
+        db: Session,
+        form: Form,
+        *,
+        review_status: SubmissionReviewStatus,
+        reviewed_by: uuid.UUID,
+        review_comment: Optional[str] = None,
+        submission_ids: Optional[List[uuid.UUID]] = None,
+        current_review_status: Optional[SubmissionReviewStatus] = None,
+        submitted_by_user_id: Optional[uuid.UUID] = None,
+        submitted_by_team_id: Optional[uuid.UUID] = None,
+        submitted_after: Optional[datetime] = None,
+        submitted_before: Optional[datetime] = None,
+    ) -> List[uuid.UUID]:
+        """Review every matching submission of a form with one UPDATE.
+
+        Submissions already in the target status are left alone so their review
+        automations do not fire twice. Returns the ids that were updated. Raises
+        ValueError("BULK_REVIEW_SCOPE_REQUIRED") unless ids or a filter are given.
+        """
+        scope = (
+            submission_ids,
+            current_review_status,
+            submitted_by_user_id,
+            submitted_by_team_id,
+            submitted_after,
+            submitted_before,
+        )
+        if all(value is None for value in scope):
+            raise ValueError("BULK_REVIEW_SCOPE_REQUIRED")
+        filters = [Submission.form_id == form.id, Submission.review_status != review_status]
+        if submission_ids is not None:
+            filters.append(Submission.id.in_(submission_ids))
+        if current_review_status is not None:
+            filters.append(Submission.review_status == current_review_status)
+        if submitted_by_user_id is not None:
+            filters.append(Submission.user_id == submitted_by_user_id)
+        if submitted_by_team_id is not None:
+            filters.append(
+                Submission.user_id.in_(select(TeamMember.user_id).where(TeamMember.team_id == submitted_by_team_id))
+            )
+        if submitted_after is not None:
+            filters.append(Submission.created_at >= submitted_after)
+        if submitted_before is not None:
+            filters.append(Submission.created_at < submitted_before)
+
+        limit = SubmissionService.BULK_REVIEW_MAX_SUBMISSIONS
+        target_ids = [
+            row[0]
+            for row in db.execute(
+                select(Submission.id)
+                .where(*filters)
+                .order_by(Submission.created_at.asc())
+                .limit(limit + 1)
+                .with_for_update(skip_locked=True)
+            )
+        ]
+        if len(target_ids) > limit:
+            db.rollback()
+            raise ValueError("BULK_REVIEW_LIMIT_EXCEEDED")
+        if not target_ids:
+            db.rollback()
+            return []
+
+        is_reset = review_status == SubmissionReviewStatus.SUBMITTED
+        db.execute(
+            update(Submission)
+            .where(Submission.id.in_(target_ids))
+            .values(
+                review_status=review_status,
+                review_comment=review_comment.strip() if review_comment else None,
+                reviewed_by=None if is_reset else reviewed_by,
+                reviewed_at=None if is_reset else datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        context = {"review_status": review_status.value}
+        events = [FormAutomationEvent.SUBMISSION_REVIEWED]
+        if review_status == SubmissionReviewStatus.APPROVED:
+            events.append(FormAutomationEvent.SUBMISSION_APPROVED)
+        events = [event for event in events if FormAutomationService.has_rules(db, form.id, event)]
+        if events:
+            batch_size = SubmissionService.BULK_REVIEW_AUTOMATION_BATCH_SIZE
+            for start in range(0, len(target_ids), batch_size):
+                batch = (
+                    db.query(Submission)
+                    .filter(Submission.id.in_(target_ids[start:start + batch_size]))
+                    .order_by(Submission.created_at.asc())
+                    .all()
+                )
+                for event in events:
+                    FormAutomationService.run_submission_events(
+                        db, form, batch, event, actor_id=reviewed_by, context=context
+                    )
+        db.commit()
+
+        if not is_reset:
+            from app.services.project_attention_service import ProjectAttentionService
+
+            ProjectAttentionService.on_submissions_reviewed(db, form.project_id, target_ids)
+        return target_ids
+
     @staticmethod
     def get_form_by_slug(db: Session, slug: str) -> Optional[Form]:
         return db.query(Form).filter(Form.slug == slug).first()
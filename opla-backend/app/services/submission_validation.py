@@ -0,0 +1,546 @@
+"""Submission validation compiled from a form's live blueprint.
+
+SubmissionValidator.compile turns a blueprint into one check per answer key
+(type, option membership, numeric range, text length) plus predicates for the
+skip logic that decides which questions a respondent actually reached: rule
+SHOW/HIDE/REQUIRE effects, legacy `logic` visibility and section jumps, and
+option-level `skip_to`. Published versions are immutable, so
+SubmissionValidatorCache keeps one validator per live version and ingest only
+pays for running the checks.
+
+Strict mode rejects a row with any issue. Lenient mode moves the offending
+answers out of the stored data and into their issues (with the value as sent),
+so stored values always match the blueprint's types and `cast(..., Float)` over
+numeric fields cannot fail on them later, while nothing the client sent is lost.
+Answers nested inside object collections are stored as sent.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.services.blueprint_index import BlueprintIndex, BlueprintIndexCache, normalize_field_type, option_entry
+
+
+STRICT = "strict"
+LENIENT = "lenient"
+VALIDATION_MODES = (STRICT, LENIENT)
+VALIDATOR_CACHE_SIZE = 256
+
+NUMBER_TYPES = frozenset({"input_number", "number", "integer", "float", "decimal", "rating_scale", "rating"})
+INTEGER_TYPES = frozenset({"integer", "rating_scale", "rating"})
+BOOLEAN_TYPES = frozenset({"toggle", "boolean", "bool"})
+SINGLE_CHOICE_TYPES = frozenset({"dropdown", "radio_group", "radio", "select"})
+MULTI_CHOICE_TYPES = frozenset({"checkbox_group", "multi_select_dropdown", "multi_select"})
+TEXT_TYPES = frozenset({"input_text", "textarea", "email_input", "phone_input", "string", "text"})
+TRUE_STRINGS = frozenset({"true", "yes", "1"})
+FALSE_STRINGS = frozenset({"false", "no", "0"})
+
+Predicate = Callable[[dict[str, Any]], bool]
+# A check returns the value to store (possibly coerced) and an issue code, or None when the value is valid.
+Check = Callable[[Any], tuple[Any, Optional[str]]]
+
+
+class SubmissionValidationError(ValueError):
+    """Raised for strict submissions; issues lists {field, code} for every rejected answer."""
+
+    def __init__(self, issues: list[dict[str, str]]):
+        super().__init__("SUBMISSION_INVALID")
+        self.issues = issues
+
+
+def _is_empty(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, dict)):
+        return not value
+    return False
+
+
+def _as_text(value: Any) -> str:
+    # Mirrors String(value ?? '') in the client rules engine.
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _as_number(value: Any) -> Optional[float | int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+    return None
+
+
+def _bound(raw: Any) -> Optional[float]:
+    if raw is None or raw == "" or isinstance(raw, bool):
+        return None
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def _always_true(_data: dict[str, Any]) -> bool:
+    return True
+
+
+def _always_false(_data: dict[str, Any]) -> bool:
+    return False
+
+
+def _accept(value: Any) -> tuple[Any, Optional[str]]:
+    return value, None
+
+
+def _number_check(node: dict, integer: bool) -> Check:
+    low, high = _bound(node.get("min")), _bound(node.get("max"))
+
+    def check(value: Any) -> tuple[Any, Optional[str]]:
+        number = _as_number(value)
+        if number is None:
+            return value, "not_a_number"
+        if integer and isinstance(number, float):
+            if not number.is_integer():
+                return value, "not_an_integer"
+            number = int(number)
+        if low is not None and number < low:
+            return value, "below_min"
+        if high is not None and number > high:
+            return value, "above_max"
+        return number, None
+
+    return check
+
+
+def _boolean_check(value: Any) -> tuple[Any, Optional[str]]:
+    if isinstance(value, bool):
+        return value, None
+    text = _as_text(value).strip().lower()
+    if text in TRUE_STRINGS:
+        return True, None
+    if text in FALSE_STRINGS:
+        return False, None
+    return value, "not_a_boolean"
+
+
+def _single_choice_check(allowed: Optional[frozenset[str]]) -> Check:
+    def check(value: Any) -> tuple[Any, Optional[str]]:
+        if isinstance(value, (list, dict)):
+            return value, "not_an_option"
+        if allowed is not None and _as_text(value) not in allowed:
+            return value, "not_an_option"
+        return value, None
+
+    return check
+
+
+def _multi_choice_check(allowed: Optional[frozenset[str]]) -> Check:
+    def check(value: Any) -> tuple[Any, Optional[str]]:
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if isinstance(item, (list, dict)) or (allowed is not None and _as_text(item) not in allowed):
+                return value, "not_an_option"
+        return values, None
+
+    return check
+
+
+def _text_check(node: dict) -> Check:
+    min_length, max_length = _bound(node.get("minLength")), _bound(node.get("maxLength"))
+    pattern = None
+    if isinstance(node.get("pattern"), str) and node["pattern"]:
+        try:
+            pattern = re.compile(node["pattern"])
+        except re.error:
+            pattern = None
+
+    def check(value: Any) -> tuple[Any, Optional[str]]:
+        if isinstance(value, (list, dict)):
+            return value, "not_text"
+        text = _as_text(value)
+        if min_length is not None and len(text) < min_length:
+            return value, "too_short"
+        if max_length is not None and len(text) > max_length:
+            return value, "too_long"
+        if pattern is not None and not pattern.fullmatch(text):
+            return value, "pattern_mismatch"
+        return value, None
+
+    return check
+
+
+def _allowed_options(node: dict, options: Optional[list[dict[str, str]]]) -> Optional[frozenset[str]]:
+    """Static option values for a choice field, or None when its options are resolved at runtime."""
+    if node.get("options_source") == "directory_form" or node.get("allow_other"):
+        return None
+    values = {entry["value"] for entry in options or []}
+    cascade = node.get("cascade_options_map")
+    if isinstance(cascade, dict):
+        for raw_options in cascade.values():
+            for raw in raw_options if isinstance(raw_options, list) else []:
+                entry = option_entry(raw)
+                if entry:
+                    values.add(entry["value"])
+    return frozenset(values) if values else None
+
+
+def _compile_check(node: dict, options: Optional[list[dict[str, str]]]) -> Check:
+    field_type = normalize_field_type(node.get("type"))
+    if field_type in NUMBER_TYPES:
+        return _number_check(node, field_type in INTEGER_TYPES)
+    if field_type in BOOLEAN_TYPES:
+        return _boolean_check
+    if field_type in SINGLE_CHOICE_TYPES:
+        return _single_choice_check(_allowed_options(node, options))
+    if field_type in MULTI_CHOICE_TYPES:
+        return _multi_choice_check(_allowed_options(node, options))
+    if field_type in TEXT_TYPES:
+        return _text_check(node)
+    return _accept
+
+
+def _compile_rule_condition(node: dict, labels: dict[str, dict[str, str]]) -> Predicate:
+    """Port of evaluateConditionNode from the client rules engine."""
+    field = str(node.get("field") or "")
+    operator = node.get("operator")
+    target = node.get("value")
+    label_map = labels.get(field) if node.get("compare_by") == "label" else None
+
+    def current(data: dict[str, Any]) -> Any:
+        value = data.get(field)
+        if label_map and not isinstance(value, (list, dict)):
+            return label_map.get(_as_text(value), value)
+        return value
+
+    if operator == "empty":
+        return lambda data: _is_empty(current(data))
+    if operator == "not_empty":
+        return lambda data: not _is_empty(current(data))
+    if operator in {"contains", "not_contains"}:
+        needle = _as_text(target).lower()
+        negate = operator == "not_contains"
+
+        def contains(data: dict[str, Any]) -> bool:
+            value = current(data)
+            found = target in value if isinstance(value, list) else needle in _as_text(value).lower()
+            return found != negate
+
+        return contains
+    if operator == "between":
+        parts = [_bound(part) for part in _as_text(target).split(",")]
+        if len(parts) != 2 or None in parts:
+            return _always_false
+        low, high = parts
+
+        def between(data: dict[str, Any]) -> bool:
+            number = _as_number(current(data))
+            return number is not None and low <= number <= high
+
+        return between
+    if operator in {"==", "!="}:
+        expected = _as_text(target).lower()
+        if operator == "==":
+            return lambda data: _as_text(current(data)).lower() == expected
+        return lambda data: _as_text(current(data)).lower() != expected
+    comparisons = {
+        ">": lambda a, b: a > b,
+        "<": lambda a, b: a < b,
+        ">=": lambda a, b: a >= b,
+        "<=": lambda a, b: a <= b,
+    }
+    if operator in comparisons:
+        compare = comparisons[operator]
+        expected_number = _as_number(target)
+        if expected_number is None:
+            return _always_false
+
+        def ordered(data: dict[str, Any]) -> bool:
+            number = _as_number(current(data))
+            return number is not None and compare(number, expected_number)
+
+        return ordered
+    return _always_false
+
+
+def _compile_rule_node(node: Any, labels: dict[str, dict[str, str]]) -> Predicate:
+    if not isinstance(node, dict):
+        return _always_true
+    if node.get("type") == "rule":
+        return _compile_rule_condition(node, labels)
+    children = tuple(_compile_rule_node(child, labels) for child in node.get("children") or [])
+    if not children:
+        return _always_true
+    if node.get("combinator") == "AND":
+        return lambda data: all(child(data) for child in children)
+    return lambda data: any(child(data) for child in children)
+
+
+def _compile_legacy_condition(rule: dict) -> Predicate:
+    """Port of evaluateLegacyRule for blueprint.logic entries."""
+    predicates: list[Predicate] = []
+    for condition in rule.get("conditions") or []:
+        if not isinstance(condition, dict):
+            continue
+        field = str(condition.get("field") or "")
+        operator = condition.get("operator")
+        expected = condition.get("value")
+        if operator == "eq":
+            predicates.append(lambda data, f=field, e=_as_text(expected): _as_text(data.get(f)) == e)
+        elif operator == "neq":
+            predicates.append(lambda data, f=field, e=_as_text(expected): _as_text(data.get(f)) != e)
+        elif operator == "contains":
+            predicates.append(lambda data, f=field, e=_as_text(expected).lower(): e in _as_text(data.get(f)).lower())
+        elif operator in {"gt", "lt"}:
+            bound = _as_number(expected)
+
+            def ordered(data: dict[str, Any], f=field, b=bound, greater=operator == "gt") -> bool:
+                number = _as_number(data.get(f))
+                if number is None or b is None:
+                    return False
+                return number > b if greater else number < b
+
+            predicates.append(ordered)
+        else:
+            predicates.append(_always_false)
+    if not predicates:
+        return _always_true
+    checks = tuple(predicates)
+    if rule.get("logic_operator") == "OR":
+        return lambda data: any(check(data) for check in checks)
+    return lambda data: all(check(data) for check in checks)
+
+
+class FieldValidator:
+    __slots__ = ("key", "ids", "section_index", "required", "check", "skip_to")
+
+    def __init__(
+        self,
+        key: str,
+        ids: frozenset[str],
+        section_index: Optional[int],
+        required: bool,
+        check: Check,
+        skip_to: dict[str, str],
+    ):
+        self.key = key
+        self.ids = ids
+        self.section_index = section_index
+        self.required = required
+        self.check = check
+        self.skip_to = skip_to
+
+
+class SubmissionValidator:
+    __slots__ = ("fields", "section_ids", "rules", "legacy_visibility", "legacy_jumps")
+
+    def __init__(
+        self,
+        fields: tuple[FieldValidator, ...],
+        section_ids: tuple[str, ...],
+        rules: tuple[tuple[Predicate, tuple[dict, ...]], ...],
+        legacy_visibility: dict[str, tuple[tuple[Predicate, bool], ...]],
+        legacy_jumps: dict[str, tuple[tuple[Predicate, str], ...]],
+    ):
+        self.fields = fields
+        self.section_ids = section_ids
+        self.rules = rules
+        self.legacy_visibility = legacy_visibility
+        self.legacy_jumps = legacy_jumps
+
+    @classmethod
+    def compile(cls, blueprint: Any, index: Optional[BlueprintIndex] = None) -> "SubmissionValidator":
+        if not isinstance(blueprint, dict):
+            return cls((), (), (), {}, {})
+        index = index or BlueprintIndex.compile(blueprint)
+
+        # Top-level schema fields describe the stored answer; a UI question bound to the
+        # same key refines it (input type, bounds, required flag).
+        nodes: dict[str, dict] = {}
+        placements: dict[str, tuple[int, frozenset[str]]] = {}
+        for field in index.schema_fields:
+            if "parent_identifier" not in field.definition:
+                nodes[field.key] = dict(field.definition)
+        for section_index, section in enumerate(index.sections):
+            for ui_field in section.fields:
+                if not ui_field.bind:
+                    continue
+                nodes[ui_field.bind] = {**nodes.get(ui_field.bind, {}), **ui_field.node}
+                ids = {ui_field.bind, str(ui_field.node.get("id") or ui_field.bind)}
+                placements[ui_field.bind] = (section_index, frozenset(ids))
+
+        fields = []
+        for key, node in nodes.items():
+            options = index.option_maps.get(key)
+            section_index, ids = placements.get(key, (None, frozenset({key})))
+            skip_to = {}
+            for raw in node.get("options") or []:
+                entry = option_entry(raw)
+                if entry and isinstance(raw, dict) and raw.get("skip_to"):
+                    skip_to[entry["value"]] = str(raw["skip_to"])
+            fields.append(
+                FieldValidator(key, ids, section_index, bool(node.get("required")), _compile_check(node, options), skip_to)
+            )
+
+        labels = {key: {entry["value"]: entry["label"] for entry in options} for key, options in index.option_maps.items()}
+        raw_rules = [rule for rule in blueprint.get("rules") or [] if isinstance(rule, dict) and rule.get("enabled") is not False]
+        raw_rules.sort(key=lambda rule: rule.get("priority") or 0)
+        rules = tuple(
+            (
+                _compile_rule_node(rule.get("condition"), labels),
+                tuple(action for action in rule.get("actions") or [] if isinstance(action, dict)),
+            )
+            for rule in raw_rules
+        )
+
+        legacy_visibility: dict[str, list[tuple[Predicate, bool]]] = {}
+        legacy_jumps: dict[str, list[tuple[Predicate, str]]] = {}
+        for rule in blueprint.get("logic") or []:
+            if not isinstance(rule, dict):
+                continue
+            if rule.get("type") == "field_visibility" and rule.get("target_id"):
+                legacy_visibility.setdefault(str(rule["target_id"]), []).append(
+                    (_compile_legacy_condition(rule), rule.get("action") == "show")
+                )
+            elif rule.get("type") == "section_jump" and rule.get("source_id") and rule.get("target_id"):
+                legacy_jumps.setdefault(str(rule["source_id"]), []).append(
+                    (_compile_legacy_condition(rule), str(rule["target_id"]))
+                )
+
+        return cls(
+            tuple(fields),
+            tuple(str(section.id or "") for section in index.sections),
+            rules,
+            {target: tuple(entries) for target, entries in legacy_visibility.items()},
+            {source: tuple(entries) for source, entries in legacy_jumps.items()},
+        )
+
+    def _visited_sections(self, data: dict[str, Any], jump_target: Optional[str]) -> set[int]:
+        """Walk sections the way the runtime does: rule jumps, legacy jumps, option skip_to, then the next section."""
+        positions = {section_id: position for position, section_id in enumerate(self.section_ids)}
+        visited: set[int] = set()
+        current = 0
+        while 0 <= current < len(self.section_ids) and current not in visited:
+            visited.add(current)
+            target = jump_target
+            if target is None:
+                for predicate, legacy_target in self.legacy_jumps.get(self.section_ids[current], ()):
+                    if predicate(data):
+                        target = legacy_target
+                        break
+            if target is None:
+                for field in self.fields:
+                    if field.section_index == current and field.skip_to:
+                        target = field.skip_to.get(_as_text(data.get(field.key)), target)
+            if target == "end":
+                break
+            current = positions.get(target, current + 1) if target is not None else current + 1
+        return visited
+
+    def validate(self, data: dict[str, Any], mode: str = STRICT) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """Return (data to store, issues). Values are coerced to their field type; lenient moves
+        rejected answers out of the data and keeps the value as sent on their issue."""
+        field_effects: dict[str, set[str]] = {}
+        hidden_sections: set[str] = set()
+        jump_target: Optional[str] = None
+        for predicate, actions in self.rules:
+            if not actions or not predicate(data):
+                continue
+            for action in actions:
+                effect, target_id = action.get("effect"), str(action.get("target_id") or "")
+                if action.get("target_type") == "field":
+                    field_effects.setdefault(target_id, set()).add(effect)
+                elif action.get("target_type") == "section":
+                    if effect == "HIDE":
+                        hidden_sections.add(target_id)
+                    elif effect == "JUMP_TO_SECTION" and jump_target is None and target_id:
+                        jump_target = target_id
+
+        visited = self._visited_sections(data, jump_target) if self.section_ids else set()
+        cleaned = dict(data)
+        issues: list[dict[str, Any]] = []
+        for field in self.fields:
+            effects = set().union(*(field_effects.get(field_id, ()) for field_id in field.ids))
+            visible = "HIDE" not in effects
+            if visible and field.section_index is not None:
+                visible = field.section_index in visited and self.section_ids[field.section_index] not in hidden_sections
+            if visible and "SHOW" not in effects:
+                legacy = [entry for field_id in field.ids for entry in self.legacy_visibility.get(field_id, ())]
+                if legacy:
+                    visible = any(predicate(data) == show for predicate, show in legacy)
+
+            value = data.get(field.key)
+            if _is_empty(value):
+                required = field.required
+                if "REQUIRE" in effects:
+                    required = True
+                elif "UNREQUIRE" in effects:
+                    required = False
+                if visible and required:
+                    issues.append({"field": field.key, "code": "required"})
+                continue
+            if not visible:
+                code: Optional[str] = "skipped_question"
+            else:
+                value, code = field.check(value)
+            if code is None:
+                cleaned[field.key] = value
+                continue
+            if mode == LENIENT:
+                issues.append({"field": field.key, "code": code, "value": cleaned.pop(field.key, data.get(field.key))})
+            else:
+                issues.append({"field": field.key, "code": code})
+        return cleaned, issues
+
+
+class SubmissionValidatorCache:
+    """In-process LRU of validators keyed by live form version, like BlueprintIndexCache."""
+
+    _lock = threading.Lock()
+    _validators: "OrderedDict[tuple, SubmissionValidator]" = OrderedDict()
+
+    @classmethod
+    def for_live_form(cls, form: Any) -> SubmissionValidator:
+        if not form.blueprint_live or form.published_version is None:
+            return SubmissionValidator.compile(form.blueprint_live)
+        key = (form.id, form.published_version)
+        with cls._lock:
+            validator = cls._validators.get(key)
+            if validator is not None:
+                cls._validators.move_to_end(key)
+                return validator
+        validator = SubmissionValidator.compile(form.blueprint_live, BlueprintIndexCache.for_live_form(form))
+        with cls._lock:
+            cls._validators[key] = validator
+            cls._validators.move_to_end(key)
+            while len(cls._validators) > VALIDATOR_CACHE_SIZE:
+                cls._validators.popitem(last=False)
+        return validator
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._validators.clear()
@@ -15,10 +15,15 @@ Dialect (v1):
 
 from __future__ import annotations
 
+import hashlib
 import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple
 
+BLOCK_CACHE_SIZE = 4096
+
 
 SUPPORTED_TYPES = {
     "text",
@@ -82,6 +87,7 @@ class SurveyMarkdownCompileError(Exception):
     """Raised when markdown cannot be compiled into a blueprint."""
 
     def __init__(self, message: str, line: Optional[int] = None):
+        self.message = message
         self.line = line
         if line is not None:
             super().__init__(f"Line {line}: {message}")
@@ -155,27 +161,69 @@ def _parse_option_line(raw: str, line_no: int) -> Dict[str, str]:
     return option
 
 
-def compile_survey_markdown(markdown: str) -> CompileResult:
-    if not markdown or not markdown.strip():
-        raise SurveyMarkdownCompileError("Markdown is empty")
+class _Field:
+    """A compiled question before cross-section bind de-duplication."""
 
-    lines = markdown.replace("\r\n", "\n").replace("\r", "\n").split("\n")
-    warnings: List[str] = []
+    __slots__ = ("bind", "child", "schema")
 
-    title: Optional[str] = None
-    sections: List[Dict[str, Any]] = []
-    current_section: Optional[Dict[str, Any]] = None
+    def __init__(self, bind: str, child: Dict[str, Any], schema: Dict[str, Any]):
+        self.bind = bind
+        self.child = child
+        self.schema = schema
+
+
+class _Block:
+    """One compiled `#`/`##` block; line numbers are relative to its first line.
+
+    ``items`` keeps fields and line-numbered warnings (prefix, line, suffix) in
+    document order. Blocks are cached and shared, so treat them as read-only.
+    """
+
+    __slots__ = ("title", "section_id", "section_title", "description", "items", "error")
+
+    def __init__(self) -> None:
+        self.title: Optional[str] = None
+        self.section_id: Optional[str] = None
+        self.section_title: Optional[str] = None
+        self.description = ""
+        self.items: List[Tuple[str, Any]] = []
+        self.error: Optional[Tuple[str, Optional[int]]] = None
+
+
+def _is_title_line(stripped: str) -> bool:
+    return stripped.startswith("# ") and not stripped.startswith("##")
+
+
+def _split_blocks(lines: List[str]) -> List[Tuple[int, str]]:
+    """(first line number, text) per block; a block starts at each `# ` or `## ` heading."""
+    blocks: List[Tuple[int, str]] = []
+    start = 0
+    for index, raw_line in enumerate(lines):
+        stripped = raw_line.strip()
+        if index > start and (stripped.startswith("## ") or _is_title_line(stripped)):
+            blocks.append((start + 1, "\n".join(lines[start:index])))
+            start = index
+    blocks.append((start + 1, "\n".join(lines[start:])))
+    return blocks
+
+
+def _compile_block(text: str) -> _Block:
+    block = _Block()
+    try:
+        _parse_block(block, text.split("\n"))
+    except SurveyMarkdownCompileError as exc:
+        block.error = (exc.message, exc.line)
+    return block
+
+
+def _parse_block(block: _Block, lines: List[str]) -> None:
     current_field: Optional[Dict[str, Any]] = None
     in_options = False
-    used_binds: set[str] = set()
-    used_section_ids: set[str] = set()
 
     def flush_field() -> None:
         nonlocal current_field, in_options
         if current_field is None:
             return
-        if current_section is None:
-            raise SurveyMarkdownCompileError("Question found before any section")
         field_type = current_field.get("_type")
         if not field_type:
             raise SurveyMarkdownCompileError(
@@ -183,9 +231,16 @@ def compile_survey_markdown(markdown: str) -> CompileResult:
                 line=current_field.get("_line"),
             )
         if field_type in UNSUPPORTED_TYPES:
-            warnings.append(
-                f"Skipped unsupported type '{field_type}' for question "
-                f"'{current_field.get('label')}' (line {current_field.get('_line')})"
+            block.items.append(
+                (
+                    "warning",
+                    (
+                        f"Skipped unsupported type '{field_type}' for question "
+                        f"'{current_field.get('label')}' (line ",
+                        current_field.get("_line"),
+                        ")",
+                    ),
+                )
             )
             current_field = None
             in_options = False
@@ -205,15 +260,6 @@ def compile_survey_markdown(markdown: str) -> CompileResult:
             )
 
         bind = current_field["bind"]
-        if bind in used_binds:
-            base = bind
-            n = 2
-            while f"{base}_{n}" in used_binds:
-                n += 1
-            bind = f"{base}_{n}"
-            warnings.append(f"Duplicate bind renamed to '{bind}'")
-        used_binds.add(bind)
-
         widget = TYPE_TO_WIDGET[field_type]
         child: Dict[str, Any] = {
             "id": bind,
@@ -232,65 +278,32 @@ def compile_survey_markdown(markdown: str) -> CompileResult:
             child.setdefault("min", 1)
             child.setdefault("max", 5)
 
-        current_section["children"].append(child)
-        current_section["_schema"].append(
-            {
-                "key": bind,
-                "id": bind,
-                "field_id": bind,
-                "type": TYPE_TO_SCHEMA[field_type],
-                "required": bool(current_field.get("required", False)),
-                **({"items": {"type": "string"}} if field_type == "checkbox" else {}),
-            }
-        )
+        schema = {
+            "key": bind,
+            "id": bind,
+            "field_id": bind,
+            "type": TYPE_TO_SCHEMA[field_type],
+            "required": bool(current_field.get("required", False)),
+            **({"items": {"type": "string"}} if field_type == "checkbox" else {}),
+        }
+        block.items.append(("field", _Field(bind, child, schema)))
         current_field = None
         in_options = False
 
-    def flush_section() -> None:
-        nonlocal current_section
-        flush_field()
-        if current_section is not None:
-            sections.append(current_section)
-            current_section = None
+    heading = lines[0].strip()
+    if _is_title_line(heading):
+        block.title = heading[2:].strip()
+    elif heading.startswith("## "):
+        block.section_id, block.section_title = _parse_heading_id_title(heading[3:].strip())
 
     for idx, raw_line in enumerate(lines, start=1):
         line = raw_line.rstrip()
         stripped = line.strip()
-        if not stripped:
-            continue
-
-        if stripped.startswith("# ") and not stripped.startswith("##"):
-            flush_section()
-            title = stripped[2:].strip()
-            continue
-
-        if stripped.startswith("## "):
-            flush_section()
-            section_id, section_title = _parse_heading_id_title(stripped[3:].strip())
-            if section_id in used_section_ids:
-                base = section_id
-                n = 2
-                while f"{base}_{n}" in used_section_ids:
-                    n += 1
-                section_id = f"{base}_{n}"
-                warnings.append(f"Duplicate section id renamed to '{section_id}'")
-            used_section_ids.add(section_id)
-            current_section = {
-                "id": section_id,
-                "type": "screen",
-                "title": section_title,
-                "render_mode": "list",
-                "description": "",
-                "platforms": ["mobile", "web"],
-                "is_repeatable": False,
-                "layout": {"x": 40, "y": 40 + len(sections) * 120},
-                "children": [],
-                "_schema": [],
-            }
+        if not stripped or (idx == 1 and (block.title is not None or block.section_id is not None)):
             continue
 
         if stripped.startswith("### "):
-            if current_section is None:
+            if block.section_id is None:
                 raise SurveyMarkdownCompileError("Question found before any section", line=idx)
             flush_field()
             bind, label = _parse_question_heading(stripped[4:].strip())
@@ -305,10 +318,10 @@ def compile_survey_markdown(markdown: str) -> CompileResult:
             continue
 
         # Goal / description under section
-        if current_section is not None and current_field is None:
+        if block.section_id is not None and current_field is None:
             goal_match = re.match(r"^(?:Goal|Description)\s*:\s*(.+)$", stripped, re.IGNORECASE)
             if goal_match:
-                current_section["description"] = goal_match.group(1).strip()
+                block.description = goal_match.group(1).strip()
                 continue
 
         if current_field is None:
@@ -380,23 +393,120 @@ def compile_survey_markdown(markdown: str) -> CompileResult:
             current_field["placeholder"] = value
             in_options = False
         else:
-            warnings.append(f"Ignored unknown attribute '{key}' on line {idx}")
+            block.items.append(("warning", (f"Ignored unknown attribute '{key}' on line ", idx, "")))
             in_options = False
 
-    flush_section()
+    flush_field()
+
+
+class CompiledBlockCache:
+    """In-process LRU of compiled blocks keyed by a hash of the block text.
+
+    Editing one section of a long survey only recompiles that section; every
+    other block is reused and merely renumbered when the document is assembled.
+    """
+
+    _lock = threading.Lock()
+    _blocks: "OrderedDict[bytes, _Block]" = OrderedDict()
+
+    @classmethod
+    def get_or_compile(cls, text: str) -> _Block:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with cls._lock:
+            block = cls._blocks.get(key)
+            if block is not None:
+                cls._blocks.move_to_end(key)
+                return block
+        block = _compile_block(text)
+        with cls._lock:
+            cls._blocks[key] = block
+            cls._blocks.move_to_end(key)
+            while len(cls._blocks) > BLOCK_CACHE_SIZE:
+                cls._blocks.popitem(last=False)
+        return block
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._blocks.clear()
+
+
+def _unique(value: str, used: set[str]) -> str:
+    if value not in used:
+        return value
+    n = 2
+    while f"{value}_{n}" in used:
+        n += 1
+    return f"{value}_{n}"
+
+
+def compile_survey_markdown(markdown: str) -> CompileResult:
+    if not markdown or not markdown.strip():
+        raise SurveyMarkdownCompileError("Markdown is empty")
+
+    lines = markdown.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    warnings: List[str] = []
+
+    title: Optional[str] = None
+    schema: List[Dict[str, Any]] = []
+    ui: List[Dict[str, Any]] = []
+    used_binds: set[str] = set()
+    used_section_ids: set[str] = set()
+
+    for first_line, text in _split_blocks(lines):
+        block = CompiledBlockCache.get_or_compile(text)
+        offset = first_line - 1
+        if block.error is not None:
+            message, line = block.error
+            raise SurveyMarkdownCompileError(message, line=None if line is None else line + offset)
+        if block.title is not None:
+            title = block.title
+        if block.section_id is None:
+            continue
+
+        section_id = _unique(block.section_id, used_section_ids)
+        if section_id != block.section_id:
+            warnings.append(f"Duplicate section id renamed to '{section_id}'")
+        used_section_ids.add(section_id)
+        section: Dict[str, Any] = {
+            "id": section_id,
+            "type": "screen",
+            "title": block.section_title,
+            "render_mode": "list",
+            "description": block.description,
+            "platforms": ["mobile", "web"],
+            "is_repeatable": False,
+            "layout": {"x": 40, "y": 40 + len(ui) * 120},
+            "children": [],
+        }
+        for kind, item in block.items:
+            if kind == "warning":
+                prefix, line, suffix = item
+                warnings.append(f"{prefix}{line + offset}{suffix}")
+                continue
+            bind = _unique(item.bind, used_binds)
+            if bind != item.bind:
+                warnings.append(f"Duplicate bind renamed to '{bind}'")
+            used_binds.add(bind)
+            # Cached blocks are shared, so copy everything handed to the caller.
+            child = {**item.child, "id": bind, "field_id": bind, "bind": bind}
+            if "options" in child:
+                child["options"] = [dict(option) for option in child["options"]]
+            section["children"].append(child)
+            field_schema = {**item.schema, "key": bind, "id": bind, "field_id": bind}
+            if "items" in field_schema:
+                field_schema["items"] = dict(field_schema["items"])
+            schema.append(field_schema)
+        ui.append(section)
 
     if not title:
         raise SurveyMarkdownCompileError("Missing survey title (`# Title`)")
-    if not sections:
+    if not ui:
         raise SurveyMarkdownCompileError("Survey has no sections (`## section`)")
 
-    schema: List[Dict[str, Any]] = []
-    ui: List[Dict[str, Any]] = []
-    for section in sections:
-        schema.extend(section.pop("_schema", []))
+    for section in ui:
         if not section["children"]:
             warnings.append(f"Section '{section['title']}' has no supported questions")
-        ui.append(section)
 
     if not any(s["children"] for s in ui):
         raise SurveyMarkdownCompileError("Survey has no supported questions after compile")
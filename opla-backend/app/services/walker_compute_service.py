@@ -1,11 +1,17 @@
 import uuid
-from typing import Any
+from typing import Any, Optional
 from sqlalchemy.orm import Session
 from app.services.analytics_service import AnalyticsService
 
 class WalkerComputeService:
     @staticmethod
-    def process_payload(db: Session, org_id: uuid.UUID, dataset_id: uuid.UUID, payload: dict[str, Any]) -> list[dict[str, Any]]:
+    def process_payload(
+        db: Session,
+        org_id: uuid.UUID,
+        dataset_id: uuid.UUID,
+        payload: dict[str, Any],
+        max_estimated_cost: Optional[float] = None,
+    ) -> list[dict[str, Any]]:
         workflow = payload.get("workflow", [])
         
         filters_map = {"combinator": "and", "rules": []}
@@ -100,7 +106,8 @@ class WalkerComputeService:
             aggregates=aggregates,
             order_by=order_by,
             limit=limit,
-            offset=offset
+            offset=offset,
+            max_estimated_cost=max_estimated_cost,
         )
         
         return result["rows"]
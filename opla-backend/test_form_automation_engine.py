@@ -0,0 +1,90 @@
+"""Unit tests for compiled form automation rule predicates and action templates."""
+
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+
+from app.services.form_automation_engine import compile_conditions, compile_context_mapping, compile_template
+
+
+def _context(data: dict, **context) -> dict:
+    return {
+        "submission": SimpleNamespace(id="sub-1", user_id=None),
+        "data": data,
+        "context": context,
+    }
+
+
+class CompileConditionsTests(unittest.TestCase):
+    def test_empty_conditions_always_match(self):
+        self.assertTrue(compile_conditions(None)(_context({})))
+        self.assertTrue(compile_conditions({"rules": []})(_context({})))
+
+    def test_bare_field_paths_resolve_against_submission_data(self):
+        predicate = compile_conditions({"rules": [{"field": "age", "operator": ">=", "value": "18"}]})
+        self.assertTrue(predicate(_context({"age": 21})))
+        self.assertFalse(predicate(_context({"age": "17"})))
+        self.assertFalse(predicate(_context({})))
+
+    def test_numeric_comparisons_treat_non_numeric_values_as_non_matches(self):
+        predicate = compile_conditions({"rules": [{"field": "amount", "operator": ">", "value": 30}]})
+        self.assertTrue(predicate(_context({"amount": " 45 "})))
+        self.assertFalse(predicate(_context({"amount": "n/a"})))
+        self.assertFalse(predicate(_context({"amount": True})))
+        self.assertFalse(predicate(_context({"amount": {"value": 45}})))
+
+    def test_nested_groups_and_combinators(self):
+        predicate = compile_conditions(
+            {
+                "combinator": "and",
+                "rules": [
+                    {"field": "context.review_status", "operator": "equal", "value": "approved"},
+                    {
+                        "combinator": "or",
+                        "rules": [
+                            {"field": "region", "operator": "in", "value": ["north", "east"]},
+                            {"field": "notes", "operator": "contains", "value": "urgent"},
+                        ],
+                    },
+                ],
+            }
+        )
+        self.assertTrue(predicate(_context({"region": "east"}, review_status="approved")))
+        self.assertTrue(predicate(_context({"region": "west", "notes": "urgent callback"}, review_status="approved")))
+        self.assertFalse(predicate(_context({"region": "west"}, review_status="approved")))
+        self.assertFalse(predicate(_context({"region": "east"}, review_status="rejected")))
+
+    def test_empty_checks_and_unknown_operators(self):
+        self.assertTrue(compile_conditions({"rules": [{"field": "photo", "operator": "isEmpty"}]})(_context({"photo": ""})))
+        self.assertTrue(compile_conditions({"rules": [{"field": "photo", "operator": "exists"}]})(_context({"photo": "x.jpg"})))
+        self.assertFalse(compile_conditions({"rules": [{"field": "photo", "operator": "matches"}]})(_context({"photo": "x"})))
+        self.assertFalse(compile_conditions({"rules": [{"operator": "exists"}]})(_context({"photo": "x"})))
+
+
+class CompileActionTemplatesTests(unittest.TestCase):
+    def test_template_renders_paths_and_drops_missing_values(self):
+        template = compile_template("  Visit {{ outlet_name }} ({{data.region}}) for {{ submission.id }}{{ missing }}  ")
+        self.assertEqual(template.render(_context({"outlet_name": "Osu 4", "region": "Accra"})), "Visit Osu 4 (Accra) for sub-1")
+        self.assertEqual(compile_template("No placeholders").render(_context({})), "No placeholders")
+
+    def test_context_mapping_resolves_nested_targets(self):
+        mapping = compile_context_mapping(
+            '{"label": "data.outlet_name", "where": "{{ region }} cluster", "routing.cluster": "cluster",'
+            ' "fixed": {"source": "automation", "empty": ""}, "blank": "  "}'
+        )
+        self.assertEqual(
+            mapping(_context({"outlet_name": "Osu 4", "region": "Accra"})),
+            {
+                "label": "Osu 4",
+                "where": "Accra cluster",
+                "routing": {"cluster": "cluster"},
+                "fixed": {"source": "automation"},
+            },
+        )
+        self.assertIsNone(compile_context_mapping("not json"))
+        self.assertIsNone(compile_context_mapping({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
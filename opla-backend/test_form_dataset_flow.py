@@ -1,10 +1,17 @@
+import threading
+import time
 import unittest
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
 
-from app.core.database import SessionLocal
+from app.core.database import SessionLocal, engine_sync
 from app.main import app
 from app.models.form import Form
 from app.models.form_dataset import FormDataset, FormDatasetField, FormDatasetFieldStatus, FormDatasetSchemaVersion
+from app.models.analytics import AnalyticsFieldSketch, AnalyticsRollupCell, AnalyticsRollupPending
+from app.models.background_job import BackgroundJob
 from app.models.form_version import FormVersion
 from app.models.org_member import GlobalRole, InvitationStatus, OrgMember
 from app.models.organization import Organization
@@ -12,8 +19,18 @@ from app.models.project import Project, ProjectStatus
 from app.models.submission import Submission
 from app.models.user import User
 from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from app.services.analytics_approximate_service import ApproximateAnalyticsService
+from app.services.analytics_guard_service import AnalyticsQueryGuard, is_query_canceled
+from app.services.analytics_rollup_service import AnalyticsRollupService
+from app.services.analytics_service import AnalyticsQueryPlanCache, AnalyticsService
+from app.services.background_job_service import BackgroundJobService
+from app.services.blueprint_index import BlueprintIndex, BlueprintIndexCache
+from app.services.csv_import_service import CsvImportService
+from app.services.dashboard_run_service import DashboardRunService
 from app.services.form_service import FormService
 from app.services.submission_service import SubmissionService
+from app.services.submission_validation import SubmissionValidationError, SubmissionValidatorCache
 
 
 class FormDatasetFlowTests(unittest.TestCase):
@@ -182,6 +199,1149 @@ class FormDatasetFlowTests(unittest.TestCase):
         self.assertEqual(submission.dataset_schema_version_id, schema_version.id)
         self.assertEqual(submission.form_version_number, published_form.published_version)
 
+    def test_compare_period_uses_calendar_windows_in_one_pass(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+
+        # March 2024 to date vs February (29 days, so the span clips) and March 2023.
+        for created_at in [
+            datetime(2024, 3, 2),
+            datetime(2024, 3, 20),
+            datetime(2024, 2, 10),
+            datetime(2024, 2, 29, 12),
+            datetime(2024, 1, 31),
+            datetime(2023, 3, 5),
+            datetime(2024, 3, 25),
+        ]:
+            submission = SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": "Ada", "region": "North", "satisfaction": "good", "comments": ""},
+                user_id=self.user.id,
+                metadata={},
+            )
+            submission.created_at = created_at
+        self.db.commit()
+
+        result = AnalyticsService.compare_period(
+            self.db,
+            self.org_id,
+            dataset.id,
+            measure_field="_submission_id",
+            agg_fn="count",
+            period="month",
+            series_length=3,
+            as_of=datetime(2024, 3, 31),
+        )
+
+        self.assertEqual(result["current_start"], datetime(2024, 3, 1))
+        self.assertEqual(result["previous_end"], datetime(2024, 3, 1))
+        self.assertEqual(result["current_value"], 3.0)
+        self.assertEqual(result["previous_value"], 2.0)
+        self.assertEqual(result["last_year_value"], 1.0)
+        self.assertEqual(result["delta_pct"], 50.0)
+        self.assertEqual(result["last_year_delta_pct"], 200.0)
+        self.assertEqual(result["direction"], "up")
+        self.assertEqual(
+            [(point["start"].month, point["value"]) for point in result["series"]],
+            [(1, 1.0), (2, 2.0), (3, 3.0)],
+        )
+
+    def test_dashboard_run_dedupes_and_merges_card_queries(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        for name, region in [("Ada", "North"), ("Kofi", "North"), ("Ama", "South"), ("Ada", "South")]:
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": name, "region": region, "satisfaction": "good", "comments": ""},
+                user_id=self.user.id,
+                metadata={},
+            )
+
+        def question(title, viz_type="chart", **query_config):
+            return AnalyticsService.create_question(
+                self.db,
+                self.org_id,
+                self.user_id,
+                {
+                    "title": title,
+                    "source_config": {"dataset_id": str(dataset.id)},
+                    "query_config": query_config,
+                    "viz_type": viz_type,
+                },
+            )
+
+        by_region = {"group_by": ["region"], "order_by": [{"field": "region", "direction": "asc"}]}
+        count_card = question("Count", aggregates=[{"field": "_submission_id", "fn": "count", "alias": "responses"}], **by_region)
+        repeat_card = question("Count again", aggregates=[{"field": "_submission_id", "fn": "count", "alias": "responses"}], **by_region)
+        people_card = question("People", aggregates=[{"field": "customer_name", "fn": "count_distinct", "alias": "people"}], **by_region)
+        notes_card = question("Notes", viz_type="markdown")
+        dashboard = AnalyticsService.create_dashboard(
+            self.db,
+            self.org_id,
+            self.user_id,
+            {
+                "title": "Overview",
+                "cards": [
+                    {"question_id": item.id, "position": {"x": index}}
+                    for index, item in enumerate([count_card, repeat_card, people_card, notes_card])
+                ],
+            },
+        )
+        dashboard = AnalyticsService.get_dashboard(self.db, dashboard.id)
+
+        payload = DashboardRunService.run_dashboard(dashboard, org_id=self.org_id)
+
+        self.assertEqual(payload["query_count"], 1)
+        cards = {card["question_id"]: card for card in payload["cards"]}
+        self.assertEqual(cards[notes_card.id]["status"], "skipped")
+        self.assertEqual(
+            cards[count_card.id]["result"]["rows"],
+            [{"region": "North", "responses": 2}, {"region": "South", "responses": 2}],
+        )
+        self.assertEqual(cards[repeat_card.id]["result"]["rows"], cards[count_card.id]["result"]["rows"])
+        self.assertEqual(
+            cards[people_card.id]["result"]["rows"],
+            [{"region": "North", "people": 2}, {"region": "South", "people": 2}],
+        )
+        self.assertEqual([column["key"] for column in cards[people_card.id]["result"]["columns"]], ["region", "people"])
+
+        filtered = DashboardRunService.run_dashboard(
+            dashboard,
+            org_id=self.org_id,
+            extra_filters={"combinator": "and", "rules": [{"field": "region", "operator": "=", "value": "South"}]},
+            card_ids={card.id for card in dashboard.cards if card.question_id == count_card.id},
+        )
+        self.assertEqual(filtered["cards"][0]["result"]["rows"], [{"region": "South", "responses": 2}])
+        self.assertIsNotNone(filtered["cards"][0]["result"]["query_id"])
+
+        # Card queries share the org's analytics slots with every other query.
+        slots = AnalyticsQueryGuard._semaphore(self.org_id)
+        for _ in range(AnalyticsQueryGuard.MAX_CONCURRENT_PER_ORG):
+            slots.acquire()
+        try:
+            with mock.patch.object(AnalyticsQueryGuard, "QUEUE_TIMEOUT_SECONDS", 0.05):
+                crowded = DashboardRunService.run_dashboard(dashboard, org_id=self.org_id)
+        finally:
+            for _ in range(AnalyticsQueryGuard.MAX_CONCURRENT_PER_ORG):
+                slots.release()
+        self.assertEqual(
+            {card["question_id"]: (card["status"], card["error"]) for card in crowded["cards"] if card["status"] != "skipped"},
+            {item.id: ("error", "ANALYTICS_QUEUE_FULL") for item in (count_card, repeat_card, people_card)},
+        )
+
+    def test_dashboard_card_timeout_starts_when_the_card_runs(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+
+        def card(job, seconds):
+            job["started_at"] = time.monotonic()
+            time.sleep(seconds)
+            return seconds
+
+        # Another run holds the only worker longer than this run's timeout.
+        pool.submit(time.sleep, 0.3)
+        quick, slow = {"cards": []}, {"cards": []}
+        futures = {pool.submit(card, quick, 0.05): quick, pool.submit(card, slow, 0.5): slow}
+        with mock.patch.object(DashboardRunService, "TIMEOUT_GRACE_SECONDS", 0):
+            timed_out = DashboardRunService._wait_per_job(futures, time.monotonic(), 0.2)
+
+        self.assertEqual([futures[future] for future in timed_out], [slow])
+        quick_future = next(future for future, job in futures.items() if job is quick)
+        self.assertEqual(quick_future.result(), 0.05)
+
+    def test_rollup_answers_matching_queries_and_tracks_new_submissions(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+
+        def submit(name, region):
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": name, "region": region, "satisfaction": "good", "comments": ""},
+                user_id=self.user.id,
+                metadata={},
+            )
+
+        submit("Ada", "North")
+        submit("Kofi", "North")
+        rollup = AnalyticsRollupService.create_rollup(
+            self.db,
+            self.org_id,
+            dataset.id,
+            name="Daily by region",
+            bucket="day",
+            time_field="_submitted_at",
+            dimensions=["region"],
+            measures=["customer_name"],
+        )
+        self.assertEqual(rollup.status, "building")
+        submit("Ama", "South")
+        job = self._wait_for_rollup_build(rollup.id)
+        self.assertEqual(job.status, "succeeded", job.error)
+        self.db.refresh(rollup)
+        self.assertEqual(rollup.status, "active")
+
+        # While a rebuild is pending, inserts are parked and queries read raw rows.
+        rollup.status = "building"
+        self.db.commit()
+        submit(None, "South")
+        self.assertEqual(self.db.query(AnalyticsRollupPending).filter(AnalyticsRollupPending.rollup_id == rollup.id).count(), 1)
+        pending_result = AnalyticsService.execute_query(
+            self.db,
+            self.org_id,
+            dataset.id,
+            select_fields=[],
+            group_by=["region"],
+            aggregates=[{"field": "_submission_id", "fn": "count", "alias": "responses"}],
+        )
+        self.assertNotIn("rollup_id", pending_result)
+        with SessionLocal() as job_db:
+            self.assertEqual(
+                AnalyticsRollupService.build(job_db, rollup.id),
+                {"rollup_id": str(rollup.id), "cells": 4, "caught_up_submissions": 0},
+            )
+        self.db.expire_all()
+        self.assertEqual(self.db.query(AnalyticsRollupPending).filter(AnalyticsRollupPending.rollup_id == rollup.id).count(), 0)
+
+        def run(**query):
+            return AnalyticsService.execute_query(
+                self.db,
+                self.org_id,
+                dataset.id,
+                select_fields=[],
+                order_by=[{"field": "region", "direction": "asc"}],
+                **query,
+            )
+
+        grouped = run(
+            group_by=["region"],
+            aggregates=[
+                {"field": "_submission_id", "fn": "count", "alias": "responses"},
+                {"field": "customer_name", "fn": "count", "alias": "named"},
+            ],
+        )
+        self.assertEqual(grouped["rollup_id"], str(rollup.id))
+        self.assertEqual(
+            grouped["rows"],
+            [{"region": "North", "responses": 2, "named": 2}, {"region": "South", "responses": 2, "named": 1}],
+        )
+
+        monthly = run(
+            group_by=["region", {"field": "_submitted_at", "bucket": "month"}],
+            aggregates=[{"field": "_submission_id", "fn": "count", "alias": "responses"}],
+            filters={"combinator": "and", "rules": [{"field": "region", "operator": "=", "value": "South"}]},
+        )
+        self.assertEqual(monthly["rollup_id"], str(rollup.id))
+        self.assertEqual([row["responses"] for row in monthly["rows"]], [2])
+
+        raw = run(
+            group_by=["region"],
+            aggregates=[{"field": "_submission_id", "fn": "count", "alias": "responses"}],
+            filters={"combinator": "and", "rules": [{"field": "satisfaction", "operator": "=", "value": "good"}]},
+        )
+        self.assertNotIn("rollup_id", raw)
+        self.assertEqual([row["responses"] for row in raw["rows"]], [2, 2])
+
+    def test_query_plan_is_reused_across_filter_values(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        for name, region in [("Ada", "North"), ("Kofi", "North"), ("Ama", "South"), ("Yaw", "East")]:
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": name, "region": region, "satisfaction": "good", "comments": ""},
+                user_id=self.user.id,
+                metadata={},
+            )
+        AnalyticsQueryPlanCache.clear()
+
+        def names(operator, value):
+            result = AnalyticsService.execute_query(
+                self.db,
+                self.org_id,
+                dataset.id,
+                select_fields=["customer_name"],
+                filters={"combinator": "and", "rules": [{"field": "region", "operator": operator, "value": value}]},
+                order_by=[{"field": "customer_name", "direction": "asc"}],
+            )
+            return [row["customer_name"] for row in result["rows"]]
+
+        self.assertEqual(names("=", "North"), ["Ada", "Kofi"])
+        self.assertEqual(names("=", "South"), ["Ama"])
+        self.assertEqual(len(AnalyticsQueryPlanCache._plans), 1)
+
+        self.assertEqual(names("in", ["South", "East"]), ["Ama", "Yaw"])
+        self.assertEqual(names("in", "North, East"), ["Ada", "Kofi", "Yaw"])
+        self.assertEqual(names("=", None), [])
+        self.assertEqual(len(AnalyticsQueryPlanCache._plans), 3)
+
+    def test_query_guard_rejects_costly_queries_queues_and_cancels(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+
+        def run(max_cost):
+            return AnalyticsService.execute_query(
+                self.db,
+                self.org_id,
+                dataset.id,
+                select_fields=[],
+                group_by=["customer_name"],
+                aggregates=[{"field": "_submission_id", "fn": "count", "alias": "responses"}],
+                max_estimated_cost=max_cost,
+            )
+
+        with self.assertRaisesRegex(ValueError, "QUERY_TOO_EXPENSIVE"):
+            run(0.001)
+        self.assertEqual(run(AnalyticsQueryGuard.MAX_ESTIMATED_COST)["rows"], [])
+
+        query_id = uuid.uuid4()
+        outcome = {}
+
+        def long_query():
+            session = SessionLocal()
+            try:
+                with AnalyticsQueryGuard.running(session, self.org_id, query_id):
+                    outcome["started"] = True
+                    session.execute(text("SELECT pg_sleep(10)"))
+            except Exception as exc:  # noqa: BLE001 - asserted below
+                outcome["error"] = exc
+            finally:
+                session.rollback()
+                session.close()
+
+        with mock.patch.object(AnalyticsQueryGuard, "QUEUE_TIMEOUT_SECONDS", 0.05), mock.patch.object(
+            AnalyticsQueryGuard, "MAX_CONCURRENT_PER_ORG", 1
+        ):
+            AnalyticsQueryGuard._slots.pop(self.org_id, None)
+            worker = threading.Thread(target=long_query)
+            worker.start()
+            for _ in range(100):
+                if outcome.get("started"):
+                    break
+                worker.join(0.05)
+            with self.assertRaisesRegex(ValueError, "ANALYTICS_QUEUE_FULL"):
+                with AnalyticsQueryGuard.running(self.db, self.org_id, uuid.uuid4()):
+                    pass
+            for _ in range(100):
+                self.assertFalse(AnalyticsQueryGuard.cancel(self.db, uuid.uuid4(), query_id))
+                if AnalyticsQueryGuard.cancel(self.db, self.org_id, query_id):
+                    break
+                worker.join(0.05)
+            else:
+                self.fail("query never became cancellable")
+            worker.join(5)
+            AnalyticsQueryGuard._slots.pop(self.org_id, None)
+
+        self.assertTrue(is_query_canceled(outcome["error"]))
+        self.assertFalse(AnalyticsQueryGuard.cancel(self.db, self.org_id, query_id))
+
+        session = SessionLocal()
+        try:
+            with AnalyticsQueryGuard.running(session, self.org_id, query_id, timeout_seconds=2):
+                session.commit()
+                # The transaction begun after the commit is still bounded and cancellable.
+                self.assertEqual(session.execute(text("SHOW statement_timeout")).scalar(), "2s")
+                self.assertEqual(
+                    session.execute(text("SHOW application_name")).scalar(),
+                    AnalyticsQueryGuard.application_name(self.org_id, query_id),
+                )
+            session.commit()
+            self.assertNotEqual(session.execute(text("SHOW statement_timeout")).scalar(), "2s")
+        finally:
+            session.close()
+
+    def test_linked_dataset_formulas_run_in_sql(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        for name, region, visits in [("Ada", "North", "12"), ("Kofi", "North", "4"), ("Ama", "South", "7"), ("Yaw", "South", "n/a")]:
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": name, "region": region, "satisfaction": "good", "comments": visits},
+                user_id=self.user.id,
+                metadata={},
+            )
+
+        linked = AnalyticsService.create_derived_dataset(
+            self.db,
+            self.org_id,
+            name="Visit bands",
+            mode="linked",
+            parent_dataset_id=dataset.id,
+            columns=[
+                {"key": "customer_name", "label": "Customer Name"},
+                {"key": "region", "label": "Region"},
+                {"key": "comments", "label": "Visits"},
+                {"key": "calc_double", "label": "Double", "calculated": True, "formula": "=[Visits] * 2"},
+                {"key": "calc_band", "label": "Band", "calculated": True, "formula": '=IF([Double]>=14, "high", "low")'},
+                {"key": "calc_lookup", "label": "Lookup", "calculated": True, "formula": "=VLOOKUP([Visits], A1:B2, 2)"},
+            ],
+        )
+
+        def run(**query):
+            return AnalyticsService.execute_query(self.db, self.org_id, linked["dataset_id"], **query)
+
+        rows = run(select_fields=[], order_by=[{"field": "calc_double", "direction": "desc"}])["rows"]
+        self.assertEqual(
+            [(row["customer_name"], row["calc_double"], row["calc_band"]) for row in rows],
+            [("Yaw", None, "low"), ("Ada", 24.0, "high"), ("Ama", 14.0, "high"), ("Kofi", 8.0, "low")],
+        )
+        self.assertNotIn("calc_lookup", rows[0])
+
+        grouped = run(
+            select_fields=[],
+            group_by=["calc_band"],
+            aggregates=[{"field": "calc_double", "fn": "sum", "alias": "total"}],
+            filters={"combinator": "and", "rules": [{"field": "calc_double", "operator": ">", "value": "5"}]},
+            order_by=[{"field": "calc_band", "direction": "asc"}],
+        )
+        self.assertEqual(grouped["rows"], [{"calc_band": "high", "total": 38.0}, {"calc_band": "low", "total": 8.0}])
+
+        # Formulas compile once per table revision, not on every request.
+        with mock.patch.object(
+            AnalyticsService, "_linked_calculated_fields", wraps=AnalyticsService._linked_calculated_fields
+        ) as compile_formulas:
+            run(select_fields=["customer_name", "calc_band"])
+            run(select_fields=[], order_by=[{"field": "calc_double", "direction": "desc"}])
+            self.assertEqual(compile_formulas.call_count, 0)
+            table = self.db.query(FormDataset).filter(FormDataset.id == linked["dataset_id"]).one()
+            table.metadata_json = {**table.metadata_json, "name": "Visit bands v2"}
+            self.db.commit()
+            run(select_fields=[])
+            run(select_fields=[])
+        self.assertEqual(compile_formulas.call_count, 1)
+
+    def test_snapshot_is_copied_server_side_by_background_job(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        for name, visits in [("Ada", "12"), ("Kofi", "4"), ("Ama", None)]:
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": name, "region": "North", "satisfaction": "good", "comments": visits},
+                user_id=self.user.id,
+                metadata={},
+            )
+
+        with mock.patch("app.services.analytics_service.SNAPSHOT_BATCH_SIZE", 2):
+            created = AnalyticsService.create_derived_dataset(
+                self.db,
+                self.org_id,
+                name="Visit snapshot",
+                mode="snapshot",
+                parent_dataset_id=dataset.id,
+                columns=[
+                    {"key": "customer_name", "label": "Customer Name"},
+                    {"key": "comments", "label": "Visits"},
+                    {"key": "calc_double", "label": "Double", "calculated": True, "formula": "=[Visits] * 2"},
+                ],
+                user_id=self.user.id,
+            )
+            self.assertIsNotNone(created["job_id"])
+            for _ in range(100):
+                self.db.expire_all()
+                job = self.db.query(BackgroundJob).filter(BackgroundJob.id == created["job_id"]).one()
+                if job.status in ("succeeded", "failed"):
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(job.status, "succeeded", job.error)
+        self.assertEqual((job.progress_done, job.progress_total), (3, 3))
+        self.assertEqual(job.result_json["row_count"], 3)
+
+        snapshot = self.db.query(FormDataset).filter(FormDataset.id == created["dataset_id"]).one()
+        self.assertEqual(snapshot.metadata_json["snapshot_status"], "ready")
+        rows = (
+            self.db.query(Submission.data)
+            .filter(Submission.dataset_id == snapshot.id)
+            .order_by(Submission.data["customer_name"].as_string())
+            .all()
+        )
+        self.assertEqual(
+            [row.data for row in rows],
+            [
+                {"customer_name": "Ada", "comments": "12", "calc_double": 24.0},
+                {"customer_name": "Ama"},
+                {"customer_name": "Kofi", "comments": "4", "calc_double": 8.0},
+            ],
+        )
+
+        failed = AnalyticsService.create_derived_dataset(
+            self.db,
+            self.org_id,
+            name="Lookup snapshot",
+            mode="snapshot",
+            parent_dataset_id=dataset.id,
+            columns=[
+                {"key": "customer_name", "label": "Customer Name"},
+                {"key": "comments", "label": "Visits"},
+                {"key": "calc_lookup", "label": "Lookup", "calculated": True, "formula": "=VLOOKUP([Visits], A1:B2, 2)"},
+            ],
+            user_id=self.user.id,
+        )
+        for _ in range(100):
+            self.db.expire_all()
+            job = self.db.query(BackgroundJob).filter(BackgroundJob.id == failed["job_id"]).one()
+            if job.status in ("succeeded", "failed"):
+                break
+            time.sleep(0.05)
+        # Formulas that only the client can evaluate fail the copy instead of being dropped from it.
+        self.assertEqual((job.status, job.error), ("failed", "UNSUPPORTED_CALCULATED_COLUMNS:calc_lookup"))
+        snapshot = self.db.query(FormDataset).filter(FormDataset.id == failed["dataset_id"]).one()
+        self.assertEqual(snapshot.metadata_json["snapshot_status"], "failed")
+        self.assertEqual(self.db.query(Submission).filter(Submission.dataset_id == snapshot.id).count(), 0)
+
+    def test_draft_history_is_stored_as_keyframes_and_deltas(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        expected = [form.blueprint_draft]
+        with mock.patch.object(FormService, "DRAFT_KEYFRAME_INTERVAL", 3):
+            for revision in range(7):
+                blueprint = self._draft_blueprint_v1()
+                blueprint["schema"].insert(
+                    1, {"id": f"q_note_{revision}", "key": f"note_{revision}", "type": "string", "label": f"Note {revision}"}
+                )
+                blueprint["schema"][0]["label"] = f"Customer Name r{revision}"
+                FormService.update_blueprint(self.db, form.id, blueprint, updated_by=self.user.id)
+                expected.append(FormService._normalize_blueprint(blueprint))
+
+        drafts = (
+            self.db.query(FormVersion)
+            .filter(FormVersion.form_id == form.id)
+            .order_by(FormVersion.version_number.asc())
+            .all()
+        )
+        # The active head is full; runs of superseded drafts are capped at three deltas.
+        self.assertEqual(
+            [version.blueprint is not None for version in drafts],
+            [False, False, False, True, False, False, False, True],
+        )
+        for version, blueprint in zip(drafts, expected):
+            self.assertEqual(FormService.get_version_blueprint(self.db, version), blueprint)
+
+        response = self.client.get(
+            f"/api/v1/forms/{form.id}/versions/{drafts[2].id}",
+            headers={"Authorization": f"Bearer {self._token()}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["blueprint"], expected[2])
+
+        # Rows written before delta encoding are full; compaction rewrites them.
+        for version in drafts[:-1]:
+            version.blueprint = FormService.get_version_blueprint(self.db, version)
+        for version in drafts[:-1]:
+            version.base_version_id = None
+            version.blueprint_delta = None
+        self.db.commit()
+        with mock.patch.object(FormService, "DRAFT_KEYFRAME_INTERVAL", 3):
+            result = FormService.compact_draft_history(self.db, form.id)
+        self.assertEqual(result["delta_versions"], 6)
+        self.db.expire_all()
+        self.assertEqual(
+            [version.blueprint is not None for version in drafts],
+            [False, False, False, True, False, False, False, True],
+        )
+        for version, blueprint in zip(drafts, expected):
+            self.assertEqual(FormService.get_version_blueprint(self.db, version), blueprint)
+
+        published = FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        self.assertEqual(published.blueprint_live, expected[-1])
+
+    def test_blueprint_patch_applies_field_operations_with_revision_check(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        headers = {"Authorization": f"Bearer {self._token()}"}
+        url = f"/api/v1/forms/{form.id}/blueprint"
+
+        response = self.client.patch(
+            url,
+            json={
+                "base_revision": 0,
+                "operations": [
+                    {"op": "add", "path": "/ui/-", "value": {"id": "screen_a", "type": "screen", "children": []}},
+                    {"op": "add", "path": "/ui/-", "value": {"id": "screen_b", "type": "screen", "children": []}},
+                    {"op": "add_field", "section_id": "screen_a", "field": {"key": "visit date", "type": "date"}},
+                    {"op": "update_field", "field_id": "q_region", "changes": {"label": "Sales Region"}},
+                    {"op": "move_field", "field_id": "comments", "index": 0},
+                    {"op": "remove_field", "field_id": "q_satisfaction"},
+                    {"op": "reorder_sections", "order": ["screen_b", "screen_a"]},
+                ],
+            },
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["blueprint_revision"], 1)
+
+        self.db.expire_all()
+        draft = self.db.query(Form).filter(Form.id == form.id).one().blueprint_draft
+        self.assertEqual(
+            [(entry["key"], entry["id"]) for entry in draft["schema"]],
+            [("comments", "q_comments"), ("customer_name", "q_customer_name"), ("region", "q_region"), ("visit_date", "visit_date")],
+        )
+        self.assertEqual(draft["schema"][2]["label"], "Sales Region")
+        self.assertEqual([section["id"] for section in draft["ui"]], ["screen_b", "screen_a"])
+        self.assertEqual(draft["ui"][1]["children"], [{"bind": "visit_date", "type": "date", "id": "visit_date", "field_id": "visit_date", "dataset_field_id": "visit_date"}])
+        self.assertEqual(draft, FormService._normalize_blueprint(draft))
+
+        stale = self.client.patch(url, json={"base_revision": 0, "operations": [{"op": "remove", "path": "/schema/0"}]}, headers=headers)
+        self.assertEqual(stale.status_code, 409)
+        invalid = self.client.patch(
+            url,
+            json={"base_revision": 1, "operations": [{"op": "remove", "path": "/schema/0"}, {"op": "test", "path": "/meta/title", "value": "Other"}]},
+            headers=headers,
+        )
+        self.assertEqual(invalid.status_code, 400)
+        self.db.expire_all()
+        self.assertEqual(self.db.query(Form).filter(Form.id == form.id).one().blueprint_draft, draft)
+
+        # Full saves enforce the revision too, so the fallback cannot overwrite another editor.
+        stale_put = self.client.put(f"{url}?base_revision=0", json=self._draft_blueprint_v1(), headers=headers)
+        self.assertEqual(stale_put.status_code, 409)
+        saved = self.client.put(f"{url}?base_revision=1", json=self._draft_blueprint_v1(), headers=headers)
+        self.assertEqual(saved.status_code, 200, saved.text)
+        self.assertEqual(saved.json()["blueprint_revision"], 2)
+
+    def test_blueprint_index_is_compiled_once_per_published_version(self):
+        blueprint = self._draft_blueprint_v1()
+        blueprint["ui"] = [
+            {
+                "id": "screen_1",
+                "title": "Visit",
+                "children": [
+                    {"bind": "satisfaction", "type": "radio", "label": "Satisfaction", "options": [{"label": "Good", "value": "good"}, "bad"]},
+                    {"bind": "photo", "type": "photo capture", "label": "Storefront"},
+                ],
+            }
+        ]
+        form = FormService.create_form(self.db, project_id=self.project.id, title="Customer Survey", blueprint=blueprint)
+        form = FormService.publish_form(self.db, form.id, published_by=self.user.id)
+
+        with mock.patch.object(BlueprintIndex, "compile", wraps=BlueprintIndex.compile) as compile_index:
+            index = BlueprintIndexCache.for_live_form(form)
+            self.assertIs(BlueprintIndexCache.for_live_form(form), index)
+            self.assertEqual(compile_index.call_count, 1)
+
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        self.assertEqual(set(index.fields_by_identifier), {field.field_identifier for field in dataset.fields})
+        self.assertEqual(index.option_maps["satisfaction"], [{"label": "Good", "value": "good"}, {"label": "bad", "value": "bad"}])
+        self.assertEqual([field.as_dict() for field in index.media_fields], [{"bind": "photo", "type": "photo_capture", "label": "Storefront"}])
+        self.assertEqual([field.bind for field in index.sections[0].fields], ["satisfaction", "photo"])
+
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        self.assertIsNot(BlueprintIndexCache.for_live_form(form), index)
+
+    def test_linked_forms_resolve_one_query_per_level_and_cache_until_republish(self):
+        def publish(title, links):
+            blueprint = self._draft_blueprint_v1()
+            blueprint["linked_form_ids"] = [str(link) for link in links]
+            form = FormService.create_form(self.db, project_id=self.project.id, title=title, blueprint=blueprint)
+            return FormService.publish_form(self.db, form.id, published_by=self.user.id)
+
+        member = publish("Member", [])
+        household = publish("Household", [member.id])
+        visit = publish("Visit", [])
+        root = publish("Census", [household.id, visit.id, uuid.uuid4(), "not-a-uuid"])
+        FormService.update_blueprint(
+            self.db, member.id, {**self._draft_blueprint_v1(), "linked_form_ids": [str(root.id), str(visit.id)]}
+        )
+        FormService.publish_form(self.db, member.id, published_by=self.user.id)
+
+        root_id, household_id, visit_id, member_id = root.id, household.id, visit.id, member.id
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine_sync, "before_cursor_execute", record)
+        try:
+            linked = FormService.get_linked_forms(self.db, root_id)
+            self.assertEqual([form.id for form in linked], [household_id, visit_id, member_id])
+            # Root, its children, the grandchild, then the full rows.
+            self.assertEqual(len(statements), 4)
+
+            statements.clear()
+            linked = FormService.get_linked_forms(self.db, root_id)
+            self.assertEqual([form.id for form in linked], [household_id, visit_id, member_id])
+            self.assertEqual(len(statements), 2)
+        finally:
+            event.remove(engine_sync, "before_cursor_execute", record)
+
+        extra = publish("Extra", [])
+        FormService.update_blueprint(self.db, visit.id, {**self._draft_blueprint_v1(), "linked_form_ids": [str(extra.id)]})
+        FormService.publish_form(self.db, visit.id, published_by=self.user.id)
+        self.assertEqual(
+            [form.id for form in FormService.get_linked_forms(self.db, root.id)],
+            [household.id, visit.id, member.id, extra.id],
+        )
+        self.assertEqual([form.id for form in FormService.get_linked_forms(self.db, root.id, max_depth=1)], [household.id, visit.id])
+
+    def test_publish_job_migrates_renamed_keys_and_rebuilds_rollups(self):
+        form = FormService.create_form(self.db, project_id=self.project.id, title="Customer Survey", blueprint=self._draft_blueprint_v1())
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        for name, region in (("Ada", "North"), ("Kofi", "North"), ("Ama", "South")):
+            SubmissionService.create_submission(
+                self.db, form_id=form.id, data={"customer_name": name, "region": region}, user_id=self.user.id
+            )
+        rollup = AnalyticsRollupService.create_rollup(
+            self.db,
+            self.org_id,
+            dataset.id,
+            name="Daily by region",
+            bucket="day",
+            time_field="_submitted_at",
+            dimensions=["region"],
+            measures=["customer_name"],
+        )
+        self.assertEqual(self._wait_for_rollup_build(rollup.id).status, "succeeded")
+
+        renamed = self._draft_blueprint_v1()
+        renamed["schema"][1]["key"] = "area"
+        FormService.update_blueprint(self.db, form.id, renamed)
+
+        with mock.patch.object(FormService, "PUBLISH_MIGRATION_BATCH_ROWS", 2):
+            response = self.client.post(
+                f"/api/v1/forms/{form.id}/publish-job",
+                json={"migrate_renamed_keys": True},
+                headers={"Authorization": f"Bearer {self._token()}"},
+            )
+            self.assertEqual(response.status_code, 202, response.text)
+            for _ in range(100):
+                self.db.expire_all()
+                job = self.db.query(BackgroundJob).filter(BackgroundJob.id == response.json()["id"]).one()
+                if job.status in ("succeeded", "failed"):
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(job.status, "succeeded", job.error)
+        self.assertEqual(job.kind, "form_publish")
+        self.assertEqual(job.progress_done, 3)
+        self.assertEqual(
+            job.result_json,
+            {
+                "form_id": str(form.id),
+                "published_version": 2,
+                "renamed_keys": {"region": "area"},
+                "migrated_submissions": 3,
+                "rebuilt_rollups": 1,
+            },
+        )
+        rows = self.db.query(Submission).filter(Submission.form_id == form.id).all()
+        self.assertEqual(sorted(row.data["area"] for row in rows), ["North", "North", "South"])
+        self.assertFalse(any("region" in row.data for row in rows))
+
+        rebuild = self._wait_for_rollup_build(rollup.id)
+        self.assertEqual(rebuild.status, "succeeded", rebuild.error)
+        self.db.refresh(rollup)
+        self.assertEqual((rollup.dimensions, rollup.status), (["area"], "active"))
+        cells = self.db.query(AnalyticsRollupCell).filter(AnalyticsRollupCell.rollup_id == rollup.id, AnalyticsRollupCell.measure_key == "*").all()
+        self.assertEqual(sorted((cell.dimensions["area"], cell.value_count) for cell in cells), [("North", 2), ("South", 1)])
+
+    def test_publish_migrates_swapped_and_chained_keys_exactly_once(self):
+        form = FormService.create_form(self.db, project_id=self.project.id, title="Customer Survey", blueprint=self._draft_blueprint_v1())
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        for name, region, satisfaction in (("Ada", "North", "good"), ("Kofi", "North", "bad"), ("Ama", "South", "good")):
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": name, "region": region, "satisfaction": satisfaction, "comments": f"{name} says hi"},
+                user_id=self.user.id,
+            )
+
+        renamed = self._draft_blueprint_v1()
+        # Swap customer_name <-> region; chain satisfaction -> comments -> remarks.
+        renamed["schema"][0]["key"] = "region"
+        renamed["schema"][1]["key"] = "customer_name"
+        renamed["schema"][2]["key"] = "comments"
+        renamed["schema"][3]["key"] = "remarks"
+        FormService.update_blueprint(self.db, form.id, renamed)
+
+        migrate = FormService._migrate_renamed_keys
+        seen_outside = []
+
+        def migrate_and_look_from_another_session(db, form_id, renames, progress=None):
+            migrated = migrate(db, form_id, renames, progress)
+            # Until the switch commits, other readers still see every answer on its old key.
+            with SessionLocal() as other:
+                seen_outside.extend(row.data for row in other.query(Submission).filter(Submission.form_id == form_id))
+            return migrated
+
+        outcome = {}
+        with mock.patch.object(FormService, "PUBLISH_MIGRATION_BATCH_ROWS", 2), mock.patch.object(
+            FormService, "_migrate_renamed_keys", side_effect=migrate_and_look_from_another_session
+        ):
+            FormService.publish_form(
+                self.db, form.id, published_by=self.user.id, migrate_renamed_keys=True, outcome=outcome
+            )
+
+        self.assertEqual(
+            outcome["renamed_keys"],
+            {"customer_name": "region", "region": "customer_name", "satisfaction": "comments", "comments": "remarks"},
+        )
+        self.assertEqual(outcome["migrated_submissions"], 3)
+        self.assertEqual(sorted(data["customer_name"] for data in seen_outside), ["Ada", "Ama", "Kofi"])
+        self.assertTrue(all("satisfaction" in data and "remarks" not in data for data in seen_outside))
+        self.db.expire_all()
+        rows = self.db.query(Submission).filter(Submission.form_id == form.id).all()
+        self.assertEqual(
+            sorted((row.data["region"], row.data["customer_name"], row.data["comments"], row.data["remarks"]) for row in rows),
+            [
+                ("Ada", "North", "good", "Ada says hi"),
+                ("Ama", "South", "good", "Ama says hi"),
+                ("Kofi", "North", "bad", "Kofi says hi"),
+            ],
+        )
+        self.assertFalse(any("satisfaction" in row.data for row in rows))
+
+    def test_failed_publish_moves_renamed_answers_back(self):
+        form = FormService.create_form(self.db, project_id=self.project.id, title="Customer Survey", blueprint=self._draft_blueprint_v1())
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        for name, region in (("Ada", "North"), ("Kofi", "North"), ("Ama", "South")):
+            SubmissionService.create_submission(
+                self.db, form_id=form.id, data={"customer_name": name, "region": region}, user_id=self.user.id
+            )
+        original = {row.id: dict(row.data) for row in self.db.query(Submission).filter(Submission.form_id == form.id)}
+
+        renamed = self._draft_blueprint_v1()
+        renamed["schema"][0]["key"] = "region"
+        renamed["schema"][1]["key"] = "area"
+        FormService.update_blueprint(self.db, form.id, renamed)
+
+        with mock.patch.object(FormService, "PUBLISH_MIGRATION_BATCH_ROWS", 2), mock.patch.object(
+            FormService, "ensure_live_dataset", side_effect=RuntimeError("dataset sync failed")
+        ):
+            with self.assertRaises(RuntimeError):
+                FormService.publish_form(self.db, form.id, published_by=self.user.id, migrate_renamed_keys=True)
+
+        self.db.expire_all()
+        self.assertEqual(self.db.query(Form).filter(Form.id == form.id).one().published_version, 1)
+        rows = {row.id: row.data for row in self.db.query(Submission).filter(Submission.form_id == form.id)}
+        self.assertEqual(rows, original)
+
+    def test_interrupted_jobs_are_failed_and_publish_skips_the_bulk_queue(self):
+        stale = BackgroundJobService.create(self.db, self.org_id, "csv_import", user_id=self.user.id)
+        fresh = BackgroundJobService.create(self.db, self.org_id, "csv_import", user_id=self.user.id)
+        stale.status = "running"
+        stale.updated_at = datetime.utcnow() - timedelta(seconds=BackgroundJobService.STALE_SECONDS + 1)
+        self.db.commit()
+        BackgroundJobService.fail_orphaned()
+        self.db.expire_all()
+        self.assertEqual((stale.status, stale.error), ("failed", "JOB_INTERRUPTED"))
+        self.assertEqual(fresh.status, "queued")
+
+        release = threading.Event()
+        bulk = []
+        for _ in range(BackgroundJobService.MAX_WORKERS + 1):
+            job = BackgroundJobService.create(self.db, self.org_id, "csv_import", user_id=self.user.id)
+            bulk.append(BackgroundJobService.start(job.id, lambda job_db, progress: release.wait(5)))
+        try:
+            publish = BackgroundJobService.create(self.db, self.org_id, "form_publish", user_id=self.user.id)
+            BackgroundJobService.start(publish.id, lambda job_db, progress: {"published": True}, priority=True).result(timeout=2)
+            self.assertGreaterEqual(BackgroundJobService.heartbeat(), len(bulk))
+        finally:
+            release.set()
+            for future in bulk:
+                future.result(timeout=5)
+        self.db.expire_all()
+        self.assertEqual((publish.status, publish.result_json), ("succeeded", {"published": True}))
+
+    def test_renamed_keys_publish_only_through_a_single_job(self):
+        form = FormService.create_form(self.db, project_id=self.project.id, title="Customer Survey", blueprint=self._draft_blueprint_v1())
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        headers = {"Authorization": f"Bearer {self._token()}"}
+
+        response = self.client.post(f"/api/v1/forms/{form.id}/publish", json={"migrate_renamed_keys": True}, headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        running = BackgroundJobService.create(self.db, self.org_id, "form_publish", user_id=self.user.id, subject_id=form.id)
+        response = self.client.post(f"/api/v1/forms/{form.id}/publish-job", json={"migrate_renamed_keys": True}, headers=headers)
+        self.assertEqual(response.status_code, 409)
+        self.db.delete(running)
+        self.db.commit()
+
+    def test_submissions_are_validated_against_the_live_blueprint(self):
+        blueprint = self._draft_blueprint_v1()
+        blueprint["ui"] = [
+            {
+                "id": "screen_1",
+                "title": "Visit",
+                "children": [
+                    {"bind": "visits", "type": "input_number", "label": "Visits", "required": True, "min": 0, "max": 50},
+                    {
+                        "bind": "satisfaction",
+                        "type": "radio_group",
+                        "label": "Satisfaction",
+                        "options": [{"label": "Good", "value": "good"}, {"label": "Bad", "value": "bad", "skip_to": "screen_3"}],
+                    },
+                    {"bind": "comments", "type": "textarea", "label": "Comments", "maxLength": 20},
+                ],
+            },
+            {"id": "screen_2", "title": "Follow up", "children": [{"bind": "reason", "type": "input_text", "label": "Reason", "required": True}]},
+            {"id": "screen_3", "title": "Close", "children": [{"bind": "consent", "type": "toggle", "label": "Consent"}]},
+        ]
+        blueprint["rules"] = [
+            {
+                "id": "hide_comments",
+                "name": "Hide comments without visits",
+                "enabled": True,
+                "condition": {"id": "root", "type": "group", "combinator": "AND", "children": [{"id": "c1", "type": "rule", "field": "visits", "operator": "==", "value": "0"}]},
+                "actions": [{"effect": "HIDE", "target_id": "comments", "target_type": "field"}],
+            }
+        ]
+        form = FormService.create_form(self.db, project_id=self.project.id, title="Customer Survey", blueprint=blueprint)
+        form = FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        self.assertIs(SubmissionValidatorCache.for_live_form(form), SubmissionValidatorCache.for_live_form(form))
+
+        submission = SubmissionService.create_submission(
+            self.db,
+            form_id=form.id,
+            data={"visits": "12", "satisfaction": "bad", "consent": "yes", "customer_name": "Ada"},
+            user_id=self.user.id,
+        )
+        self.assertEqual(submission.data, {"visits": 12, "satisfaction": "bad", "consent": True, "customer_name": "Ada"})
+
+        invalid = {"visits": "0", "satisfaction": "meh", "comments": "hello", "consent": "maybe"}
+        with self.assertRaises(SubmissionValidationError) as rejected:
+            SubmissionService.create_submission(
+                self.db, form_id=form.id, data=invalid, user_id=self.user.id, validation_mode="strict"
+            )
+        self.assertEqual(
+            rejected.exception.issues,
+            [
+                {"field": "satisfaction", "code": "not_an_option"},
+                {"field": "comments", "code": "skipped_question"},
+                {"field": "reason", "code": "required"},
+                {"field": "consent", "code": "not_a_boolean"},
+            ],
+        )
+
+        lenient = SubmissionService.create_submission(
+            self.db, form_id=form.id, data={**invalid, "reason": "Closed"}, user_id=self.user.id
+        )
+        self.assertEqual(lenient.data, {"visits": 0, "reason": "Closed"})
+        # Rejected answers leave the typed data but keep the value as sent.
+        self.assertEqual(
+            lenient.metadata_json["validation_issues"],
+            [
+                {"field": "satisfaction", "code": "not_an_option", "value": "meh"},
+                {"field": "comments", "code": "skipped_question", "value": "hello"},
+                {"field": "consent", "code": "not_a_boolean", "value": "maybe"},
+            ],
+        )
+
+        response = self.client.post(
+            "/api/v1/submissions",
+            json={"form_id": str(form.id), "data": {"visits": 99, "reason": "Closed"}, "validation_mode": "strict"},
+            headers={"Authorization": f"Bearer {self._token()}"},
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["detail"]["issues"], [{"field": "visits", "code": "above_max"}])
+
+        # Clients that predate validation modes (and their offline queues) are ingested leniently.
+        response = self.client.post(
+            "/api/v1/submissions",
+            json={"form_id": str(form.id), "data": {"visits": 99, "reason": "Closed"}},
+            headers={"Authorization": f"Bearer {self._token()}"},
+        )
+        self.assertEqual(response.status_code, 201, response.text)
+        self.assertEqual(response.json()["data"], {"reason": "Closed"})
+
+    def test_csv_upload_streams_rows_through_copy_in_a_background_job(self):
+        upload = (
+            "\ufeffName,Visits,Name,\r\n"
+            "Ada,12,A,x\r\n"
+            "Kofi,4,,\r\n"
+            ",,,\r\n"
+            "\"Ama, Jr\",n/a,C,\r\n"
+        ).encode("utf-8")
+
+        with mock.patch.object(CsvImportService, "SAMPLE_ROWS", 2), mock.patch.object(CsvImportService, "COPY_BATCH_ROWS", 2):
+            response = self.client.post(
+                f"/api/v1/organizations/{self.org_id}/analytics/upload-csv",
+                params={"project_id": str(self.project.id)},
+                files={"file": ("visits.csv", upload, "text/csv")},
+                headers={"Authorization": f"Bearer {self._token()}"},
+            )
+            self.assertEqual(response.status_code, 202, response.text)
+            created = response.json()
+            self.assertEqual(
+                [(field["key"], field["field_type"]) for field in created["fields"]],
+                [("Name", "string"), ("Visits", "number"), ("Name_2", "string"), ("column_4", "string")],
+            )
+            for _ in range(100):
+                self.db.expire_all()
+                job = self.db.query(BackgroundJob).filter(BackgroundJob.id == created["job_id"]).one()
+                if job.status in ("succeeded", "failed"):
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(job.status, "succeeded", job.error)
+        self.assertEqual(job.progress_done, len(upload))
+        self.assertEqual(job.result_json["row_count"], 3)
+        self.assertEqual(job.result_json["downgraded_fields"], ["Visits"])
+
+        dataset = self.db.query(FormDataset).filter(FormDataset.id == created["dataset_id"]).one()
+        self.assertEqual(dataset.metadata_json["import_status"], "ready")
+        visits = self.db.query(FormDatasetField).filter(
+            FormDatasetField.dataset_id == dataset.id, FormDatasetField.field_key == "Visits"
+        ).one()
+        self.assertEqual(visits.field_type, "string")
+        rows = (
+            self.db.query(Submission)
+            .filter(Submission.dataset_id == dataset.id)
+            .order_by(Submission.data["Name"].as_string())
+            .all()
+        )
+        self.assertEqual(
+            [row.data for row in rows],
+            [
+                {"Name": "Ada", "Visits": 12, "Name_2": "A", "column_4": "x"},
+                {"Name": "Ama, Jr", "Visits": "n/a", "Name_2": "C"},
+                {"Name": "Kofi", "Visits": 4},
+            ],
+        )
+        self.assertEqual({row.user_id for row in rows}, {self.user.id})
+        self.assertEqual({row.form_version_number for row in rows}, {1})
+
+    def test_approximate_query_reports_intervals_and_sketched_distinct_counts(self):
+        form = FormService.create_form(
+            self.db,
+            project_id=self.project.id,
+            title="Customer Survey",
+            blueprint=self._draft_blueprint_v1(),
+        )
+        FormService.publish_form(self.db, form.id, published_by=self.user.id)
+        dataset = self.db.query(FormDataset).filter(FormDataset.form_id == form.id).one()
+        for index in range(40):
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": f"Customer {index % 25}", "region": "North" if index % 2 else "South", "satisfaction": "good", "comments": ""},
+                user_id=self.user.id,
+                metadata={},
+            )
+
+        def run(**query):
+            return AnalyticsService.execute_query(self.db, self.org_id, dataset.id, select_fields=[], **query)
+
+        distinct_people = [{"field": "customer_name", "fn": "count_distinct", "alias": "people"}]
+        # The first whole-dataset count queues the sketch build and is answered exactly meanwhile.
+        exact = run(aggregates=distinct_people, approximate={})
+        self.assertEqual(exact["rows"], [{"people": 25}])
+        self.assertEqual(exact["approximate"]["intervals"][0]["people"], {"low": 25, "high": 25})
+        for _ in range(100):
+            self.db.expire_all()
+            job = self.db.query(BackgroundJob).filter(BackgroundJob.kind == "analytics_sketch_build", BackgroundJob.org_id == self.org_id).one()
+            if job.status in ("succeeded", "failed"):
+                break
+            time.sleep(0.05)
+        self.assertEqual(job.status, "succeeded", job.error)
+
+        distinct = run(aggregates=distinct_people, approximate={})
+        self.assertEqual(distinct["rows"], [{"people": 25}])
+        self.assertIsNone(distinct["approximate"]["sample_percent"])
+        bounds = distinct["approximate"]["intervals"][0]["people"]
+        self.assertLess(bounds["low"], 25)
+        self.assertGreater(bounds["high"], 25)
+
+        # Later submissions are folded into the maintained sketch.
+        SubmissionService.create_submission(
+            self.db,
+            form_id=form.id,
+            data={"customer_name": "Newcomer", "region": "North", "satisfaction": "good", "comments": ""},
+            user_id=self.user.id,
+            metadata={},
+        )
+        self.assertEqual(run(aggregates=distinct_people, approximate={})["rows"], [{"people": 26}])
+
+        # A sketch that failed to take a submission is dropped rather than left undercounting.
+        with mock.patch.object(ApproximateAnalyticsService, "apply_submission", side_effect=RuntimeError("boom")):
+            SubmissionService.create_submission(
+                self.db,
+                form_id=form.id,
+                data={"customer_name": "Latecomer", "region": "North", "satisfaction": "good", "comments": ""},
+                user_id=self.user.id,
+                metadata={},
+            )
+        self.assertEqual(self.db.query(AnalyticsFieldSketch).filter(AnalyticsFieldSketch.dataset_id == dataset.id).count(), 0)
+        self.assertEqual(run(aggregates=distinct_people, approximate={})["rows"], [{"people": 27}])
+        for _ in range(100):
+            self.db.expire_all()
+            builds = self.db.query(BackgroundJob).filter(BackgroundJob.kind == "analytics_sketch_build", BackgroundJob.org_id == self.org_id)
+            if all(build.status in ("succeeded", "failed") for build in builds):
+                break
+            time.sleep(0.05)
+        self.assertEqual(builds.count(), 2)
+
+        sampled = run(
+            group_by=["region"],
+            aggregates=[
+                {"field": "_submission_id", "fn": "count", "alias": "responses"},
+                {"field": "customer_name", "fn": "count_distinct", "alias": "people"},
+            ],
+            order_by=[{"field": "region", "direction": "asc"}],
+            approximate={"sample_percent": 99.9, "seed": 7},
+        )
+        self.assertEqual(sampled["approximate"]["sample_percent"], 99.9)
+        self.assertEqual(len(sampled["approximate"]["intervals"]), len(sampled["rows"]))
+        for row, interval in zip(sampled["rows"], sampled["approximate"]["intervals"]):
+            self.assertNotIn("__n_responses", row)
+            self.assertLessEqual(interval["responses"]["low"], row["responses"])
+            self.assertGreaterEqual(interval["responses"]["high"], row["responses"])
+        self.assertEqual({row["region"]: row["people"] for row in sampled["rows"]}, {"North": 22, "South": 20})
+
     def test_republish_preserves_legacy_fields_and_adds_new_schema_version(self):
         form = FormService.create_form(
             self.db,
@@ -477,6 +1637,20 @@ class FormDatasetFlowTests(unittest.TestCase):
         self.assertEqual(payload["options"][0]["value"], "PUB-001")
         self.assertEqual(payload["options"][0]["label"], "Public Ada")
 
+    def _wait_for_rollup_build(self, rollup_id):
+        for _ in range(100):
+            self.db.expire_all()
+            job = (
+                self.db.query(BackgroundJob)
+                .filter(BackgroundJob.kind == "analytics_rollup_build", BackgroundJob.subject_id == rollup_id)
+                .order_by(BackgroundJob.created_at.desc())
+                .first()
+            )
+            if job is not None and job.status in ("succeeded", "failed"):
+                return job
+            time.sleep(0.05)
+        return job
+
     def _token(self) -> str:
         from app.services.auth_service import auth_service
 
@@ -0,0 +1,251 @@
+"""Tests for the async Groq client and AI survey drafting against a local stub of the chat API."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_current_user
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.main import app
+from app.models.ai_response_cache import AiResponseCacheEntry
+from app.services import ai_survey_service, groq_client
+from app.services.ai_response_cache import AiResponseCache
+from app.services.groq_client import RateLimiter
+
+
+class _StubGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        server.requests.append({"port": self.client_address[1], "path": self.path, "body": body})
+        if server.responder is not None:
+            status, headers, payload = server.responder(body)
+        else:
+            status, headers, payload = server.responses.pop(0) if server.responses else server.default
+        if server.delay:
+            time.sleep(server.delay)
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def _completion(content: str, total_tokens: int = 120) -> dict:
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"total_tokens": total_tokens},
+    }
+
+
+class GroqClientStubServerTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGroqHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.responses = []
+        self.server.default = (200, {}, _completion("{}"))
+        self.server.delay = 0
+        self.server.responder = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/openai/v1"
+        # The response cache needs Postgres; only the cache test turns it on.
+        settings_overrides = {"GROQ_API_KEY": "test-key", "GROQ_BASE_URL": base_url, "AI_CACHE_TTL_SECONDS": 0}
+        for name, value in settings_overrides.items():
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        limiter = mock.patch.object(groq_client, "_limiter", RateLimiter(60, 100_000))
+        limiter.start()
+        self.addCleanup(limiter.stop)
+
+    def test_rate_limited_calls_retry_on_the_pooled_connection(self):
+        questions = {"questions": [{"id": "q1", "prompt": "Who is the audience?", "kind": "text"}]}
+        self.server.responses = [
+            (429, {"retry-after": "0.05"}, {"error": {"message": "Rate limit reached"}}),
+            (200, {}, _completion(json.dumps(questions), total_tokens=300)),
+        ]
+
+        async def run():
+            try:
+                return await ai_survey_service.generate_interview_questions("Staff wellbeing pulse")
+            finally:
+                await groq_client.aclose()
+
+        started = time.monotonic()
+        result = asyncio.run(run())
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(result[0]["prompt"], "Who is the audience?")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[0]["path"], "/openai/v1/chat/completions")
+        self.assertEqual(self.server.requests[1]["body"]["response_format"], {"type": "json_object"})
+        # Retry reused the keep-alive connection rather than dialling a new one.
+        self.assertEqual(self.server.requests[0]["port"], self.server.requests[1]["port"])
+        # The max_tokens reservation is refunded down to the reported usage.
+        self.assertGreater(groq_client.rate_limiter().tokens.level, 100_000 - 1500)
+
+    def test_cancelling_the_caller_aborts_the_in_flight_request(self):
+        self.server.delay = 2.0
+
+        async def run():
+            task = asyncio.ensure_future(groq_client.chat_completion([{"role": "user", "content": "hi"}]))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            try:
+                await task
+            finally:
+                await groq_client.aclose()
+
+        started = time.monotonic()
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(run())
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_chunked_drafts_stream_sections_drafted_concurrently(self):
+        outline = {
+            "title": "Clinic Feedback",
+            "sections": [
+                {"id": "arrival", "title": "Arrival", "question_count": 10},
+                {"id": "care", "title": "Care", "question_count": 10},
+                {"id": "billing", "title": "Billing", "question_count": 10},
+            ],
+        }
+
+        def respond(body):
+            system = body["messages"][0]["content"]
+            if body.get("response_format"):
+                return 200, {}, _completion(json.dumps(outline))
+            sid = re.search(r"section id MUST be `(\w+)`", system).group(1)
+            return 200, {}, _completion(f"## {sid}: {sid.title()}\n\n### {sid}_q1. How was it?\n- type: text\n")
+
+        self.server.responder = respond
+        self.server.delay = 0.3
+        app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="user-1")
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+
+        started = time.monotonic()
+        with TestClient(app) as client:
+            with client.stream(
+                "POST",
+                "/api/v1/ai/survey/draft/stream",
+                json={"brief": "Patient feedback survey with about 30 questions"},
+            ) as response:
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+                frames = [frame for frame in response.read().decode().split("\n\n") if frame]
+        elapsed = time.monotonic() - started
+
+        events = [
+            (re.search(r"^event: (.*)$", frame, re.M).group(1), json.loads(re.search(r"^data: (.*)$", frame, re.M).group(1)))
+            for frame in frames
+        ]
+        self.assertEqual([name for name, _ in events], ["outline", "section", "section", "section", "done"])
+        self.assertEqual([s["id"] for s in events[0][1]["sections"]], ["arrival", "care", "billing"])
+        self.assertEqual(sorted(data["index"] for name, data in events if name == "section"), [0, 1, 2])
+        done = events[-1][1]
+        self.assertEqual(done["title"], "Clinic Feedback")
+        # Sections keep outline order in the final document whatever order they finished in.
+        self.assertLess(done["markdown"].index("## arrival"), done["markdown"].index("## care"))
+        self.assertLess(done["markdown"].index("## care"), done["markdown"].index("## billing"))
+        # One outline call plus three section calls; sequential drafting would take >= 1.2s.
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertLess(elapsed, 1.1)
+
+    def test_repeated_steps_and_unchanged_sections_are_served_from_the_cache(self):
+        questions = {"questions": [{"id": "q1", "prompt": "Who is the audience?", "kind": "text"}]}
+        outline = {
+            "title": "Clinic Feedback",
+            "sections": [
+                {"id": "arrival", "title": "Arrival", "question_count": 15},
+                {"id": "care", "title": "Care", "question_count": 15},
+            ],
+        }
+
+        def respond(body):
+            system = body["messages"][0]["content"]
+            if "clarifying questions" in system:
+                return 200, {}, _completion(json.dumps(questions))
+            if body.get("response_format"):
+                return 200, {}, _completion(json.dumps(outline))
+            sid = re.search(r"section id MUST be `(\w+)`", system).group(1)
+            return 200, {}, _completion(f"## {sid}: {sid.title()}\n\n### {sid}_q1. How was it?\n- type: text\n")
+
+        self.server.responder = respond
+        cache_ttl = mock.patch.object(settings, "AI_CACHE_TTL_SECONDS", 3600)
+        cache_ttl.start()
+        self.addCleanup(cache_ttl.stop)
+        AiResponseCache.clear()
+        self.addCleanup(AiResponseCache.clear)
+
+        async def run(coro):
+            try:
+                return await coro
+            finally:
+                await groq_client.aclose()
+
+        first = asyncio.run(run(ai_survey_service.generate_interview_questions("Staff  wellbeing pulse")))
+        retried = asyncio.run(run(ai_survey_service.generate_interview_questions(" Staff wellbeing\npulse ")))
+        self.assertEqual(first, retried)
+        self.assertEqual(len(self.server.requests), 1)
+
+        brief = "Patient feedback survey with about 30 questions"
+        draft = asyncio.run(run(ai_survey_service.draft_survey_markdown(brief)))
+        self.assertEqual(len(self.server.requests), 4)
+        with SessionLocal() as db:
+            db.query(AiResponseCacheEntry).filter(AiResponseCacheEntry.step == "draft").delete()
+            db.commit()
+        # Re-planning the document asks for the outline again, but both sections come from the cache.
+        redraft = asyncio.run(run(ai_survey_service.draft_survey_markdown(brief)))
+        self.assertEqual(redraft, draft)
+        self.assertEqual(len(self.server.requests), 5)
+
+        with mock.patch.object(settings, "AI_CACHE_TTL_SECONDS", 0):
+            asyncio.run(run(ai_survey_service.generate_interview_questions("Staff wellbeing pulse")))
+        self.assertEqual(len(self.server.requests), 6)
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_callers_beyond_the_budget_wait_and_cancelled_waits_are_refunded(self):
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600)
+
+        async def run():
+            await limiter.acquire(100)
+            await limiter.acquire(100)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(limiter.acquire(100), timeout=0.1)
+
+        asyncio.run(run())
+        self.assertAlmostEqual(limiter.requests.level, 0, delta=0.1)
+        self.assertAlmostEqual(limiter.tokens.level, 400, delta=5)
+
+    def test_oversized_requests_are_clamped_to_the_bucket_capacity(self):
+        limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=600)
+        self.assertEqual(asyncio.run(limiter.acquire(10_000)), 600)
+
+
+if __name__ == "__main__":
+    unittest.main()
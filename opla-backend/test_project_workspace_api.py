@@ -1,11 +1,14 @@
+import time
 import unittest
 import uuid
-from datetime import date
+from datetime import date, datetime, timedelta
+from unittest import mock
 
 from fastapi.testclient import TestClient
 
 from app.core.database import SessionLocal
 from app.main import app
+from app.models.background_job import BackgroundJob
 from app.models.form import Form, FormStatus
 from app.models.form_dataset import FormDataset, FormDatasetField, FormDatasetSchemaVersion
 from app.models.form_version import FormVersion
@@ -14,6 +17,7 @@ from app.models.organization import Organization
 from app.models.project import Project, ProjectStatus
 from app.models.project_access import AccessorType, ProjectAccess, ProjectRole
 from app.models.project_asset import ProjectAsset, ProjectAssetKind
+from app.models.project_attention import AttentionItemStatus, ProjectAttentionItem
 from app.models.project_report import ProjectReport
 from app.models.project_role_template import ProjectRoleTemplate
 from app.models.project_message_channel import ProjectMessageChannel
@@ -23,9 +27,11 @@ from app.models.role_template import OrgRole, OrgRoleAssignment, AccessorType as
 from app.models.submission import Submission, SubmissionReviewStatus
 from app.models.user import User
 from app.services.auth_service import auth_service
+from app.services.form_automation_service import FormAutomationService
 from app.services.form_service import FormService, ProjectService
 from app.services.organization_service import OrganizationService
 from app.services.project_role_service import ProjectRoleService
+from app.services.project_task_service import ProjectTaskService
 
 
 class ProjectWorkspaceApiTests(unittest.TestCase):
@@ -453,6 +459,93 @@ class ProjectWorkspaceApiTests(unittest.TestCase):
         self.assertEqual(checked_out["check_out_location_json"]["label"], "Osu Debrief")
         self.assertEqual(checked_out["check_out_note"], "Day complete")
 
+    def test_check_in_updates_open_attendance_gap_incrementally(self):
+        from app.services.project_attention_service import ProjectAttentionService
+
+        gap = ProjectAttentionItem(
+            project_id=self.open_project.id,
+            kind="attendance_gap",
+            dedupe_key=f"attendance_gap:{self.open_project.id}:2026-05-25",
+            severity="warning",
+            title="Attendance gap during collection window",
+            detail="0 of 0 expected people have not checked in today.",
+            status=AttentionItemStatus.OPEN.value,
+        )
+        self.db.add(gap)
+        self.db.commit()
+
+        response = self.client.post(
+            f"/api/v1/organizations/{self.organization.id}/projects/{self.open_project.id}/attendance/check-in",
+            headers=self.auth_headers(self.member_user),
+            json={"timestamp": "2026-05-25T08:00:00", "location": {"latitude": 5.6037, "longitude": -0.1870}},
+        )
+        self.assertEqual(response.status_code, 201)
+
+        self.db.refresh(gap)
+        expected = ProjectAttentionService._expected_user_ids(self.db, self.open_project.id)
+        missing = len(expected - {self.member_user.id})
+        if missing:
+            self.assertEqual(gap.status, AttentionItemStatus.OPEN.value)
+            self.assertEqual(gap.detail, f"{missing} of {len(expected)} expected people have not checked in today.")
+        else:
+            self.assertEqual(gap.status, AttentionItemStatus.RESOLVED.value)
+
+    def test_attendance_changes_debounce_one_reconcile_through_the_database(self):
+        from app.services.project_attention_service import AttentionReconcileScheduler
+
+        base = f"/api/v1/organizations/{self.organization.id}/projects/{self.open_project.id}/attendance"
+        response = self.client.post(
+            f"{base}/check-in",
+            headers=self.auth_headers(self.member_user),
+            json={"timestamp": "2026-05-25T08:00:00", "location": {"latitude": 5.6037, "longitude": -0.1870}},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.db.refresh(self.open_project)
+        first_due = self.open_project.attention_reconcile_due_at
+        self.assertIsNotNone(first_due)
+        self.assertEqual(self.open_project.attention_reconcile_actor_id, self.member_user.id)
+
+        time.sleep(0.01)
+        response = self.client.post(
+            f"{base}/check-out",
+            headers=self.auth_headers(self.member_user),
+            json={"timestamp": "2026-05-25T17:00:00", "location": {"latitude": 5.6037, "longitude": -0.1870}},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.db.refresh(self.open_project)
+        # Each event restarts the window rather than riding the first one.
+        self.assertGreater(self.open_project.attention_reconcile_due_at, first_due)
+        self.assertEqual(AttentionReconcileScheduler.run_due(), 0)
+
+        self.open_project.attention_reconcile_due_at = datetime.utcnow() - timedelta(seconds=1)
+        self.db.commit()
+        with mock.patch(
+            "app.services.project_attention_service.ProjectAttentionService.reconcile_project"
+        ) as reconcile:
+            self.assertEqual(AttentionReconcileScheduler.run_due(), 1)
+            self.assertEqual(AttentionReconcileScheduler.run_due(), 0)
+        self.assertEqual(reconcile.call_count, 1)
+        self.assertEqual(reconcile.call_args.kwargs["actor_id"], self.member_user.id)
+        self.db.refresh(self.open_project)
+        self.assertIsNone(self.open_project.attention_reconcile_due_at)
+        self.assertIsNone(self.open_project.attention_reconcile_requested_at)
+
+        # A burst that never goes quiet still reconciles once the first event is MAX_WAIT_SECONDS old.
+        self.open_project.attention_reconcile_requested_at = datetime.utcnow() - timedelta(
+            seconds=AttentionReconcileScheduler.MAX_WAIT_SECONDS + 1
+        )
+        self.db.commit()
+        AttentionReconcileScheduler.schedule(self.db, self.open_project.id)
+        # A failed pass is logged and scheduled again rather than lost.
+        with mock.patch(
+            "app.services.project_attention_service.ProjectAttentionService.reconcile_project",
+            side_effect=RuntimeError("reconcile failed"),
+        ), self.assertLogs("app.services.project_attention_service", level="ERROR"):
+            self.assertEqual(AttentionReconcileScheduler.run_due(), 1)
+        self.db.refresh(self.open_project)
+        self.assertIsNotNone(self.open_project.attention_reconcile_due_at)
+        self.assertGreater(self.open_project.attention_reconcile_due_at, datetime.utcnow())
+
     def test_admin_can_list_project_attendance_for_day(self):
         self.client.post(
             f"/api/v1/organizations/{self.organization.id}/projects/{self.open_project.id}/attendance/check-in",
@@ -504,8 +597,9 @@ class ProjectWorkspaceApiTests(unittest.TestCase):
         )
 
         self.assertEqual(list_response.status_code, 200)
-        self.assertEqual(len(list_response.json()), 1)
-        self.assertEqual(list_response.json()[0]["review_status"], SubmissionReviewStatus.SUBMITTED.value)
+        self.assertEqual(len(list_response.json()["items"]), 1)
+        self.assertEqual(list_response.json()["items"][0]["review_status"], SubmissionReviewStatus.SUBMITTED.value)
+        self.assertIsNone(list_response.json()["next_cursor"])
 
         review_response = self.client.patch(
             f"/api/v1/submissions/{submission_id}/review",
@@ -520,6 +614,16 @@ class ProjectWorkspaceApiTests(unittest.TestCase):
         self.assertEqual(reviewed["reviewed_by"], str(self.admin_user.id))
         self.assertIsNotNone(reviewed["reviewed_at"])
 
+        counts = {
+            status: self.client.get(
+                f"/api/v1/forms/{form.id}/submissions/count",
+                params={"review_status": status},
+                headers=self.auth_headers(self.admin_user),
+            ).json()["count"]
+            for status in ("submitted", "approved")
+        }
+        self.assertEqual(counts, {"submitted": 0, "approved": 1})
+
     def test_member_without_review_permission_cannot_review_submission(self):
         form = Form(
             project_id=self.open_project.id,
@@ -705,6 +809,390 @@ class ProjectWorkspaceApiTests(unittest.TestCase):
         self.assertEqual(matching_tasks[0]["context_json"]["routing"]["cluster"], "South Coast")
         self.assertEqual(matching_tasks[0]["context_json"]["review"]["review_status"], "approved")
 
+    def test_automation_backtest_previews_matches_and_apply_creates_tasks_once(self):
+        form = Form(
+            project_id=self.open_project.id,
+            title=f"Backtest Intake {self.suffix}",
+            slug=f"backtest-intake-{self.suffix}",
+            blueprint_draft={"meta": {"title": "Backtest Intake"}},
+            blueprint_live={"meta": {"title": "Backtest Intake"}, "ui": []},
+            version=1,
+            published_version=1,
+            status=FormStatus.LIVE,
+            is_public=False,
+        )
+        self.db.add(form)
+        self.db.flush()
+        for charge_type, amount in [("transport", 45), ("transport", "12"), ("meals", 80), ("transport", "n/a")]:
+            self.db.add(
+                Submission(
+                    form_id=form.id,
+                    user_id=self.admin_user.id,
+                    data={"charge_type": charge_type, "amount": amount},
+                    form_version_number=1,
+                    review_status=SubmissionReviewStatus.APPROVED,
+                )
+            )
+        self.db.add(
+            Submission(
+                form_id=form.id,
+                user_id=self.admin_user.id,
+                data={"charge_type": "transport", "amount": 99},
+                form_version_number=1,
+                review_status=SubmissionReviewStatus.SUBMITTED,
+            )
+        )
+        self.db.commit()
+
+        create_rule = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules",
+            headers=self.auth_headers(self.admin_user),
+            json={
+                "name": "Settle large transport",
+                "event_type": "submission_approved",
+                "action_type": "create_task",
+                "conditions_json": {
+                    "combinator": "and",
+                    "rules": [
+                        {"field": "charge_type", "operator": "equal", "value": "transport"},
+                        {"field": "amount", "operator": ">", "value": 30},
+                    ],
+                },
+                "action_config_json": {"title_template": "Settle {{ data.amount }} {{ data.charge_type }}"},
+            },
+        )
+        self.assertEqual(create_rule.status_code, 201)
+        rule_id = create_rule.json()["id"]
+
+        backtest = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules/{rule_id}/backtest",
+            headers=self.auth_headers(self.admin_user),
+            json={"conditions_json": {"rules": [{"field": "charge_type", "operator": "equal", "value": "transport"}]}},
+        )
+        self.assertEqual(backtest.status_code, 200)
+        self.assertEqual(backtest.json()["candidate_count"], 4)
+        self.assertEqual(backtest.json()["matched_count"], 3)
+        self.assertTrue(backtest.json()["pushed_down"])
+
+        unsaved_numeric = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules/{rule_id}/backtest",
+            headers=self.auth_headers(self.admin_user),
+            json={"conditions_json": {"rules": [{"field": "amount", "operator": ">", "value": 30}]}},
+        )
+        # Non-numeric history ("n/a") is a non-match, in SQL and in the predicate, not an error.
+        self.assertEqual(unsaved_numeric.status_code, 200)
+        self.assertEqual(unsaved_numeric.json()["scanned_count"], 2)
+        self.assertEqual(unsaved_numeric.json()["matched_count"], 2)
+
+        backtest = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules/{rule_id}/backtest",
+            headers=self.auth_headers(self.admin_user),
+        )
+        self.assertEqual(backtest.status_code, 200)
+        self.assertEqual(backtest.json()["matched_count"], 1)
+        self.assertEqual(backtest.json()["samples"][0]["data"]["amount"], 45)
+
+        results = []
+        for _ in range(2):
+            apply_response = self.client.post(
+                f"/api/v1/forms/{form.id}/automation-rules/{rule_id}/apply",
+                headers=self.auth_headers(self.admin_user),
+            )
+            self.assertEqual(apply_response.status_code, 202)
+            self.assertEqual(apply_response.json()["kind"], "form_automation_apply")
+            for _ in range(100):
+                self.db.expire_all()
+                job = self.db.query(BackgroundJob).filter(BackgroundJob.id == apply_response.json()["id"]).one()
+                if job.status in ("succeeded", "failed"):
+                    break
+                time.sleep(0.05)
+            self.assertEqual(job.status, "succeeded", job.error)
+            results.append(job.result_json)
+
+        self.assertEqual([result["applied_count"] for result in results], [1, 0])
+        self.assertEqual([result["skipped_count"] for result in results], [0, 1])
+        tasks = self.db.query(ProjectTask).filter(ProjectTask.automation_rule_id == uuid.UUID(rule_id)).all()
+        self.assertEqual([task.title for task in tasks], ["Settle 45 transport"])
+
+        deactivate = self.client.patch(
+            f"/api/v1/forms/{form.id}/automation-rules/{rule_id}",
+            headers=self.auth_headers(self.admin_user),
+            json={"is_active": False},
+        )
+        self.assertEqual(deactivate.status_code, 200)
+        inactive_apply = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules/{rule_id}/apply",
+            headers=self.auth_headers(self.admin_user),
+        )
+        self.assertEqual(inactive_apply.status_code, 409)
+
+    def test_apply_keeps_earlier_actions_when_one_submission_fails(self):
+        form = Form(
+            project_id=self.open_project.id,
+            title=f"Apply Savepoint Intake {self.suffix}",
+            slug=f"apply-savepoint-intake-{self.suffix}",
+            blueprint_draft={"meta": {"title": "Apply Savepoint Intake"}},
+            blueprint_live={"meta": {"title": "Apply Savepoint Intake"}, "ui": []},
+            version=1,
+            published_version=1,
+            status=FormStatus.LIVE,
+            is_public=False,
+        )
+        self.db.add(form)
+        self.db.flush()
+        for index, outlet in enumerate(["Outlet A", "Outlet B", "Outlet C"]):
+            self.db.add(
+                Submission(
+                    form_id=form.id,
+                    user_id=self.admin_user.id,
+                    data={"outlet": outlet},
+                    form_version_number=1,
+                    review_status=SubmissionReviewStatus.APPROVED,
+                    created_at=datetime.utcnow() - timedelta(minutes=10 - index),
+                )
+            )
+        self.db.commit()
+
+        create_rule = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules",
+            headers=self.auth_headers(self.admin_user),
+            json={
+                "name": "Visit every outlet",
+                "event_type": "submission_approved",
+                "action_type": "create_task",
+                "conditions_json": {"combinator": "and", "rules": []},
+                "action_config_json": {"title_template": "Visit {{ data.outlet }}"},
+            },
+        )
+        self.assertEqual(create_rule.status_code, 201)
+        rule_id = uuid.UUID(create_rule.json()["id"])
+
+        create_task = ProjectTaskService.create_task
+
+        def failing_for_outlet_b(db, project, **kwargs):
+            if kwargs["title"] == "Visit Outlet B":
+                create_task(db, project, **kwargs)
+                raise RuntimeError("action failed")
+            return create_task(db, project, **kwargs)
+
+        with mock.patch.object(ProjectTaskService, "create_task", side_effect=failing_for_outlet_b):
+            with self.assertLogs("app.services.form_automation_service", level="ERROR") as logs:
+                summary = FormAutomationService.apply_rule_to_existing(
+                    self.db, form.id, rule_id, actor_id=self.admin_user.id
+                )
+
+        self.assertEqual(summary["applied_count"], 2)
+        self.assertEqual(summary["failed_count"], 1)
+        outlet_b = self.db.query(Submission).filter(Submission.form_id == form.id, Submission.data["outlet"].as_string() == "Outlet B").one()
+        self.assertEqual(summary["failures"], [{"submission_id": str(outlet_b.id), "error": "ACTION_FAILED"}])
+        self.assertIn("action failed", logs.output[0])
+        tasks = self.db.query(ProjectTask).filter(ProjectTask.automation_rule_id == rule_id).all()
+        self.assertEqual(sorted(task.title for task in tasks), ["Visit Outlet A", "Visit Outlet C"])
+
+    def test_bulk_review_approves_filtered_submissions_and_resolves_attention(self):
+        form = Form(
+            project_id=self.open_project.id,
+            title=f"Bulk Review Intake {self.suffix}",
+            slug=f"bulk-review-intake-{self.suffix}",
+            blueprint_draft={"meta": {"title": "Bulk Review Intake"}},
+            blueprint_live={"meta": {"title": "Bulk Review Intake"}, "ui": []},
+            version=1,
+            published_version=1,
+            status=FormStatus.LIVE,
+            is_public=False,
+        )
+        self.db.add(form)
+        self.db.flush()
+        cutoff = datetime.utcnow() - timedelta(days=1)
+        old_admin = [
+            Submission(
+                form_id=form.id,
+                user_id=self.admin_user.id,
+                data={"outlet": f"Outlet {index}"},
+                form_version_number=1,
+                review_status=SubmissionReviewStatus.SUBMITTED,
+                created_at=cutoff - timedelta(hours=index + 1),
+            )
+            for index in range(3)
+        ]
+        recent_admin = Submission(
+            form_id=form.id,
+            user_id=self.admin_user.id,
+            data={"outlet": "Recent"},
+            form_version_number=1,
+            review_status=SubmissionReviewStatus.SUBMITTED,
+        )
+        old_member = Submission(
+            form_id=form.id,
+            user_id=self.member_user.id,
+            data={"outlet": "Member"},
+            form_version_number=1,
+            review_status=SubmissionReviewStatus.SUBMITTED,
+            created_at=cutoff - timedelta(hours=2),
+        )
+        self.db.add_all([*old_admin, recent_admin, old_member])
+        self.db.flush()
+        for submission in [*old_admin, old_member]:
+            self.db.add(
+                ProjectAttentionItem(
+                    project_id=self.open_project.id,
+                    kind="pending_review_aging",
+                    dedupe_key=f"pending_review:{submission.id}",
+                    severity="warning",
+                    title="Submission pending review",
+                    status=AttentionItemStatus.OPEN.value,
+                    source_submission_id=submission.id,
+                )
+            )
+        self.db.commit()
+
+        create_rule = self.client.post(
+            f"/api/v1/forms/{form.id}/automation-rules",
+            headers=self.auth_headers(self.admin_user),
+            json={
+                "name": "Visit approved outlets",
+                "event_type": "submission_approved",
+                "action_type": "create_task",
+                "action_config_json": {"title_template": "Visit {{ outlet }}"},
+            },
+        )
+        self.assertEqual(create_rule.status_code, 201)
+
+        response = self.client.post(
+            f"/api/v1/forms/{form.id}/submissions/review",
+            headers=self.auth_headers(self.admin_user),
+            json={
+                "review_status": "approved",
+                "review_comment": "Batch approved",
+                "current_review_status": "submitted",
+                "submitted_by_user_id": str(self.admin_user.id),
+                "submitted_before": cutoff.isoformat(),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated_count"], 3)
+        self.assertEqual(
+            set(response.json()["submission_ids"]),
+            {str(submission.id) for submission in old_admin},
+        )
+
+        self.db.expire_all()
+        self.assertEqual(
+            {submission.review_status for submission in old_admin},
+            {SubmissionReviewStatus.APPROVED},
+        )
+        self.assertEqual(old_admin[0].reviewed_by, self.admin_user.id)
+        self.assertEqual(recent_admin.review_status, SubmissionReviewStatus.SUBMITTED)
+        self.assertEqual(old_member.review_status, SubmissionReviewStatus.SUBMITTED)
+
+        tasks = self.db.query(ProjectTask).filter(ProjectTask.automation_rule_id == uuid.UUID(create_rule.json()["id"])).all()
+        self.assertEqual(sorted(task.title for task in tasks), ["Visit Outlet 0", "Visit Outlet 1", "Visit Outlet 2"])
+
+        items = {
+            item.source_submission_id: item.status
+            for item in self.db.query(ProjectAttentionItem).filter(ProjectAttentionItem.project_id == self.open_project.id)
+        }
+        self.assertEqual(items[old_admin[0].id], AttentionItemStatus.RESOLVED.value)
+        self.assertEqual(items[old_member.id], AttentionItemStatus.OPEN.value)
+
+        repeat = self.client.post(
+            f"/api/v1/forms/{form.id}/submissions/review",
+            headers=self.auth_headers(self.admin_user),
+            json={"review_status": "approved", "submission_ids": [str(submission.id) for submission in old_admin]},
+        )
+        self.assertEqual(repeat.status_code, 200)
+        self.assertEqual(repeat.json()["updated_count"], 0)
+
+        unscoped = self.client.post(
+            f"/api/v1/forms/{form.id}/submissions/review",
+            headers=self.auth_headers(self.admin_user),
+            json={"review_status": "rejected"},
+        )
+        self.assertEqual(unscoped.status_code, 400)
+        self.db.expire_all()
+        self.assertEqual(
+            self.db.query(Submission)
+            .filter(Submission.form_id == form.id, Submission.review_status == SubmissionReviewStatus.REJECTED)
+            .count(),
+            0,
+        )
+
+    def test_submission_listing_paginates_filters_and_projects_fields(self):
+        form = Form(
+            project_id=self.open_project.id,
+            title=f"Paged Intake {self.suffix}",
+            slug=f"paged-intake-{self.suffix}",
+            blueprint_draft={"meta": {"title": "Paged Intake"}},
+            blueprint_live={"meta": {"title": "Paged Intake"}, "ui": []},
+            version=1,
+            published_version=1,
+            status=FormStatus.LIVE,
+            is_public=False,
+        )
+        self.db.add(form)
+        self.db.flush()
+        base_time = datetime.utcnow() - timedelta(days=1)
+        for index in range(5):
+            self.db.add(
+                Submission(
+                    form_id=form.id,
+                    user_id=self.admin_user.id if index != 4 else self.member_user.id,
+                    data={"outlet": f"Outlet {index}", "region": "north" if index % 2 == 0 else "south", "stock": index * 10},
+                    metadata_json={"device": "tablet"},
+                    form_version_number=1,
+                    review_status=SubmissionReviewStatus.SUBMITTED,
+                    created_at=base_time + timedelta(minutes=index),
+                )
+            )
+        self.db.commit()
+
+        outlets = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 2, "fields": "outlet", "include_metadata": "false"}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(
+                f"/api/v1/forms/{form.id}/submissions",
+                headers=self.auth_headers(self.admin_user),
+                params=params,
+            )
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            pages += 1
+            for item in payload["items"]:
+                self.assertEqual(set(item["data"]), {"outlet"})
+                self.assertNotIn("metadata_json", item)
+                self.assertEqual(item["review_status"], "submitted")
+            outlets.extend(item["data"]["outlet"] for item in payload["items"])
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(outlets, [f"Outlet {index}" for index in reversed(range(5))])
+
+        filtered = self.client.get(
+            f"/api/v1/forms/{form.id}/submissions",
+            headers=self.auth_headers(self.admin_user),
+            params=[
+                ("field_filter", "region:equal:north"),
+                ("field_filter", "stock:>=:10"),
+                ("user_id", str(self.admin_user.id)),
+            ],
+        )
+        self.assertEqual(filtered.status_code, 200)
+        self.assertEqual([item["data"]["outlet"] for item in filtered.json()["items"]], ["Outlet 2"])
+        self.assertEqual(filtered.json()["items"][0]["metadata_json"], {"device": "tablet"})
+        self.assertIsNone(filtered.json()["next_cursor"])
+
+        invalid = self.client.get(
+            f"/api/v1/forms/{form.id}/submissions",
+            headers=self.auth_headers(self.admin_user),
+            params={"field_filter": "region"},
+        )
+        self.assertEqual(invalid.status_code, 400)
+
     def test_admin_can_view_form_dataset_details(self):
         form = FormService.create_form(
             self.db,
@@ -3,8 +3,11 @@
 from __future__ import annotations
 
 import unittest
+from unittest import mock
 
+from app.services import ai_survey_service, json_patch, survey_markdown_compiler
 from app.services.survey_markdown_compiler import (
+    CompiledBlockCache,
     SurveyMarkdownCompileError,
     compile_survey_markdown,
 )
@@ -150,5 +153,63 @@ class SurveyMarkdownCompilerTests(unittest.TestCase):
             compile_survey_markdown("   ")
 
 
+class IncrementalCompileTests(unittest.TestCase):
+    def setUp(self):
+        CompiledBlockCache.clear()
+        self.addCleanup(CompiledBlockCache.clear)
+
+    def test_only_edited_sections_recompile_and_cached_sections_are_renumbered(self):
+        compile_survey_markdown(SAMPLE_MARKDOWN)
+        edited = SAMPLE_MARKDOWN.replace(
+            "## parents: Parent Feedback\n",
+            "## parents: Parent Feedback\n\n### satisfaction. Parent satisfaction\n- type: yes_no\n",
+        )
+
+        with mock.patch.object(
+            survey_markdown_compiler, "_compile_block", wraps=survey_markdown_compiler._compile_block
+        ) as compile_block:
+            incremental = compile_survey_markdown(edited)
+        self.assertEqual(compile_block.call_count, 1)
+
+        CompiledBlockCache.clear()
+        cold = compile_survey_markdown(edited)
+        self.assertEqual(incremental, cold)
+        # Cross-section bind de-duplication and later line numbers follow the edit.
+        parents = incremental.blueprint["ui"][2]
+        self.assertEqual(parents["children"][0]["bind"], "satisfaction_2")
+        self.assertIn("Duplicate bind renamed to 'satisfaction_2'", incremental.warnings)
+        matrix_line = edited.split("\n").index("### matrix_q. Facility Rating Matrix") + 1
+        self.assertTrue(any(w.endswith(f"(line {matrix_line})") for w in incremental.warnings))
+
+    def test_errors_in_cached_sections_report_document_line_numbers(self):
+        broken = "# T\n## a: A\n### q. Q\n- type: text\n## b: B\n### r. R\n- required: true\n"
+        with self.assertRaises(SurveyMarkdownCompileError) as first:
+            compile_survey_markdown(broken)
+        self.assertEqual(first.exception.line, 6)
+        with self.assertRaises(SurveyMarkdownCompileError) as shifted:
+            compile_survey_markdown(broken.replace("- type: text\n", "- type: text\n- required: true\n"))
+        self.assertEqual(shifted.exception.line, 7)
+
+    def test_preview_patches_against_the_base_revision(self):
+        ai_survey_service.CompilePreviewCache.clear()
+        first = ai_survey_service.compile_markdown_preview(SAMPLE_MARKDOWN)
+        self.assertIsNone(first.get("patch"))
+
+        edited = SAMPLE_MARKDOWN.replace("Facility notes", "Facility comments")
+        second = ai_survey_service.compile_markdown_preview(edited, first["revision"])
+        self.assertNotIn("blueprint", second)
+        self.assertEqual(
+            second["patch"],
+            [{"op": "replace", "path": "/ui/2/children/0/label", "value": "Facility comments"}],
+        )
+        self.assertEqual(
+            json_patch.apply(first["blueprint"], second["patch"]),
+            compile_survey_markdown(edited).blueprint,
+        )
+
+        unknown = ai_survey_service.compile_markdown_preview(edited, "not-a-revision")
+        self.assertEqual(unknown["blueprint"], compile_survey_markdown(edited).blueprint)
+
+
 if __name__ == "__main__":
     unittest.main()
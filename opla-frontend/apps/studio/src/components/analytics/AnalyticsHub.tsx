@@ -3,7 +3,7 @@ import { Suspense, lazy, useEffect, useMemo, useRef, useState } from 'react';
 import { ArrowRight, FlaskConical, Loader2, Map, PanelsTopLeft, Table2, UploadCloud } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
-import { analyticsAPI } from '../../lib/api';
+import { analyticsAPI, jobsAPI } from '../../lib/api';
 import type { AnalyticsSource } from './types';
 import {
   AnalyticsHubSkeleton,
@@ -107,20 +107,9 @@ export default function AnalyticsHub({ orgId, projectId, forms = [], activeTool
     setUploading(true);
     setError(null);
     try {
-      const token = localStorage.getItem('opla_auth_token') || '';
-      const res = await fetch(
-        `http://localhost:8000/api/v1/organizations/${orgId}/analytics/upload-csv?project_id=${projectId}`,
-        {
-          method: 'POST',
-          headers: { Authorization: `Bearer ${token}` },
-          body: (() => {
-            const formData = new FormData();
-            formData.append('file', file);
-            return formData;
-          })(),
-        },
-      );
-      if (!res.ok) throw new Error('Upload failed');
+      const upload = await analyticsAPI.uploadCsv(orgId, projectId, file);
+      const job = await jobsAPI.waitFor(orgId, upload.job_id);
+      if (job.status === 'failed') throw new Error(job.error || 'CSV import failed.');
       await reloadSources();
     } catch (err: any) {
       setError(err.message || 'Could not upload CSV.');
@@ -43,51 +43,39 @@ export default function DashboardViewer({ dashboard, onClose, orgId }: Dashboard
 		? dashboard.layout_config 
 		: [{ id: '0', name: 'Overview' }];
 
-	const fetchCardData = useCallback(async (card: DashboardCard) => {
-		const question = card.question;
-		if (!question) return;
-		const cardId = card.id;
+	const fetchDashboardData = useCallback(async () => {
+		const runnable = dashboard.cards.filter(card => {
+			const vizType = card.question?.viz_type;
+			return card.question && vizType !== 'markdown' && vizType !== 'walker';
+		});
+		if (!runnable.length) return;
 
-		setCardLoading(prev => ({ ...prev, [cardId]: true }));
+		const loading = Object.fromEntries(runnable.map(card => [card.id, true]));
+		setCardLoading(prev => ({ ...prev, ...loading }));
 
 		try {
-			const cfg = question.query_config as Record<string, any> || {};
-			const src = question.source_config as Record<string, any> || {};
-			const existingFilters = cfg.filters as Record<string, any> | undefined;
-			const filters = { ...(existingFilters || {}) } as Record<string, any>;
-			const rules: any[] = filters.rules || [];
-
-			if (crossFilter) {
-				rules.push({ field: crossFilter.field, operator: '=', value: crossFilter.value });
+			const payload = await analyticsAPI.runDashboard(orgId, dashboard.id, {
+				filters: crossFilter
+					? { combinator: 'and', rules: [{ field: crossFilter.field, operator: '=', value: crossFilter.value }] }
+					: undefined,
+				card_ids: runnable.map(card => card.id),
+			});
+			const results: Record<string, QueryResult> = {};
+			for (const card of payload.cards as Array<{ card_id: string; status: string; result: QueryResult | null }>) {
+				// Failed or timed-out cards are left empty; the rest of the dashboard still renders.
+				if (card.status === 'ok' && card.result) results[card.card_id] = card.result;
 			}
-
-			const queryPayload: any = {
-				dataset_id: src.dataset_id,
-				select_fields: cfg.select_fields,
-				filters: rules.length > 0 ? { combinator: 'and', rules } : undefined,
-				group_by: cfg.group_by,
-				aggregates: cfg.aggregates,
-				order_by: cfg.order_by,
-				limit: cfg.limit || 500,
-			};
-
-			const result = await analyticsAPI.runQuery(orgId, queryPayload);
-			setCardData(prev => ({ ...prev, [cardId]: result }));
+			setCardData(prev => ({ ...prev, ...results }));
 		} catch {
-			// Silently handle errors per card
+			// Silently handle dashboard run errors
 		} finally {
-			setCardLoading(prev => ({ ...prev, [cardId]: false }));
+			setCardLoading(prev => ({ ...prev, ...Object.fromEntries(runnable.map(card => [card.id, false])) }));
 		}
-	}, [orgId, crossFilter]);
+	}, [orgId, dashboard.id, dashboard.cards, crossFilter]);
 
 	useEffect(() => {
-		dashboard.cards.forEach(card => {
-			const vizType = card.question?.viz_type;
-			if (card.question && vizType !== 'markdown' && vizType !== 'walker') {
-				fetchCardData(card);
-			}
-		});
-	}, [dashboard.cards, fetchCardData]);
+		fetchDashboardData();
+	}, [fetchDashboardData]);
 
 	const handleDrillThrough = async (question: SavedQuestion, category: string) => {
 		try {
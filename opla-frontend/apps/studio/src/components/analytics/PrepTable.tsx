@@ -2,7 +2,7 @@ import { useEffect, useMemo, useRef, useState, type MouseEvent as ReactMouseEven
 import { Columns3, FlaskConical, Link2, Loader2, Plus, Save, Search, Table2, Trash2, Unlink, X } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
-import { analyticsAPI } from '../../lib/api';
+import { analyticsAPI, jobsAPI } from '../../lib/api';
 import { defaultSource } from './queryUtils';
 import type { AnalyticsToolProps } from './types';
 import { evaluateCalculatedColumn, validateFormula } from './excelFormulas';
@@ -229,6 +229,7 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 	const [saveSelectedKeys, setSaveSelectedKeys] = useState<string[]>([]);
 	const [saving, setSaving] = useState(false);
 	const [saveError, setSaveError] = useState<string | null>(null);
+	const [saveProgress, setSaveProgress] = useState<string | null>(null);
 	const [columnWidths, setColumnWidths] = useState<Record<string, number>>({});
 	const [displayMode, setDisplayMode] = useState<DisplayMode>('label');
 	const columnWidthsRef = useRef(columnWidths);
@@ -342,6 +343,12 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 				const selectKeys = directory.length
 					? directory.map(column => column.key)
 					: selectedSource.fields.map(field => field.field_key);
+				// Linked tables evaluate their formulas in SQL; ask for those columns too.
+				if (isLinked) {
+					for (const column of selectedSource.derived?.columns ?? []) {
+						if (column.calculated && !selectKeys.includes(column.key)) selectKeys.push(column.key);
+					}
+				}
 
 				const response = await analyticsAPI.runQuery(orgId, {
 					dataset_id: selectedSource.dataset_id,
@@ -370,7 +377,10 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 				let nextRows: Array<Record<string, unknown>> = response.rows ?? [];
 
 				if (isLinked || responseDerived?.mode === 'linked') {
-					const applied = applyPrepFormulas(nextRows, nextColumns);
+					const serverComputed = new Set<string>(
+						(response.columns ?? []).map((column: { key: string }) => column.key),
+					);
+					const applied = applyPrepFormulas(nextRows, nextColumns, serverComputed);
 					if (applied.error) {
 						setError(applied.error);
 					}
@@ -559,17 +569,7 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 		setSaving(true);
 		setSaveError(null);
 		try {
-			const projectedRows =
-				saveMode === 'snapshot'
-					? rows.map(row => {
-							const next: Record<string, unknown> = {};
-							for (const column of selectedColumns) {
-								next[column.key] = row[column.key];
-							}
-							return next;
-						})
-					: [];
-
+			// Snapshots are copied from the parent on the server; no rows are posted.
 			const result = await analyticsAPI.saveDerivedDataset(orgId, {
 				name,
 				mode: saveMode,
@@ -582,8 +582,24 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 					calculated: Boolean(column.calculated),
 					formula: column.formula || null,
 				})),
-				rows: projectedRows,
 			});
+			if (result?.job_id) {
+				const job = await jobsAPI.waitFor(orgId, result.job_id, progress =>
+					setSaveProgress(
+						progress.progress_total ? `${progress.progress_done.toLocaleString()} / ${progress.progress_total.toLocaleString()} rows` : null,
+					),
+				);
+				if (job.status === 'failed') {
+					const unsupported = job.error?.startsWith('UNSUPPORTED_CALCULATED_COLUMNS:')
+						? job.error.split(':', 2)[1].split(',').map(key => selectedColumns.find(column => column.key === key)?.label || key)
+						: null;
+					throw new Error(
+						unsupported
+							? `These formulas cannot be saved in a snapshot: ${unsupported.join(', ')}. Remove them or save as a linked table.`
+							: job.error || 'Snapshot could not be created.',
+					);
+				}
+			}
 			await onSourcesChanged?.();
 			setShowSave(false);
 			if (result?.dataset_id) {
@@ -593,6 +609,7 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 			setSaveError(err?.response?.data?.detail || err?.message || 'Could not save table.');
 		} finally {
 			setSaving(false);
+			setSaveProgress(null);
 		}
 	}
 
@@ -862,7 +879,7 @@ export default function PrepTable({ orgId, projectId, sources, initialSource, on
 							{saving ? (
 								<>
 									<Loader2 className="mr-1.5 h-3.5 w-3.5 animate-spin" />
-									Saving…
+									{saveProgress ? `Copying ${saveProgress}…` : 'Saving…'}
 								</>
 							) : (
 								<>Save as {saveMode === 'snapshot' ? 'snapshot' : 'linked table'}</>
@@ -70,13 +70,17 @@ export function columnsFromDerivedMeta(
 	}));
 }
 
-/** Re-apply calculated Prep formulas onto live parent rows (linked tables). */
+/** Re-apply calculated Prep formulas onto live parent rows (linked tables).
+ * Columns listed in serverComputed already arrive evaluated by the query and are skipped. */
 export function applyPrepFormulas(
 	baseRows: Array<Record<string, unknown>>,
 	columns: PrepColumn[],
+	serverComputed: Set<string> = new Set(),
 ): { rows: Array<Record<string, unknown>>; error: string | null } {
 	let working = baseRows.map(row => ({ ...row }));
-	const calcColumns = columns.filter(column => column.calculated && column.formula);
+	const calcColumns = columns.filter(
+		column => column.calculated && column.formula && !serverComputed.has(column.key),
+	);
 	for (const column of calcColumns) {
 		const prior = columns.filter(c => c.key !== column.key || !c.calculated);
 		const { values, error } = evaluateCalculatedColumn(working, prior.length ? prior : columns.filter(c => !c.calculated), column.formula!);
@@ -120,13 +120,10 @@ export function useInboxAttention(
                             const captureForms = Array.isArray(forms) ? forms : [];
                             const queues = await Promise.all(
                                 captureForms.map((form: { id: string }) =>
-                                    submissionAPI.listForForm(form.id, 'submitted').catch(() => []),
+                                    submissionAPI.countForForm(form.id, { review_status: 'submitted' }).catch(() => 0),
                                 ),
                             );
-                            pendingReview = queues.reduce(
-                                (sum, rows) => sum + (Array.isArray(rows) ? rows.length : 0),
-                                0,
-                            );
+                            pendingReview = queues.reduce((sum, count) => sum + count, 0);
                             const attendanceRows = Array.isArray(attendance) ? attendance : [];
                             attendanceTotal = attendanceRows.length;
                             checkedIn = attendanceRows.filter(
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import type { JsonPatchOperation } from './jsonPatch';
 
 // API Base URL from environment
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api/v1';
@@ -594,10 +595,21 @@ export const formAPI = {
         const response = await apiClient.put(`/forms/${formId}/responsibility`, data);
         return response.data;
     },
-    updateBlueprint: async (formId: string, blueprint: any, targetSlot: number = 1) => {
-        const response = await apiClient.put(`/forms/${formId}/blueprint?target_slot=${targetSlot}`, blueprint);
+    /** Replace a draft slot; with `baseRevision` the save rejects with 409 when the draft moved on. */
+    updateBlueprint: async (formId: string, blueprint: any, targetSlot: number = 1, baseRevision?: number) => {
+        const response = await apiClient.put(`/forms/${formId}/blueprint`, blueprint, {
+            params: { target_slot: targetSlot, base_revision: baseRevision },
+        });
         return response.data;
     },
+    /** Apply JSON Patch / field operations on top of `baseRevision`; rejects with 409 when the draft moved on. */
+    patchBlueprint: async (formId: string, baseRevision: number, operations: unknown[], targetSlot: number = 1) => {
+        const response = await apiClient.patch(`/forms/${formId}/blueprint?target_slot=${targetSlot}`, {
+            base_revision: baseRevision,
+            operations,
+        });
+        return response.data as { id: string; blueprint_revision: number; updated_at: string };
+    },
     get: async (formId: string) => {
         const response = await apiClient.get(`/forms/${formId}`);
         return response.data;
@@ -610,6 +622,14 @@ export const formAPI = {
         const response = await apiClient.post(`/forms/${formId}/publish`, payload || {});
         return response.data;
     },
+    /** Publish as a background job; poll it with jobsAPI.waitFor. */
+    publishInBackground: async (
+        formId: string,
+        payload?: { draft_version_id?: string; draft_slot?: number; changelog?: string; migrate_renamed_keys?: boolean },
+    ) => {
+        const response = await apiClient.post(`/forms/${formId}/publish-job`, payload || {});
+        return response.data as BackgroundJob;
+    },
     listVersions: async (formId: string) => {
         const response = await apiClient.get(`/forms/${formId}/versions`);
         return response.data;
@@ -674,6 +694,11 @@ export type AiSurveyInterviewQuestion = {
     options?: string[] | null;
 };
 
+export type AiSurveyDraftEvents = {
+    onOutline?: (outline: { title: string; sections: { id: string; title: string }[] }) => void;
+    onSection?: (section: { index: number; id: string; markdown: string }) => void;
+};
+
 export const aiSurveyAPI = {
     interview: async (brief: string): Promise<{ questions: AiSurveyInterviewQuestion[] }> => {
         const response = await apiClient.post('/ai/survey/interview', { brief }, { timeout: 60000 });
@@ -684,12 +709,69 @@ export const aiSurveyAPI = {
         const response = await apiClient.post('/ai/survey/draft', { brief, answers }, { timeout: 300000 });
         return response.data;
     },
+    /**
+     * Chunked drafts stream over SSE: sections arrive as each one compiles. Uses
+     * fetch because EventSource cannot POST; abort the signal to cancel the draft.
+     */
+    draftStream: async (
+        brief: string,
+        answers: Record<string, string> | undefined,
+        events: AiSurveyDraftEvents = {},
+        signal?: AbortSignal,
+    ): Promise<{ title: string; markdown: string }> => {
+        const token = localStorage.getItem('access_token');
+        const response = await fetch(`${API_URL}/ai/survey/draft/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...(token ? { Authorization: `Bearer ${token}` } : {}),
+            },
+            body: JSON.stringify({ brief, answers }),
+            signal,
+        });
+        if (!response.ok || !response.body) {
+            const payload = await response.json().catch(() => null);
+            throw new Error(payload?.detail || `Draft failed (${response.status})`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                boundary = buffer.indexOf('\n\n');
+                const event = frame.match(/^event: (.*)$/m)?.[1];
+                const data = frame.match(/^data: (.*)$/m)?.[1];
+                if (!event || data === undefined) continue;
+                const payload = JSON.parse(data);
+                if (event === 'outline') events.onOutline?.(payload);
+                else if (event === 'section') events.onSection?.(payload);
+                else if (event === 'error') throw new Error(payload.detail || 'Draft failed');
+                else if (event === 'done') return payload;
+            }
+        }
+        throw new Error('Draft stream ended early');
+    },
     revise: async (markdown: string, instruction: string): Promise<{ markdown: string }> => {
         const response = await apiClient.post('/ai/survey/revise', { markdown, instruction }, { timeout: 180000 });
         return response.data;
     },
-    compile: async (markdown: string): Promise<{ title: string; blueprint: any; warnings: string[] }> => {
-        const response = await apiClient.post('/ai/survey/compile', { markdown }, { timeout: 30000 });
+    /** With a baseRevision the server may answer with a JSON Patch against that preview instead of the blueprint. */
+    compile: async (
+        markdown: string,
+        baseRevision?: string,
+    ): Promise<{ title: string; revision: string; blueprint?: any; patch?: JsonPatchOperation[]; warnings: string[] }> => {
+        const response = await apiClient.post(
+            '/ai/survey/compile',
+            { markdown, base_revision: baseRevision },
+            { timeout: 30000 },
+        );
         return response.data;
     },
     generate: async (projectId: string, data: { markdown: string; title?: string }) => {
@@ -744,11 +826,41 @@ export const submissionAPI = {
         const response = await apiClient.post('/submissions', data);
         return response.data;
     },
-    listForForm: async (formId: string, reviewStatus?: 'submitted' | 'approved' | 'rejected') => {
+    listPageForForm: async (
+        formId: string,
+        params: {
+            review_status?: 'submitted' | 'approved' | 'rejected';
+            user_id?: string;
+            submitted_after?: string;
+            submitted_before?: string;
+            field_filter?: string[];
+            fields?: string;
+            include_metadata?: boolean;
+            limit?: number;
+            cursor?: string;
+        } = {},
+    ) => {
         const response = await apiClient.get(`/forms/${formId}/submissions`, {
-            params: reviewStatus ? { review_status: reviewStatus } : undefined,
+            params,
+            paramsSerializer: { indexes: null },
         });
-        return response.data;
+        return response.data as { items: any[]; next_cursor: string | null };
+    },
+    countForForm: async (
+        formId: string,
+        params: {
+            review_status?: 'submitted' | 'approved' | 'rejected';
+            user_id?: string;
+            submitted_after?: string;
+            submitted_before?: string;
+            field_filter?: string[];
+        } = {},
+    ) => {
+        const response = await apiClient.get(`/forms/${formId}/submissions/count`, {
+            params,
+            paramsSerializer: { indexes: null },
+        });
+        return (response.data?.count ?? 0) as number;
     },
     review: async (submissionId: string, data: { review_status: 'submitted' | 'approved' | 'rejected'; review_comment?: string }) => {
         const response = await apiClient.patch(`/submissions/${submissionId}/review`, data);
@@ -801,11 +913,26 @@ export const analyticsAPI = {
             order_by?: Array<{ field: string; direction?: 'asc' | 'desc' }>;
             limit?: number;
             offset?: number;
+            query_id?: string;
         },
     ) => {
         const response = await apiClient.post(`/organizations/${orgId}/analytics/query`, data);
         return response.data;
     },
+    cancelQuery: async (orgId: string, queryId: string) => {
+        const response = await apiClient.post(`/organizations/${orgId}/analytics/queries/${queryId}/cancel`);
+        return response.data;
+    },
+    /** Upload a CSV as a new dataset; rows are imported by the returned background job. */
+    uploadCsv: async (orgId: string, projectId: string, file: File) => {
+        const formData = new FormData();
+        formData.append('file', file);
+        const response = await apiClient.post(`/organizations/${orgId}/analytics/upload-csv`, formData, {
+            params: { project_id: projectId },
+            headers: { 'Content-Type': 'multipart/form-data' },
+        });
+        return response.data as { dataset_id: string; form_id: string; name: string; job_id: string };
+    },
     walkerCompute: async (orgId: string, datasetId: string, payload: any) => {
         const response = await apiClient.post(`/analytics/walker/${datasetId}/compute`, payload, {
             params: { org_id: orgId }
@@ -844,6 +971,14 @@ export const analyticsAPI = {
         const response = await apiClient.patch(`/organizations/${orgId}/analytics/dashboards/${dashboardId}`, data);
         return response.data;
     },
+    runDashboard: async (
+        orgId: string,
+        dashboardId: string,
+        data: { filters?: unknown; card_ids?: string[]; timeout_seconds?: number } = {},
+    ) => {
+        const response = await apiClient.post(`/organizations/${orgId}/analytics/dashboards/${dashboardId}/run`, data);
+        return response.data;
+    },
     deleteDashboard: async (orgId: string, dashboardId: string) => {
         const response = await apiClient.delete(`/organizations/${orgId}/analytics/dashboards/${dashboardId}`);
         return response.data;
@@ -857,6 +992,8 @@ export const analyticsAPI = {
             date_field?: string;
             period?: string;
             filters?: unknown;
+            series_length?: number;
+            as_of?: string;
         },
     ) => {
         const response = await apiClient.post(`/organizations/${orgId}/analytics/compare`, data);
@@ -888,8 +1025,41 @@ export const analyticsAPI = {
             parent_dataset_id?: string;
             row_count: number;
             record_count: number;
+            job_id?: string | null;
         };
     },
 };
 
+export interface BackgroundJob {
+    id: string;
+    kind: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    progress_done: number;
+    progress_total?: number | null;
+    subject_id?: string | null;
+    result_json?: Record<string, unknown> | null;
+    error?: string | null;
+}
+
+export const jobsAPI = {
+    get: async (orgId: string, jobId: string) => {
+        const response = await apiClient.get(`/organizations/${orgId}/jobs/${jobId}`);
+        return response.data as BackgroundJob;
+    },
+    /** Poll a job until it finishes, reporting progress along the way. */
+    waitFor: async (
+        orgId: string,
+        jobId: string,
+        onProgress?: (job: BackgroundJob) => void,
+        intervalMs = 1000,
+    ) => {
+        for (;;) {
+            const job = await jobsAPI.get(orgId, jobId);
+            onProgress?.(job);
+            if (job.status === 'succeeded' || job.status === 'failed') return job;
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    },
+};
+
 export default apiClient;
@@ -0,0 +1,112 @@
+export type JsonPatchOperation =
+    | { op: 'add' | 'replace'; path: string; value: unknown }
+    | { op: 'remove'; path: string };
+
+const escapeToken = (token: string) => token.replace(/~/g, '~0').replace(/\//g, '~1');
+
+const kindOf = (value: unknown) => (value === null ? 'null' : Array.isArray(value) ? 'array' : typeof value);
+
+const isEqual = (a: unknown, b: unknown): boolean => {
+    if (a === b) return true;
+    const kind = kindOf(a);
+    if (kind !== kindOf(b)) return false;
+    if (kind === 'array') {
+        const left = a as unknown[];
+        const right = b as unknown[];
+        return left.length === right.length && left.every((item, index) => isEqual(item, right[index]));
+    }
+    if (kind === 'object') {
+        const left = a as Record<string, unknown>;
+        const right = b as Record<string, unknown>;
+        const keys = Object.keys(left).filter(key => left[key] !== undefined);
+        return keys.length === Object.keys(right).filter(key => right[key] !== undefined).length
+            && keys.every(key => isEqual(left[key], right[key]));
+    }
+    return false;
+};
+
+/**
+ * RFC 6902 operations turning `source` into `target`, mirroring the server's
+ * diff: lists trim their common prefix and suffix so an inserted question is a
+ * single add. Keys whose value is undefined are treated as absent, as in JSON.
+ */
+export const diffJson = (source: unknown, target: unknown, path = ''): JsonPatchOperation[] => {
+    const kind = kindOf(source);
+    if (kind !== kindOf(target)) return [{ op: 'replace', path, value: target }];
+
+    if (kind === 'object') {
+        const left = source as Record<string, unknown>;
+        const right = target as Record<string, unknown>;
+        const ops: JsonPatchOperation[] = [];
+        for (const key of Object.keys(left)) {
+            if (left[key] === undefined) continue;
+            const child = `${path}/${escapeToken(key)}`;
+            if (right[key] === undefined) ops.push({ op: 'remove', path: child });
+            else ops.push(...diffJson(left[key], right[key], child));
+        }
+        for (const key of Object.keys(right)) {
+            if (right[key] !== undefined && left[key] === undefined) {
+                ops.push({ op: 'add', path: `${path}/${escapeToken(key)}`, value: right[key] });
+            }
+        }
+        return ops;
+    }
+
+    if (kind === 'array') {
+        const left = source as unknown[];
+        const right = target as unknown[];
+        let start = 0;
+        while (start < left.length && start < right.length && isEqual(left[start], right[start])) start += 1;
+        let leftEnd = left.length;
+        let rightEnd = right.length;
+        while (leftEnd > start && rightEnd > start && isEqual(left[leftEnd - 1], right[rightEnd - 1])) {
+            leftEnd -= 1;
+            rightEnd -= 1;
+        }
+        const ops: JsonPatchOperation[] = [];
+        const common = Math.min(leftEnd, rightEnd) - start;
+        for (let offset = 0; offset < common; offset += 1) {
+            ops.push(...diffJson(left[start + offset], right[start + offset], `${path}/${start + offset}`));
+        }
+        for (let index = leftEnd - 1; index >= start + common; index -= 1) {
+            ops.push({ op: 'remove', path: `${path}/${index}` });
+        }
+        for (let index = start + common; index < rightEnd; index += 1) {
+            ops.push({ op: 'add', path: `${path}/${index}`, value: right[index] });
+        }
+        return ops;
+    }
+
+    return isEqual(source, target) ? [] : [{ op: 'replace', path, value: target }];
+};
+
+const unescapeToken = (token: string) => token.replace(/~1/g, '/').replace(/~0/g, '~');
+
+/**
+ * Applies RFC 6902 add/replace/remove operations (as produced by `diffJson` or
+ * the server's diff) to a copy of `document`; the input is left untouched.
+ */
+export const applyJsonPatch = <T>(document: T, ops: JsonPatchOperation[]): T => {
+    let root: unknown = structuredClone(document);
+    for (const op of ops) {
+        if (op.path === '') {
+            root = op.op === 'remove' ? undefined : structuredClone(op.value);
+            continue;
+        }
+        const tokens = op.path.slice(1).split('/').map(unescapeToken);
+        const last = tokens.pop() as string;
+        let parent: any = root;
+        for (const token of tokens) parent = Array.isArray(parent) ? parent[Number(token)] : parent[token];
+        if (Array.isArray(parent)) {
+            const index = last === '-' ? parent.length : Number(last);
+            if (op.op === 'add') parent.splice(index, 0, structuredClone(op.value));
+            else if (op.op === 'replace') parent[index] = structuredClone(op.value);
+            else parent.splice(index, 1);
+        } else if (op.op === 'remove') {
+            delete parent[last];
+        } else {
+            parent[last] = structuredClone(op.value);
+        }
+    }
+    return root as T;
+};
@@ -1,9 +1,10 @@
-import React, { useEffect, useMemo, useState } from 'react';
+import React, { useEffect, useMemo, useRef, useState } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 import { ArrowLeft, Code2, Eye, Loader2, Sparkles, Wand2 } from 'lucide-react';
 import ThemeToggle from '../components/ThemeToggle';
 import SurveyMarkdownPreview from '../components/SurveyMarkdownPreview';
 import { aiSurveyAPI, type AiSurveyInterviewQuestion } from '../lib/api';
+import { applyJsonPatch } from '../lib/jsonPatch';
 
 type WizardStep = 'brief' | 'interview' | 'draft';
 type DraftViewMode = 'preview' | 'edit';
@@ -26,6 +27,8 @@ const AiSurveyWizard: React.FC = () => {
     const [busy, setBusy] = useState(false);
     const [busyLabel, setBusyLabel] = useState('Working…');
     const [draftView, setDraftView] = useState<DraftViewMode>('preview');
+    // Last compiled preview; the server patches it instead of resending the whole blueprint.
+    const previewRef = useRef<{ revision: string; blueprint: any } | null>(null);
 
     const canContinueBrief = brief.trim().length >= 8;
 
@@ -44,10 +47,15 @@ const AiSurveyWizard: React.FC = () => {
         }
         const handle = window.setTimeout(async () => {
             try {
-                const result = await aiSurveyAPI.compile(markdown);
+                const previous = previewRef.current;
+                const result = await aiSurveyAPI.compile(markdown, previous?.revision);
+                const blueprint = result.patch && previous
+                    ? applyJsonPatch(previous.blueprint, result.patch)
+                    : result.blueprint;
+                previewRef.current = { revision: result.revision, blueprint };
                 setWarnings(result.warnings || []);
                 setTitle((prev) => prev || result.title);
-                const ui = Array.isArray(result.blueprint?.ui) ? result.blueprint.ui : [];
+                const ui = Array.isArray(blueprint?.ui) ? blueprint.ui : [];
                 setSectionCount(ui.length);
                 setFieldCount(
                     ui.reduce((sum: number, screen: any) => sum + (Array.isArray(screen?.children) ? screen.children.length : 0), 0),
@@ -72,7 +80,18 @@ const AiSurveyWizard: React.FC = () => {
         setBusyLabel('Drafting questionnaire… larger surveys are built section-by-section');
         setError('');
         try {
-            const result = await aiSurveyAPI.draft(brief.trim(), withAnswers);
+            let total = 0;
+            let drafted = 0;
+            const result = await aiSurveyAPI.draftStream(brief.trim(), withAnswers, {
+                onOutline: (outline) => {
+                    total = outline.sections.length;
+                    setBusyLabel(`Drafting ${total} sections of “${outline.title}”…`);
+                },
+                onSection: () => {
+                    drafted += 1;
+                    setBusyLabel(`Drafted ${drafted} of ${total} sections…`);
+                },
+            });
             setTitle(result.title);
             setMarkdown(result.markdown);
             setDraftView('preview');
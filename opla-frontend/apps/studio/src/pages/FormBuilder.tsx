@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useMemo, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { formAPI, projectAPI, sectionTemplateAPI } from '../lib/api';
+import { formAPI, jobsAPI, projectAPI, sectionTemplateAPI } from '../lib/api';
+import { diffJson } from '../lib/jsonPatch';
 import { projectNavHref, projectShellNavHref } from '../lib/vocabulary';
 import { useOrg } from '../contexts/OrgContext';
 import StudioLayout from '../components/StudioLayout';
@@ -1300,6 +1301,8 @@ const FormBuilder: React.FC = () => {
     const [isLeftPanelPinned, setIsLeftPanelPinned] = useState(false);
     const [leftPanelWidth, setLeftPanelWidth] = useState(560);
     const isResizingLeftPanel = useRef(false);
+    // Last working draft this session saved, and the server revision it produced; autosaves send a diff against it.
+    const savedDraftRef = useRef<{ blueprint: FormBlueprint | null; revision: number }>({ blueprint: null, revision: 0 });
     const leftPanelStartX = useRef(0);
     const leftPanelStartW = useRef(0);
     const [rightPanelWidth, setRightPanelWidth] = useState(560);
@@ -1589,6 +1592,7 @@ const FormBuilder: React.FC = () => {
     const [initialHash, setInitialHash] = useState<string>('');
     const [hasUnsavedChanges, setHasUnsavedChanges] = useState<boolean>(false);
     const [isPublishing, setIsPublishing] = useState(false);
+    const [migrateRenamedKeys, setMigrateRenamedKeys] = useState(false);
     const [swipedFieldId, setSwipedFieldId] = useState<string | null>(null);
     const [swipeOffset, setSwipeOffset] = useState(0);
     const [confirmDeleteFieldId, setConfirmDeleteFieldId] = useState<string | null>(null);
@@ -2300,6 +2304,7 @@ const FormBuilder: React.FC = () => {
                 });
                 setActiveVersions(Array.isArray(versions) ? versions : []);
                 setTitle(data.title || 'Untitled Form');
+                savedDraftRef.current = { blueprint: null, revision: data.blueprint_revision ?? 0 };
 
                 // Load sibling forms in same project for form-link picker
                 if (data.project_id) {
@@ -2634,6 +2639,40 @@ const FormBuilder: React.FC = () => {
         has_no_max: field.has_no_max,
     });
 
+    const saveWorkingDraft = async (blueprint: FormBlueprint) => {
+        if (!formId) return;
+        const saved = savedDraftRef.current;
+        if (saved.blueprint) {
+            const operations = diffJson(saved.blueprint, blueprint);
+            if (operations.length === 0) return;
+            try {
+                const result = await formAPI.patchBlueprint(formId, saved.revision, operations, 1);
+                savedDraftRef.current = { blueprint, revision: result.blueprint_revision };
+                return;
+            } catch (err: any) {
+                // The patch no longer applies: fall back to a full save. A 409 (draft changed elsewhere) propagates.
+                if (err?.response?.status !== 400) throw err;
+            }
+        }
+        const form = await formAPI.updateBlueprint(formId, blueprint, 1, saved.revision);
+        savedDraftRef.current = { blueprint, revision: form.blueprint_revision ?? 0 };
+    };
+
+    /** Another editor saved the draft since we loaded it: overwrite only if the user says so, else reload theirs. */
+    const resolveDraftConflict = async (blueprint: FormBlueprint) => {
+        if (!formId) return false;
+        if (window.confirm('This draft was changed by someone else since you opened it. Overwrite their changes with yours? Cancel loads the latest draft instead.')) {
+            const form = await formAPI.updateBlueprint(formId, blueprint, 1);
+            savedDraftRef.current = { blueprint, revision: form.blueprint_revision ?? 0 };
+            return true;
+        }
+        const latest = await formAPI.get(formId);
+        savedDraftRef.current = { blueprint: null, revision: latest.blueprint_revision ?? 0 };
+        const latestBlueprint = latest.blueprint_draft || latest.blueprint_live;
+        if (latestBlueprint) applyBlueprintToBuilder(latestBlueprint, latest.title || title);
+        return false;
+    };
+
     const handleSave = async () => {
         if (!formId) return;
         setIsSaving(true);
@@ -2679,7 +2718,15 @@ const FormBuilder: React.FC = () => {
                     .filter((id, idx, arr) => arr.indexOf(id) === idx),
             };
             // Working draft is always slot 1.
-            await formAPI.updateBlueprint(formId, blueprint, 1);
+            try {
+                await saveWorkingDraft(blueprint);
+            } catch (err: any) {
+                if (err?.response?.status !== 409) throw err;
+                if (!(await resolveDraftConflict(blueprint))) {
+                    showToast('Draft reloaded', 'Loaded the latest draft saved by another editor.', 'info');
+                    return;
+                }
+            }
 
             const versions = await formAPI.listVersions(formId);
             setActiveVersions(Array.isArray(versions) ? versions : []);
@@ -2729,8 +2776,17 @@ const FormBuilder: React.FC = () => {
                 await handleSave();
             }
 
-            // Publish always promotes the working draft (slot 1).
-            const data = await formAPI.publish(formId, { draft_slot: 1 });
+            // Publish always promotes the working draft (slot 1). When the author opts in,
+            // the job also moves existing answers of renamed fields to their new keys.
+            let data;
+            if (currentOrg?.id) {
+                const job = await formAPI.publishInBackground(formId, { draft_slot: 1, migrate_renamed_keys: migrateRenamedKeys });
+                const finished = await jobsAPI.waitFor(currentOrg.id, job.id);
+                if (finished.status === 'failed') throw new Error(finished.error || 'JOB_FAILED');
+                data = await formAPI.get(formId);
+            } else {
+                data = await formAPI.publish(formId, { draft_slot: 1 });
+            }
             setFormMeta((prev) => prev ? {
                 ...prev,
                 version: data.version ?? prev.version,
@@ -2741,6 +2797,7 @@ const FormBuilder: React.FC = () => {
             const versions = await formAPI.listVersions(formId);
             setActiveVersions(Array.isArray(versions) ? versions : []);
 
+            setMigrateRenamedKeys(false);
             showToast('Published', `Live version ${data.published_version ?? data.version ?? ''} is now deployed.`, 'success');
         } catch (err) {
             console.error('Publish failed', err);
@@ -2795,7 +2852,8 @@ const FormBuilder: React.FC = () => {
                     .filter((id, idx, arr) => arr.indexOf(id) === idx),
             };
 
-            await formAPI.updateBlueprint(formId, blueprint, slot);
+            const saved = await formAPI.updateBlueprint(formId, blueprint, slot);
+            savedDraftRef.current = { ...savedDraftRef.current, revision: saved.blueprint_revision ?? 0 };
             const versions = await formAPI.listVersions(formId);
             setActiveVersions(Array.isArray(versions) ? versions : []);
             showToast('Backup saved', `Stored current state in backup ${slot === 2 ? 'A' : 'B'}.`, 'success');
@@ -2820,6 +2878,7 @@ const FormBuilder: React.FC = () => {
         try {
             await formAPI.updateBlueprint(formId, backup.blueprint, 1);
             const refreshedForm = await formAPI.get(formId);
+            savedDraftRef.current = { blueprint: null, revision: refreshedForm.blueprint_revision ?? 0 };
             const versions = await formAPI.listVersions(formId);
             setActiveVersions(Array.isArray(versions) ? versions : []);
 
@@ -6415,6 +6474,21 @@ const FormBuilder: React.FC = () => {
                                                 <span>Publish Live</span>
                                             </button>
                                         </div>
+                                        {formMeta?.published_version ? (
+                                            <label
+                                                className="flex items-start gap-2 text-[11px] text-[hsl(var(--text-secondary))] cursor-pointer select-none"
+                                                title="Existing submissions are rewritten in batches; if the publish fails they are moved back."
+                                            >
+                                                <input
+                                                    type="checkbox"
+                                                    checked={migrateRenamedKeys}
+                                                    onChange={(e) => setMigrateRenamedKeys(e.target.checked)}
+                                                    disabled={isPublishing || !currentOrg?.id}
+                                                    className="mt-0.5 h-3.5 w-3.5 rounded border-[hsl(var(--border))] text-[hsl(var(--primary))] focus:ring-[hsl(var(--primary))]/30 cursor-pointer"
+                                                />
+                                                <span>Move existing answers of renamed fields to their new keys</span>
+                                            </label>
+                                        ) : null}
                                     </div>
 
                                     {/* Simulate Buttons */}
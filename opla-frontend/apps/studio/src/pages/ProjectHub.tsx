@@ -113,7 +113,7 @@ const ProjectHub: React.FC = () => {
     const [datasets, setDatasets] = useState<HubDataset[]>([]);
     const [teams, setTeams] = useState<HubTeam[]>([]);
     const [tasks, setTasks] = useState<any[]>([]);
-    const [submissions, setSubmissions] = useState<any[]>([]);
+    const [submissionStats, setSubmissionStats] = useState({ total: 0, pending: 0, thisWeek: 0, todayCount: 0 });
     const [attendanceToday, setAttendanceToday] = useState<any[]>([]);
     const [accessRules, setAccessRules] = useState<any[]>([]);
     const [pinnedQuestions, setPinnedQuestions] = useState<SavedQuestion[]>([]);
@@ -177,10 +177,29 @@ const ProjectHub: React.FC = () => {
                 const directories: HubForm[] = Array.isArray(directoryKindForms) ? directoryKindForms : [];
                 const formIds = [...allForms, ...directories].map((f) => f.id);
 
-                const submissionBatches = await Promise.all(
-                    formIds.map((formId) => submissionAPI.listForForm(formId).catch(() => [])),
+                // The hub only shows totals, so ask for counts instead of paging every submission.
+                const todayStart = new Date();
+                todayStart.setHours(0, 0, 0, 0);
+                const weekStart = startOfWeek(new Date());
+                const countBatches = await Promise.all(
+                    formIds.map((formId) =>
+                        Promise.all([
+                            submissionAPI.countForForm(formId),
+                            submissionAPI.countForForm(formId, { review_status: 'submitted' }),
+                            submissionAPI.countForForm(formId, { submitted_after: weekStart.toISOString() }),
+                            submissionAPI.countForForm(formId, { submitted_after: todayStart.toISOString() }),
+                        ]).catch(() => [0, 0, 0, 0]),
+                    ),
+                );
+                const hubSubmissionStats = countBatches.reduce(
+                    (stats, [total, pending, thisWeek, todayCount]) => ({
+                        total: stats.total + total,
+                        pending: stats.pending + pending,
+                        thisWeek: stats.thisWeek + thisWeek,
+                        todayCount: stats.todayCount + todayCount,
+                    }),
+                    { total: 0, pending: 0, thisWeek: 0, todayCount: 0 },
                 );
-                const flatSubmissions = submissionBatches.flat();
 
                 const teamAccessIds = new Set(
                     (access || [])
@@ -217,7 +236,7 @@ const ProjectHub: React.FC = () => {
                 setAccessRules(access || []);
                 setTeams(hubTeams);
                 setDatasets(projectDatasets);
-                setSubmissions(flatSubmissions);
+                setSubmissionStats(hubSubmissionStats);
                 setAttendanceToday(attendance || []);
                 setCanEditPins(Boolean(pinnedPayload?.can_edit));
                 setMaxPins(pinnedPayload?.max_pins || 4);
@@ -244,21 +263,6 @@ const ProjectHub: React.FC = () => {
         };
     }, [currentOrg?.id, projectId, refreshCurrentProject, setCurrentProject]);
 
-    const weekStart = useMemo(() => startOfWeek(new Date()), []);
-
-    const submissionStats = useMemo(() => {
-        const total = submissions.length;
-        const pending = submissions.filter((s) => (s.review_status || 'submitted') === 'submitted').length;
-        const thisWeek = submissions.filter((s) => {
-            const created = new Date(s.created_at);
-            return created >= weekStart;
-        }).length;
-        const todayStart = new Date();
-        todayStart.setHours(0, 0, 0, 0);
-        const todayCount = submissions.filter((s) => new Date(s.created_at) >= todayStart).length;
-        return { total, pending, thisWeek, todayCount };
-    }, [submissions, weekStart]);
-
     const taskStats = useMemo(() => {
         const done = tasks.filter((t) => t.status === 'done').length;
         const open = tasks.filter((t) => t.status !== 'done' && t.status !== 'cancelled').length;
@@ -210,6 +210,8 @@ type AccessorOption = {
     label: string;
 };
 
+const REVIEW_QUEUE_PAGE_SIZE = 50;
+
 const statusTone: Record<string, string> = {
     planning: 'bg-amber-500/10 text-amber-300 border border-amber-500/20',
     active: 'bg-emerald-500/10 text-emerald-300 border border-emerald-500/20',
@@ -400,6 +402,7 @@ const ProjectWorkspace: React.FC = () => {
     const [directoryConfirmLoading, setDirectoryConfirmLoading] = useState(false);
     const [entriesLoading, setEntriesLoading] = useState(false);
     const [reviewQueue, setReviewQueue] = useState<ReviewQueueItem[]>([]);
+    const [pendingReviewCount, setPendingReviewCount] = useState(0);
     const [tasks, setTasks] = useState<ProjectTask[]>([]);
     const [attendanceRecords, setAttendanceRecords] = useState<ProjectAttendanceRecord[]>([]);
     const [reports, setReports] = useState<ReportArtifact[]>([]);
@@ -480,21 +483,25 @@ const ProjectWorkspace: React.FC = () => {
                     analyticsAPI.listSources(currentOrg.id).catch(() => []),
                     projectAPI.listMessages(currentOrg.id, projectId).catch(() => []),
                 ]);
-                const pendingReviews = (
-                    await Promise.all(
-                        projectForms.map(async (form: WorkspaceForm) => {
-                            try {
-                                const submissions = await submissionAPI.listForForm(form.id, 'submitted');
-                                  return (Array.isArray(submissions) ? submissions : []).map((submission: any) => ({
-                                    ...submission,
-                                    form_title: form.title,
-                                }));
-                            } catch {
-                                return [];
-                            }
-                        }),
-                    )
-                ).flat();
+                // Load the newest page of each form's queue plus the true pending total,
+                // rather than following every cursor.
+                const reviewPages = await Promise.all(
+                    projectForms.map(async (form: WorkspaceForm) => {
+                        try {
+                            const [page, pending] = await Promise.all([
+                                submissionAPI.listPageForForm(form.id, { review_status: 'submitted', limit: REVIEW_QUEUE_PAGE_SIZE }),
+                                submissionAPI.countForForm(form.id, { review_status: 'submitted' }),
+                            ]);
+                            return {
+                                items: page.items.map((submission: any) => ({ ...submission, form_title: form.title })),
+                                pending,
+                            };
+                        } catch {
+                            return { items: [], pending: 0 };
+                        }
+                    }),
+                );
+                const pendingReviews = reviewPages.flatMap((page) => page.items);
                 setCurrentProject(project);
                 setForms(projectForms);
                 const projectDatasets = (Array.isArray(analyticsSources) ? analyticsSources : [])
@@ -508,6 +515,7 @@ const ProjectWorkspace: React.FC = () => {
                     }));
                 setDatasets(projectDatasets);
                 setReviewQueue(pendingReviews);
+                setPendingReviewCount(reviewPages.reduce((sum, page) => sum + page.pending, 0));
                 setTasks(projectTasks);
                 setAttendanceRecords(projectAttendance);
                 setReports(projectReports);
@@ -787,7 +795,7 @@ const ProjectWorkspace: React.FC = () => {
         const publishedReports = reports.filter((report) => report.status === 'published').length;
 
         return {
-            pendingReview: reviewQueue.length,
+            pendingReview: pendingReviewCount,
             sourceLinkedTasks,
             automatedTasks,
             completedTasks,
@@ -795,7 +803,7 @@ const ProjectWorkspace: React.FC = () => {
             attendanceCompletionRate: attendanceRecords.length > 0 ? Math.round((attendanceSummary.checkedOut / attendanceRecords.length) * 100) : 0,
             publishedReports,
         };
-    }, [attendanceRecords.length, attendanceSummary.checkedOut, reports, reviewQueue.length, tasks]);
+    }, [attendanceRecords.length, attendanceSummary.checkedOut, pendingReviewCount, reports, tasks]);
 
     const workflowJoinNotes = useMemo(() => ([
         'Source records join to assignments through source_submission_id on project tasks.',
@@ -998,6 +1006,7 @@ const ProjectWorkspace: React.FC = () => {
         try {
             await submissionAPI.review(submissionId, { review_status: reviewStatus });
             setReviewQueue(prev => prev.filter(item => item.id !== submissionId));
+            setPendingReviewCount(prev => Math.max(0, prev - 1));
         } catch (err: any) {
             setError(err?.response?.data?.detail || err?.message || 'Failed to update submission review');
         }